@@ -1,9 +1,8 @@
 # type: ignore
 # %% Import Python libraries and set up Trino
-import openpyxl as px
 import polars as pl
-from openpyxl.utils.dataframe import dataframe_to_rows
 from tq.connectors import get_trino_connection
+from tq.reports import write_workbook
 
 trino_conn = get_trino_connection()
 
@@ -11,23 +10,6 @@ MIN_N_PAYERS = 2
 MIN_RATE_SCORE = 3
 
 
-# Automatically set the column width in Excel sheets based on the content
-def set_column_width(sheet, column, max_width):
-    max_length = 0
-    column_letter = column[0].column_letter
-    for cell in column:
-        try:
-            if (
-                len(str(cell.value)) > max_length
-                and len(str(cell.value)) < max_width
-            ):
-                max_length = len(str(cell.value))
-        except AttributeError:
-            pass
-    adjusted_width = max_length + 2
-    sheet.column_dimensions[column_letter].width = adjusted_width
-
-
 # %% Grab hand-picked codes and attach revenue
 codes_df = pl.read_csv(
     "data/input/codes.csv", dtypes={"billing_code": pl.String}
@@ -110,39 +92,16 @@ provider_counts_df = provider_counts_df.select(
     pl.col("percent_coverage").alias("Percent Coverage"),
 )
 
-# %% Write the results to an Excel file
-wb = px.Workbook()
-ws1 = wb.active
-ws1.title = "Codes"
-for r in dataframe_to_rows(codes_df.to_pandas(), index=False, header=True):
-    ws1.append(r)
-# Set the header row to bold and adjust column widths
-for cell in ws1[1]:
-    cell.font = px.styles.Font(bold=True)
-for col in ws1.columns:
-    set_column_width(ws1, col, 60)
-    if col[0].value == "Claims Revenue":
-        for cell in col[1:]:
-            cell.number_format = '"$"#,##0'
-
-    if (
-        col[0].value
-        == f"Percent Providers w >= {str(MIN_N_PAYERS)} Payers Per Code"
-    ):
-        for cell in col[1:]:
-            cell.number_format = "0.0%"
-
-ws2 = wb.create_sheet("Counts by Payer-Provider")
-for r in dataframe_to_rows(
-    provider_counts_df.to_pandas(), index=False, header=True
-):
-    ws2.append(r)
-for cell in ws2[1]:
-    cell.font = px.styles.Font(bold=True)
-for col in ws2.columns:
-    set_column_width(ws2, col, 60)
-    if col[0].value == "Percent Coverage":
-        for cell in col[1:]:
-            cell.number_format = "0.0%"
-
-wb.save("data/output/codes_check.xlsx")
+# %% Write the results to an Excel file. Rows are streamed in constant memory,
+# with bold headers, fitted column widths and per-column number formats
+write_workbook(
+    "data/output/codes_check.xlsx",
+    {"Codes": codes_df, "Counts by Payer-Provider": provider_counts_df},
+    formats={
+        "Claims Revenue": "currency",
+        f"Percent Providers w >= {str(MIN_N_PAYERS)} Payers Per Code": (
+            "percent"
+        ),
+        "Percent Coverage": "percent",
+    },
+)
@@ -1,33 +1,40 @@
 # %% Import Python libraries and set up Trino
 import logging
 
-import duckdb
 import polars as pl
-import requests as r
-from census import Census
-from dotenv import dotenv_values
+from tq.census import read_acs_geographies
 from tq.connectors import get_trino_connection
-from tq.utils import get_env_file_path
+from tq.query import render_sql
+from tq.rates import Bound, OutlierPolicy, Prefer, select_canonical
+from tq.traveltimes import read_times
 
 trino_conn = get_trino_connection()
-config = dotenv_values(get_env_file_path())
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Get OpenTimes DuckDB database
-duckdb_conn = duckdb.connect(database=":memory:")
-duckdb_conn.execute("""
-  INSTALL httpfs;
-  LOAD httpfs;
-  ATTACH 'https://data.opentimes.org/databases/0.0.1.duckdb' AS opentimes;
-""")
-
 
 # %% Grab hospital delivery rate data from Turquoise Health
 logger.info("Fetching raw data from Trino")
 
+# Replicate some Turquoise outlier trimming methods, since they aren't
+# applied to the full set of rates. Rates are trimmed in Trino, before
+# they're downloaded
+# https://turquoisehealth.zendesk.com/hc/en-us/articles/31190981752603-Outlier-Management-in-hospital-rates
+rates_outliers = OutlierPolicy(
+    [
+        Bound("final_rate_amount", 3000, 500_000),
+        # Don't use Medicare rates for comparison if they're null or 0
+        Bound.ratio(
+            "final_rate_amount", "medicare_rate", 0.6, 10.0, keep_missing=True
+        ),
+    ]
+)
+
 with open("queries/rates.sql", "r") as query:
-    rates_df = pl.read_database(query.read(), trino_conn)
+    rates_df = pl.read_database(
+        render_sql(query.read(), {"outlier_filter": rates_outliers.to_sql()}),
+        trino_conn,
+    )
 
 # Grab payer covered lives to use for weighting during aggregations
 with open("queries/payer_stats.sql", "r") as query:
@@ -50,23 +57,6 @@ rates_df = (
     )
 )
 
-# Replicate some Turquoise outlier trimming methods, since they aren't
-# applied to the full set of rates
-# https://turquoisehealth.zendesk.com/hc/en-us/articles/31190981752603-Outlier-Management-in-hospital-rates
-rates_fil_df = rates_df.filter(
-    (
-        # Don't use Medicare rates for comparison if they're null or 0
-        (pl.col("medicare_rate").is_null())
-        | (pl.col("medicare_rate") == 0)
-        | (
-            (pl.col("final_rate_amount") / pl.col("medicare_rate") >= 0.6)
-            & (pl.col("final_rate_amount") / pl.col("medicare_rate") <= 10.0)
-        )
-    )
-    & pl.col("final_rate_amount").is_between(3000, 500_000)
-    & pl.col("final_rate_amount").is_not_nan()
-)
-
 # If multiple rates exist for the same provider-payer-plan-drg
 # combination, then prioritize by most simple rate type. Many hospitals combine
 # case rates and per diem rates (i.e. a case rate for the first 2 days, then
@@ -82,7 +72,8 @@ rates_sort_cols = [
     "revenue_code",
     "final_rate_type",
 ]
-rates_type_rank = pl.Enum(
+rates_type_rank = Prefer.values(
+    "final_rate_type",
     [
         "case rate",
         "percent of total billed charges",
@@ -90,12 +81,13 @@ rates_type_rank = pl.Enum(
         "estimated allowed amount",
         "fee schedule",
         "other",
-    ]
+    ],
 )
-rates_fil_df = (
-    rates_fil_df.with_columns(pl.col("final_rate_type").cast(rates_type_rank))
-    .sort(rates_sort_cols, nulls_last=True)
-    .unique(rates_sort_cols, keep="first")
+# Keep one rate per rate type for each key, then sort so the simplest rate
+# type comes first, which the group_by(...).first() below relies on
+rates_fil_df = select_canonical(rates_df, rates_sort_cols).sort(
+    [*rates_sort_cols[:-1], rates_type_rank.rank(pl.String)],
+    nulls_last=True,
 )
 
 # Keep only revenue codes related to inpatient stays, null revenue codes,
@@ -156,7 +148,6 @@ rates_fil_df = rates_fil_df.filter(
 
 # %% Fetch Census population, housing, and income data
 logger.info("Fetching Census data")
-cen = Census(config.get("CENSUS_API_KEY"), year=2023)
 cen_vars = {
     "B01001_001E": "total_pop",
     "B19013_001E": "median_hh_income",
@@ -186,62 +177,14 @@ class CenDataFrame:
         ).select(pl.all().exclude("^ins_p.._work.*$"))
 
 
-# State
-cen_df_state = (
-    pl.DataFrame(cen.acs5.state(list(cen_vars.keys()), state_fips="*"))
-    .rename({**cen_vars, "state": "geoid"})
-    .cen.ins_agg()
-)
-
-# County
-cen_df_county = (
-    pl.DataFrame(
-        cen.acs5.state_county(
-            list(cen_vars.keys()), state_fips="*", county_fips="*"
-        )
-    )
-    .rename(cen_vars)
-    .with_columns(
-        pl.concat_str(pl.col("state"), pl.col("county")).alias("geoid")
-    )
-    .select(pl.exclude(["state", "county"]))
-    .cen.ins_agg()
-)
-
-# CBSA (no helper method for this one, so use the Census API directly)
-cen_request_cbsa = r.get(
-    (
-        "https://api.census.gov/data/2023/acs/acs5?get="
-        f"{','.join(list(cen_vars.keys()))}&for=metropolitan%20statistical%20area/"
-        f"micropolitan%20statistical%20area:*&key={config.get('CENSUS_API_KEY')}"
-    )
-).json()
-cen_df_cbsa = (
-    pl.DataFrame(cen_request_cbsa[1:])
-    .transpose()
-    .rename(
-        {
-            **{
-                "column_" + str(i): list(cen_vars.values())[i]
-                for i in range(0, len(cen_vars))
-            },
-            "column_" + str(len(cen_vars)): "geoid",
-        }
-    )
-    .with_columns(
-        pl.all().exclude("geoid").cast(pl.Float64),
-    )
-    .cen.ins_agg()
-)
-
-# ZCTA
-cen_df_zcta = (
-    pl.DataFrame(
-        cen.acs5.state_zipcode(list(cen_vars.keys()), state_fips="*", zcta="*")
-    )
-    .rename({**cen_vars, "zip code tabulation area": "geoid"})
-    .cen.ins_agg()
+# Fetch all geographies at once. Results are cached in .tq_cache/census
+cen_frames = read_acs_geographies(
+    cen_vars, ["state", "county", "cbsa", "zcta"], year=2023
 )
+cen_df_state = cen_frames["state"].cen.ins_agg()
+cen_df_county = cen_frames["county"].cen.ins_agg()
+cen_df_cbsa = cen_frames["cbsa"].cen.ins_agg()
+cen_df_zcta = cen_frames["zcta"].cen.ins_agg()
 
 
 # %% Attach Census data to rates and keep only needed columns
@@ -340,17 +283,14 @@ rates_clean_df.write_parquet("data/rates_clean.parquet")
 
 # %% Fetch ZIP code travel time data
 
-# Grab ZIP-to-ZIP driving travel times
-times_zcta_df = pl.DataFrame(
-    duckdb_conn.execute("""
-  SELECT origin_id, destination_id, duration_sec
-  FROM opentimes.public.times
-  WHERE version = '0.0.1'
-      AND mode = 'car'
-      AND year = '2024'
-      AND geography = 'zcta'
-      AND duration_sec <= 14400
-""").fetchdf()
+# Grab ZIP-to-ZIP driving travel times from the local OpenTimes mirror (synced
+# to .tq_cache/traveltimes on first run), only keeping ZIPs with providers
+times_zcta_df = read_times(
+    "car",
+    2024,
+    "zcta",
+    max_duration=14400,
+    destinations=rates_clean_df["geoid_zcta"].drop_nulls().unique(),
 )
 
 # Get all providers within the catchment of each ZIP
@@ -1,63 +1,11 @@
-import re
-
-import duckdb
 import polars as pl
-from census import Census
-from dotenv import dotenv_values
+import tq
+import tq.polars  # noqa: F401 (registers the .util namespaces)
+from tq.census import read_acs
 from tq.connectors import get_trino_connection
-from tq.utils import get_env_file_path
+from tq.traveltimes import read_times
 
 trino_conn = get_trino_connection()
-config = dotenv_values(get_env_file_path())
-cen = Census(config.get("CENSUS_API_KEY"), year=2023)
-
-# Get OpenTimes DuckDB database
-duckdb_conn = duckdb.connect(database=":memory:")
-duckdb_conn.execute("""
-  INSTALL httpfs;
-  LOAD httpfs;
-  ATTACH 'https://data.opentimes.org/databases/0.0.1.duckdb' AS opentimes;
-""")
-
-
-# Mini-classes for attaching utility methods to Polars DataFrames, mostly for
-# cleaning up OPAIS data
-@pl.api.register_dataframe_namespace("util")
-class UtilDataFrame:
-    def __init__(self, df: pl.DataFrame) -> None:
-        self._df = df
-
-    def to_snake_case(self) -> pl.DataFrame:
-        """Convert all column names to snake_case."""
-        return self._df.rename(
-            {
-                col: re.sub(r"[^a-zA-Z0-9]", "_", col.lower())
-                for col in self._df.columns
-            }
-        )
-
-    def empty_strings_to_null(self) -> pl.DataFrame:
-        """Convert all empty string columns to null."""
-        return self._df.with_columns(
-            pl.when(pl.col(pl.String).str.len_chars() == 0)
-            .then(None)
-            .otherwise(pl.col(pl.String))
-            .name.keep()
-        )
-
-
-@pl.api.register_expr_namespace("util")
-class UtilExpr:
-    def __init__(self, expr: pl.Expr) -> None:
-        self._expr = expr
-
-    def wmean(self, weight: str) -> pl.Expr:
-        """
-        Compute the weighted mean for an expression, given a weight column name.
-        Usage: pl.col("value_col").util.wmean("weight_col")
-        """
-        weights = pl.when(self._expr.is_not_null()).then(pl.col(weight))
-        return weights.dot(self._expr).truediv(weights.sum()).fill_nan(None)
 
 
 ###### Data loading ############################################################
@@ -72,9 +20,9 @@ with open("queries/rates_code.sql", "r") as query:
 
 # Load and cleanup the HRSA OPAIS data to get CAH status for each hospital
 opais_ce_df = (
-    pl.read_excel(
-        source="data/input/340b_opais.xlsx",
-        sheet_name="Covered Entities",
+    tq.read_excel_cached(
+        "data/input/340b_opais.xlsx",
+        "Covered Entities",
         read_options={"header_row": 3},
     )
     .util.to_snake_case()
@@ -220,31 +168,10 @@ ruca_df = (
 # 2022 Census counties (i.e. before Connecticut's 2022 redrawing), so we have
 # to manually match Connecticut providers
 cen_vars = {"B01001_001E": "total_pop", "B19013_001E": "median_hh_income"}
-cen_df_county = (
-    pl.DataFrame(
-        cen.acs5.state_county(
-            list(cen_vars.keys()), state_fips="*", county_fips="*"
-        )
-    )
-    .rename(cen_vars)
-    .with_columns(
-        pl.concat_str(pl.col("state"), pl.col("county")).alias("geoid")
-    )
-    .select(pl.exclude(["state", "county"]))
-)
+cen_df_county = read_acs(cen_vars, "county", year=2023)
 
-# Grab county-to-county driving times from OpenTimes
-times_county_df = pl.DataFrame(
-    duckdb_conn.execute("""
-  SELECT origin_id, destination_id, duration_sec
-  FROM opentimes.public.times
-  WHERE version = '0.0.1'
-      AND mode = 'car'
-      AND year = '2024'
-      AND geography = 'county'
-      AND duration_sec <= 3600
-""").fetchdf()
-)
+# Grab county-to-county driving times from the local OpenTimes mirror
+times_county_df = read_times("car", 2024, "county", max_duration=3600)
 
 ###### Data joining ############################################################
 
@@ -2,11 +2,17 @@
 import polars as pl
 from dotenv import dotenv_values
 from geopy.geocoders import GoogleV3
+from tq.geocode import Geocoder, GeopyBackend
 from tq.utils import get_env_file_path
 
-# Setup geocoding classes. Nominatim only allows 1 request per second
+# Setup geocoding classes. Results are cached in .tq_cache/geocode, so reruns
+# only send new addresses to Google. Google allows 50 requests per second
 config = dotenv_values(get_env_file_path())
-geocoder = GoogleV3(api_key=config.get("GOOGLE_API_KEY"))
+geocoder = Geocoder(
+    GeopyBackend(GoogleV3(api_key=config.get("GOOGLE_API_KEY")), timeout=10),
+    rate=40,
+    max_concurrency=16,
+)
 
 # %% Grab the OPAIS detailed entity data for geocoding
 opais_ce_child_df = pl.read_parquet("data/intermediate/opais_ce_child.parquet")
@@ -17,30 +23,12 @@ opais_cp_fil_df = pl.read_parquet(
 
 ##### Geocode CE sites #########################################################
 
-# %% Geocode the covered entity child sites
-opais_ce_unique_addresses = set(
-    opais_ce_child_df["street_address_full"].to_list()
-)
-opais_ce_lon = []
-opais_ce_lat = []
-
-for address in opais_ce_unique_addresses:
-    location = geocoder.geocode(address, exactly_one=True, timeout=5)
-    if location:
-        opais_ce_lon.append(location.longitude)
-        opais_ce_lat.append(location.latitude)
-    else:
-        opais_ce_lon.append(None)
-        opais_ce_lat.append(None)
-
-# %% Construct a dataframe of the geocoding results and attach it
-# back to the covered entity child dataframe
-opais_ce_geocoded_df = pl.DataFrame(
-    {
-        "street_address_full": list(opais_ce_unique_addresses),
-        "longitude": opais_ce_lon,
-        "latitude": opais_ce_lat,
-    }
+# %% Geocode the covered entity child sites and attach the results back to the
+# covered entity child dataframe
+opais_ce_geocoded_df = geocoder.geocode(
+    opais_ce_child_df["street_address_full"]
+).select(
+    pl.col("address").alias("street_address_full"), "longitude", "latitude"
 )
 opais_ce_child_df = opais_ce_child_df.join(
     opais_ce_geocoded_df,
@@ -54,30 +42,12 @@ opais_ce_child_df.write_parquet(
 
 ##### Geocode CP sites #########################################################
 
-# %% Geocode the contract pharmacy sites
-opais_cp_unique_addresses = set(
-    opais_cp_fil_df["street_address_full"].to_list()
-)
-opais_cp_lon = []
-opais_cp_lat = []
-
-for address in opais_cp_unique_addresses:
-    location = geocoder.geocode(address, exactly_one=True, timeout=10)
-    if location:
-        opais_cp_lon.append(location.longitude)
-        opais_cp_lat.append(location.latitude)
-    else:
-        opais_cp_lon.append(None)
-        opais_cp_lat.append(None)
-
-# %% Construct a dataframe of the geocoding results and attach it
-# back to the covered entity child dataframe
-opais_cp_geocoded_df = pl.DataFrame(
-    {
-        "street_address_full": list(opais_cp_unique_addresses),
-        "longitude": opais_cp_lon,
-        "latitude": opais_cp_lat,
-    }
+# %% Geocode the contract pharmacy sites and attach the results back to the
+# contract pharmacy dataframe
+opais_cp_geocoded_df = geocoder.geocode(
+    opais_cp_fil_df["street_address_full"]
+).select(
+    pl.col("address").alias("street_address_full"), "longitude", "latitude"
 )
 opais_cp_fil_df = opais_cp_fil_df.join(
     opais_cp_geocoded_df,
@@ -1,51 +1,14 @@
 # %% Import Python libraries and set up Trino
-import re
-
 import polars as pl
+import tq
+import tq.polars  # noqa: F401 (registers the .util namespaces)
 from tq.connectors import get_trino_connection
+from tq.polars import weighted_stats
+from tq.rates import Bound, OutlierPolicy
 
 trino_conn = get_trino_connection()
 
 
-# Mini-classes for attaching utility methods to Polars DataFrames
-@pl.api.register_dataframe_namespace("util")
-class UtilDataFrame:
-    def __init__(self, df: pl.DataFrame) -> None:
-        self._df = df
-
-    def to_snake_case(self: pl.DataFrame) -> pl.DataFrame:
-        """Convert all column names to snake_case."""
-        return self._df.rename(
-            {
-                col: re.sub(r"[^a-zA-Z0-9]", "_", col.lower())
-                for col in self._df.columns
-            }
-        )
-
-    def empty_strings_to_null(self: pl.DataFrame) -> pl.DataFrame:
-        """Convert all empty string columns to null."""
-        return self._df.with_columns(
-            pl.when(pl.col(pl.String).str.len_chars() == 0)
-            .then(None)
-            .otherwise(pl.col(pl.String))
-            .name.keep()
-        )
-
-
-@pl.api.register_expr_namespace("util")
-class UtilExpr:
-    def __init__(self, expr: pl.Expr) -> None:
-        self._expr = expr
-
-    def wmean(self, weight: str) -> pl.Expr:
-        """
-        Compute the weighted mean for an expression, given a weight column name.
-        Usage: pl.col("value_col").util.weighted_mean("weight_col")
-        """
-        weights = pl.when(self._expr.is_not_null()).then(pl.col(weight))
-        return weights.dot(self._expr).truediv(weights.sum()).fill_nan(None)
-
-
 ###### Data loading ############################################################
 
 # %% Grab Illinois hospital IDs, bed counts, locations from Turquoise
@@ -56,9 +19,25 @@ with open("queries/il_hospitals.sql", "r") as query:
 with open("queries/price_example.sql", "r") as query:
     price_example_df = pl.read_database(query.read(), trino_conn)
 
-# %% Grab Keytruda drug pricing example
+# %% Grab drug rates, trimming outliers in Trino before they're downloaded.
+# Drops some remaining outliers that result from whack dose standardization,
+# plus super high and low rates since they mess up % over ASP aggregations
+drug_rates_outliers = OutlierPolicy(
+    [
+        Bound.ratio("gross_charge_std", "asp", upper=10, keep_missing=True),
+        Bound.ratio(
+            "canonical_rate", "medicare_rate", upper=10, keep_missing=True
+        ),
+        Bound("canonical_rate", 1, 250_000),
+    ]
+)
 with open("queries/drug_rates.sql", "r") as query:
-    drug_rates_df = pl.read_database(query.read(), trino_conn)
+    drug_rates_df = pl.read_database(
+        tq.render_sql(
+            query.read(), {"outlier_filter": drug_rates_outliers.to_sql()}
+        ),
+        trino_conn,
+    )
 
 # %% Grab OBBB analysis data from Medicare cost reports
 with open("queries/obbb.sql", "r") as query:
@@ -83,34 +62,31 @@ with open("queries/medicare_cost_reports.sql", "r") as query:
 # %% Grab Illinois hospitals profiles data from HSFRB:
 # https://hfsrb.illinois.gov/inventories-data.html
 # Saved Excel file was manually cleaned to make it parseable with polars
+# Both sheets are parsed once and cached as Parquet in .tq_cache/excel
+ahq_sheets = tq.read_excel_cached(
+    "data/input/il_ahq_2023.xlsx", ["Counts", "Revenue"]
+)
 ahq_counts_df = (
-    pl.read_excel(source="data/input/il_ahq_2023.xlsx", sheet_name="Counts")
-    .util.to_snake_case()
-    .util.empty_strings_to_null()
+    ahq_sheets["Counts"].util.to_snake_case().util.empty_strings_to_null()
 )
 ahq_revenue_df = (
-    pl.read_excel(source="data/input/il_ahq_2023.xlsx", sheet_name="Revenue")
-    .util.to_snake_case()
-    .util.empty_strings_to_null()
+    ahq_sheets["Revenue"].util.to_snake_case().util.empty_strings_to_null()
 )
 
 # %% Grab OPAIS data from exported "daily" file: https://340bopais.hrsa.gov/home
+opais_sheets = tq.read_excel_cached(
+    "data/input/340b_opais.xlsx",
+    ["Covered Entities", "Contract Pharmacies"],
+    read_options={"header_row": 3},
+)
 opais_ce_df = (
-    pl.read_excel(
-        source="data/input/340b_opais.xlsx",
-        sheet_name="Covered Entities",
-        read_options={"header_row": 3},
-    )
+    opais_sheets["Covered Entities"]
     .util.to_snake_case()
     .util.empty_strings_to_null()
     .with_columns((pl.col("participating") == "TRUE").alias("participating"))
 )
 opais_cp_df = (
-    pl.read_excel(
-        source="data/input/340b_opais.xlsx",
-        sheet_name="Contract Pharmacies",
-        read_options={"header_row": 3},
-    )
+    opais_sheets["Contract Pharmacies"]
     .util.to_snake_case()
     .util.empty_strings_to_null()
     .with_columns((pl.col("participating") == "TRUE").alias("participating"))
@@ -277,38 +253,42 @@ ahq_merged_df = (
 
 # %% Aggregate drug rates to the provider + code level, weighting by payer
 # market share
+drug_rates_keys = ["provider_id", "provider_name", "billing_code"]
+drug_rates_base_df = drug_rates_df.with_columns(
+    (pl.col("canonical_rate") / pl.col("medicare_rate")).alias(
+        "rate_pct_of_medicare"
+    ),
+    (pl.col("canonical_rate") / pl.col("asp")).alias("rate_pct_of_asp"),
+    (pl.col("gross_charge_std") / pl.col("medicare_rate")).alias(
+        "gross_pct_of_medicare"
+    ),
+    (pl.col("gross_charge_std") / pl.col("asp")).alias("gross_pct_of_asp"),
+    (pl.col("canonical_rate") / pl.col("canonical_gross_charge")).alias(
+        "rate_to_gross"
+    ),
+    pl.col("state_market_share").fill_null(0.01).alias("state_market_share"),
+).filter(pl.col("count_enc").is_not_null())
+
+# Weighted means by state market share (biggest payer), all computed from
+# one grouped pass of weighted sums
+drug_rates_wtd_names = {
+    "canonical_rate": "rate_avg_wtd",
+    "rate_pct_of_asp": "rate_poa_avg_wtd",
+    "rate_pct_of_medicare": "rate_pom_avg_wtd",
+    "canonical_gross_charge": "gross_avg_wtd",
+    "gross_pct_of_asp": "gross_poa_avg_wtd",
+    "gross_pct_of_medicare": "gross_pom_avg_wtd",
+    "rate_to_gross": "rate_to_gross_avg_wtd",
+}
+drug_rates_wtd_df = weighted_stats(
+    drug_rates_base_df,
+    drug_rates_keys,
+    list(drug_rates_wtd_names),
+    "state_market_share",
+).rename({f"{c}_mean": name for c, name in drug_rates_wtd_names.items()})
+
 drug_rates_agg_df = (
-    drug_rates_df.with_columns(
-        (pl.col("canonical_rate") / pl.col("medicare_rate")).alias(
-            "rate_pct_of_medicare"
-        ),
-        (pl.col("canonical_rate") / pl.col("asp")).alias("rate_pct_of_asp"),
-        (pl.col("gross_charge_std") / pl.col("medicare_rate")).alias(
-            "gross_pct_of_medicare"
-        ),
-        (pl.col("gross_charge_std") / pl.col("asp")).alias("gross_pct_of_asp"),
-        pl.col("state_market_share")
-        .fill_null(0.01)
-        .alias("state_market_share"),
-    )
-    # Drop some remaining outliers that result from whack dose standardization
-    .filter(
-        (
-            (pl.col("gross_pct_of_asp") <= 10)
-            | (pl.col("gross_pct_of_asp").is_null())
-        )
-        & (
-            (pl.col("rate_pct_of_medicare") <= 10)
-            | (pl.col("rate_pct_of_medicare").is_null())
-        )
-    )
-    # Drop super high and low rates since they mess up % over ASP aggregations
-    .filter(
-        (pl.col("canonical_rate") >= 1)
-        & (pl.col("canonical_rate") <= 250_000)
-        & pl.col("count_enc").is_not_null()
-    )
-    .group_by(["provider_id", "provider_name", "billing_code"])
+    drug_rates_base_df.group_by(drug_rates_keys)
     .agg(
         # Unweighted averages of rates, gross charges, rate % of ASP,
         # gross % of ASP, and rate % of Medicare
@@ -332,33 +312,10 @@ drug_rates_agg_df = (
         pl.col("canonical_gross_charge").mean().alias("gross_avg_uwtd"),
         pl.col("gross_pct_of_asp").mean().alias("gross_poa_avg_uwtd"),
         pl.col("gross_pct_of_medicare").mean().alias("gross_pom_avg_uwtd"),
-        # Same as above, but now weighted by state market share (biggest payer)
-        pl.col("canonical_rate")
-        .util.wmean("state_market_share")
-        .alias("rate_avg_wtd"),
-        pl.col("rate_pct_of_asp")
-        .util.wmean("state_market_share")
-        .alias("rate_poa_avg_wtd"),
-        pl.col("rate_pct_of_medicare")
-        .util.wmean("state_market_share")
-        .alias("rate_pom_avg_wtd"),
-        pl.col("canonical_gross_charge")
-        .util.wmean("state_market_share")
-        .alias("gross_avg_wtd"),
-        pl.col("gross_pct_of_asp")
-        .util.wmean("state_market_share")
-        .alias("gross_poa_avg_wtd"),
-        pl.col("gross_pct_of_medicare")
-        .util.wmean("state_market_share")
-        .alias("gross_pom_avg_wtd"),
-        (pl.col("canonical_rate") / pl.col("canonical_gross_charge"))
-        .mean()
-        .alias("rate_to_gross_avg_uwtd"),
-        (pl.col("canonical_rate") / pl.col("canonical_gross_charge"))
-        .util.wmean("state_market_share")
-        .alias("rate_to_gross_avg_wtd"),
+        pl.col("rate_to_gross").mean().alias("rate_to_gross_avg_uwtd"),
         pl.col("count_enc").first().alias("count_enc"),
     )
+    .join(drug_rates_wtd_df, on=drug_rates_keys, how="left", nulls_equal=True)
 )
 
 drug_rates_cols = [
@@ -387,19 +344,27 @@ drug_rates_agg_df = drug_rates_agg_df.with_columns(
 )
 
 # %% Collapse to the provider-level, weighting by state-level code utilization
-drug_rates_provider_df = drug_rates_agg_df.group_by(
-    ["provider_id", "provider_name"]
-).agg(
-    *[
-        pl.col(c).sum().alias(c)
-        for c in [
+drug_rates_provider_df = (
+    drug_rates_agg_df.group_by(["provider_id", "provider_name"])
+    .agg(
+        pl.col(
             "rate_count_uwtd",
             "gross_count_uwtd",
             "rate_count_wtd",
             "gross_count_wtd",
-        ]
-    ],
-    *[pl.col(c).util.wmean("count_enc").alias(c) for c in drug_rates_cols],
+        ).sum()
+    )
+    .join(
+        weighted_stats(
+            drug_rates_agg_df,
+            ["provider_id", "provider_name"],
+            drug_rates_cols,
+            "count_enc",
+        ).rename({f"{c}_mean": c for c in drug_rates_cols}),
+        on=["provider_id", "provider_name"],
+        how="left",
+        nulls_equal=True,
+    )
 )
 
 # %% Recalculate DPP and DSH using estimated Medicaid spending cuts from the
@@ -99,37 +99,44 @@ payer_market_share AS (
     LEFT JOIN state_total AS st
         ON pr.state = st.state
         AND pr.line_of_business = st.line_of_business
+),
+
+drug_rates AS (
+    SELECT
+        pr.provider_id,
+        pr.provider_name,
+        pr.payer_id,
+        pr.payer_name,
+        pms.state_market_share,
+        pr.billing_code,
+        pr.medicare_rate,
+        pr.asp_payment_limit / 1.06 AS asp,
+        pr.canonical_rate,
+        pr.canonical_rate_source,
+        pr.canonical_rate_type,
+        pr.canonical_gross_charge,
+        pr.canonical_gross_charge_type,
+        -- MRF gross charges aren't (yet) standardized, so here just applying the
+        -- same dose transformation as was used for the rate
+        CASE WHEN pr.canonical_gross_charge_type = 'mrf_gross_charge_provider'
+                THEN (pr.canonical_gross_charge / pr.parsed_quantity)
+                * pr.asp_quantity
+            ELSE
+                pr.canonical_gross_charge
+        END AS gross_charge_std,
+        tn.count_enc
+    FROM parsed_rates AS pr
+    INNER JOIN top_n_drugs AS tn
+        ON pr.state = tn.state
+        AND pr.billing_code = tn.billing_code
+    LEFT JOIN payer_market_share AS pms
+        ON pr.state = pms.state
+        AND pr.payer_id = pms.payer_id
+    WHERE pr.taxonomy_grouping = 'Hospitals'
+        AND pr.canonical_rate_score >= 3
 )
 
-SELECT
-    pr.provider_id,
-    pr.provider_name,
-    pr.payer_id,
-    pr.payer_name,
-    pms.state_market_share,
-    pr.billing_code,
-    pr.medicare_rate,
-    pr.asp_payment_limit / 1.06 AS asp,
-    pr.canonical_rate,
-    pr.canonical_rate_source,
-    pr.canonical_rate_type,
-    pr.canonical_gross_charge,
-    pr.canonical_gross_charge_type,
-    -- MRF gross charges aren't (yet) standardized, so here just applying the
-    -- same dose transformation as was used for the rate
-    CASE WHEN pr.canonical_gross_charge_type = 'mrf_gross_charge_provider'
-            THEN (pr.canonical_gross_charge / pr.parsed_quantity)
-            * pr.asp_quantity
-        ELSE
-            pr.canonical_gross_charge
-    END AS gross_charge_std,
-    tn.count_enc
-FROM parsed_rates AS pr
-INNER JOIN top_n_drugs AS tn
-    ON pr.state = tn.state
-    AND pr.billing_code = tn.billing_code
-LEFT JOIN payer_market_share AS pms
-    ON pr.state = pms.state
-    AND pr.payer_id = pms.payer_id
-WHERE pr.taxonomy_grouping = 'Hospitals'
-    AND pr.canonical_rate_score >= 3
+-- Trim outlier rates server-side, using rules shared with ingest.py
+SELECT *
+FROM drug_rates
+WHERE {{ outlier_filter }}
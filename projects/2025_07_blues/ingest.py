@@ -1,51 +1,51 @@
 import polars as pl
-from tq.connectors import get_trino_connection
-
-trino_conn = get_trino_connection()
-
+import tq
+from tq.rates import Bound, OutlierPolicy, Prefer, select_canonical
 
 ###### Data loading ############################################################
 
-# Load flatfile of all Blues by state and transform to string of payer IDs
+# Load flatfile of all Blues by state
 blues_df = pl.read_csv(
     "data/blues.csv", schema_overrides={"state_fips": pl.String}
 )
-blues_payer_ids = ",".join(
-    f"'{val}'" for val in blues_df["tq_payer_id"].unique().to_list()
-)
+blues_payer_ids = blues_df["tq_payer_id"].cast(pl.String).unique()
 
 # Keep only states with 2+ Blues, make a separate list of those IDs
 blues_twos_df = blues_df.filter(pl.len().over("state_fips") >= 2)
-blues_twos_payer_ids = ",".join(
-    f"'{val}'" for val in blues_twos_df["tq_payer_id"].unique().to_list()
-)
-blues_twos_states = ",".join(
-    f"'{val}'" for val in blues_twos_df["state_name"].unique().to_list()
-)
-
-# Grab rates for states with multiple Blues
-with open("queries/blue_rates.sql", "r") as query:
-    sql_template = query.read()
-    sql = sql_template.replace("{{ blue_payer_ids }}", blues_twos_payer_ids)
-    sql = sql.replace("{{ blue_states }}", blues_twos_states)
-    blue_rates_df = pl.read_database(sql, trino_conn)
+blues_twos_payer_ids = blues_twos_df["tq_payer_id"].cast(pl.String).unique()
+blues_twos_states = blues_twos_df["state_name"].unique()
 
-with open("queries/blue_providers.sql", "r") as query:
-    sql_template = query.read()
-    sql = sql_template.replace("{{ blue_payer_ids }}", blues_twos_payer_ids)
-    sql = sql.replace("{{ blue_states }}", blues_twos_states)
-    blue_providers_df = pl.read_database(sql, trino_conn)
-
-with open("queries/stoploss.sql", "r") as query:
-    sql_template = query.read()
-    sql = sql_template.replace("{{ blue_payer_ids }}", blues_twos_payer_ids)
-    stoploss_df = pl.read_database(sql, trino_conn)
+# Drop some outliers not caught by CLD using % of Medicare rules. Applied
+# in the rates query, so the trimmed rates are never downloaded
+blue_rates_outliers = OutlierPolicy(
+    [Bound("canonical_rate_percent_of_medicare", 0.7, 100.0)]
+)
 
-# Grab employers that utilize any Blue payer
-with open("queries/employers.sql", "r") as query:
-    sql_template = query.read()
-    sql = sql_template.replace("{{ blue_payer_ids }}", blues_payer_ids)
-    employers_df = pl.read_database(sql, trino_conn)
+# Grab rates and providers for states with multiple Blues, plus employers
+# that utilize any Blue payer. The queries are independent, so run them
+# on Trino in parallel
+results = tq.run_queries(
+    {
+        "blue_rates": (
+            "queries/blue_rates.sql",
+            {"outlier_filter": blue_rates_outliers.to_sql("cld")},
+        ),
+        "blue_providers": "queries/blue_providers.sql",
+        "stoploss": "queries/stoploss.sql",
+        "employers": (
+            "queries/employers.sql",
+            {"blue_payer_ids": blues_payer_ids},
+        ),
+    },
+    params={
+        "blue_payer_ids": blues_twos_payer_ids,
+        "blue_states": blues_twos_states,
+    },
+)
+blue_rates_df = results["blue_rates"]
+blue_providers_df = results["blue_providers"]
+stoploss_df = results["stoploss"]
+employers_df = results["employers"]
 
 
 ###### Data cleaning ###########################################################
@@ -71,22 +71,16 @@ blue_rates_df_clean = blue_rates_df.join(
     ]
 )
 
-# Drop some outliers not caught by CLD using % of Medicare rules
-blue_rates_df_clean = blue_rates_df_clean.filter(
-    pl.col("canonical_rate_percent_of_medicare") >= 0.7,
-    pl.col("canonical_rate_percent_of_medicare") <= 100.0,
-)
-
 # For each provider-state-code combination, keep the highest scored rate of
 # each payer, then the min and max if any additional rows remain. Finally,
 # keep only rates that have a provider-code pair
 blue_rates_cols = ["state", "provider_id", "billing_code_type", "billing_code"]
 blue_rates_df_clean = (
-    blue_rates_df_clean.filter(
-        pl.col("canonical_rate_score")
-        == pl.col("canonical_rate_score")
-        .max()
-        .over(blue_rates_cols + ["payer_id"])
+    select_canonical(
+        blue_rates_df_clean,
+        blue_rates_cols + ["payer_id"],
+        priority=[Prefer.max("canonical_rate_score")],
+        tiebreak="all",
     )
     .filter(
         pl.all_horizontal(
@@ -53,3 +53,5 @@ WHERE cld.taxonomy_grouping = 'Hospitals'
         )
         OR cld.billing_code_type = 'MS-DRG'
     )
+    -- Drop outliers not caught by CLD, using rules shared with ingest.py
+    AND {{ outlier_filter }}
@@ -1,9 +1,21 @@
 import json
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
 from pathlib import Path
 from urllib.parse import urlencode
 
 import polars as pl
 import requests
+from requests.adapters import HTTPAdapter
+from tq.polars import read_json_records
+from tq.shard import consolidate_shards
+from tq.utils import temp_path
+from urllib3.util import Retry
 
 # Available via devtools in any browser session :P
 APP_ID = "2R6TWFHRPG"
@@ -19,64 +31,77 @@ HEADERS = {
     "Referer": "https://mishe.co/",
 }
 
+# Requests in flight at once, across all specialties and pages. Also the size
+# of the connection pool, so every worker reuses a warm connection
+MAX_WORKERS = 8
+
+# Columns every page is guaranteed to have. All hit columns are strings
+# (nested values as JSON), so pages from different specialties line up
+HIT_SCHEMA = {"objectID": pl.String, "npi": pl.String}
+
 INTERMEDIATE_DIR = Path("data/intermediate")
+PAGES_DIR = INTERMEDIATE_DIR / "cpw_providers"
 FINAL_DIR = Path("data/input")
 INTERMEDIATE_DIR.mkdir(parents=True, exist_ok=True)
 FINAL_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def normalize_hit(hit: dict) -> dict:
-    """
-    Normalize a single Algolia hit so Polars can infer a clean schema.
-
-    Strategy: make EVERY non-null value a string.
-    - dict / list  -> JSON string
-    - scalar       -> str(...)
-    - None stays None
-    """
-    out = {}
-    for k, v in hit.items():
-        if v is None:
-            out[k] = None
-        elif isinstance(v, (dict, list)):
-            out[k] = json.dumps(v, ensure_ascii=False)
-        else:
-            out[k] = str(v)
-    return out
-
-
-def search_letter_page(
-    letter: str, page: int, hits_per_page: int = 1000
-) -> dict:
+def make_session() -> requests.Session:
     """
-    Call Algolia search endpoint for a single page of results.
+    Pooled session that retries connection errors, rate limits (429) and
+    server errors with exponential backoff, honoring Retry-After.
     """
+    retry = Retry(
+        total=6,
+        backoff_factor=1.0,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=None,  # Algolia search is a POST, but idempotent
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=MAX_WORKERS, max_retries=retry
+    )
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", adapter)
+    return session
 
-    params_dict = {
-        "query": letter,
-        "hitsPerPage": hits_per_page,
-        "page": page,
-    }
-    params_str = urlencode(params_dict)
-
-    body = {"params": params_str}
 
-    resp = requests.post(SEARCH_URL, headers=HEADERS, data=json.dumps(body))
+def search_page(
+    session: requests.Session, query: str, page: int, hits_per_page: int
+) -> bytes:
+    """
+    Call Algolia search endpoint for a single page of results and return
+    the raw JSON response body.
+    """
+    params = {"query": query, "hitsPerPage": hits_per_page, "page": page}
+    resp = session.post(SEARCH_URL, json={"params": urlencode(params)})
     resp.raise_for_status()
-    return resp.json()
+    return resp.content
 
 
-def fetch_specialty_to_parquet(
-    specialty: str,
-    hits_per_page: int = 1000,
-    max_pages_per_specialty: int | None = None,
-) -> Path | None:
+def parse_hits(content: bytes) -> tuple[pl.DataFrame, int]:
     """
-    Fetch all providers for a given specialty,
-    save them to a Parquet file under data/intermediate, and return the path.
-    If there are no hits, returns None.
+    Parse an Algolia response into a frame of hits and the total page count.
+
+    The response is decoded by Polars without a loop over hits. Every hit
+    column is a string, formatted as the old per-hit normalize_hit did:
+    nested values as JSON text and scalars in their str() form, so pages
+    always share a schema.
     """
-    # Convert specialty to snake_case for filename
+    hits, response = read_json_records(content, "hits")
+    nb_pages = response.get("nbPages", 1)
+    if hits.height == 0:
+        return pl.DataFrame(schema=HIT_SCHEMA), nb_pages
+    missing = [
+        pl.lit(None, dtype).alias(name)
+        for name, dtype in HIT_SCHEMA.items()
+        if name not in hits.columns
+    ]
+    return hits.with_columns(missing), nb_pages
+
+
+def specialty_dir(specialty: str) -> Path:
+    """Checkpoint directory for one specialty, named in snake_case."""
     specialty_snake = (
         specialty.lower()
         .replace(" ", "_")
@@ -89,50 +114,113 @@ def fetch_specialty_to_parquet(
         .replace("'", "")
         .replace('"', "")
     )
-    out_path = INTERMEDIATE_DIR / f"cpw_provider_{specialty_snake}.parquet"
+    return PAGES_DIR / specialty_snake
 
-    if out_path.exists():
-        print(
-            f"[{specialty}] Parquet already exists at {out_path}, skipping query."
-        )
-        return out_path
 
-    print(f"[{specialty}] Querying Algolia...")
+def write_page(df: pl.DataFrame, path: Path) -> None:
+    """Atomically write one page checkpoint."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(path)
+    try:
+        df.write_parquet(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
 
-    all_hits = []
 
-    first_page = search_letter_page(
-        specialty, page=0, hits_per_page=hits_per_page
-    )
-    nb_pages = first_page.get("nbPages", 1)
+class SpecialtyFetcher:
+    """
+    Fetch every page of every specialty concurrently, checkpointing each
+    page to Parquet under data/intermediate/cpw_providers/<specialty>/.
 
-    pages_for_specialty = nb_pages
-    if max_pages_per_specialty is not None:
-        pages_for_specialty = min(nb_pages, max_pages_per_specialty)
+    Page 0 of each specialty is fetched first to learn its page count (saved
+    to _manifest.json), then the remaining pages are queued on the same
+    pool. Pages already on disk are skipped, so an interrupted run resumes
+    where it left off.
+    """
 
-    for page in range(pages_for_specialty):
-        if page > 0:
-            page_json = search_letter_page(
-                specialty, page=page, hits_per_page=hits_per_page
+    def __init__(
+        self,
+        hits_per_page: int = 1000,
+        max_pages_per_specialty: int | None = None,
+        max_workers: int = MAX_WORKERS,
+    ) -> None:
+        self.hits_per_page = hits_per_page
+        self.max_pages_per_specialty = max_pages_per_specialty
+        self.max_workers = max_workers
+        self.session = make_session()
+
+    def _page_path(self, specialty: str, page: int) -> Path:
+        return specialty_dir(specialty) / f"page_{page:04d}.parquet"
+
+    def _fetch_page(self, specialty: str, page: int) -> int:
+        """Fetch, parse and checkpoint one page. Returns the page count."""
+        content = search_page(
+            self.session, specialty, page, self.hits_per_page
+        )
+        hits, nb_pages = parse_hits(content)
+        if page == 0:
+            manifest = specialty_dir(specialty) / "_manifest.json"
+            manifest.parent.mkdir(parents=True, exist_ok=True)
+            manifest.write_text(json.dumps({"nb_pages": nb_pages}))
+        write_page(hits, self._page_path(specialty, page))
+        return nb_pages
+
+    def _remaining_pages(self, specialty: str, nb_pages: int) -> list[int]:
+        if self.max_pages_per_specialty is not None:
+            nb_pages = min(nb_pages, self.max_pages_per_specialty)
+        return [
+            page
+            for page in range(1, nb_pages)
+            if not self._page_path(specialty, page).exists()
+        ]
+
+    def run(self, specialties: list[str]) -> None:
+        """
+        Fetch all specialties. Pages that still fail after retries are
+        reported at the end; rerun to fetch just those.
+        """
+        failed: list[tuple[str, int, Exception]] = []
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            pending: dict[Future, tuple[str, int]] = {}
+
+            def submit(specialty: str, page: int) -> None:
+                future = pool.submit(self._fetch_page, specialty, page)
+                pending[future] = (specialty, page)
+
+            for specialty in specialties:
+                manifest = specialty_dir(specialty) / "_manifest.json"
+                if (
+                    manifest.exists()
+                    and self._page_path(specialty, 0).exists()
+                ):
+                    nb_pages = json.loads(manifest.read_text())["nb_pages"]
+                    for page in self._remaining_pages(specialty, nb_pages):
+                        submit(specialty, page)
+                else:
+                    submit(specialty, 0)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    specialty, page = pending.pop(future)
+                    try:
+                        nb_pages = future.result()
+                    except Exception as exc:
+                        print(f"[{specialty}] Page {page} failed: {exc}")
+                        failed.append((specialty, page, exc))
+                        continue
+                    if page == 0:
+                        remaining = self._remaining_pages(specialty, nb_pages)
+                        print(f"[{specialty}] {len(remaining) + 1} page(s)")
+                        for next_page in remaining:
+                            submit(specialty, next_page)
+
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} page(s) failed, rerun to resume: "
+                + ", ".join(f"{s} p{p}" for s, p, _ in failed[:10])
             )
-        else:
-            page_json = first_page
-
-        hits = page_json.get("hits", [])
-        if not hits:
-            break
-
-        for h in hits:
-            all_hits.append(normalize_hit(h))
-
-    if not all_hits:
-        print(f"[{specialty}] No hits for this specialty, nothing to save.")
-        return None
-
-    df = pl.DataFrame(all_hits, infer_schema_length=1000)
-    df.write_parquet(out_path)
-    print(f"[{specialty}] Wrote {df.height} rows to {out_path}")
-    return out_path
 
 
 def main():
@@ -143,27 +231,23 @@ def main():
 
     print(f"Found {len(specialties)} specialties to query")
 
-    for specialty in specialties:
-        fetch_specialty_to_parquet(specialty, hits_per_page=1000)
+    SpecialtyFetcher(hits_per_page=1000).run(specialties)
 
-    parquet_paths = sorted(INTERMEDIATE_DIR.glob("cpw_provider_*.parquet"))
+    parquet_paths = sorted(PAGES_DIR.glob("*/page_*.parquet"))
     if not parquet_paths:
         print("No intermediate parquet files found; nothing to concatenate.")
         return
 
-    dfs = []
-    for path in parquet_paths:
-        print(f"Loading {path}")
-        dfs.append(pl.read_parquet(path))
-
-    combined = pl.concat(dfs, how="diagonal_relaxed")
+    # Stream all pages into one file and write the unique NPIs in the same
+    # pass, without loading the pages into memory
     final_path = FINAL_DIR / "cpw_providers.parquet"
-    combined.write_parquet(final_path)
-    print(f"Wrote combined {combined.height} rows to {final_path}")
-
-    combined.select(pl.col("npi")).unique("npi").write_csv(
-        "data/output/cpw_provider_npis.csv"
+    combined = consolidate_shards(
+        parquet_paths,
+        final_path,
+        unique={"data/output/cpw_provider_npis.csv": ["npi"]},
     )
+    n_rows = combined.select(pl.len()).collect().item()
+    print(f"Wrote combined {n_rows} rows to {final_path}")
 
 
 if __name__ == "__main__":
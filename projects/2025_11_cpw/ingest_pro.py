@@ -1,45 +1,17 @@
-import re
-
 import polars as pl
 import polars.selectors as cs
 import tq
+import tq.polars  # noqa: F401 (registers the .util namespaces)
 
 trino_conn = tq.get_trino_connection()
 
 
-# Mini-classes for attaching utility methods to Polars DataFrames, mostly for
-# cleaning up OPAIS data
-@pl.api.register_dataframe_namespace("util")
-class UtilDataFrame:
-    def __init__(self, df: pl.DataFrame) -> None:
-        self._df = df
-
-    def to_snake_case(self) -> pl.DataFrame:
-        """Convert all column names to snake_case."""
-        return self._df.rename(
-            {
-                col: re.sub(r"[^a-zA-Z0-9]", "_", col.lower())
-                for col in self._df.columns
-            }
-        )
-
-    def empty_strings_to_null(self) -> pl.DataFrame:
-        """Convert all empty string columns to null."""
-        return self._df.with_columns(
-            pl.when(pl.col(pl.String).str.len_chars() == 0)
-            .then(None)
-            .otherwise(pl.col(pl.String))
-            .name.keep()
-        )
-
-
 ###### Data loading ############################################################
 
 # Grab professional/PG rates and NPIs from the files here:
 # https://www.costpluswellness.com/contracts/baylor-scott-and-white-professional
-bswh_pro_df_dict = pl.read_excel(
-    "data/input/CostPlusWellness.com_C010_RateSheet_BSWH_Professional.xlsx",
-    sheet_id=0,
+bswh_pro_df_dict = tq.read_excel_cached(
+    "data/input/CostPlusWellness.com_C010_RateSheet_BSWH_Professional.xlsx"
 )
 # Drop the free-standing imaging rates since they have a different file schema
 bswh_pro_fsi_df = bswh_pro_df_dict.pop("FreeStandingImaging")
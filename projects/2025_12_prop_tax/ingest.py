@@ -3,8 +3,8 @@ import os
 import polars as pl
 import requests
 from dotenv import load_dotenv
-from polars_readstat import scan_readstat
 from tq.connectors import get_trino_connection
+from tq.costreports import convert_cost_reports, scan_cost_reports
 
 load_dotenv()
 SC_HEADERS = {"X-App-Token": os.getenv("SOCRATA_APP_TOKEN")}
@@ -80,18 +80,11 @@ macneal_pins_df_confirmed.write_csv(
 
 # Load all cost report data from the SAS files at:
 # https://www.cms.gov/data-research/statistics-trends-and-reports/cost-reports/hospital-2552-2010-form
-cost_reports_dir = "data/input/cost_reports"
-cost_reports_dfs = []
-for file in sorted(os.listdir(cost_reports_dir)):
-    if file.endswith(".sas7bdat"):
-        year = int(file.replace("prds_hosp10_yr", "").replace(".sas7bdat", ""))
-        df = scan_readstat(f"{cost_reports_dir}/{file}")
-        df = df.rename(lambda x: x.lower())
-        df = df.with_columns(pl.lit(year).alias("year"))
-        cost_reports_dfs.append(df)
-
+# Each year is converted to Parquet once (in parallel) and only reconverted
+# if its SAS file changes. The scan then reads only the cells used below
+convert_cost_reports("data/input/cost_reports")
 cost_reports_df = (
-    pl.concat(cost_reports_dfs, how="diagonal")
+    scan_cost_reports()
     .select(
         pl.col("prvdr_num").alias("mcr_ccn"),
         pl.col("fy_end_dt").alias("mcr_fy_end_date"),
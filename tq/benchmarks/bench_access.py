@@ -0,0 +1,111 @@
+"""
+Compare join-based 2SFCA against tq.access sparse matrix products.
+
+Builds a synthetic national ZCTA-to-provider edge list (by default ~33k
+origins, 6k providers and 300 reachable providers per origin) and times
+the join/group-by pipeline against building a CatchmentMatrix and
+running 2SFCA, gravity and providers-within queries on it. Usage:
+
+    python benchmarks/bench_access.py [--origins 33000] [--per-origin 300]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import polars as pl
+
+from tq.access import (
+    CatchmentMatrix,
+    gaussian_decay,
+    gravity_access,
+    providers_within,
+    two_step_fca,
+)
+
+
+def synthetic_edges(
+    origins: int, providers: int, per_origin: int
+) -> pl.DataFrame:
+    """Random edges with durations up to 4 hours."""
+    rng = np.random.default_rng(0)
+    n = origins * per_origin
+    return pl.DataFrame(
+        {
+            "origin_id": np.repeat(np.arange(origins), per_origin).astype(str),
+            "provider_id": rng.integers(0, providers, n).astype(str),
+            "duration_sec": rng.uniform(0, 4 * 3600, n),
+        }
+    )
+
+
+def naive_2sfca(edges, supply, demand, max_duration):
+    """Join-based 2SFCA."""
+    catchment = edges.filter(pl.col("duration_sec") <= max_duration)
+    ratios = (
+        catchment.join(demand, on="origin_id")
+        .group_by("provider_id")
+        .agg(pl.col("pop").sum())
+        .join(supply, on="provider_id")
+        .select("provider_id", ratio=pl.col("beds") / pl.col("pop"))
+    )
+    return (
+        catchment.join(ratios, on="provider_id")
+        .group_by("origin_id")
+        .agg(pl.col("ratio").sum())
+    )
+
+
+def timed(name: str, func):
+    """Run and time one method."""
+    start = time.perf_counter()
+    result = func()
+    print(f"{name:>24}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--origins", type=int, default=33_000)
+    parser.add_argument("--providers", type=int, default=6_000)
+    parser.add_argument("--per-origin", type=int, default=300)
+    args = parser.parse_args()
+
+    edges = synthetic_edges(args.origins, args.providers, args.per_origin)
+    edges = edges.unique(["origin_id", "provider_id"])
+    supply = pl.DataFrame(
+        {
+            "provider_id": np.arange(args.providers).astype(str),
+            "beds": np.random.default_rng(1).integers(1, 500, args.providers),
+        }
+    )
+    demand = pl.DataFrame(
+        {
+            "origin_id": np.arange(args.origins).astype(str),
+            "pop": np.random.default_rng(2).integers(1, 50_000, args.origins),
+        }
+    )
+    print(f"{edges.height:,} edges")
+
+    timed(
+        "join 2SFCA (1 hr)", lambda: naive_2sfca(edges, supply, demand, 3600)
+    )
+    matrix = timed(
+        "build CSR matrix", lambda: CatchmentMatrix.from_edges(edges)
+    )
+    timed(
+        "CSR 2SFCA (1 hr)",
+        lambda: two_step_fca(matrix, supply, demand, max_duration=3600),
+    )
+    timed(
+        "CSR Gaussian 2SFCA",
+        lambda: two_step_fca(
+            matrix, supply, demand, decay=gaussian_decay(3600)
+        ),
+    )
+    timed("CSR gravity", lambda: gravity_access(matrix, supply, demand))
+    timed("CSR within 30 min", lambda: providers_within(matrix, 1800))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare canonical-rate selection by global sort against tq.rates.
+
+Builds a synthetic rates frame (provider x payer x code groups with a
+rate type and a score per rate) and keeps one rate per group three ways:
+the sort(...).unique(keep="first") used in the delivery costs ingest, the
+chained min().over(...) window filters used in the blues ingest, and
+tq.rates.select_canonical. Usage:
+
+    python benchmarks/bench_canonical.py [--rows 100000000] [--groups 20000000]
+"""
+
+import argparse
+import time
+
+import polars as pl
+
+from tq.rates import Prefer, select_canonical
+
+KEYS = ["provider_id", "payer_id", "billing_code"]
+
+RATE_TYPES = [
+    "case rate",
+    "percent of total billed charges",
+    "per diem",
+    "estimated allowed amount",
+    "fee schedule",
+    "other",
+]
+
+
+def synthetic_rates(rows: int, groups: int) -> pl.DataFrame:
+    """Build a deterministic rates frame with ``groups`` selection groups."""
+    idx = pl.int_range(rows, dtype=pl.UInt64)
+    group = idx.hash(1) % groups
+    return pl.select(
+        (group // 1000).cast(pl.UInt32).alias("provider_id"),
+        (group // 100 % 10).cast(pl.UInt32).alias("payer_id"),
+        (group % 100).cast(pl.String).alias("billing_code"),
+        pl.lit(pl.Series(RATE_TYPES))
+        .gather(idx.hash(2) % len(RATE_TYPES))
+        .alias("final_rate_type"),
+        ((idx.hash(3) % 100) / 100).alias("canonical_rate_score"),
+        ((idx.hash(4) % 10_000_000) / 100).alias("final_rate_amount"),
+    )
+
+
+def sort_unique(df: pl.DataFrame) -> pl.DataFrame:
+    """Selection as done in the delivery costs ingest."""
+    return (
+        df.with_columns(pl.col("final_rate_type").cast(pl.Enum(RATE_TYPES)))
+        .sort(
+            [*KEYS, "final_rate_type", "canonical_rate_score"],
+            descending=[False] * len(KEYS) + [False, True],
+            nulls_last=True,
+        )
+        .unique(KEYS, keep="first")
+    )
+
+
+def window_filters(df: pl.DataFrame) -> pl.DataFrame:
+    """Selection as done in the blues ingest, one window per rule."""
+    rank = pl.col("final_rate_type").cast(pl.Enum(RATE_TYPES)).to_physical()
+    score = pl.col("canonical_rate_score")
+    return (
+        df.filter(rank == rank.min().over(KEYS))
+        .filter(score == score.max().over(KEYS))
+        .filter(pl.int_range(pl.len()).over(KEYS) == 0)
+    )
+
+
+def timed(name: str, func) -> pl.DataFrame:
+    """Run and time one method."""
+    start = time.perf_counter()
+    result = func()
+    print(f"{name:>20}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--groups", type=int, default=20_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_rates(args.rows, args.groups)
+    print(f"{df.height:,} rows, {args.groups:,} groups")
+
+    sorted_df = timed("sort + unique", lambda: sort_unique(df))
+    timed("window filters", lambda: window_filters(df))
+    selected = timed(
+        "select_canonical",
+        lambda: select_canonical(
+            df,
+            KEYS,
+            priority=[
+                Prefer.values("final_rate_type", RATE_TYPES),
+                Prefer.max("canonical_rate_score"),
+            ],
+        ),
+    )
+
+    # Ties may be broken differently, but the winning ranks must agree
+    compare = [*KEYS, "canonical_rate_score"]
+    same = (
+        sorted_df.select(compare)
+        .sort(KEYS)
+        .equals(selected.select(compare).sort(KEYS))
+    )
+    print(f"{selected.height:,} rows selected, same as sort: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare streaming Arrow fetches against pl.read_database for one query.
+
+Each method runs in a fresh subprocess so that peak memory is measured
+independently. Requires a working Trino .env file. Usage:
+
+    python benchmarks/bench_fetch.py path/to/query.sql [--batch-size N]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+METHODS = ["read_database", "stream", "stream_to_parquet"]
+
+
+def run_method(method: str, sql_path: str, batch_size: int) -> dict:
+    """Run a single fetch method in the current process and time it."""
+    import polars as pl
+
+    from tq.connectors import get_trino_connection
+    from tq.query import load_sql
+    from tq.stream import peak_rss_bytes, stream_query
+
+    sql = load_sql(sql_path)
+    conn = get_trino_connection()
+    start = time.perf_counter()
+
+    if method == "read_database":
+        rows = pl.read_database(sql, conn).height
+    elif method == "stream":
+        rows = sum(b.num_rows for b in stream_query(sql, conn, batch_size))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            stream = stream_query(sql, conn, batch_size)
+            rows = stream.to_parquet(Path(tmp, "out.parquet")).rows
+
+    seconds = time.perf_counter() - start
+    return {
+        "method": method,
+        "rows": rows,
+        "seconds": round(seconds, 2),
+        "rows_per_sec": round(rows / seconds) if seconds else 0,
+        "peak_rss_mb": round((peak_rss_bytes() or 0) / 1024**2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sql_path")
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--method", choices=METHODS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.method:
+        print(
+            json.dumps(run_method(args.method, args.sql_path, args.batch_size))
+        )
+        return
+
+    for method in METHODS:
+        result = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                args.sql_path,
+                "--batch-size",
+                str(args.batch_size),
+                "--method",
+                method,
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        print(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
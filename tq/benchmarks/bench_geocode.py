@@ -0,0 +1,58 @@
+"""
+Compare serial geocoding against concurrent and cached tq.geocode runs.
+
+Uses the offline FakeBackend with a simulated per-request latency, so no
+API key or network access is needed. Usage:
+
+    python benchmarks/bench_geocode.py [--addresses 2000] [--latency 0.05]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from tq.geocode import FakeBackend, GeocodeCache, Geocoder
+
+
+def timed(name: str, func) -> None:
+    """Run and time one method."""
+    start = time.perf_counter()
+    func()
+    print(f"{name:>24}: {time.perf_counter() - start:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--addresses", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    addresses = [
+        f"{i} Main St, Chicago, IL 60601" for i in range(args.addresses)
+    ]
+    backend = FakeBackend(latency=args.latency)
+    print(f"{args.addresses:,} addresses, {args.latency * 1000:.0f}ms latency")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = GeocodeCache(Path(tmp, "geocode.sqlite"))
+        timed(
+            "serial",
+            lambda: Geocoder(backend, cache=False, max_concurrency=1).geocode(
+                addresses
+            ),
+        )
+        geocoder = Geocoder(
+            backend, cache=cache, max_concurrency=args.concurrency
+        )
+        timed(
+            f"concurrent ({args.concurrency})",
+            lambda: geocoder.geocode(addresses),
+        )
+        timed("cached rerun", lambda: geocoder.geocode(addresses))
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare brute-force haversine proximity against tq.spatial KD-tree queries.
+
+Builds a synthetic set of providers and query points spread over the
+continental US and times a chunked all-pairs haversine nearest-neighbor
+search against building a SpatialIndex and running kNN and radius
+queries on it. Usage:
+
+    python benchmarks/bench_spatial.py [--providers 50000] [--points 1000000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import polars as pl
+
+from tq.spatial import SpatialIndex, haversine
+
+
+def synthetic_points(n: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """Uniform points over the continental US bounding box."""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(25, 49, n), rng.uniform(-124, -67, n)
+
+
+def brute_force_nearest(lat, lon, plat, plon, chunk: int = 1_000):
+    """Nearest provider per point via all-pairs haversine."""
+    nearest = np.empty(len(lat), dtype=np.int64)
+    for start in range(0, len(lat), chunk):
+        stop = start + chunk
+        distances = haversine(
+            lat[start:stop, None], lon[start:stop, None], plat, plon
+        )
+        nearest[start:stop] = distances.argmin(axis=1)
+    return nearest
+
+
+def timed(name: str, func):
+    """Run and time one method."""
+    start = time.perf_counter()
+    result = func()
+    print(f"{name:>24}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--providers", type=int, default=50_000)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--brute-force-points", type=int, default=10_000)
+    args = parser.parse_args()
+
+    plat, plon = synthetic_points(args.providers, seed=0)
+    lat, lon = synthetic_points(args.points, seed=1)
+    providers = pl.DataFrame(
+        {"id": np.arange(args.providers), "lat": plat, "lon": plon}
+    )
+    n = args.brute_force_points
+    print(f"{args.providers:,} providers, {args.points:,} query points")
+
+    elapsed = time.perf_counter()
+    brute_force_nearest(lat[:n], lon[:n], plat, plon)
+    elapsed = (time.perf_counter() - elapsed) * args.points / n
+    print(f"{'brute force (projected)':>24}: {elapsed:.2f}s")
+
+    index = timed("build index", lambda: SpatialIndex.from_frame(providers))
+    timed("nearest k=1", lambda: index.nearest(lat, lon, k=1))
+    timed("nearest k=5", lambda: index.nearest(lat, lon, k=5))
+    timed("within 10 km", lambda: index.within(lat, lon, radius=10_000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compare the copy-pasted wmean namespace against tq.polars weighted stats.
+
+Builds a synthetic rates frame (provider x billing code groups, several
+rate columns and a market share weight) and times the same grouped
+weighted means three ways: the original wmean expression, the
+tq.polars wmean expression, and the fused tq.polars.weighted_stats. Usage:
+
+    python benchmarks/bench_weighted.py [--rows 50000000] [--groups 1000000]
+"""
+
+import argparse
+import time
+
+import polars as pl
+
+from tq.polars import weighted_stats
+
+VALUE_COLUMNS = [
+    "canonical_rate",
+    "rate_pct_of_asp",
+    "rate_pct_of_medicare",
+    "canonical_gross_charge",
+    "gross_pct_of_asp",
+    "gross_pct_of_medicare",
+    "rate_to_gross",
+    "medicare_rate",
+]
+
+
+def original_wmean(expr: pl.Expr, weight: str) -> pl.Expr:
+    """wmean as copy-pasted into the project ingest scripts."""
+    weights = pl.when(expr.is_not_null()).then(pl.col(weight))
+    return weights.dot(expr).truediv(weights.sum()).fill_nan(None)
+
+
+def synthetic_rates(rows: int, groups: int) -> pl.DataFrame:
+    """Build a deterministic rates frame with ~10% null values."""
+    idx = pl.int_range(rows, dtype=pl.UInt64)
+    return pl.select(
+        (idx.hash(1) % groups).alias("group_id"),
+        *[
+            pl.when(idx.hash(i + 10) % 10 == 0)
+            .then(None)
+            .otherwise((idx.hash(i + 20) % 1_000_000) / 100)
+            .alias(col)
+            for i, col in enumerate(VALUE_COLUMNS)
+        ],
+        ((idx.hash(2) % 1000) / 1000).alias("state_market_share"),
+    )
+
+
+def timed(name: str, func) -> pl.DataFrame:
+    """Run and time one method."""
+    start = time.perf_counter()
+    result = func()
+    print(f"{name:>20}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--groups", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = synthetic_rates(args.rows, args.groups)
+    print(f"{df.height:,} rows, {args.groups:,} groups")
+
+    original = timed(
+        "original wmean",
+        lambda: df.group_by("group_id").agg(
+            original_wmean(pl.col(c), "state_market_share").alias(f"{c}_mean")
+            for c in VALUE_COLUMNS
+        ),
+    )
+    timed(
+        "tq.polars wmean",
+        lambda: df.group_by("group_id").agg(
+            pl.col(c).util.wmean("state_market_share").alias(f"{c}_mean")
+            for c in VALUE_COLUMNS
+        ),
+    )
+    fused = timed(
+        "weighted_stats",
+        lambda: weighted_stats(
+            df, "group_id", VALUE_COLUMNS, "state_market_share"
+        ),
+    )
+
+    joined = original.join(fused, on="group_id", suffix="_fused")
+    max_diff = joined.select(
+        pl.max_horizontal(
+            (pl.col(f"{c}_mean") - pl.col(f"{c}_mean_fused")).abs().max()
+            for c in VALUE_COLUMNS
+        )
+    ).item()
+    print(f"max abs difference vs original: {max_diff}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,62 @@
-from .connectors import get_trino_connection
-from .utils import get_env_file_path, get_project_root
+import importlib
+from typing import TYPE_CHECKING, Any
 
-__all__ = ["get_trino_connection", "get_env_file_path", "get_project_root"]
+if TYPE_CHECKING:
+    from .cache import QueryCache
+    from .connectors import get_trino_connection
+    from .estimate import estimate_query
+    from .excel import read_excel_cached
+    from .incremental import refresh_incremental
+    from .pool import ConnectionPool, get_connection_pool
+    from .query import read_query, render_sql, run_queries
+    from .shard import (
+        Shard,
+        consolidate_shards,
+        run_sharded,
+        shards_by_range,
+        shards_by_values,
+    )
+    from .stream import stream_query
+    from .tables import TempTable, register_frame
+    from .utils import get_env_file_path, get_project_root
+
+# Public names and the submodules defining them. Submodules are only
+# imported on first access, so `import tq` stays fast and doesn't pull in
+# Polars, PyArrow or the Trino client until they're actually needed
+_EXPORTS = {
+    "ConnectionPool": "pool",
+    "QueryCache": "cache",
+    "Shard": "shard",
+    "TempTable": "tables",
+    "consolidate_shards": "shard",
+    "estimate_query": "estimate",
+    "get_connection_pool": "pool",
+    "get_env_file_path": "utils",
+    "get_project_root": "utils",
+    "get_trino_connection": "connectors",
+    "read_excel_cached": "excel",
+    "read_query": "query",
+    "refresh_incremental": "incremental",
+    "register_frame": "tables",
+    "render_sql": "query",
+    "run_queries": "query",
+    "run_sharded": "shard",
+    "shards_by_range": "shard",
+    "shards_by_values": "shard",
+    "stream_query": "stream",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    if name in _EXPORTS:
+        module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
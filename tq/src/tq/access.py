@@ -0,0 +1,453 @@
+"""
+Spatial accessibility from travel-time edge lists, as sparse matrix math.
+
+A :class:`CatchmentMatrix` stores origin-to-provider travel times (e.g.
+OpenTimes ZCTA times joined to provider locations) as a compressed sparse
+row (CSR) matrix. Catchment statistics then become sparse matrix-vector
+products instead of joins and group-bys over the long edge list:
+
+    from tq.access import CatchmentMatrix, gaussian_decay, two_step_fca
+
+    matrix = CatchmentMatrix.from_edges(
+        pl.read_parquet("data/zip_adj_matrix.parquet"),
+        max_duration=3600,
+    )
+    beds_per_capita = two_step_fca(
+        matrix,
+        supply=providers.select("provider_id", "total_beds"),
+        demand=zctas.select("geoid", "total_pop"),
+        decay=gaussian_decay(3600),
+    )
+
+Only numpy is needed: products are computed with ``np.bincount`` over the
+CSR structure.
+"""
+
+from collections.abc import Callable, Iterable
+from functools import cached_property
+
+import numpy as np
+import polars as pl
+
+# Maps an array of durations (seconds) to weights
+Decay = Callable[[np.ndarray], np.ndarray]
+
+# Supply or demand values: an array aligned to the matrix, or a frame of
+# (id, value) columns
+Values = np.ndarray | pl.Series | pl.DataFrame
+
+
+def gaussian_decay(max_duration: float) -> Decay:
+    """
+    Gaussian decay used by the Gaussian 2SFCA: weight 1 at zero duration,
+    falling to 0 at ``max_duration``.
+    """
+
+    def decay(durations: np.ndarray) -> np.ndarray:
+        ratio = np.minimum(durations / max_duration, 1.0)
+        weights = (np.exp(-0.5 * ratio**2) - np.exp(-0.5)) / (1 - np.exp(-0.5))
+        return np.where(durations <= max_duration, weights, 0.0)
+
+    return decay
+
+
+def power_decay(beta: float = 1.0, min_duration: float = 60.0) -> Decay:
+    """
+    Inverse power decay of classic gravity models, ``duration ** -beta``.
+    Durations are floored at ``min_duration`` so co-located origins and
+    providers don't get infinite weight.
+    """
+
+    def decay(durations: np.ndarray) -> np.ndarray:
+        return np.maximum(durations, min_duration) ** -beta
+
+    return decay
+
+
+def logistic_decay(midpoint: float, steepness: float) -> Decay:
+    """
+    Logistic decay, ``1 / (1 + exp(steepness * (duration - midpoint)))``:
+    close to 1 well under ``midpoint`` seconds and close to 0 well over.
+    """
+
+    def decay(durations: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(steepness * (durations - midpoint)))
+
+    return decay
+
+
+class CatchmentMatrix:
+    """
+    Sparse origin-by-provider matrix of travel durations in CSR layout.
+
+    Row ``i`` holds the providers reachable from ``origins[i]``: their
+    column indices are ``indices[indptr[i]:indptr[i + 1]]`` (into
+    ``providers``) and their travel times are the same slice of
+    ``durations``. Missing entries mean the provider is out of reach.
+
+    Build one with :meth:`from_edges`.
+    """
+
+    def __init__(
+        self,
+        origins: pl.Series,
+        providers: pl.Series,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        durations: np.ndarray,
+    ) -> None:
+        if len(indptr) != len(origins) + 1:
+            raise ValueError("indptr must have one more entry than origins.")
+        if len(indices) != len(durations) or indptr[-1] != len(indices):
+            raise ValueError("indices and durations must have nnz entries.")
+        self.origins = origins
+        self.providers = providers
+        self.indptr = indptr
+        self.indices = indices
+        self.durations = durations
+
+    def __repr__(self) -> str:
+        return (
+            f"CatchmentMatrix({len(self.origins):,} origins x "
+            f"{len(self.providers):,} providers, {self.nnz:,} entries)"
+        )
+
+    @classmethod
+    def from_edges(
+        cls,
+        edges: pl.DataFrame | pl.LazyFrame,
+        origin: str = "origin_id",
+        provider: str = "provider_id",
+        duration: str = "duration_sec",
+        max_duration: float | None = None,
+        origins: Iterable | None = None,
+    ) -> "CatchmentMatrix":
+        """
+        Build a matrix from a long edge list of travel times.
+
+        Duplicate (origin, provider) pairs, e.g. from providers with
+        several locations, keep their shortest duration.
+
+        :param edges:
+            Edge list with origin, provider and duration columns.
+        :type edges: pl.DataFrame | pl.LazyFrame
+        :param origin:
+            Origin ID column.
+        :type origin: str
+        :param provider:
+            Provider ID column.
+        :type provider: str
+        :param duration:
+            Travel duration column, in seconds.
+        :type duration: str
+        :param max_duration:
+            Drop edges longer than this many seconds.
+        :type max_duration: float
+        :param origins:
+            Extra origin IDs to include as empty rows, e.g. all ZCTAs, so
+            origins with no provider in reach still get a score.
+        :type origins: Iterable
+
+        :return:
+            The sparse matrix.
+        :rtype: CatchmentMatrix
+        """
+        lf = edges.lazy().select(
+            pl.col(origin), pl.col(provider), pl.col(duration).cast(pl.Float64)
+        )
+        lf = lf.drop_nulls()
+        if max_duration is not None:
+            lf = lf.filter(pl.col(duration) <= max_duration)
+        df = (
+            lf.group_by(origin, provider).agg(pl.col(duration).min()).collect()
+        )
+
+        origin_ids = df.get_column(origin)
+        if origins is not None:
+            extra = pl.Series(origin, list(origins), dtype=origin_ids.dtype)
+            origin_ids = pl.concat([origin_ids, extra])
+        origin_ids = origin_ids.unique().sort()
+        provider_ids = df.get_column(provider).unique().sort()
+
+        df = df.join(
+            origin_ids.to_frame().with_row_index("__row"), on=origin
+        ).join(provider_ids.to_frame().with_row_index("__col"), on=provider)
+        rows = df.get_column("__row").to_numpy().astype(np.int64)
+        cols = df.get_column("__col").to_numpy().astype(np.int64)
+        # Sorting a single combined key is much faster than a multi-column
+        # sort, and orders entries by row then column
+        order = np.argsort(rows * len(provider_ids) + cols)
+
+        indptr = np.zeros(len(origin_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(origin_ids)), out=indptr[1:])
+
+        return cls(
+            origin_ids,
+            provider_ids,
+            indptr,
+            cols[order],
+            df.get_column(duration).to_numpy()[order],
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """(number of origins, number of providers)"""
+        return len(self.origins), len(self.providers)
+
+    @property
+    def nnz(self) -> int:
+        """Number of stored (origin, provider) entries."""
+        return len(self.indices)
+
+    @cached_property
+    def rows(self) -> np.ndarray:
+        """Row (origin) index of every stored entry."""
+        return np.repeat(
+            np.arange(len(self.origins), dtype=np.int64), np.diff(self.indptr)
+        )
+
+    def weights(self, decay: Decay | None = None) -> np.ndarray:
+        """Weight of every stored entry: ``decay(duration)``, or all 1s."""
+        if decay is None:
+            return np.ones(self.nnz)
+        return decay(self.durations)
+
+    def within(self, max_duration: float) -> "CatchmentMatrix":
+        """Matrix with only the entries up to ``max_duration`` seconds."""
+        keep = self.durations <= max_duration
+        indptr = np.zeros_like(self.indptr)
+        np.cumsum(
+            np.bincount(self.rows[keep], minlength=len(self.origins)),
+            out=indptr[1:],
+        )
+        return CatchmentMatrix(
+            self.origins,
+            self.providers,
+            indptr,
+            self.indices[keep],
+            self.durations[keep],
+        )
+
+    def matvec(
+        self, provider_values: np.ndarray, decay: Decay | None = None
+    ) -> np.ndarray:
+        """
+        Weighted sum over providers for each origin:
+        ``out[o] = sum_p decay(d[o, p]) * provider_values[p]``.
+        """
+        return np.bincount(
+            self.rows,
+            weights=self.weights(decay) * provider_values[self.indices],
+            minlength=len(self.origins),
+        )
+
+    def rmatvec(
+        self, origin_values: np.ndarray, decay: Decay | None = None
+    ) -> np.ndarray:
+        """
+        Weighted sum over origins for each provider:
+        ``out[p] = sum_o decay(d[o, p]) * origin_values[o]``.
+        """
+        return np.bincount(
+            self.indices,
+            weights=self.weights(decay) * origin_values[self.rows],
+            minlength=len(self.providers),
+        )
+
+    def align(self, values: Values, axis: str) -> np.ndarray:
+        """
+        Align values to the matrix origins or providers.
+
+        :param values:
+            An array already in matrix order, or a frame whose first
+            column holds IDs and second column values. IDs missing from
+            the frame get 0.
+        :type values: np.ndarray | pl.Series | pl.DataFrame
+        :param axis:
+            ``"origins"`` or ``"providers"``.
+        :type axis: str
+
+        :return:
+            Float array with one value per origin or provider.
+        :rtype: np.ndarray
+        """
+        ids = self.origins if axis == "origins" else self.providers
+        if isinstance(values, pl.DataFrame):
+            id_col, value_col = values.columns[:2]
+            values = (
+                ids.to_frame("__id")
+                .join(
+                    values.select(
+                        pl.col(id_col).cast(ids.dtype).alias("__id"),
+                        pl.col(value_col).cast(pl.Float64),
+                    )
+                    .group_by("__id")
+                    .agg(pl.col(value_col).sum()),
+                    on="__id",
+                    how="left",
+                    maintain_order="left",
+                )
+                .get_column(value_col)
+                .fill_null(0.0)
+            )
+        array = np.asarray(values, dtype=np.float64)
+        if array.shape != (len(ids),):
+            raise ValueError(f"Expected {len(ids)} values, one per {axis}.")
+        return array
+
+    def to_edges(
+        self,
+        origin: str = "origin_id",
+        provider: str = "provider_id",
+        duration: str = "duration_sec",
+    ) -> pl.DataFrame:
+        """Convert back to a long edge list."""
+        return pl.DataFrame(
+            {
+                origin: self.origins.gather(self.rows),
+                provider: self.providers.gather(self.indices),
+                duration: self.durations,
+            }
+        )
+
+
+def _origin_frame(
+    matrix: CatchmentMatrix, name: str, values: np.ndarray
+) -> pl.DataFrame:
+    """Pair per-origin results with their IDs."""
+    return pl.DataFrame({"origin_id": matrix.origins, name: values})
+
+
+def two_step_fca(
+    matrix: CatchmentMatrix,
+    supply: Values,
+    demand: Values,
+    max_duration: float | None = None,
+    decay: Decay | None = None,
+) -> pl.DataFrame:
+    """
+    Two-step floating catchment area (2SFCA) accessibility.
+
+    1. Each provider's supply is divided by the (decay-weighted) demand
+       within its catchment: ``R_p = S_p / sum_o f(d_op) D_o``.
+    2. Each origin sums the ratios of providers within its catchment:
+       ``A_o = sum_p f(d_op) R_p``.
+
+    Without a decay function every provider within ``max_duration`` (or
+    in the matrix) counts fully, which is the original 2SFCA. Pass e.g.
+    :func:`gaussian_decay` for the enhanced/Gaussian variants.
+
+    :param matrix:
+        Origin-by-provider travel times.
+    :type matrix: CatchmentMatrix
+    :param supply:
+        Provider capacity, e.g. beds or physicians.
+    :type supply: np.ndarray | pl.DataFrame
+    :param demand:
+        Origin demand, e.g. population.
+    :type demand: np.ndarray | pl.DataFrame
+    :param max_duration:
+        Catchment size in seconds.
+    :type max_duration: float
+    :param decay:
+        Distance decay applied in both steps.
+    :type decay: Callable
+
+    :return:
+        Frame of ``origin_id`` and ``accessibility`` (supply per unit of
+        demand).
+    :rtype: pl.DataFrame
+    """
+    if max_duration is not None:
+        matrix = matrix.within(max_duration)
+    supply = matrix.align(supply, "providers")
+    demand = matrix.align(demand, "origins")
+
+    catchment_demand = matrix.rmatvec(demand, decay)
+    ratios = np.divide(
+        supply,
+        catchment_demand,
+        out=np.zeros_like(supply),
+        where=catchment_demand > 0,
+    )
+    return _origin_frame(matrix, "accessibility", matrix.matvec(ratios, decay))
+
+
+def gravity_access(
+    matrix: CatchmentMatrix,
+    supply: Values,
+    demand: Values | None = None,
+    decay: Decay | None = None,
+) -> pl.DataFrame:
+    """
+    Gravity-model accessibility.
+
+    Without demand this is Hansen accessibility, ``A_o = sum_p S_p
+    f(d_op)``. With demand, each provider's supply is first discounted by
+    its potential demand, ``V_p = sum_o D_o f(d_op)``, giving
+    ``A_o = sum_p S_p f(d_op) / V_p`` (Joseph and Bantock).
+
+    :param matrix:
+        Origin-by-provider travel times.
+    :type matrix: CatchmentMatrix
+    :param supply:
+        Provider capacity.
+    :type supply: np.ndarray | pl.DataFrame
+    :param demand:
+        Optional origin demand.
+    :type demand: np.ndarray | pl.DataFrame
+    :param decay:
+        Distance decay, by default :func:`power_decay` with ``beta=1``.
+    :type decay: Callable
+
+    :return:
+        Frame of ``origin_id`` and ``accessibility``.
+    :rtype: pl.DataFrame
+    """
+    decay = decay or power_decay()
+    supply = matrix.align(supply, "providers")
+    if demand is not None:
+        potential = matrix.rmatvec(matrix.align(demand, "origins"), decay)
+        supply = np.divide(
+            supply, potential, out=np.zeros_like(supply), where=potential > 0
+        )
+    return _origin_frame(matrix, "accessibility", matrix.matvec(supply, decay))
+
+
+def providers_within(
+    matrix: CatchmentMatrix,
+    max_duration: float,
+    weights: Values | None = None,
+) -> pl.DataFrame:
+    """
+    Count the providers within ``max_duration`` seconds of each origin.
+
+    :param matrix:
+        Origin-by-provider travel times.
+    :type matrix: CatchmentMatrix
+    :param max_duration:
+        Maximum travel time in seconds.
+    :type max_duration: float
+    :param weights:
+        Optional provider values (e.g. beds) to sum instead of counting.
+    :type weights: np.ndarray | pl.DataFrame
+
+    :return:
+        Frame of ``origin_id`` and ``providers`` (the count or weighted
+        sum) for every origin.
+    :rtype: pl.DataFrame
+    """
+    values = (
+        np.ones(len(matrix.providers))
+        if weights is None
+        else matrix.align(weights, "providers")
+    )
+    reachable = (matrix.durations <= max_duration).astype(np.float64)
+    totals = np.bincount(
+        matrix.rows,
+        weights=reachable * values[matrix.indices],
+        minlength=len(matrix.origins),
+    )
+    if weights is None:
+        totals = totals.astype(np.int64)
+    return _origin_frame(matrix, "providers", totals)
@@ -0,0 +1,480 @@
+"""
+Asyncio-native Trino queries, for fanning out many small lookups at once.
+
+Queries go straight to the Trino HTTP protocol through a non-blocking
+``aiohttp`` session instead of the blocking ``trino.dbapi`` client, so
+dozens of queries can run concurrently from one event loop without threads.
+Requires the ``aio`` extra: ``pip install "tq[aio]"``.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import time
+import weakref
+from collections.abc import AsyncIterator, Mapping
+from contextlib import aclosing
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+import pyarrow as pa
+from trino.exceptions import TrinoQueryError
+
+from .connectors import get_trino_config
+from .query import load_sql, render_sql
+from .stats import QueryRecord, record_query
+from .stream import DEFAULT_BATCH_SIZE, FetchStats, trino_type_to_arrow
+
+try:
+    import aiohttp
+except ImportError as exc:
+    raise ImportError(
+        "tq.aio requires aiohttp. Install it with: pip install 'tq[aio]'"
+    ) from exc
+
+logger = logging.getLogger(__name__)
+
+# Trino asks clients to retry requests that fail with these statuses
+_RETRY_STATUSES = {429, 502, 503, 504}
+
+
+def _json_type(arrow_type: pa.DataType) -> pa.DataType:
+    """
+    Get the Arrow type used for a column in the Trino JSON protocol.
+
+    Times, binary values, rows and timestamps with time zones arrive as
+    strings or arrays that don't convert cleanly, so they're kept as
+    (JSON) strings.
+    """
+    if pa.types.is_list(arrow_type):
+        value_type = _json_type(arrow_type.value_type)
+        if value_type != arrow_type.value_type:
+            return pa.string()
+    elif pa.types.is_map(arrow_type):
+        item_type = _json_type(arrow_type.item_type)
+        if item_type != arrow_type.item_type:
+            return pa.string()
+    elif (
+        pa.types.is_time(arrow_type)
+        or pa.types.is_binary(arrow_type)
+        or pa.types.is_struct(arrow_type)
+        or (pa.types.is_timestamp(arrow_type) and arrow_type.tz)
+    ):
+        return pa.string()
+    return arrow_type
+
+
+def _wire_type(arrow_type: pa.DataType) -> pa.DataType:
+    """
+    Get the Arrow type values of a column are sent as in the JSON protocol.
+
+    Decimals, dates and timestamps are sent as strings e.g. ``"12.50"``,
+    ``"2024-01-01 00:00:00.000"``, including inside arrays and maps, so
+    they're read as strings and cast afterwards.
+    """
+    if pa.types.is_list(arrow_type):
+        return pa.list_(_wire_type(arrow_type.value_type))
+    if pa.types.is_map(arrow_type):
+        return pa.map_(
+            _wire_type(arrow_type.key_type), _wire_type(arrow_type.item_type)
+        )
+    if (
+        pa.types.is_decimal(arrow_type)
+        or pa.types.is_date(arrow_type)
+        or pa.types.is_timestamp(arrow_type)
+    ):
+        return pa.string()
+    return arrow_type
+
+
+def json_schema(columns: list[dict[str, Any]]) -> pa.Schema:
+    """
+    Build an Arrow schema from the ``columns`` of a Trino protocol response.
+
+    :param columns:
+        Column descriptions with ``name`` and ``type`` keys.
+    :type columns: list[dict]
+
+    :return:
+        Schema of the result.
+    :rtype: pyarrow.Schema
+    """
+    return pa.schema(
+        [
+            pa.field(col["name"], _json_type(trino_type_to_arrow(col["type"])))
+            for col in columns
+        ]
+    )
+
+
+def json_rows_to_batch(rows: list[Any], schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Convert rows of JSON values from the Trino protocol to a record batch.
+
+    :param rows:
+        Row arrays from the ``data`` of protocol responses.
+    :type rows: list
+    :param schema:
+        Schema of the result, see :func:`json_schema`.
+    :type schema: pyarrow.Schema
+
+    :return:
+        The rows as a record batch.
+    :rtype: pyarrow.RecordBatch
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for values, schema_field in zip(columns, schema):
+        arrow_type = schema_field.type
+        if pa.types.is_string(arrow_type):
+            array = pa.array(
+                [
+                    v if v is None or isinstance(v, str) else json.dumps(v)
+                    for v in values
+                ],
+                type=pa.string(),
+            )
+        elif pa.types.is_floating(arrow_type):
+            # NaN and infinity are sent as strings
+            array = pa.array(
+                [None if v is None else float(v) for v in values],
+                type=arrow_type,
+            )
+        else:
+            wire_type = _wire_type(arrow_type)
+            array = pa.array(values, type=wire_type)
+            if wire_type != arrow_type:
+                array = array.cast(arrow_type)
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class AsyncTrinoClient:
+    """
+    Non-blocking Trino client with a limit on concurrent queries.
+
+    All queries share one keep-alive HTTP session. At most
+    ``max_concurrency`` queries run on Trino at once; further queries wait
+    for a free slot. Cancelling the task running a query (or breaking out
+    of :meth:`iter_batches` early) cancels the query on the server too.
+    Use as an async context manager, or call :meth:`close` when done.
+
+    :param config:
+        Trino connection parameters, see
+        :func:`tq.connectors.get_trino_config`.
+        Loaded from the .env file on first use if not provided.
+    :type config: dict
+    :param max_concurrency:
+        Maximum number of queries running at the same time.
+    :type max_concurrency: int
+    :param http_scheme:
+        ``"https"`` (the default) or ``"http"``.
+    :type http_scheme: str
+    :param record_stats:
+        Append stats of finished queries to the query stats log, see
+        :mod:`tq.stats`.
+    :type record_stats: bool
+    """
+
+    def __init__(
+        self,
+        config: dict[str, Any] | None = None,
+        max_concurrency: int = 8,
+        http_scheme: str = "https",
+        record_stats: bool = True,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+
+        self.config = config
+        self.max_concurrency = max_concurrency
+        self.http_scheme = http_scheme
+        self.record_stats = record_stats
+        self._limiter = asyncio.Semaphore(max_concurrency)
+        self._session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> "AsyncTrinoClient":
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_config(self) -> dict[str, Any]:
+        """Get the connection parameters, loading the .env file once."""
+        if self.config is None:
+            self.config = get_trino_config()
+        return self.config
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the HTTP session on first use, inside the running loop."""
+        if self._session is None or self._session.closed:
+            config = self._get_config()
+            username = str(config.get("TQ_TRINO_USERNAME", "user"))
+            password = str(config.get("TQ_TRINO_PASSWORD", "password"))
+            headers = {
+                "Authorization": "Basic "
+                + base64.b64encode(f"{username}:{password}".encode()).decode(),
+                "X-Trino-User": username,
+                "X-Trino-Source": "tq",
+                "X-Trino-Catalog": config.get("TQ_TRINO_CATALOG", "hive"),
+                "X-Trino-Schema": config.get("TQ_TRINO_SCHEMA"),
+            }
+            self._session = aiohttp.ClientSession(
+                headers={k: v for k, v in headers.items() if v}
+            )
+        return self._session
+
+    @property
+    def statement_url(self) -> str:
+        """URL that new queries are submitted to."""
+        config = self._get_config()
+        host = config.get("TQ_TRINO_HOST", "trino")
+        port = int(str(config.get("TQ_TRINO_PORT", "443")))
+        return f"{self.http_scheme}://{host}:{port}/v1/statement"
+
+    async def _request(
+        self, method: str, url: str, data: bytes | None = None
+    ) -> dict[str, Any]:
+        """Send one protocol request, retrying when Trino asks to."""
+        session = self._get_session()
+        for attempt in range(5):
+            async with session.request(method, url, data=data) as response:
+                if response.status in _RETRY_STATUSES and attempt < 4:
+                    await asyncio.sleep(0.1 * 2**attempt)
+                    continue
+                response.raise_for_status()
+                return await response.json()
+        raise AssertionError("unreachable")
+
+    async def _cancel(self, next_uri: str, query_id: str | None) -> None:
+        """Cancel a running query on the server."""
+        try:
+            session = self._get_session()
+            async with session.delete(next_uri):
+                pass
+            logger.info("Cancelled Trino query %s", query_id)
+        except Exception as exc:
+            logger.warning(
+                "Failed to cancel Trino query %s: %s", query_id, exc
+            )
+
+    def _record(
+        self,
+        sql: str,
+        query_id: str | None,
+        server_stats: dict[str, Any],
+        client_stats: FetchStats,
+    ) -> None:
+        """Log server- and client-side stats of a finished query."""
+        if not self.record_stats:
+            return
+        try:
+            record_query(
+                QueryRecord.from_query(
+                    sql, query_id, server_stats, client_stats
+                )
+            )
+        except Exception as exc:
+            logger.warning("Failed to record query stats: %s", exc)
+
+    async def iter_batches(
+        self, sql: str, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> AsyncIterator[pa.RecordBatch]:
+        """
+        Run a query and iterate over its result as Arrow record batches.
+
+        A query with no rows yields a single empty batch with the result
+        schema. Statements without a result (e.g. DDL) yield nothing.
+
+        :param sql:
+            SQL text to execute.
+        :type sql: str
+        :param batch_size:
+            Maximum number of rows per record batch.
+        :type batch_size: int
+
+        :return:
+            Async iterator of record batches.
+        :rtype: AsyncIterator[pyarrow.RecordBatch]
+
+        :raises trino.exceptions.TrinoQueryError:
+            If the query fails on the server.
+        """
+        async with self._limiter:
+            stats = FetchStats()
+            response = await self._request(
+                "POST", self.statement_url, data=sql.encode("utf-8")
+            )
+            query_id = response.get("id")
+            next_uri = response.get("nextUri")
+            schema, rows, yielded = None, [], False
+            try:
+                while True:
+                    if response.get("error"):
+                        raise TrinoQueryError(response["error"], query_id)
+                    if schema is None and response.get("columns"):
+                        schema = json_schema(response["columns"])
+                    rows.extend(response.get("data") or [])
+                    next_uri = response.get("nextUri")
+
+                    while schema is not None and len(rows) >= batch_size:
+                        batch = json_rows_to_batch(rows[:batch_size], schema)
+                        rows = rows[batch_size:]
+                        if stats.first_row_seconds is None:
+                            stats.first_row_seconds = (
+                                time.perf_counter() - stats.started
+                            )
+                        stats.rows += batch.num_rows
+                        stats.batches += 1
+                        yielded = True
+                        yield batch
+
+                    if next_uri is None:
+                        break
+                    response = await self._request("GET", next_uri)
+
+                if schema is not None and (rows or not yielded):
+                    batch = json_rows_to_batch(rows, schema)
+                    stats.rows += batch.num_rows
+                    stats.batches += 1
+                    yield batch
+            finally:
+                if next_uri is not None:
+                    # The query was cancelled, failed on the client or the
+                    # consumer stopped early, so stop it on the server
+                    await asyncio.shield(self._cancel(next_uri, query_id))
+
+            stats.seconds = time.perf_counter() - stats.started
+            self._record(sql, query_id, response.get("stats") or {}, stats)
+
+    async def query(
+        self,
+        sql_or_path: str | Path,
+        params: Mapping[str, Any] | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> pl.DataFrame:
+        """
+        Run a (templated) query and collect the result as a DataFrame.
+
+        :param sql_or_path:
+            SQL text or path to a ``.sql`` template file.
+        :type sql_or_path: str | Path
+        :param params:
+            Values for ``{{ name }}`` template placeholders, see
+            :func:`tq.query.render_sql`.
+        :type params: Mapping
+        :param batch_size:
+            Maximum number of rows converted to Arrow at a time.
+        :type batch_size: int
+
+        :return:
+            The query result.
+        :rtype: pl.DataFrame
+        """
+        sql = render_sql(load_sql(sql_or_path), params)
+        batches = []
+        async with aclosing(self.iter_batches(sql, batch_size)) as stream:
+            async for batch in stream:
+                batches.append(batch)
+
+        if not batches:
+            return pl.DataFrame()
+        table = pa.Table.from_batches(batches)
+        return pl.from_arrow(table)  # type: ignore[return-value]
+
+
+# One default client per event loop, since HTTP sessions are bound to a loop
+_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_client() -> AsyncTrinoClient:
+    """
+    Get the default client of the running event loop, creating it if needed.
+
+    :return:
+        The shared client, limited to 8 concurrent queries.
+    :rtype: AsyncTrinoClient
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = AsyncTrinoClient()
+    return _clients[loop]
+
+
+async def query(
+    sql_or_path: str | Path,
+    params: Mapping[str, Any] | None = None,
+    client: AsyncTrinoClient | None = None,
+) -> pl.DataFrame:
+    """
+    Run a (templated) Trino query without blocking the event loop.
+
+    Run many queries concurrently with e.g. ``asyncio.gather``; the client
+    limits how many run on Trino at once. Cancelling the awaiting task
+    cancels the query on the server.
+
+    :param sql_or_path:
+        SQL text or path to a ``.sql`` template file.
+    :type sql_or_path: str | Path
+    :param params:
+        Values for ``{{ name }}`` template placeholders.
+    :type params: Mapping
+    :param client:
+        Client to use. Defaults to the shared client of the running loop,
+        see :func:`get_client`.
+    :type client: AsyncTrinoClient
+
+    :return:
+        The query result.
+    :rtype: pl.DataFrame
+    """
+    client = client or get_client()
+    return await client.query(sql_or_path, params)
+
+
+async def iter_batches(
+    sql_or_path: str | Path,
+    params: Mapping[str, Any] | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    client: AsyncTrinoClient | None = None,
+) -> AsyncIterator[pa.RecordBatch]:
+    """
+    Run a (templated) Trino query and iterate over Arrow record batches.
+
+    :param sql_or_path:
+        SQL text or path to a ``.sql`` template file.
+    :type sql_or_path: str | Path
+    :param params:
+        Values for ``{{ name }}`` template placeholders.
+    :type params: Mapping
+    :param batch_size:
+        Maximum number of rows per record batch.
+    :type batch_size: int
+    :param client:
+        Client to use. Defaults to the shared client of the running loop.
+    :type client: AsyncTrinoClient
+
+    :return:
+        Async iterator of record batches.
+    :rtype: AsyncIterator[pyarrow.RecordBatch]
+    """
+    client = client or get_client()
+    sql = render_sql(load_sql(sql_or_path), params)
+    async with aclosing(client.iter_batches(sql, batch_size)) as stream:
+        async for batch in stream:
+            yield batch
+
+
+async def close() -> None:
+    """Close the default client of the running event loop, if any."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .utils import get_cache_dir, temp_path
+
+if TYPE_CHECKING:
+    from .stream import QueryStream
+
+# Prefix for all tq keys stored in the Parquet footer key-value metadata
+METADATA_PREFIX = "tq."
+
+# Default cap on the total size of cached query results (20 GiB)
+DEFAULT_MAX_BYTES = 20 * 1024**3
+
+# Quoted SQL literals/identifiers and block comments (kept verbatim), a
+# line comment with the whitespace after it, or a run of whitespace
+_SQL_TOKENS = re.compile(
+    r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|/\*.*?\*/)|(--[^\n]*)\s*|\s+""",
+    re.DOTALL,
+)
+
+
+def _normalize_token(match: re.Match[str]) -> str:
+    """Replacement for one :data:`_SQL_TOKENS` match."""
+    if match.group(1) is not None:
+        return match.group(1)
+    if match.group(2) is not None:
+        # A line comment ends at a newline, which must be kept
+        return match.group(2) + "\n"
+    return " "
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapse runs of whitespace in SQL to single spaces, except inside
+    quoted string literals and identifiers and inside comments. The line
+    break ending a ``--`` comment is kept.
+    """
+    return _SQL_TOKENS.sub(_normalize_token, sql.strip())
+
+
+def cache_key(sql: str, catalog: str | None, schema: str | None) -> str:
+    """
+    Build a content-addressed cache key for a rendered SQL statement.
+
+    Whitespace differences in the SQL do not change the key, but anything
+    else (literals, comments, casing) does. Whitespace inside quoted
+    string literals, identifiers and comments is kept as is, see
+    :func:`normalize_sql`.
+
+    :param sql:
+        Fully rendered SQL text i.e. with all template values filled in.
+    :type sql: str
+    :param catalog:
+        Trino catalog the query runs against.
+    :type catalog: str
+    :param schema:
+        Trino schema the query runs against.
+    :type schema: str
+
+    :return:
+        Hex SHA-256 digest identifying the query result.
+    :rtype: str
+    """
+    payload = "\x1f".join([catalog or "", schema or "", normalize_sql(sql)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Hex SHA-256 digest of a file's contents, read in chunks so large
+    files are never held in memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_seconds(ttl: timedelta | float | None) -> float | None:
+    """Convert a TTL given as a timedelta or seconds to seconds."""
+    if isinstance(ttl, timedelta):
+        return ttl.total_seconds()
+    return ttl
+
+
+class QueryCache:
+    """
+    Local, content-addressed store of query results as zstd Parquet files.
+
+    Each entry is a single Parquet file named by its cache key. The file
+    modification time records when the result was fetched (used for TTL
+    checks) and the access time records the last cache hit (used for LRU
+    eviction once the cache grows beyond ``max_bytes``).
+
+    :param path:
+        Directory to store cached results in. Defaults to
+        ``<project root>/.tq_cache/queries``.
+    :type path: Path
+    :param max_bytes:
+        Maximum total size of the cache. Least recently used entries are
+        evicted after each write until the cache fits. ``None`` disables
+        eviction.
+    :type max_bytes: int
+    :param ttl:
+        Default time-to-live of an entry, as a timedelta or in seconds.
+        ``None`` means entries never expire.
+    :type ttl: timedelta | float
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        max_bytes: int | None = DEFAULT_MAX_BYTES,
+        ttl: timedelta | float | None = None,
+    ) -> None:
+        self.path = (
+            Path(path) if path is not None else get_cache_dir("queries")
+        )
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def path_for(self, key: str) -> Path:
+        """Get the Parquet file path for a cache key."""
+        return self.path / f"{key}.parquet"
+
+    def get(
+        self, key: str, ttl: timedelta | float | None = None
+    ) -> Path | None:
+        """
+        Look up a cache entry and mark it as recently used.
+
+        :param key:
+            Cache key, see :func:`cache_key`.
+        :type key: str
+        :param ttl:
+            Time-to-live override for this lookup. Falls back to the cache
+            default when not provided.
+        :type ttl: timedelta | float
+
+        :return:
+            Path to the cached Parquet file, or ``None`` if the entry is
+            missing or expired. Expired entries are deleted.
+        :rtype: Path | None
+        """
+        entry = self.path_for(key)
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            return None
+
+        max_age = _to_seconds(ttl if ttl is not None else self.ttl)
+        now = time.time()
+        if max_age is not None and now - stat.st_mtime > max_age:
+            entry.unlink(missing_ok=True)
+            return None
+
+        # Bump the access time only, the modification time is the fetch time
+        os.utime(entry, (now, stat.st_mtime))
+        return entry
+
+    def put(
+        self,
+        key: str,
+        table: pa.Table,
+        metadata: dict[str, Any] | None = None,
+    ) -> Path:
+        """
+        Store a query result, recording its provenance in the file footer.
+
+        :param key:
+            Cache key, see :func:`cache_key`.
+        :type key: str
+        :param table:
+            Query result to store.
+        :type table: pyarrow.Table
+        :param metadata:
+            Provenance information (SQL, params, etc.) to save in the Parquet
+            footer. Keys are prefixed with ``tq.`` and values are JSON
+            encoded.
+        :type metadata: dict
+
+        :return:
+            Path to the written Parquet file.
+        :rtype: Path
+        """
+        entry = self.path_for(key)
+        footer = dict(table.schema.metadata or {})
+        footer.update(encode_metadata(metadata or {}))
+
+        # Write to a temporary file first so that readers never see a
+        # partially written entry
+        tmp = temp_path(entry)
+        pq.write_table(
+            table.replace_schema_metadata(footer), tmp, compression="zstd"
+        )
+        os.replace(tmp, entry)
+
+        self.evict()
+        return entry
+
+    def put_stream(
+        self,
+        key: str,
+        stream: "QueryStream",
+        metadata: dict[str, Any] | None = None,
+    ) -> Path:
+        """
+        Store a streamed query result without materializing it in memory.
+
+        :param key:
+            Cache key, see :func:`cache_key`.
+        :type key: str
+        :param stream:
+            Query result stream, see :func:`tq.stream.stream_query`. The
+            final row count is added to the footer metadata automatically.
+        :type stream: tq.stream.QueryStream
+        :param metadata:
+            Provenance information to save in the Parquet footer.
+        :type metadata: dict
+
+        :return:
+            Path to the written Parquet file.
+        :rtype: Path
+        """
+        entry = self.path_for(key)
+        stream.to_parquet(entry, metadata=metadata)
+
+        self.evict()
+        return entry
+
+    def metadata(self, key: str) -> dict[str, Any]:
+        """Read the provenance metadata of a cache entry from its footer."""
+        return read_metadata(self.path_for(key))
+
+    def evict(self) -> list[Path]:
+        """
+        Delete least recently used entries until the cache fits.
+
+        :return:
+            Paths of the deleted entries.
+        :rtype: list[Path]
+        """
+        if self.max_bytes is None:
+            return []
+
+        entries = []
+        for entry in self.path.glob("*.parquet"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, entry in sorted(entries, key=lambda x: x[0]):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+            evicted.append(entry)
+
+        return evicted
+
+    def clear(self) -> None:
+        """Delete every entry in the cache."""
+        for entry in self.path.glob("*.parquet"):
+            entry.unlink(missing_ok=True)
+
+
+def encode_metadata(metadata: dict[str, Any]) -> dict[bytes, bytes]:
+    """Encode a metadata dict as prefixed Parquet footer key-value pairs."""
+    encoded = {}
+    for key, value in metadata.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        value = json.dumps(value, default=str)
+        encoded[f"{METADATA_PREFIX}{key}".encode()] = value.encode()
+
+    return encoded
+
+
+def read_metadata(path: Path) -> dict[str, Any]:
+    """
+    Read the ``tq.`` metadata stored in a Parquet file footer.
+
+    :param path:
+        Path to a Parquet file written by tq.
+    :type path: Path
+
+    :return:
+        Decoded metadata with the ``tq.`` prefix removed.
+    :rtype: dict
+    """
+    footer = pq.read_metadata(path).metadata or {}
+    metadata = {}
+    for key, value in footer.items():
+        key = key.decode()
+        if not key.startswith(METADATA_PREFIX):
+            continue
+        metadata[key.removeprefix(METADATA_PREFIX)] = json.loads(value)
+
+    return metadata
+
+
+def utc_now() -> datetime:
+    """Get the current time in UTC, used for fetch timestamps."""
+    return datetime.now(timezone.utc)
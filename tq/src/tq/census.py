@@ -0,0 +1,387 @@
+"""
+Cached, parallel fetches of American Community Survey (ACS) data from the
+Census API.
+
+All requests for all geographies run concurrently. Variable lists longer
+than the API's per-request limit are split across requests and joined
+back together. Results are written as typed Parquet to the shared tq cache
+keyed by (year, dataset, geography, variables), so reruns don't touch the
+network:
+
+    from tq.census import read_acs_geographies
+
+    frames = read_acs_geographies(
+        {"B01001_001E": "total_pop", "B19013_001E": "median_hh_income"},
+        ["state", "county", "cbsa", "zcta"],
+        year=2023,
+    )
+    frames["county"]  # geoid, total_pop, median_hh_income
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from .cache import encode_metadata, utc_now
+from .utils import get_cache_dir, get_env_file_path, temp_path
+
+logger = logging.getLogger(__name__)
+
+CENSUS_API_URL = "https://api.census.gov/data"
+
+# Maximum variables per Census API request
+MAX_VARIABLES = 50
+
+# Numeric variable codes: estimates, margins of error, and the percentage
+# versions of both e.g. B01001_001E, S0101_C01_001M or DP03_0009PE
+NUMERIC_VARIABLE = re.compile(r"^[A-Z0-9]+(?:_[A-Z0-9]+)*_\d+(?:E|M|PE|PM)$")
+
+# Annotation values the API returns in place of estimates, e.g. -666666666
+# when there are too few sample observations
+_ANNOTATIONS = [
+    "-111111111",
+    "-222222222",
+    "-333333333",
+    "-555555555",
+    "-666666666",
+    "-888888888",
+    "-999999999",
+]
+
+
+@dataclass(frozen=True)
+class Geography:
+    """How to request a geography and build its ``geoid``."""
+
+    for_clause: str
+    in_clause: str | None
+    id_columns: tuple[str, ...]
+
+
+_CBSA = "metropolitan statistical area/micropolitan statistical area"
+
+GEOGRAPHIES = {
+    "state": Geography("state:*", None, ("state",)),
+    "county": Geography("county:*", "state:*", ("state", "county")),
+    "place": Geography("place:*", "state:*", ("state", "place")),
+    "cbsa": Geography(f"{_CBSA}:*", None, (_CBSA,)),
+    "zcta": Geography(
+        "zip code tabulation area:*", None, ("zip code tabulation area",)
+    ),
+}
+
+
+def get_census_api_key() -> str | None:
+    """
+    Get the Census API key from ``CENSUS_API_KEY``, either in the
+    environment or in the .env file.
+    """
+    from dotenv import dotenv_values
+
+    key = os.environ.get("CENSUS_API_KEY")
+    if key is None:
+        key = dotenv_values(get_env_file_path()).get("CENSUS_API_KEY")
+    return key or None
+
+
+def _chunks(items: Sequence[str], size: int) -> list[list[str]]:
+    """Split a list into consecutive chunks of at most ``size`` items."""
+    return [list(items[i : i + size]) for i in range(0, len(items), size)]
+
+
+def _dtype_names(
+    variables: Sequence[str], dtypes: Mapping[str, pl.DataType] | None
+) -> dict[str, str]:
+    """Names of the dtype overrides that apply to the given variables."""
+    dtypes = dtypes or {}
+    return {v: str(dtypes[v]) for v in sorted(variables) if v in dtypes}
+
+
+def _cache_path(
+    year: int,
+    dataset: str,
+    geography: str,
+    variables: Sequence[str],
+    dtypes: Mapping[str, pl.DataType] | None = None,
+) -> Path:
+    """
+    Cache file for one (year, dataset, geography, variables, dtypes) fetch.
+    """
+    key = json.dumps(
+        [
+            year,
+            dataset,
+            geography,
+            sorted(variables),
+            _dtype_names(variables, dtypes),
+        ]
+    )
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    slug = dataset.replace("/", "_")
+    return (
+        get_cache_dir("census") / f"{slug}_{year}_{geography}_{digest}.parquet"
+    )
+
+
+def _request_json(
+    url: str, params: dict[str, str], retries: int = 2, backoff: float = 2.0
+) -> list[list[str]]:
+    """GET a Census API endpoint, retrying server errors."""
+    import requests
+
+    for attempt in range(retries + 1):
+        response = requests.get(url, params=params, timeout=300)
+        if response.status_code < 500 or attempt == retries:
+            break
+        delay = backoff * 2**attempt
+        logger.warning(
+            "Census API returned %d, retrying in %.1fs",
+            response.status_code,
+            delay,
+        )
+        time.sleep(delay)
+    response.raise_for_status()
+    return response.json()
+
+
+def parse_response(
+    rows: list[list[str]],
+    geography: str,
+    dtypes: Mapping[str, pl.DataType] | None = None,
+) -> pl.DataFrame:
+    """
+    Convert a Census API JSON response into a typed frame.
+
+    The first row of the response holds the column names and every value
+    is a string. Geography columns are combined into a single ``geoid``
+    (e.g. state + county FIPS). Numeric variables (estimates and margins
+    of error, see ``NUMERIC_VARIABLE``) are cast to Float64, with
+    annotation values like ``-666666666`` set to null. Other variables are
+    kept as strings.
+
+    :param rows:
+        Decoded JSON response.
+    :type rows: list
+    :param geography:
+        Name of the requested geography, see ``GEOGRAPHIES``.
+    :type geography: str
+    :param dtypes:
+        Optional dtype overrides by variable name.
+    :type dtypes: Mapping
+
+    :return:
+        Frame with a ``geoid`` column and one column per variable.
+    :rtype: pl.DataFrame
+    """
+    header, *data = rows
+    id_columns = GEOGRAPHIES[geography].id_columns
+    frame = pl.DataFrame(
+        data, schema=dict.fromkeys(header, pl.String), orient="row"
+    )
+    dtypes = dtypes or {}
+    variables = [col for col in header if col not in id_columns]
+
+    casts = []
+    for col in variables:
+        dtype = dtypes.get(col)
+        if dtype is None and NUMERIC_VARIABLE.match(col):
+            dtype = pl.Float64
+        if dtype is None or dtype == pl.String:
+            casts.append(pl.col(col))
+        elif dtype.is_numeric():
+            casts.append(
+                pl.when(pl.col(col).is_in(_ANNOTATIONS))
+                .then(None)
+                .otherwise(pl.col(col))
+                .cast(dtype, strict=False)
+                .alias(col)
+            )
+        else:
+            casts.append(pl.col(col).cast(dtype, strict=False))
+
+    return frame.select(
+        pl.concat_str([pl.col(c) for c in id_columns]).alias("geoid"),
+        *casts,
+    )
+
+
+def _write_cache(
+    frame: pl.DataFrame, path: Path, meta: dict[str, Any]
+) -> None:
+    """Atomically write a fetched frame with its request in the footer."""
+    table = frame.to_arrow()
+    table = table.replace_schema_metadata(
+        {
+            **(table.schema.metadata or {}),
+            **encode_metadata({**meta, "fetched_at": utc_now()}),
+        }
+    )
+    tmp = temp_path(path)
+    try:
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def read_acs_geographies(
+    variables: Sequence[str] | Mapping[str, str],
+    geographies: Sequence[str],
+    year: int,
+    dataset: str = "acs/acs5",
+    api_key: str | None = None,
+    dtypes: Mapping[str, pl.DataType] | None = None,
+    cache: bool = True,
+    refresh: bool = False,
+    max_concurrency: int = 8,
+) -> dict[str, pl.DataFrame]:
+    """
+    Fetch ACS variables for several geographies at once.
+
+    Every (geography, variable chunk) request that isn't cached runs
+    concurrently in a thread pool. Chunks for the same geography are
+    joined on ``geoid``.
+
+    :param variables:
+        Census variable codes, e.g. ``["B01001_001E"]``, or a mapping of
+        codes to output column names.
+    :type variables: Sequence[str] | Mapping[str, str]
+    :param geographies:
+        Geographies to fetch, any of ``"state"``, ``"county"``,
+        ``"place"``, ``"cbsa"`` and ``"zcta"``.
+    :type geographies: Sequence[str]
+    :param year:
+        Survey year i.e. the last year of 5-year estimates.
+    :type year: int
+    :param dataset:
+        Census API dataset path, e.g. ``"acs/acs5"`` or
+        ``"acs/acs1/profile"``.
+    :type dataset: str
+    :param api_key:
+        Census API key. Defaults to ``CENSUS_API_KEY`` from the environment
+        or .env file.
+    :type api_key: str
+    :param dtypes:
+        Optional dtype overrides by variable code. By default numeric
+        variables are Float64 and anything else a string.
+    :type dtypes: Mapping
+    :param cache:
+        Whether to read and write the Parquet cache.
+    :type cache: bool
+    :param refresh:
+        Fetch from the API even if a cached result exists.
+    :type refresh: bool
+    :param max_concurrency:
+        Maximum number of API requests in flight at once.
+    :type max_concurrency: int
+
+    :return:
+        Frames by geography, each with a ``geoid`` column and one column
+        per variable.
+    :rtype: dict[str, pl.DataFrame]
+    """
+    unknown = set(geographies) - set(GEOGRAPHIES)
+    if unknown:
+        raise ValueError(
+            f"Unknown geographies {sorted(unknown)}, expected any of "
+            f"{list(GEOGRAPHIES)}."
+        )
+    renames = dict(variables) if isinstance(variables, Mapping) else {}
+    codes = list(dict.fromkeys(variables))
+    url = f"{CENSUS_API_URL}/{year}/{dataset}"
+
+    frames: dict[str, pl.DataFrame] = {}
+    to_fetch: list[str] = []
+    for geography in dict.fromkeys(geographies):
+        path = _cache_path(year, dataset, geography, codes, dtypes)
+        if cache and not refresh and path.exists():
+            frames[geography] = pl.read_parquet(path)
+        else:
+            to_fetch.append(geography)
+
+    if to_fetch:
+        api_key = api_key or get_census_api_key()
+        jobs = [
+            (geography, chunk)
+            for geography in to_fetch
+            for chunk in _chunks(codes, MAX_VARIABLES)
+        ]
+        logger.info(
+            "Fetching %d Census API requests for %s",
+            len(jobs),
+            ", ".join(to_fetch),
+        )
+
+        def fetch(geography: str, chunk: list[str]) -> pl.DataFrame:
+            geo = GEOGRAPHIES[geography]
+            params = {"get": ",".join(chunk), "for": geo.for_clause}
+            if geo.in_clause:
+                params["in"] = geo.in_clause
+            if api_key:
+                params["key"] = api_key
+            return parse_response(
+                _request_json(url, params), geography, dtypes
+            )
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = list(executor.map(lambda job: fetch(*job), jobs))
+
+        for geography in to_fetch:
+            parts = [
+                frame
+                for (geo, _), frame in zip(jobs, results)
+                if geo == geography
+            ]
+            frame = parts[0]
+            for part in parts[1:]:
+                frame = frame.join(part, on="geoid", how="full", coalesce=True)
+            frame = frame.select("geoid", *codes).sort("geoid")
+            if cache:
+                _write_cache(
+                    frame,
+                    _cache_path(year, dataset, geography, codes, dtypes),
+                    {
+                        "year": year,
+                        "dataset": dataset,
+                        "geography": geography,
+                        "variables": codes,
+                        "dtypes": _dtype_names(codes, dtypes),
+                    },
+                )
+            frames[geography] = frame
+
+    return {
+        geography: frames[geography].rename(renames)
+        for geography in dict.fromkeys(geographies)
+    }
+
+
+def read_acs(
+    variables: Sequence[str] | Mapping[str, str],
+    geography: str,
+    year: int,
+    dataset: str = "acs/acs5",
+    **kwargs: Any,
+) -> pl.DataFrame:
+    """
+    Fetch ACS variables for a single geography. Takes the same arguments
+    as :func:`read_acs_geographies`.
+
+    :return:
+        Frame with a ``geoid`` column and one column per variable.
+    :rtype: pl.DataFrame
+    """
+    return read_acs_geographies(
+        variables, [geography], year, dataset, **kwargs
+    )[geography]
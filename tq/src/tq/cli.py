@@ -0,0 +1,65 @@
+import argparse
+from collections.abc import Sequence
+from pathlib import Path
+
+import polars as pl
+
+from .stats import load_stats, summarize_stats
+
+
+def stats_command(args: argparse.Namespace) -> None:
+    """Print a summary of the query stats log."""
+    stats = load_stats(args.log)
+    if stats.is_empty():
+        print("No queries recorded yet.")
+        return
+
+    if args.project:
+        stats = stats.filter(pl.col("project").str.contains(args.project))
+    summary = summarize_stats(stats, by=args.by, sort=args.sort)
+
+    with pl.Config(
+        tbl_rows=args.limit,
+        tbl_cols=-1,
+        tbl_width_chars=200,
+        fmt_str_lengths=60,
+        thousands_separator=True,
+    ):
+        print(summary.head(args.limit))
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Entry point for the ``tq`` command line tool."""
+    parser = argparse.ArgumentParser(
+        prog="tq", description="Price Points helper tools."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser(
+        "stats", help="Report Trino cost by query fingerprint or project."
+    )
+    stats_parser.add_argument(
+        "--by",
+        choices=["fingerprint", "project"],
+        default="fingerprint",
+        help="Group queries by SQL fingerprint or project.",
+    )
+    stats_parser.add_argument(
+        "--sort",
+        choices=["cpu_ms", "elapsed_ms", "processed_bytes", "runs"],
+        default="cpu_ms",
+        help="Total to sort groups by (descending).",
+    )
+    stats_parser.add_argument(
+        "--project", help="Only include projects matching this pattern."
+    )
+    stats_parser.add_argument(
+        "--limit", type=int, default=25, help="Number of groups to show."
+    )
+    stats_parser.add_argument(
+        "--log", type=Path, help="Path to the stats log file."
+    )
+    stats_parser.set_defaults(func=stats_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
@@ -1,17 +1,99 @@
+import threading
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import trino
 from dotenv import dotenv_values
 
 from .utils import get_env_file_path
 
+if TYPE_CHECKING:
+    import trino
+
+_config_cache: dict[Path, tuple[float, dict[str, str | None]]] = {}
+
+
+def get_trino_config(env_file: Path | None = None) -> dict[str, str | None]:
+    """
+    Load the Trino connection parameters (``TQ_TRINO_*``) from an env file.
+
+    The parsed file is memoized until it's modified, so calling this for
+    every query is cheap.
+
+    :param env_file:
+        Path to the .env file containing the connection parameters. If not
+        provided, uses the same lookup as :func:`get_trino_connection`.
+    :type env_file: Path
+
+    :return:
+        Dictionary of all values found in the env file.
+    :rtype: dict
+    """
+    env_file = get_env_file_path(env_file)
+    try:
+        mtime = env_file.stat().st_mtime
+    except OSError:
+        return dict(dotenv_values(env_file))
+
+    cached = _config_cache.get(env_file)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, dict(dotenv_values(env_file)))
+        _config_cache[env_file] = cached
+    return dict(cached[1])
+
+
+class LazyConnection:
+    """
+    Trino connection that's only created when it's first used.
+
+    Behaves like the ``trino.dbapi.Connection`` it wraps (attribute access
+    is forwarded), so it can be passed to ``pl.read_database`` and other
+    DB-API consumers. Scripts that only read local files never pay for
+    importing the Trino client or loading the env file.
+
+    :param env_file:
+        Path to the .env file containing the connection parameters.
+    :type env_file: Path
+    """
+
+    def __init__(self, env_file: Path | None = None) -> None:
+        self._env_file = env_file
+        self._conn: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        """Whether the underlying connection has been created."""
+        return self._conn is not None
+
+    def _connect(self) -> Any:
+        """Create the underlying connection on first use."""
+        with self._lock:
+            if self._conn is None:
+                self._conn = connect_trino(get_trino_config(self._env_file))
+        return self._conn
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__") or name in {"_conn", "_lock", "_env_file"}:
+            raise AttributeError(name)
+        return getattr(self._connect(), name)
+
+    def __enter__(self) -> Any:
+        return self._connect().__enter__()
+
+    def __exit__(self, *exc: object) -> Any:
+        return self._connect().__exit__(*exc)
+
 
 def get_trino_connection(
     env_file: Path | None = None,
-) -> trino.dbapi.Connection:
+) -> "trino.dbapi.Connection":
     """
     Create a connection object for Turquoise Trino using an env file.
 
+    The connection is created lazily: the env file is read and the Trino
+    client imported when the connection is first used, not when this is
+    called.
+
     :param env_file:
         Path to the .env file containing the connection parameters. If not
         provided, looks for .env in current working directory first,
@@ -22,13 +104,28 @@ def get_trino_connection(
         A Trino connection object for use with Pandas, Polars, etc.
     :rtype: trino.dbapi.Connection
     """
-    env_file = get_env_file_path(env_file)
-    config = dotenv_values(env_file)
+    return LazyConnection(env_file)  # type: ignore[return-value]
+
+
+def connect_trino(config: dict[str, str | None]) -> "trino.dbapi.Connection":
+    """
+    Create a Trino connection object from already loaded config values.
+
+    :param config:
+        Connection parameters, see :func:`get_trino_config`.
+    :type config: dict
+
+    :return:
+        A Trino connection object for use with Pandas, Polars, etc.
+    :rtype: trino.dbapi.Connection
+    """
+    import trino
 
     trino_conn = trino.dbapi.connect(
         host=config.get("TQ_TRINO_HOST", "trino"),
         port=int(str(config.get("TQ_TRINO_PORT", "443"))),
         catalog=config.get("TQ_TRINO_CATALOG", "hive"),
+        schema=config.get("TQ_TRINO_SCHEMA"),
         http_scheme="https",
         auth=trino.auth.BasicAuthentication(
             username=str(config.get("TQ_TRINO_USERNAME", "user")),
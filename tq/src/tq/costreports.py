@@ -0,0 +1,640 @@
+"""
+Local Parquet store of CMS hospital cost reports (form 2552-10).
+
+The yearly SAS files from
+https://www.cms.gov/data-research/statistics-trends-and-reports/cost-reports/hospital-2552-2010-form
+are converted once, in parallel across processes, into a hive-partitioned
+Parquet store with lowercase column names:
+
+    .tq_cache/costreports/sas/year=2022/part-0.parquet
+
+Each source file's size, modification time and SHA-256 are recorded in a
+manifest, so reruns only convert new or changed files. Reads are lazy
+scans, so only the selected cells and years are ever read from disk:
+
+    from tq.costreports import convert_cost_reports, scan_cost_reports
+
+    convert_cost_reports("data/input/cost_reports")
+    drug_costs = scan_cost_reports(["prvdr_num", "c_1_c5_73"]).collect()
+
+The raw HCRIS RPT/NMRC/ALPHA CSVs can be converted the same way into
+long tables of cells addressed by (report, worksheet, line, column),
+from which only the needed cells are pivoted:
+
+    from tq.costreports import Cell, convert_hcris, scan_hcris_cells
+
+    convert_hcris("data/input/hcris")
+    cells = scan_hcris_cells({"drug_cost": Cell("C000001", 73, 5)})
+
+Reading SAS requires polars-readstat: ``pip install "tq[costreports]"``.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import re
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from .cache import file_hash, utc_now
+from .shard import scan_aligned, unify_schemas
+from .utils import get_cache_dir, temp_path
+
+logger = logging.getLogger(__name__)
+
+# Yearly SAS files published by CMS, e.g. prds_hosp10_yr2022.sas7bdat
+SAS_PATTERN = r"prds_hosp10_yr(\d{4})\.sas7bdat"
+
+_MANIFEST = "_manifest.json"
+
+
+def get_cost_reports_dir() -> Path:
+    """Default directory of the converted cost report store."""
+    return get_cache_dir("costreports") / "sas"
+
+
+def read_sas(path: str | Path) -> pl.LazyFrame:
+    """Lazily read a SAS file with polars-readstat."""
+    try:
+        from polars_readstat import scan_readstat
+    except ImportError as exc:
+        raise ImportError(
+            "Reading SAS cost reports requires polars-readstat. Install it "
+            "with: pip install 'tq[costreports]'"
+        ) from exc
+    return scan_readstat(str(path))
+
+
+def _fingerprint(path: Path) -> dict[str, Any]:
+    stat = path.stat()
+    return {
+        "source": path.name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(path),
+    }
+
+
+def _part_path(out_dir: Path, year: int) -> Path:
+    return out_dir / f"year={year}" / "part-0.parquet"
+
+
+def _convert_file(
+    source: Path,
+    dest: Path,
+    reader: Callable[[Path], pl.LazyFrame],
+) -> dict[str, Any]:
+    """
+    Convert one source file to Parquet. Runs in a worker process and
+    returns the source fingerprint and row count for the manifest.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(dest)
+    try:
+        reader(source).rename(str.lower).sink_parquet(tmp)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return {**_fingerprint(source), "rows": pq.read_metadata(dest).num_rows}
+
+
+def _is_unchanged(source: Path, entry: dict[str, Any] | None) -> bool:
+    """
+    Compare a source file to its manifest entry. Size and mtime are
+    checked first; the file is only hashed when it was touched without
+    changing size.
+    """
+    if entry is None:
+        return False
+    stat = source.stat()
+    if stat.st_size != entry["size"]:
+        return False
+    if stat.st_mtime_ns == entry["mtime_ns"]:
+        return True
+    if file_hash(source) == entry["sha256"]:
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True
+    return False
+
+
+def _read_manifest(out_dir: Path) -> dict[str, dict[str, Any]]:
+    manifest = out_dir / _MANIFEST
+    if not manifest.exists():
+        return {}
+    return json.loads(manifest.read_text())["years"]
+
+
+def _find_years(source_dir: str | Path, pattern: str) -> dict[int, Path]:
+    """Source files in a directory, keyed by the year in their name."""
+    years = {}
+    for path in sorted(Path(source_dir).iterdir()):
+        if match := re.fullmatch(pattern, path.name):
+            years[int(match.group(1))] = path
+    if not years:
+        raise FileNotFoundError(
+            f"No files matching '{pattern}' found in {source_dir}."
+        )
+    return years
+
+
+def _convert_years(
+    years: dict[int, Path],
+    out_dir: Path,
+    reader: Callable[[Path], pl.LazyFrame],
+    max_workers: int | None,
+    refresh: bool,
+) -> None:
+    """Convert changed source files to year partitions of ``out_dir``."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(out_dir)
+    pending = {
+        year: source
+        for year, source in years.items()
+        if refresh
+        or not _part_path(out_dir, year).exists()
+        or not _is_unchanged(source, manifest.get(str(year)))
+    }
+    logger.info(
+        "Converting %d of %d files to %s (%d unchanged)",
+        len(pending),
+        len(years),
+        out_dir,
+        len(years) - len(pending),
+    )
+
+    def write_manifest() -> None:
+        (out_dir / _MANIFEST).write_text(
+            json.dumps(
+                {"updated_at": utc_now().isoformat(), "years": manifest},
+                indent=2,
+            )
+        )
+
+    # Spawn rather than fork, since forking a process that has already
+    # started Polars' thread pool can deadlock
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        futures = {
+            executor.submit(
+                _convert_file, source, _part_path(out_dir, year), reader
+            ): year
+            for year, source in pending.items()
+        }
+        for future in as_completed(futures):
+            year = futures[future]
+            entry = future.result()
+            manifest[str(year)] = {
+                **entry,
+                "converted_at": utc_now().isoformat(),
+            }
+            write_manifest()
+            logger.info(
+                "Converted %s: %d rows", entry["source"], entry["rows"]
+            )
+
+    # Persist mtimes refreshed by hash checks of touched files
+    write_manifest()
+
+
+def _scan_years(
+    out_dir: Path,
+    columns: Sequence[str] | None,
+    years: Iterable[int] | None,
+    convert_func: str,
+) -> pl.LazyFrame:
+    """Scan year partitions of ``out_dir``, aligned to a unified schema."""
+    available = sorted(int(year) for year in _read_manifest(out_dir))
+    if not available:
+        raise FileNotFoundError(
+            f"No converted cost reports in {out_dir}, see "
+            f"tq.costreports.{convert_func}."
+        )
+    if years is not None:
+        years = set(years)
+        available = [year for year in available if year in years]
+        if not available:
+            raise ValueError(f"No converted cost reports for {sorted(years)}.")
+    paths = {year: _part_path(out_dir, year) for year in available}
+
+    schema = unify_schemas(list(paths.values()))
+    if columns is not None:
+        missing = set(columns) - set(schema)
+        if missing:
+            raise ValueError(f"Unknown cost report columns: {sorted(missing)}")
+        schema = pl.Schema({name: schema[name] for name in columns})
+
+    return pl.concat(
+        [
+            scan_aligned(path, schema).with_columns(
+                pl.lit(year, pl.Int32).alias("year")
+            )
+            for year, path in paths.items()
+        ],
+        how="vertical",
+    )
+
+
+def convert_cost_reports(
+    source_dir: str | Path,
+    out_dir: str | Path | None = None,
+    pattern: str = SAS_PATTERN,
+    reader: Callable[[Path], pl.LazyFrame] = read_sas,
+    max_workers: int | None = None,
+    refresh: bool = False,
+) -> Path:
+    """
+    Convert yearly cost report files to a year-partitioned Parquet store.
+
+    Files are converted in parallel, one per worker process, since SAS
+    parsing is CPU-bound. Files whose size and modification time (or,
+    failing that, SHA-256) match the manifest are skipped, and the
+    manifest is updated as each file finishes, so an interrupted run only
+    redoes unfinished years.
+
+    :param source_dir:
+        Directory of source files.
+    :type source_dir: str | Path
+    :param out_dir:
+        Root of the Parquet store. Defaults to
+        ``.tq_cache/costreports/sas``.
+    :type out_dir: str | Path
+    :param pattern:
+        Regex matching source file names, with the year as its first group.
+    :type pattern: str
+    :param reader:
+        Function lazily reading one source file. Must be picklable.
+    :type reader: Callable[[Path], pl.LazyFrame]
+    :param max_workers:
+        Maximum number of worker processes. Defaults to the CPU count.
+    :type max_workers: int
+    :param refresh:
+        Convert every file, even if unchanged.
+    :type refresh: bool
+
+    :return:
+        Root of the Parquet store.
+    :rtype: Path
+    """
+    out_dir = Path(out_dir) if out_dir is not None else get_cost_reports_dir()
+    _convert_years(
+        _find_years(source_dir, pattern), out_dir, reader, max_workers, refresh
+    )
+    return out_dir
+
+
+def scan_cost_reports(
+    columns: Sequence[str] | None = None,
+    years: Iterable[int] | None = None,
+    out_dir: str | Path | None = None,
+) -> pl.LazyFrame:
+    """
+    Lazily scan the converted cost report store.
+
+    Column sets differ between years, so every year's file is aligned to
+    the union of their schemas (read from the Parquet footers), with
+    missing columns filled with nulls. Only the requested years' files are
+    scanned and only the selected columns are read from them.
+
+    :param columns:
+        Columns to select (lowercase), in addition to ``year``. Defaults
+        to all columns.
+    :type columns: Sequence[str]
+    :param years:
+        Only scan these years.
+    :type years: Iterable[int]
+    :param out_dir:
+        Root of the Parquet store. Defaults to
+        ``.tq_cache/costreports/sas``.
+    :type out_dir: str | Path
+
+    :return:
+        Lazy frame of the selected columns plus ``year``.
+    :rtype: pl.LazyFrame
+    """
+    out_dir = Path(out_dir) if out_dir is not None else get_cost_reports_dir()
+    return _scan_years(out_dir, columns, years, "convert_cost_reports")
+
+
+##### HCRIS ####################################################################
+
+# CSV files inside the yearly HCRIS zips, e.g. HOSP10_2022_NMRC.CSV
+HCRIS_PATTERNS = {
+    "rpt": r"(?i)hosp10_(\d{4})_rpt\.csv",
+    "nmrc": r"(?i)hosp10_(\d{4})_nmrc\.csv",
+    "alpha": r"(?i)hosp10_(\d{4})_alpha\.csv",
+}
+
+# The HCRIS CSVs have no header row
+RPT_COLUMNS = [
+    "rpt_rec_num",
+    "prvdr_ctrl_type_cd",
+    "prvdr_num",
+    "npi",
+    "rpt_stus_cd",
+    "fy_bgn_dt",
+    "fy_end_dt",
+    "proc_dt",
+    "initl_rpt_sw",
+    "last_rpt_sw",
+    "trnsmtl_num",
+    "fi_num",
+    "adr_vndr_cd",
+    "fi_creat_dt",
+    "util_cd",
+    "npr_dt",
+    "spec_ind",
+    "fi_rcpt_dt",
+]
+
+# Cell address columns of the long NMRC/ALPHA tables
+CELL_COLUMNS = ["worksheet", "line", "column"]
+
+
+@dataclass(frozen=True)
+class Cell:
+    """
+    Address of one HCRIS worksheet cell.
+
+    Lines and columns are five-character codes with two implied decimals,
+    so line 73 is ``"07300"`` and column 5.01 is ``"00501"``. Numbers are
+    converted to codes, strings are used as is:
+
+        Cell("C000001", 73, 5)  # Worksheet C part I, line 73, column 5
+
+    :param worksheet:
+        Worksheet code, e.g. ``"C000001"`` or ``"G300000"``.
+    :type worksheet: str
+    :param line:
+        Line number or code.
+    :type line: str | float
+    :param column:
+        Column number or code.
+    :type column: str | float
+    """
+
+    worksheet: str
+    line: str | float
+    column: str | float
+
+    @staticmethod
+    def _code(value: str | float) -> str:
+        if isinstance(value, str):
+            return value
+        return f"{round(value * 100):05d}"
+
+    def codes(self) -> tuple[str, str, str]:
+        """The cell's (worksheet, line, column) codes."""
+        return self.worksheet, self._code(self.line), self._code(self.column)
+
+
+def get_hcris_dir() -> Path:
+    """Default directory of the converted HCRIS store."""
+    return get_cache_dir("costreports") / "hcris"
+
+
+def read_hcris_rpt(path: str | Path) -> pl.LazyFrame:
+    """Lazily read an HCRIS RPT file of one row per report."""
+    dates = [name for name in RPT_COLUMNS if name.endswith("_dt")]
+    return (
+        pl.scan_csv(
+            path,
+            has_header=False,
+            schema=dict.fromkeys(RPT_COLUMNS, pl.String),
+        )
+        .with_columns(
+            pl.col("rpt_rec_num").cast(pl.Int32),
+            pl.col(dates).str.to_date("%m/%d/%Y", strict=False),
+        )
+        .sort("rpt_rec_num")
+    )
+
+
+def _read_hcris_cells(
+    path: str | Path, value: str, dtype: pl.DataType
+) -> pl.LazyFrame:
+    """
+    Lazily read an HCRIS NMRC/ALPHA file as a long table of cells, sorted
+    by address so Parquet statistics let cell lookups skip row groups.
+    Address columns are categorical, so each distinct code is stored once.
+    """
+    return (
+        pl.scan_csv(
+            path,
+            has_header=False,
+            schema={
+                "rpt_rec_num": pl.Int32,
+                **dict.fromkeys(CELL_COLUMNS, pl.String),
+                value: dtype,
+            },
+        )
+        .sort(*CELL_COLUMNS, "rpt_rec_num")
+        .with_columns(pl.col(CELL_COLUMNS).cast(pl.Categorical))
+    )
+
+
+def read_hcris_nmrc(path: str | Path) -> pl.LazyFrame:
+    """Lazily read an HCRIS NMRC file of numeric cells."""
+    return _read_hcris_cells(path, "value", pl.Float64)
+
+
+def read_hcris_alpha(path: str | Path) -> pl.LazyFrame:
+    """Lazily read an HCRIS ALPHA file of text cells."""
+    return _read_hcris_cells(path, "text", pl.String)
+
+
+_HCRIS_READERS = {
+    "rpt": read_hcris_rpt,
+    "nmrc": read_hcris_nmrc,
+    "alpha": read_hcris_alpha,
+}
+
+
+def convert_hcris(
+    source_dir: str | Path,
+    out_dir: str | Path | None = None,
+    max_workers: int | None = None,
+    refresh: bool = False,
+) -> Path:
+    """
+    Convert HCRIS hospital (2552-10) CSVs to a year-partitioned store.
+
+    Reads the unzipped ``HOSP10_<year>_{RPT,NMRC,ALPHA}.CSV`` files from
+    https://www.cms.gov/data-research/statistics-trends-and-reports/cost-reports/cost-reports-fiscal-year
+    into three tables: ``rpt`` (one row per report), and ``nmrc`` and
+    ``alpha`` (one row per numeric or text cell, addressed by
+    ``rpt_rec_num``, ``worksheet``, ``line`` and ``column``). Files are
+    converted in parallel and skipped when unchanged, as in
+    :func:`convert_cost_reports`.
+
+    :param source_dir:
+        Directory of unzipped HCRIS CSVs.
+    :type source_dir: str | Path
+    :param out_dir:
+        Root of the store. Defaults to ``.tq_cache/costreports/hcris``.
+    :type out_dir: str | Path
+    :param max_workers:
+        Maximum number of worker processes. Defaults to the CPU count.
+    :type max_workers: int
+    :param refresh:
+        Convert every file, even if unchanged.
+    :type refresh: bool
+
+    :return:
+        Root of the store.
+    :rtype: Path
+    """
+    out_dir = Path(out_dir) if out_dir is not None else get_hcris_dir()
+    for table, pattern in HCRIS_PATTERNS.items():
+        _convert_years(
+            _find_years(source_dir, pattern),
+            out_dir / table,
+            _HCRIS_READERS[table],
+            max_workers,
+            refresh,
+        )
+    return out_dir
+
+
+def scan_hcris(
+    table: str,
+    columns: Sequence[str] | None = None,
+    years: Iterable[int] | None = None,
+    out_dir: str | Path | None = None,
+) -> pl.LazyFrame:
+    """
+    Lazily scan one table of the converted HCRIS store.
+
+    :param table:
+        ``"rpt"``, ``"nmrc"`` or ``"alpha"``.
+    :type table: str
+    :param columns:
+        Columns to select, in addition to ``year``. Defaults to all.
+    :type columns: Sequence[str]
+    :param years:
+        Only scan these years.
+    :type years: Iterable[int]
+    :param out_dir:
+        Root of the store. Defaults to ``.tq_cache/costreports/hcris``.
+    :type out_dir: str | Path
+
+    :return:
+        Lazy frame of the selected columns plus ``year``.
+    :rtype: pl.LazyFrame
+    """
+    if table not in HCRIS_PATTERNS:
+        raise ValueError(
+            f"Unknown HCRIS table '{table}', expected one of "
+            f"{list(HCRIS_PATTERNS)}."
+        )
+    out_dir = Path(out_dir) if out_dir is not None else get_hcris_dir()
+    return _scan_years(out_dir / table, columns, years, "convert_hcris")
+
+
+def _pivot_cells(
+    lf: pl.LazyFrame, cells: Mapping[str, Cell], value: str
+) -> pl.LazyFrame:
+    """
+    Keep only the requested cells of a long table and pivot them to one
+    column per cell and one row per (year, report).
+    """
+    codes = [cell.codes() for cell in cells.values()]
+    wanted = pl.LazyFrame(
+        dict(zip(CELL_COLUMNS, zip(*codes), strict=True))
+        | {"name": list(cells)},
+        schema={**dict.fromkeys(CELL_COLUMNS, pl.String), "name": pl.String},
+    )
+    # Filter on each address part first, so the scan can skip row groups,
+    # then join to drop cross combinations (e.g. a wanted line on the
+    # wrong worksheet)
+    matched = (
+        lf.filter(
+            *(
+                pl.col(name).is_in(sorted({c[i] for c in codes}))
+                for i, name in enumerate(CELL_COLUMNS)
+            )
+        )
+        .with_columns(pl.col(CELL_COLUMNS).cast(pl.String))
+        .join(wanted, on=CELL_COLUMNS)
+    )
+    return matched.group_by("year", "rpt_rec_num").agg(
+        pl.col(value).filter(pl.col("name") == name).first().alias(name)
+        for name in cells
+    )
+
+
+def scan_hcris_cells(
+    cells: Mapping[str, Cell],
+    text_cells: Mapping[str, Cell] | None = None,
+    years: Iterable[int] | None = None,
+    report_columns: Sequence[str] = ("prvdr_num", "fy_bgn_dt", "fy_end_dt"),
+    out_dir: str | Path | None = None,
+) -> pl.LazyFrame:
+    """
+    Lazily pivot selected HCRIS cells to one column per cell.
+
+    Only the requested cells are read from the long tables, then pivoted
+    to one row per report, so deriving a measure across every hospital
+    and year never builds the full wide table:
+
+        from tq.costreports import Cell, scan_hcris_cells
+
+        drug_ccr = scan_hcris_cells(
+            {
+                "drug_cost": Cell("C000001", 73, 5),
+                "drug_charges_ip": Cell("C000001", 73, 6),
+                "drug_charges_op": Cell("C000001", 73, 7),
+            }
+        ).with_columns(
+            drug_ccr=pl.col("drug_cost")
+            / (pl.col("drug_charges_ip") + pl.col("drug_charges_op"))
+        )
+
+    :param cells:
+        Output column names mapped to numeric (NMRC) cells.
+    :type cells: Mapping[str, Cell]
+    :param text_cells:
+        Output column names mapped to text (ALPHA) cells.
+    :type text_cells: Mapping[str, Cell]
+    :param years:
+        Only read these years.
+    :type years: Iterable[int]
+    :param report_columns:
+        Columns of the ``rpt`` table to include for each report.
+    :type report_columns: Sequence[str]
+    :param out_dir:
+        Root of the store. Defaults to ``.tq_cache/costreports/hcris``.
+    :type out_dir: str | Path
+
+    :return:
+        One row per report, with ``year``, ``rpt_rec_num``, the report
+        columns and one column per cell (null where a report doesn't
+        fill the cell).
+    :rtype: pl.LazyFrame
+    """
+    names = [*cells, *(text_cells or {})]
+    if len(set(names)) != len(names):
+        raise ValueError("Cell names must be unique.")
+
+    keys = ["year", "rpt_rec_num"]
+    lf = scan_hcris(
+        "rpt", ["rpt_rec_num", *report_columns], years, out_dir
+    ).select(*keys, *report_columns)
+    for table, value, table_cells in (
+        ("nmrc", "value", cells),
+        ("alpha", "text", text_cells),
+    ):
+        if table_cells:
+            long = scan_hcris(table, years=years, out_dir=out_dir)
+            lf = lf.join(
+                _pivot_cells(long, table_cells, value), on=keys, how="left"
+            )
+    return lf.sort(keys)
@@ -0,0 +1,263 @@
+import json
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Uncached results estimated to be larger than this are streamed through a
+# spill file on disk rather than fetched straight into memory, unless
+# TQ_SPILL_BYTES says otherwise
+DEFAULT_SPILL_BYTES = 2 * 1024**3
+
+_UNITS = {
+    "": 1,
+    "B": 1,
+    "KB": 1024,
+    "MB": 1024**2,
+    "GB": 1024**3,
+    "TB": 1024**4,
+    "PB": 1024**5,
+}
+
+
+class ScanBudgetError(RuntimeError):
+    """Raised when a query is estimated to scan more than the budget."""
+
+
+def parse_bytes(value: int | float | str) -> int:
+    """
+    Parse a byte size such as ``500GB``, ``1.5 TB`` or ``1024``.
+
+    Units are binary, so ``1KB`` is 1024 bytes.
+
+    :param value:
+        Size as a number of bytes or a string with an optional unit.
+    :type value: int | float | str
+
+    :return:
+        Size in bytes.
+    :rtype: int
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    match = re.fullmatch(
+        r"\s*([\d.]+)\s*([KMGTP]?B?)\s*", value, flags=re.IGNORECASE
+    )
+    if match is None:
+        raise ValueError(f"Invalid byte size: {value!r}")
+
+    number, unit = match.groups()
+    unit = unit.upper()
+    if unit and not unit.endswith("B"):
+        unit += "B"
+    return int(float(number) * _UNITS[unit])
+
+
+def format_bytes(value: float | None) -> str:
+    """Format a byte count for humans e.g. ``1.2 TB``."""
+    if value is None:
+        return "unknown"
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} PB"
+
+
+def _config_value(name: str, config: dict[str, Any] | None) -> Any:
+    """Look up a setting in the environment first, then the .env config."""
+    value = os.environ.get(name)
+    if value is None and config is not None:
+        value = config.get(name)
+    return value or None
+
+
+def get_scan_budget(config: dict[str, Any] | None = None) -> int | None:
+    """
+    Get the configured scan budget in bytes, if any.
+
+    The budget is set with ``TQ_SCAN_BUDGET`` (e.g. ``500GB``), either in
+    the environment or in the .env file. Since the .env file in the working
+    directory takes precedence over the one at the repo root, each project
+    can set its own budget.
+
+    :param config:
+        Loaded .env values, see :func:`tq.connectors.get_trino_config`.
+    :type config: dict
+
+    :return:
+        Budget in bytes, or ``None`` if no budget is set.
+    :rtype: int
+    """
+    value = _config_value("TQ_SCAN_BUDGET", config)
+    return parse_bytes(value) if value is not None else None
+
+
+def get_spill_bytes(config: dict[str, Any] | None = None) -> int:
+    """
+    Get the estimated result size above which uncached fetches are
+    streamed through a spill file instead of straight into memory.
+    """
+    value = _config_value("TQ_SPILL_BYTES", config)
+    return parse_bytes(value) if value is not None else DEFAULT_SPILL_BYTES
+
+
+def _number(value: Any) -> float | None:
+    """Convert an EXPLAIN estimate to a float, mapping NaN to ``None``."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+@dataclass(frozen=True)
+class QueryEstimate:
+    """
+    Cost-based optimizer estimates for a query, from ``EXPLAIN (TYPE IO)``.
+
+    Estimates are ``None`` when Trino has no statistics for a table, e.g.
+    Hive tables that were never analyzed.
+    """
+
+    input_bytes: float | None
+    input_rows: float | None
+    output_bytes: float | None
+    output_rows: float | None
+    tables: tuple[str, ...] = ()
+
+    @classmethod
+    def from_io_plan(cls, plan: dict[str, Any]) -> "QueryEstimate":
+        """
+        Build an estimate from the JSON of ``EXPLAIN (TYPE IO, FORMAT JSON)``.
+
+        :param plan:
+            Parsed IO plan.
+        :type plan: dict
+
+        :return:
+            Total input estimates over all scanned tables, and the output
+            estimate of the query.
+        :rtype: QueryEstimate
+        """
+        inputs = plan.get("inputTableColumnInfos") or []
+        input_bytes = [
+            _number(i.get("estimate", {}).get("outputSizeInBytes"))
+            for i in inputs
+        ]
+        input_rows = [
+            _number(i.get("estimate", {}).get("outputRowCount"))
+            for i in inputs
+        ]
+        tables = []
+        for i in inputs:
+            table = i.get("table", {})
+            schema_table = table.get("schemaTable", {})
+            tables.append(
+                ".".join(
+                    str(part)
+                    for part in [
+                        table.get("catalog"),
+                        schema_table.get("schema"),
+                        schema_table.get("table"),
+                    ]
+                    if part
+                )
+            )
+
+        def total(values: list[float | None]) -> float | None:
+            if not values or any(v is None for v in values):
+                return None
+            return sum(values)  # type: ignore[arg-type]
+
+        output = plan.get("estimate") or {}
+        return cls(
+            input_bytes=total(input_bytes),
+            input_rows=total(input_rows),
+            output_bytes=_number(output.get("outputSizeInBytes")),
+            output_rows=_number(output.get("outputRowCount")),
+            tables=tuple(tables),
+        )
+
+
+def estimate_query(sql: str, conn: Any) -> QueryEstimate:
+    """
+    Estimate the input and output size of a query without running it.
+
+    Runs ``EXPLAIN (TYPE IO, FORMAT JSON)``, which only plans the query, so
+    it returns in about the time Trino takes to analyze the statement.
+
+    :param sql:
+        SQL text of the query.
+    :type sql: str
+    :param conn:
+        Trino connection to use.
+    :type conn: trino.dbapi.Connection
+
+    :return:
+        The optimizer estimates.
+    :rtype: QueryEstimate
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"EXPLAIN (TYPE IO, FORMAT JSON) {sql}")
+    ((plan,),) = cursor.fetchall()
+    estimate = QueryEstimate.from_io_plan(json.loads(plan))
+    logger.info(
+        "Estimated scan of %s (%s rows), returning %s rows",
+        format_bytes(estimate.input_bytes),
+        estimate.input_rows,
+        estimate.output_rows,
+    )
+    return estimate
+
+
+def check_scan_budget(
+    estimate: QueryEstimate, budget: int | None, confirm: bool = False
+) -> None:
+    """
+    Refuse to run a query that's estimated to scan more than the budget.
+
+    :param estimate:
+        Query estimate, see :func:`estimate_query`.
+    :type estimate: QueryEstimate
+    :param budget:
+        Scan budget in bytes. ``None`` disables the check.
+    :type budget: int
+    :param confirm:
+        Ask for confirmation on the console instead of refusing outright.
+    :type confirm: bool
+
+    :raises ScanBudgetError:
+        If the estimate exceeds the budget and the query wasn't confirmed.
+    """
+    if budget is None:
+        return
+    if estimate.input_bytes is None:
+        logger.warning(
+            "Can't check the scan budget: no size estimate for %s",
+            ", ".join(estimate.tables) or "the query",
+        )
+        return
+    if estimate.input_bytes <= budget:
+        return
+
+    message = (
+        f"Query is estimated to scan {format_bytes(estimate.input_bytes)}, "
+        f"over the budget of {format_bytes(budget)}"
+    )
+    if confirm:
+        try:
+            answer = input(f"{message}. Run it anyway? [y/N] ")
+        except EOFError:
+            answer = ""
+        if answer.strip().lower() in {"y", "yes"}:
+            return
+
+    raise ScanBudgetError(
+        f"{message}. Add filters, or raise TQ_SCAN_BUDGET to run it."
+    )
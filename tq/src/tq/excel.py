@@ -0,0 +1,197 @@
+"""
+Parquet cache of parsed Excel sheets.
+
+Parsing XLSX is usually the slowest local step of an ingest script, and
+the same workbook is often read several times (one sheet per call, or
+across projects). :func:`read_excel_cached` parses all requested sheets
+in one pass over the workbook, and caches each as Parquet keyed by the
+workbook's content hash and the read options. Later calls memory-map the
+cached Parquet instead of re-parsing the XML:
+
+    import tq
+
+    sheets = tq.read_excel_cached(
+        "data/input/340b_opais.xlsx",
+        ["Covered Entities", "Contract Pharmacies"],
+        read_options={"header_row": 3},
+    )
+
+Editing the workbook changes its hash, so stale sheets are never
+returned. Reading requires fastexcel (Polars' default Excel engine):
+``pip install "tq[excel]"``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, overload
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from .cache import encode_metadata, file_hash, utc_now
+from .utils import get_cache_dir, temp_path
+
+logger = logging.getLogger(__name__)
+
+
+def _sheet_names(path: Path) -> list[str]:
+    """Names of all sheets in a workbook, without parsing any of them."""
+    import fastexcel
+
+    return fastexcel.read_excel(path).sheet_names
+
+
+def _cache_path(
+    path: Path,
+    workbook_hash: str,
+    sheet: str,
+    read_options: Mapping[str, Any],
+) -> Path:
+    """Cache file for one sheet of one version of a workbook."""
+    key = json.dumps(
+        [workbook_hash, sheet, dict(read_options)], sort_keys=True, default=str
+    )
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    slug = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{path.stem}_{sheet}")
+    return get_cache_dir("excel") / f"{slug}_{digest}.parquet"
+
+
+def _write_sheet(
+    df: pl.DataFrame, out_path: Path, metadata: dict[str, Any]
+) -> None:
+    """Atomically write one parsed sheet to the cache."""
+    table = df.to_arrow()
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), **encode_metadata(metadata)}
+    )
+    tmp = temp_path(out_path)
+    try:
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, out_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    logger.info(
+        "Cached sheet '%s' of %s: %d rows",
+        metadata["sheet"],
+        metadata["source"],
+        df.height,
+    )
+
+
+@overload
+def read_excel_cached(
+    path: str | Path,
+    sheet: str,
+    read_options: Mapping[str, Any] | None = ...,
+    max_workers: int = ...,
+    refresh: bool = ...,
+) -> pl.DataFrame: ...
+
+
+@overload
+def read_excel_cached(
+    path: str | Path,
+    sheet: Sequence[str] | None = ...,
+    read_options: Mapping[str, Any] | None = ...,
+    max_workers: int = ...,
+    refresh: bool = ...,
+) -> dict[str, pl.DataFrame]: ...
+
+
+def read_excel_cached(
+    path: str | Path,
+    sheet: str | Sequence[str] | None = None,
+    read_options: Mapping[str, Any] | None = None,
+    max_workers: int = 4,
+    refresh: bool = False,
+) -> pl.DataFrame | dict[str, pl.DataFrame]:
+    """
+    Read Excel sheets through a Parquet cache.
+
+    Sheets without a cache entry for the current workbook contents and
+    read options are parsed by a single ``pl.read_excel`` call, so the
+    workbook is opened and its shared strings parsed only once, then
+    written to ``.tq_cache/excel`` concurrently. All sheets are returned from the
+    memory-mapped cache files, so cold and warm reads give identical
+    frames.
+
+    :param path:
+        Path to the workbook.
+    :type path: str | Path
+    :param sheet:
+        Sheet name, list of sheet names, or ``None`` for every sheet.
+    :type sheet: str | Sequence[str]
+    :param read_options:
+        Options passed to ``pl.read_excel(read_options=...)``, e.g.
+        ``{"header_row": 3}``. Part of the cache key.
+    :type read_options: Mapping[str, Any]
+    :param max_workers:
+        Maximum number of cache files written at once.
+    :type max_workers: int
+    :param refresh:
+        Re-parse sheets even if they're cached.
+    :type refresh: bool
+
+    :return:
+        The sheet as a DataFrame if ``sheet`` is a string, otherwise a
+        dict of sheet name to DataFrame, in the requested (or workbook)
+        order.
+    :rtype: pl.DataFrame | dict[str, pl.DataFrame]
+    """
+    path = Path(path)
+    read_options = dict(read_options or {})
+    if isinstance(sheet, str):
+        sheets = [sheet]
+    elif sheet is None:
+        sheets = _sheet_names(path)
+    else:
+        sheets = list(sheet)
+
+    workbook_hash = file_hash(path)
+    paths = {
+        name: _cache_path(path, workbook_hash, name, read_options)
+        for name in sheets
+    }
+    pending = [
+        name
+        for name in dict.fromkeys(sheets)
+        if refresh or not paths[name].exists()
+    ]
+    if pending:
+        logger.info(
+            "Parsing %d of %d sheets from %s", len(pending), len(sheets), path
+        )
+        metadata = {
+            "source": str(path),
+            "sha256": workbook_hash,
+            "read_options": read_options,
+            "created_at": utc_now(),
+        }
+        parsed = pl.read_excel(
+            path, sheet_name=pending, read_options=read_options
+        )
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tq-excel"
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _write_sheet,
+                    parsed[name],
+                    paths[name],
+                    {**metadata, "sheet": name},
+                )
+                for name in pending
+            ]
+            for future in futures:
+                future.result()
+
+    frames = {
+        name: pl.read_parquet(paths[name], memory_map=True) for name in sheets
+    }
+    return frames[sheet] if isinstance(sheet, str) else frames
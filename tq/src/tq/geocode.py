@@ -0,0 +1,590 @@
+"""
+Concurrent, rate-limited geocoding with a persistent address cache.
+
+Addresses are normalized (case, punctuation and whitespace) and looked up
+in a local SQLite cache first. Only cache misses are sent to the geocoding
+backend, in batches dispatched from a thread pool and throttled by a
+token-bucket rate limiter. Results are written to the cache as each batch
+finishes, so an interrupted run picks up where it left off:
+
+    from geopy.geocoders import GoogleV3
+    from tq.geocode import GeopyBackend, Geocoder
+
+    geocoder = Geocoder(GeopyBackend(GoogleV3(api_key=...)), rate=40)
+    locations = geocoder.geocode(df["street_address_full"])
+    df = df.join(locations, left_on="street_address_full", right_on="address")
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Protocol
+
+import polars as pl
+
+from .cache import utc_now
+from .utils import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+CENSUS_BATCH_URL = (
+    "https://geocoding.geo.census.gov/geocoder/locations/addressbatch"
+)
+
+# Maximum addresses per Census batch geocoder request
+CENSUS_BATCH_SIZE = 10_000
+
+# Trailing "STATE ZIP" of a US address, optionally separated by a comma
+_STATE_ZIP = re.compile(
+    r"[\s,]+([A-Z]{2})\s*,?\s*(\d{5}(?:-?\d{4})?)?\s*$", re.IGNORECASE
+)
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalize an address into its cache key.
+
+    Casing, punctuation (other than ``#``, ``-`` and ``/``) and repeated
+    whitespace are ignored, so ``"1 Main St., Chicago IL"`` and
+    ``"1 MAIN ST CHICAGO  IL"`` share a key.
+
+    :param address:
+        Free-form, single-line address.
+    :type address: str
+
+    :return:
+        The normalized address.
+    :rtype: str
+    """
+    cleaned = re.sub(r"[^\w\s#/-]", " ", address.upper())
+    return " ".join(cleaned.split())
+
+
+def split_address(address: str) -> tuple[str, str, str, str]:
+    """
+    Split a single-line US address into street, city, state and ZIP.
+
+    Expects the street and city to be separated by a comma, with the state
+    (and optionally the ZIP) at the end, e.g. ``"1 Main St, Chicago, IL
+    60601"`` or ``"1 Main St , Chicago IL , 60601"``. Parts that can't be
+    found are returned empty, with everything unparsed left in the street.
+
+    :param address:
+        Free-form, single-line address.
+    :type address: str
+
+    :return:
+        Tuple of (street, city, state, zip).
+    :rtype: tuple
+    """
+    address = address.strip()
+    match = _STATE_ZIP.search(address)
+    if match is None:
+        return address, "", "", ""
+
+    state, zip_code = match.group(1).upper(), match.group(2) or ""
+    street, _, city = address[: match.start()].rpartition(",")
+    if not street:
+        street, city = city, ""
+    return street.strip(" ,"), city.strip(" ,"), state, zip_code
+
+
+@dataclass(frozen=True)
+class GeocodeResult:
+    """Location of one address, as returned by a backend."""
+
+    latitude: float
+    longitude: float
+    matched_address: str | None = None
+
+
+class GeocodeBackend(Protocol):
+    """
+    Geocoding service. ``geocode_batch`` receives at most ``batch_size``
+    addresses per call and returns one result per address, ``None`` for
+    addresses it couldn't find. Exceptions mean the whole batch failed and
+    should be retried.
+    """
+
+    name: str
+    batch_size: int
+
+    def geocode_batch(
+        self, addresses: Sequence[str]
+    ) -> list[GeocodeResult | None]: ...
+
+
+class GeopyBackend:
+    """
+    Backend for any single-address `geopy` geocoder, e.g. ``GoogleV3``
+    or ``Nominatim``.
+
+    :param geocoder:
+        Instantiated geopy geocoder.
+    :type geocoder: geopy.geocoders.base.Geocoder
+    :param timeout:
+        Seconds to wait for each request.
+    :type timeout: float
+    """
+
+    batch_size = 1
+
+    def __init__(self, geocoder: Any, timeout: float = 10.0) -> None:
+        self._geocoder = geocoder
+        self._timeout = timeout
+        self.name = type(geocoder).__name__.lower()
+
+    def geocode_batch(
+        self, addresses: Sequence[str]
+    ) -> list[GeocodeResult | None]:
+        results: list[GeocodeResult | None] = []
+        for address in addresses:
+            location = self._geocoder.geocode(
+                address, exactly_one=True, timeout=self._timeout
+            )
+            results.append(
+                GeocodeResult(
+                    location.latitude, location.longitude, location.address
+                )
+                if location
+                else None
+            )
+        return results
+
+
+class CensusBatchBackend:
+    """
+    US Census Bureau batch geocoder, up to 10,000 addresses per request.
+    Free and doesn't need an API key, but only covers US addresses.
+
+    Single-line addresses are split into components with
+    :func:`split_address`.
+
+    :param benchmark:
+        Census address benchmark (vintage) to match against.
+    :type benchmark: str
+    :param batch_size:
+        Addresses per request, at most 10,000.
+    :type batch_size: int
+    :param timeout:
+        Seconds to wait for each batch. Full batches can take minutes.
+    :type timeout: float
+    """
+
+    name = "census"
+
+    def __init__(
+        self,
+        benchmark: str = "Public_AR_Current",
+        batch_size: int = CENSUS_BATCH_SIZE,
+        timeout: float = 600.0,
+    ) -> None:
+        if not 1 <= batch_size <= CENSUS_BATCH_SIZE:
+            raise ValueError(
+                f"batch_size must be between 1 and {CENSUS_BATCH_SIZE}."
+            )
+        self.batch_size = batch_size
+        self._benchmark = benchmark
+        self._timeout = timeout
+
+    @staticmethod
+    def format_batch(addresses: Sequence[str]) -> str:
+        """Build the batch CSV: id, street, city, state, ZIP."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for i, address in enumerate(addresses):
+            writer.writerow([i, *split_address(address)])
+        return buffer.getvalue()
+
+    @staticmethod
+    def parse_batch(text: str, n_addresses: int) -> list[GeocodeResult | None]:
+        """Parse the batch response CSV into results in input order."""
+        results: list[GeocodeResult | None] = [None] * n_addresses
+        for row in csv.reader(io.StringIO(text)):
+            # id, input, Match/No_Match/Tie, match type, matched, "lon,lat"
+            if len(row) < 6 or row[2] != "Match":
+                continue
+            lon, lat = row[5].split(",")
+            results[int(row[0])] = GeocodeResult(
+                float(lat), float(lon), row[4]
+            )
+        return results
+
+    def geocode_batch(
+        self, addresses: Sequence[str]
+    ) -> list[GeocodeResult | None]:
+        import requests
+
+        response = requests.post(
+            CENSUS_BATCH_URL,
+            data={"benchmark": self._benchmark},
+            files={
+                "addressFile": (
+                    "addresses.csv",
+                    self.format_batch(addresses),
+                    "text/csv",
+                )
+            },
+            timeout=self._timeout,
+        )
+        response.raise_for_status()
+        return self.parse_batch(response.text, len(addresses))
+
+
+class FakeBackend:
+    """
+    Offline backend for tests and benchmarks. Each address gets a
+    deterministic location derived from its hash.
+
+    :param batch_size:
+        Addresses per call.
+    :type batch_size: int
+    :param latency:
+        Seconds each call sleeps for, to mimic network round trips.
+    :type latency: float
+    :param missing:
+        Addresses to return no match for.
+    :type missing: Iterable[str]
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        batch_size: int = 1,
+        latency: float = 0.0,
+        missing: Iterable[str] = (),
+    ) -> None:
+        self.batch_size = batch_size
+        self.latency = latency
+        self.missing = set(missing)
+        self.calls: list[list[str]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def locate(address: str) -> GeocodeResult:
+        """Deterministic fake location of an address."""
+        digest = hashlib.sha256(normalize_address(address).encode()).digest()
+        lat = 25 + int.from_bytes(digest[:4], "big") / 2**32 * 24
+        lon = -125 + int.from_bytes(digest[4:8], "big") / 2**32 * 58
+        return GeocodeResult(lat, lon, normalize_address(address))
+
+    def geocode_batch(
+        self, addresses: Sequence[str]
+    ) -> list[GeocodeResult | None]:
+        with self._lock:
+            self.calls.append(list(addresses))
+        if self.latency:
+            time.sleep(self.latency)
+        return [
+            None if address in self.missing else self.locate(address)
+            for address in addresses
+        ]
+
+
+class RateLimiter:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    The bucket holds up to ``burst`` tokens and refills at ``rate`` tokens
+    per second. Each :meth:`acquire` takes tokens, sleeping until enough
+    are available.
+
+    :param rate:
+        Tokens (requests) added per second.
+    :type rate: float
+    :param burst:
+        Bucket capacity i.e. how many requests can be made back-to-back.
+    :type burst: float
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1.")
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Take ``tokens`` from the bucket, waiting until they're available."""
+        if tokens > self.burst:
+            raise ValueError("Can't acquire more tokens than the burst size.")
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class GeocodeCache:
+    """
+    Persistent SQLite store of geocoding results, keyed by backend and
+    normalized address, so switching backend doesn't reuse another
+    backend's results. Addresses the backend couldn't find are stored too
+    (with null coordinates), so they aren't looked up again on every run.
+
+    :param path:
+        SQLite database file. Defaults to
+        ``<project root>/.tq_cache/geocode/geocode.sqlite``.
+    :type path: Path
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = (
+            Path(path) if path else get_cache_dir("geocode") / "geocode.sqlite"
+        )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    backend TEXT,
+                    address TEXT,
+                    latitude REAL,
+                    longitude REAL,
+                    matched_address TEXT,
+                    geocoded_at TEXT,
+                    PRIMARY KEY (backend, address)
+                )
+                """
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT count(*) FROM geocodes"
+            ).fetchone()[0]
+
+    def get_many(
+        self, keys: Iterable[str], backend: str
+    ) -> dict[str, GeocodeResult | None]:
+        """
+        Look up a backend's cached results by normalized address. Keys that
+        aren't cached are left out; cached misses map to ``None``.
+        """
+        keys = list(keys)
+        found: dict[str, GeocodeResult | None] = {}
+        # Stay under SQLite's limit on bound parameters
+        for start in range(0, len(keys), 900):
+            chunk = keys[start : start + 900]
+            placeholders = ", ".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT address, latitude, longitude, matched_address "
+                    "FROM geocodes "
+                    f"WHERE backend = ? AND address IN ({placeholders})",
+                    [backend, *chunk],
+                ).fetchall()
+            for key, lat, lon, matched in rows:
+                found[key] = (
+                    None if lat is None else GeocodeResult(lat, lon, matched)
+                )
+        return found
+
+    def put_many(
+        self, results: dict[str, GeocodeResult | None], backend: str
+    ) -> None:
+        """Store a backend's results keyed by normalized address."""
+        geocoded_at = utc_now().isoformat()
+        rows = [
+            (
+                backend,
+                key,
+                result.latitude if result else None,
+                result.longitude if result else None,
+                result.matched_address if result else None,
+                geocoded_at,
+            )
+            for key, result in results.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class Geocoder:
+    """
+    Geocode addresses through a backend, with caching, batching,
+    concurrency and rate limiting.
+
+    :param backend:
+        Geocoding service, e.g. :class:`GeopyBackend`,
+        :class:`CensusBatchBackend` or :class:`FakeBackend`.
+    :type backend: GeocodeBackend
+    :param cache:
+        Result cache. Defaults to the shared cache in the tq cache
+        directory. Pass ``False`` to disable caching.
+    :type cache: GeocodeCache | bool
+    :param rate:
+        Maximum backend requests (batches) per second. ``None`` means no
+        limit.
+    :type rate: float
+    :param max_concurrency:
+        Maximum number of requests in flight at once.
+    :type max_concurrency: int
+    :param retries:
+        Number of times to retry a failed request.
+    :type retries: int
+    :param backoff:
+        Seconds to wait before the first retry, doubling after each one.
+    :type backoff: float
+    """
+
+    def __init__(
+        self,
+        backend: GeocodeBackend,
+        cache: GeocodeCache | bool = True,
+        rate: float | None = None,
+        max_concurrency: int = 8,
+        retries: int = 2,
+        backoff: float = 1.0,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        self.backend = backend
+        if cache is True:
+            cache = GeocodeCache()
+        self.cache = cache if isinstance(cache, GeocodeCache) else None
+        self.limiter = RateLimiter(rate) if rate else None
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+
+    def _geocode_batch(
+        self, addresses: list[str]
+    ) -> list[GeocodeResult | None]:
+        """Send one batch to the backend, with rate limiting and retries."""
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                return self.backend.geocode_batch(addresses)
+            except Exception as exc:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                attempt += 1
+                logger.warning(
+                    "Geocoding batch of %d failed (%s), retrying in %.1fs",
+                    len(addresses),
+                    exc,
+                    delay,
+                )
+                time.sleep(delay)
+
+    def geocode(self, addresses: Iterable[str | None]) -> pl.DataFrame:
+        """
+        Geocode addresses, returning one row per unique input address.
+
+        Batches that still fail after all retries are logged and their
+        addresses returned with null coordinates. Those addresses aren't
+        cached, so they're retried on the next call.
+
+        :param addresses:
+            Addresses to geocode, e.g. a Polars Series. Duplicates and
+            nulls are dropped.
+        :type addresses: Iterable[str]
+
+        :return:
+            DataFrame with ``address`` (as given), ``latitude``,
+            ``longitude`` and ``matched_address`` columns.
+        :rtype: pl.DataFrame
+        """
+        unique = list(dict.fromkeys(a for a in addresses if a is not None))
+        keys = {address: normalize_address(address) for address in unique}
+
+        results = (
+            self.cache.get_many(set(keys.values()), self.backend.name)
+            if self.cache is not None
+            else {}
+        )
+        # One backend lookup per key, using the first address seen for it
+        to_fetch: dict[str, str] = {}
+        for address, key in keys.items():
+            if key not in results:
+                to_fetch.setdefault(key, address)
+        logger.info(
+            "Geocoding %d addresses (%d cached)",
+            len(to_fetch),
+            len(set(keys.values())) - len(to_fetch),
+        )
+
+        pending = list(to_fetch.items())
+        size = self.backend.batch_size
+        batches = [pending[i : i + size] for i in range(0, len(pending), size)]
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                executor.submit(
+                    self._geocode_batch, [address for _, address in batch]
+                ): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    found = dict(
+                        zip([key for key, _ in batch], future.result())
+                    )
+                except Exception as exc:
+                    logger.error(
+                        "Geocoding batch of %d failed: %s", len(batch), exc
+                    )
+                    continue
+                if self.cache is not None:
+                    self.cache.put_many(found, self.backend.name)
+                results.update(found)
+
+        rows = [results.get(keys[address]) for address in unique]
+        return pl.DataFrame(
+            {
+                "address": unique,
+                "latitude": [r.latitude if r else None for r in rows],
+                "longitude": [r.longitude if r else None for r in rows],
+                "matched_address": [
+                    r.matched_address if r else None for r in rows
+                ],
+            },
+            schema={
+                "address": pl.String,
+                "latitude": pl.Float64,
+                "longitude": pl.Float64,
+                "matched_address": pl.String,
+            },
+        )
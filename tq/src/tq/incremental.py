@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import os
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from .cache import encode_metadata, normalize_sql, read_metadata, utc_now
+from .query import _PLACEHOLDER, _connection, load_sql, render_sql, sql_literal
+from .stream import stream_query
+from .utils import temp_path
+
+logger = logging.getLogger(__name__)
+
+
+def _base_sql_hash(sql: str) -> str:
+    """Hash the rendered query, so edits to it force a full refresh."""
+    return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+
+def incremental_sql(sql: str, watermark: str, high_water: Any) -> str:
+    """
+    Restrict a query to rows at or after a watermark value.
+
+    If the query has a ``{{ watermark }}`` placeholder, it's filled with the
+    watermark literal, so the filter can be placed where it prunes best,
+    e.g. ``AND snapshot_date >= {{ watermark }}`` on a partition column.
+    Otherwise the query is wrapped in a filter on the ``watermark`` output
+    column, which Trino pushes down into the scan. Either way the
+    ``watermark`` column must be in the output, since
+    :func:`refresh_incremental` reads the next high-water mark from it.
+
+    :param sql:
+        Rendered SQL text, possibly with a ``{{ watermark }}`` placeholder.
+    :type sql: str
+    :param watermark:
+        Name of the watermark column in the query output.
+    :type watermark: str
+    :param high_water:
+        Largest watermark value already materialized.
+    :type high_water: Any
+
+    :return:
+        SQL text selecting only new or changed rows.
+    :rtype: str
+    """
+    literal = sql_literal(high_water)
+    if "watermark" in _PLACEHOLDER.findall(sql):
+        return render_sql(sql, {"watermark": literal})
+
+    return (
+        f"SELECT * FROM (\n{sql}\n) AS tq_base\n"
+        f'WHERE tq_base."{watermark}" >= {literal}'
+    )
+
+
+def refresh_incremental(
+    sql_or_path: str | Path,
+    path: str | Path,
+    key: str | Sequence[str],
+    watermark: str,
+    params: Mapping[str, Any] | None = None,
+    conn: Any = None,
+    initial_watermark: Any = None,
+    full_refresh: bool = False,
+) -> pl.DataFrame:
+    """
+    Materialize a query to Parquet, fetching only rows changed since the
+    last refresh.
+
+    On the first run (or when the query changed) the full result is
+    fetched. Later runs read the largest ``watermark`` value from the
+    existing file, fetch only rows with a watermark at or after it (see
+    :func:`incremental_sql`), and merge them in: fetched rows replace
+    existing rows with the same ``key``, and all other rows are kept. Rows
+    deleted upstream are not removed, so run a ``full_refresh`` now and
+    then if that matters.
+
+    The file is replaced atomically, and records the watermark and a hash
+    of the query in its footer, see :func:`tq.cache.read_metadata`.
+
+    :param sql_or_path:
+        SQL text or path to a ``.sql`` template file. The output must
+        include the ``key`` and ``watermark`` columns.
+    :type sql_or_path: str | Path
+    :param path:
+        Parquet file holding the materialized result.
+    :type path: str | Path
+    :param key:
+        Column(s) uniquely identifying a row, used to merge changed rows.
+    :type key: str | Sequence[str]
+    :param watermark:
+        Output column that increases whenever a row is added or changed,
+        e.g. an update timestamp or snapshot date.
+    :type watermark: str
+    :param params:
+        Values for ``{{ name }}`` template placeholders, see
+        :func:`tq.query.render_sql`. ``watermark`` is filled automatically.
+    :type params: Mapping
+    :param conn:
+        Trino connection to use. If not provided, one is checked out of the
+        default pool.
+    :type conn: trino.dbapi.Connection
+    :param initial_watermark:
+        Value for a ``{{ watermark }}`` placeholder on a full refresh. If
+        not provided, the placeholder can't be used on a full refresh.
+    :type initial_watermark: Any
+    :param full_refresh:
+        Ignore the existing file and fetch the full result.
+    :type full_refresh: bool
+
+    :return:
+        The full, merged result.
+    :rtype: pl.DataFrame
+    """
+    path = Path(path)
+    keys = [key] if isinstance(key, str) else list(key)
+    template = load_sql(sql_or_path)
+    # Keep the watermark placeholder for incremental_sql to fill
+    sql = render_sql(
+        template, {**(params or {}), "watermark": "{{ watermark }}"}
+    )
+    sql_hash = _base_sql_hash(sql)
+
+    existing = None
+    if path.exists() and not full_refresh:
+        if read_metadata(path).get("sql_hash") == sql_hash:
+            existing = pl.scan_parquet(path)
+        else:
+            logger.info("Query changed since last refresh, fetching all rows")
+
+    high_water = None
+    if existing is not None:
+        high_water = existing.select(pl.col(watermark).max()).collect().item()
+
+    if high_water is not None:
+        fetch_sql = incremental_sql(sql, watermark, high_water)
+    elif "watermark" in _PLACEHOLDER.findall(sql):
+        if initial_watermark is None:
+            raise ValueError(
+                "initial_watermark is required to fill {{ watermark }} on a "
+                "full refresh."
+            )
+        fetch_sql = incremental_sql(sql, watermark, initial_watermark)
+    else:
+        fetch_sql = sql
+
+    with _connection(conn) as trino_conn:
+        table = stream_query(fetch_sql, trino_conn).read_all()
+    new: pl.DataFrame = pl.from_arrow(table)  # type: ignore[assignment]
+
+    if existing is not None and high_water is not None:
+        kept = existing.join(new.lazy().select(keys), on=keys, how="anti")
+        result = pl.concat(
+            [kept.collect(), new], how="vertical_relaxed"
+        ).rechunk()
+        logger.info(
+            "Fetched %d new or changed rows since %s=%s, %d rows total",
+            new.height,
+            watermark,
+            high_water,
+            result.height,
+        )
+    else:
+        result = new
+        logger.info("Fetched all %d rows", result.height)
+
+    new_high_water = (
+        result.select(pl.col(watermark).max()).item()
+        if result.height
+        else high_water
+    )
+    table = result.to_arrow()
+    table = table.replace_schema_metadata(
+        {
+            **(table.schema.metadata or {}),
+            **encode_metadata(
+                {
+                    "sql": sql,
+                    "sql_hash": sql_hash,
+                    "watermark": watermark,
+                    "high_water": new_high_water,
+                    "refreshed_at": utc_now(),
+                    "row_count": result.height,
+                }
+            ),
+        }
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(path)
+    try:
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    return result
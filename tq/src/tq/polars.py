@@ -0,0 +1,277 @@
+"""
+Shared Polars extensions. Importing this module registers ``util``
+namespaces on DataFrames and expressions:
+
+    import tq.polars  # noqa: F401
+
+    df.util.to_snake_case().util.empty_strings_to_null()
+    df.group_by("npi").agg(pl.col("rate").util.wmean("market_share"))
+
+To compute several weighted statistics over the same weight column, use
+:func:`weighted_stats`, which does the work in one grouped pass.
+
+:func:`read_json_records` decodes a JSON API response's list of records
+into string columns without a Python loop over the records.
+"""
+
+import io
+import re
+from collections.abc import Sequence
+from typing import Any, TypeVar
+
+import polars as pl
+
+FrameT = TypeVar("FrameT", pl.DataFrame, pl.LazyFrame)
+
+# Statistics supported by weighted_stats
+WEIGHTED_STATS = ("count", "sum", "mean", "std", "median")
+
+
+def _weighted_quantile(x: pl.Expr, w: pl.Expr, quantile: float) -> pl.Expr:
+    """
+    Lower weighted quantile: the smallest value whose cumulative weight
+    reaches ``quantile`` of the total weight. Rows with a null value or
+    weight are ignored.
+    """
+    if not 0 <= quantile <= 1:
+        raise ValueError("quantile must be between 0 and 1.")
+
+    valid = x.is_not_null() & w.is_not_null()
+    values = x.filter(valid)
+    weights = w.filter(valid).sort_by(values)
+    cum_weights = weights.cum_sum()
+    return (
+        values.sort()
+        .filter(cum_weights >= cum_weights.last() * quantile)
+        .first()
+    )
+
+
+@pl.api.register_dataframe_namespace("util")
+class UtilDataFrame:
+    def __init__(self, df: pl.DataFrame) -> None:
+        self._df = df
+
+    def to_snake_case(self) -> pl.DataFrame:
+        """Convert all column names to snake_case."""
+        return self._df.rename(
+            {
+                col: re.sub(r"[^a-zA-Z0-9]", "_", col.lower())
+                for col in self._df.columns
+            }
+        )
+
+    def empty_strings_to_null(self) -> pl.DataFrame:
+        """Convert all empty string columns to null."""
+        return self._df.with_columns(
+            pl.when(pl.col(pl.String).str.len_chars() == 0)
+            .then(None)
+            .otherwise(pl.col(pl.String))
+            .name.keep()
+        )
+
+
+@pl.api.register_expr_namespace("util")
+class UtilExpr:
+    """
+    Weighted aggregations, given a weight column name. Rows where the value
+    is null don't count towards the total weight.
+    Usage: pl.col("value_col").util.wmean("weight_col")
+    """
+
+    def __init__(self, expr: pl.Expr) -> None:
+        self._expr = expr
+
+    def wcount(self, weight: str) -> pl.Expr:
+        """Compute the weighted count i.e. the total weight of non-nulls."""
+        return pl.when(self._expr.is_not_null()).then(pl.col(weight)).sum()
+
+    def wsum(self, weight: str) -> pl.Expr:
+        """Compute the weighted sum of an expression."""
+        return self._expr.dot(pl.col(weight))
+
+    def wmean(self, weight: str) -> pl.Expr:
+        """Compute the weighted mean of an expression."""
+        weights = pl.when(self._expr.is_not_null()).then(pl.col(weight))
+        return self._expr.dot(weights).truediv(weights.sum()).fill_nan(None)
+
+    def wstd(self, weight: str) -> pl.Expr:
+        """
+        Compute the weighted (population) standard deviation of an
+        expression.
+        """
+        w = pl.col(weight)
+        mean = self.wmean(weight)
+        sq_dev = (self._expr - mean).pow(2)
+        return (sq_dev * w).sum().truediv(self.wcount(weight)).sqrt()
+
+    def wquantile(self, weight: str, quantile: float) -> pl.Expr:
+        """
+        Compute the weighted quantile of an expression, the smallest value
+        whose cumulative weight reaches ``quantile`` of the total weight.
+        """
+        return _weighted_quantile(self._expr, pl.col(weight), quantile)
+
+    def wmedian(self, weight: str) -> pl.Expr:
+        """Compute the weighted median of an expression."""
+        return self.wquantile(weight, 0.5)
+
+
+def weighted_stats(
+    frame: FrameT,
+    by: str | Sequence[str],
+    columns: Sequence[str],
+    weight: str,
+    stats: Sequence[str] = ("mean",),
+    quantiles: Sequence[float] = (),
+) -> FrameT:
+    """
+    Compute weighted statistics of many columns over one weight, per group.
+
+    Counts, sums, means and standard deviations are all derived from three
+    weighted sums per column (weight, weight * x and weight * x^2), which
+    are computed in a single ``group_by`` of plain sums. That's much faster
+    than evaluating a separate weighted expression per statistic inside
+    the aggregation. Medians and quantiles need sorted values, so they're
+    computed per group in the same aggregation.
+
+    Output columns are named ``{column}_{stat}`` e.g. ``rate_mean``, and
+    ``{column}_q{percent}`` for quantiles e.g. ``rate_q25``.
+
+    :param frame:
+        Data to aggregate.
+    :type frame: pl.DataFrame | pl.LazyFrame
+    :param by:
+        Column(s) to group by.
+    :type by: str | Sequence[str]
+    :param columns:
+        Value columns to compute statistics of.
+    :type columns: Sequence[str]
+    :param weight:
+        Weight column shared by all statistics. Rows with a null value (or
+        weight) don't count towards that column's statistics.
+    :type weight: str
+    :param stats:
+        Statistics to compute, any of ``"count"`` (total weight),
+        ``"sum"``, ``"mean"``, ``"std"`` (population) and ``"median"``.
+    :type stats: Sequence[str]
+    :param quantiles:
+        Weighted quantiles to compute, between 0 and 1.
+    :type quantiles: Sequence[float]
+
+    :return:
+        One row per group, in the same frame type as ``frame``.
+    :rtype: pl.DataFrame | pl.LazyFrame
+    """
+    unknown = set(stats) - set(WEIGHTED_STATS)
+    if unknown:
+        raise ValueError(f"Unknown weighted statistics: {sorted(unknown)}")
+
+    by = [by] if isinstance(by, str) else list(by)
+    w = pl.col(weight)
+    moments = {"count", "sum", "mean", "std"} & set(stats)
+
+    # Pre-compute weighted terms once, so the group_by is plain sums
+    terms, aggs = [], []
+    for col in columns:
+        x = pl.col(col)
+        valid = x.is_not_null() & w.is_not_null()
+        if moments:
+            terms.append(pl.when(valid).then(w).alias(f"__w_{col}"))
+            terms.append((x * w).alias(f"__wx_{col}"))
+            aggs += [pl.col(f"__w_{col}").sum(), pl.col(f"__wx_{col}").sum()]
+        if "std" in stats:
+            terms.append((x * x * w).alias(f"__wxx_{col}"))
+            aggs.append(pl.col(f"__wxx_{col}").sum())
+        if "median" in stats:
+            aggs.append(_weighted_quantile(x, w, 0.5).alias(f"{col}_median"))
+        for q in quantiles:
+            aggs.append(
+                _weighted_quantile(x, w, q).alias(f"{col}_q{q * 100:g}")
+            )
+
+    grouped = (
+        frame.with_columns(terms).group_by(by, maintain_order=True).agg(aggs)
+    )
+
+    outputs = []
+    for col in columns:
+        total = pl.col(f"__w_{col}")
+        mean = (pl.col(f"__wx_{col}") / total).fill_nan(None)
+        for stat in stats:
+            if stat == "count":
+                outputs.append(total.alias(f"{col}_count"))
+            elif stat == "sum":
+                outputs.append(pl.col(f"__wx_{col}").alias(f"{col}_sum"))
+            elif stat == "mean":
+                outputs.append(mean.alias(f"{col}_mean"))
+            elif stat == "std":
+                variance = (pl.col(f"__wxx_{col}") / total - mean.pow(2)).clip(
+                    lower_bound=0
+                )
+                outputs.append(variance.sqrt().alias(f"{col}_std"))
+            else:
+                outputs.append(pl.col(f"{col}_{stat}"))
+        outputs += [pl.col(f"{col}_q{q * 100:g}") for q in quantiles]
+
+    return grouped.select(*by, *outputs)
+
+
+def read_json_records(
+    source: bytes, field: str
+) -> tuple[pl.DataFrame, dict[str, Any]]:
+    """
+    Read the list of JSON objects under ``field`` of a JSON document into a
+    frame with one string column per key.
+
+    Values are formatted as ``str`` would format the decoded Python value,
+    except that nested values become their own JSON text: ``true`` becomes
+    ``"True"``, ``1.0`` stays ``"1.0"``, and ``[1]`` becomes ``"[1]"``
+    even if the key holds a string in other records. Keys missing from a
+    record are null, and objects keep only their own keys.
+
+    The document is decoded by Polars twice, with no Python loop: once
+    inferring types, to find every key and which hold booleans or floats,
+    and once with every key read as a string, which keeps strings and
+    integers as is and nested values as JSON whatever their type. Like
+    ``pl.read_json``, it raises ``ComputeError`` on lists that mix objects
+    with other values.
+
+    :param source:
+        JSON document, e.g. an API response body.
+    :type source: bytes
+    :param field:
+        Top-level key holding the list of records.
+    :type field: str
+
+    :return:
+        The records, and the document's other top-level values.
+    :rtype: tuple[pl.DataFrame, dict[str, Any]]
+    """
+    typed = pl.read_json(io.BytesIO(source), infer_schema_length=None)
+    others = typed.drop(field, strict=False).row(0, named=True)
+    dtype = typed.schema.get(field)
+    if not (isinstance(dtype, pl.List) and isinstance(dtype.inner, pl.Struct)):
+        return pl.DataFrame(), others
+    fields = {f.name: f.dtype for f in dtype.inner.fields}
+
+    # JSON strings can't hold raw newlines, so this puts the document on
+    # a single NDJSON line
+    raw = pl.read_ndjson(
+        io.BytesIO(source.replace(b"\n", b" ").replace(b"\r", b" ")),
+        schema={field: pl.List(pl.Struct(dict.fromkeys(fields, pl.String)))},
+    )
+    records = raw.select(pl.col(field).explode()).unnest(field)
+    typed_records = typed.select(pl.col(field).explode()).unnest(field)
+
+    formatted = []
+    for name, field_dtype in fields.items():
+        value = typed_records[name]
+        if field_dtype == pl.Boolean:
+            formatted.append(value.cast(pl.String).str.to_titlecase())
+        elif field_dtype.is_float():
+            # Python pads negative exponents to two digits, e.g. 1e-07
+            formatted.append(
+                value.cast(pl.String).str.replace(r"e-(\d)$", "e-0$1")
+            )
+    return records.with_columns(formatted), others
@@ -0,0 +1,244 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from .connectors import connect_trino, get_trino_config
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable Trino connections.
+
+    Each Trino connection owns a keep-alive HTTP session, so reusing
+    connections lets parallel workers and notebooks skip the TLS handshake
+    and authentication of a fresh connection for every query. Nothing is
+    read or created until the first checkout: the env file is loaded once
+    per pool and connections are created on demand, up to ``max_size``.
+
+    A connection is checked out by exactly one thread at a time. Threads
+    block on checkout while all ``max_size`` connections are in use.
+    Connections that have been idle longer than ``health_check_interval``
+    are checked with a trivial query before being handed out, and replaced
+    if the check fails.
+
+    :param env_file:
+        Path to the .env file with the Trino connection parameters, see
+        :func:`tq.connectors.get_trino_connection`.
+    :type env_file: Path
+    :param max_size:
+        Maximum number of open connections.
+    :type max_size: int
+    :param health_check_interval:
+        Seconds a connection can sit idle before it's health checked on
+        checkout. ``None`` disables health checks.
+    :type health_check_interval: float
+    :param connect:
+        Optional zero-argument factory for new connections. Defaults to
+        connecting with the env file parameters.
+    :type connect: Callable
+    """
+
+    def __init__(
+        self,
+        env_file: Path | None = None,
+        max_size: int = 8,
+        health_check_interval: float | None = 300.0,
+        connect: Callable[[], Any] | None = None,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+
+        self.env_file = env_file
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        self._config: dict[str, str | None] | None = None
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Number of connections currently open (idle or checked out)."""
+        return self._size
+
+    def _new_connection(self) -> Any:
+        """Create a new connection, loading the env file on first use."""
+        if self._connect is not None:
+            return self._connect()
+
+        with self._lock:
+            if self._config is None:
+                self._config = get_trino_config(self.env_file)
+        return connect_trino(self._config)
+
+    @staticmethod
+    def is_healthy(conn: Any) -> bool:
+        """Check that a connection can still run a trivial query."""
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _close(conn: Any) -> None:
+        """Close a connection, ignoring errors from dead connections."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout: float | None = None) -> Any:
+        """
+        Check out a connection for exclusive use by the calling thread.
+
+        Prefer :meth:`connection`, which returns the connection to the pool
+        automatically.
+
+        :param timeout:
+            Seconds to wait for a connection when the pool is exhausted.
+            ``None`` waits forever.
+        :type timeout: float
+
+        :return:
+            A Trino connection. Must be returned with :meth:`release`.
+        :rtype: trino.dbapi.Connection
+
+        :raises PoolTimeoutError:
+            If no connection became available within ``timeout``.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeoutError(
+                f"No Trino connection available after {timeout}s "
+                f"(max_size={self.max_size})."
+            )
+
+        try:
+            while True:
+                try:
+                    conn, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._new_connection()
+                    with self._lock:
+                        self._size += 1
+                    return conn
+
+                interval = self.health_check_interval
+                if (
+                    interval is None
+                    or time.monotonic() - idle_since < interval
+                ):
+                    return conn
+                if self.is_healthy(conn):
+                    return conn
+
+                logger.info("Replacing unhealthy pooled Trino connection")
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """
+        Return a checked out connection to the pool.
+
+        :param conn:
+            Connection previously returned by :meth:`acquire`.
+        :type conn: trino.dbapi.Connection
+        :param discard:
+            Close the connection instead of reusing it e.g. after an error
+            that may have left it in a bad state.
+        :type discard: bool
+        """
+        if discard:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+        self._slots.release()
+
+    def _discard(self, conn: Any) -> None:
+        """Close a connection and free up its place in the pool."""
+        self._close(conn)
+        with self._lock:
+            self._size -= 1
+
+    @contextmanager
+    def connection(self, timeout: float | None = None) -> Iterator[Any]:
+        """
+        Check out a connection for the duration of a ``with`` block.
+
+        The connection is returned to the pool on exit. If the block
+        raises, the connection is health checked before being reused.
+
+        :param timeout:
+            Seconds to wait for a connection when the pool is exhausted.
+        :type timeout: float
+        """
+        conn = self.acquire(timeout=timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=not self.is_healthy(conn))
+            raise
+        else:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close all idle connections. Checked out ones are unaffected."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+_default_pool: ConnectionPool | None = None
+_default_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> ConnectionPool:
+    """
+    Get the process-wide default connection pool, creating it if needed.
+
+    The pool uses the default env file lookup and is closed at exit.
+
+    :return:
+        The shared connection pool.
+    :rtype: ConnectionPool
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+@contextmanager
+def pooled_connection(timeout: float | None = None) -> Iterator[Any]:
+    """
+    Check out a connection from the default pool for a ``with`` block.
+
+    :param timeout:
+        Seconds to wait for a connection when the pool is exhausted.
+    :type timeout: float
+    """
+    with get_connection_pool().connection(timeout=timeout) as conn:
+        yield conn
@@ -0,0 +1,412 @@
+import atexit
+import logging
+import re
+import sys
+import time
+import uuid
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+from .cache import QueryCache, cache_key, utc_now
+from .connectors import get_trino_config
+from .estimate import (
+    QueryEstimate,
+    check_scan_budget,
+    estimate_query,
+    get_scan_budget,
+    get_spill_bytes,
+    parse_bytes,
+)
+from .pool import pooled_connection
+from .stream import stream_query
+from .tables import content_addressed_sql
+from .utils import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Matches template placeholders of the form {{ name }}, as used throughout
+# the project queries/*.sql files
+_PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+# Uncached lazy results are spilled to .tq_cache/spill, and files older
+# than this are assumed to be left over from crashed processes
+SPILL_MAX_AGE = timedelta(days=1)
+
+
+def load_sql(sql_or_path: str | Path) -> str:
+    """
+    Get SQL text from either a path to a ``.sql`` file or a SQL string.
+
+    :param sql_or_path:
+        Path to a SQL file (as a Path or a string ending in ``.sql``) or the
+        SQL text itself.
+    :type sql_or_path: str | Path
+
+    :return:
+        The SQL text.
+    :rtype: str
+    """
+    if isinstance(sql_or_path, Path) or (
+        sql_or_path.rstrip().endswith(".sql") and "\n" not in sql_or_path
+    ):
+        with open(sql_or_path, "r") as query:
+            return query.read()
+
+    return sql_or_path
+
+
+def sql_literal(value: Any) -> str:
+    """Format a single Python value as a Trino SQL literal."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, datetime):
+        return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+    if isinstance(value, date):
+        return f"DATE '{value.isoformat()}'"
+
+    escaped = str(value).replace("'", "''")
+    return f"'{escaped}'"
+
+
+def _format_param(value: Any) -> str:
+    """Format a template parameter value for substitution into SQL."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, pl.Series):
+        value = value.to_list()
+    if isinstance(value, Iterable):
+        return ",".join(sql_literal(v) for v in value)
+
+    return sql_literal(value)
+
+
+def render_sql(sql: str, params: Mapping[str, Any] | None = None) -> str:
+    """
+    Fill ``{{ name }}`` placeholders in a SQL template.
+
+    Strings are substituted verbatim, so they can contain SQL fragments.
+    Lists, tuples, sets and Polars Series are rendered as comma-separated
+    literals for use in ``IN (...)`` clauses: strings are single-quoted
+    (with quotes escaped) and numbers are left bare. Cast a Series to
+    ``pl.String`` first to compare against a VARCHAR column.
+
+    :param sql:
+        SQL template text.
+    :type sql: str
+    :param params:
+        Mapping of placeholder names to values. Extra keys are ignored.
+    :type params: Mapping
+
+    :return:
+        The rendered SQL text.
+    :rtype: str
+
+    :raises ValueError:
+        If the template contains placeholders with no matching parameter.
+    """
+    params = params or {}
+    missing = sorted({m for m in _PLACEHOLDER.findall(sql) if m not in params})
+    if missing:
+        raise ValueError(f"Missing SQL template parameters: {missing}")
+
+    return _PLACEHOLDER.sub(lambda m: _format_param(params[m.group(1)]), sql)
+
+
+@contextmanager
+def _connection(conn: Any) -> Iterator[Any]:
+    """Use the given connection, or check one out of the default pool."""
+    if conn is not None:
+        yield conn
+    else:
+        with pooled_connection() as pooled:
+            yield pooled
+
+
+def _preflight(
+    sql: str,
+    conn: Any,
+    config: dict[str, Any] | None,
+    scan_budget: int | str | None,
+    confirm: bool,
+) -> QueryEstimate:
+    """Estimate a query and enforce the scan budget before running it."""
+    budget = (
+        parse_bytes(scan_budget)
+        if scan_budget is not None
+        else get_scan_budget(config)
+    )
+    estimate = estimate_query(sql, conn)
+    check_scan_budget(estimate, budget, confirm=confirm)
+    return estimate
+
+
+def _remove_spill_files(paths: set[Path]) -> None:
+    """Remove this process's spill files at interpreter exit."""
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+_spill_paths: set[Path] = set()
+atexit.register(_remove_spill_files, _spill_paths)
+
+
+def _spill(sql: str, conn: Any) -> Path:
+    """
+    Stream a query result to a spill file in bounded Arrow batches.
+
+    Spill files live in ``.tq_cache/spill`` until the interpreter exits.
+    Files left behind by crashed processes are removed once they're older
+    than :data:`SPILL_MAX_AGE`.
+    """
+    spill_dir = get_cache_dir("spill")
+    cutoff = time.time() - SPILL_MAX_AGE.total_seconds()
+    for stale in spill_dir.glob("*.parquet"):
+        try:
+            if stale.stat().st_mtime < cutoff:
+                stale.unlink()
+        except OSError:
+            pass
+
+    path = spill_dir / f"{uuid.uuid4().hex}.parquet"
+    _spill_paths.add(path)
+    stream_query(sql, conn).to_parquet(path)
+    return path
+
+
+def _fetch_frame(sql: str, conn: Any) -> pl.DataFrame:
+    """Fetch a query result into memory."""
+    table = stream_query(sql, conn).read_all()
+    return pl.from_arrow(table)  # type: ignore[return-value]
+
+
+def read_query(
+    sql_or_path: str | Path,
+    params: Mapping[str, Any] | None = None,
+    ttl: timedelta | float | None = None,
+    conn: Any = None,
+    lazy: bool = False,
+    cache: QueryCache | bool = True,
+    refresh: bool = False,
+    estimate: bool = False,
+    scan_budget: int | str | None = None,
+    confirm: bool = False,
+) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Run a (templated) Trino query, caching the result locally as Parquet.
+
+    Results are keyed by a hash of the rendered SQL plus the connection
+    catalog and schema. A cache hit is read straight from disk without
+    opening a Trino connection. On a miss, the result is streamed from Trino
+    to the cache file in bounded Arrow batches (see
+    :func:`tq.stream.stream_query`). Each cache entry records its SQL,
+    params, fetch time and row count in the Parquet footer, see
+    :func:`tq.cache.read_metadata`.
+
+    :param sql_or_path:
+        SQL text or path to a ``.sql`` template file.
+    :type sql_or_path: str | Path
+    :param params:
+        Values for ``{{ name }}`` template placeholders, see
+        :func:`render_sql`.
+    :type params: Mapping
+    :param ttl:
+        Maximum age of a cached result, as a timedelta or in seconds. Older
+        results are re-fetched. ``None`` uses the cache default.
+    :type ttl: timedelta | float
+    :param conn:
+        Trino connection to use on a cache miss. If not provided, one is
+        checked out of the default pool, see
+        :func:`tq.pool.get_connection_pool`.
+    :type conn: trino.dbapi.Connection
+    :param lazy:
+        Return a LazyFrame scanning the cached Parquet file instead of
+        reading it into memory. Without caching, the result is streamed
+        to a spill file in ``.tq_cache/spill`` (removed at exit) and
+        scanned from there, so memory use stays bounded.
+    :type lazy: bool
+    :param cache:
+        A :class:`tq.cache.QueryCache` to use, ``True`` for the default
+        project cache, or ``False`` to always query Trino.
+    :type cache: QueryCache | bool
+    :param refresh:
+        Ignore any existing cache entry and re-run the query.
+    :type refresh: bool
+    :param estimate:
+        Before running the query, estimate its input and output size with
+        ``EXPLAIN (TYPE IO)`` and refuse to run it if it would scan more
+        than the scan budget (``TQ_SCAN_BUDGET`` in the environment or
+        .env file e.g. ``500GB``). Without caching, eager results
+        estimated to be larger than ``TQ_SPILL_BYTES`` (2 GB by default)
+        are streamed to a spill file and read back from it, instead of
+        being fetched into memory batch by batch. Only applies when the
+        query actually runs.
+    :type estimate: bool
+    :param scan_budget:
+        Scan budget override, in bytes or as a string like ``"1TB"``.
+        Implies ``estimate=True``.
+    :type scan_budget: int | str
+    :param confirm:
+        Ask for confirmation on the console instead of refusing queries
+        over the scan budget.
+    :type confirm: bool
+
+    :return:
+        The query result.
+    :rtype: pl.DataFrame | pl.LazyFrame
+
+    :raises tq.estimate.ScanBudgetError:
+        If the query is estimated to scan more than the budget.
+    """
+    sql = render_sql(load_sql(sql_or_path), params)
+    estimate = estimate or scan_budget is not None
+    config = get_trino_config() if conn is None or estimate else None
+
+    if cache is False:
+        with _connection(conn) as trino_conn:
+            spill = lazy
+            if estimate:
+                output_bytes = _preflight(
+                    sql, trino_conn, config, scan_budget, confirm
+                ).output_bytes
+                if output_bytes is not None and output_bytes > get_spill_bytes(
+                    config
+                ):
+                    logger.info(
+                        "Result is estimated at %.1f GB, spilling to disk",
+                        output_bytes / 1024**3,
+                    )
+                    spill = True
+            if not spill:
+                return _fetch_frame(sql, trino_conn)
+            path = _spill(sql, trino_conn)
+        if lazy:
+            return pl.scan_parquet(path)
+        frame = pl.read_parquet(path)
+        path.unlink(missing_ok=True)
+        _spill_paths.discard(path)
+        return frame
+
+    store = cache if isinstance(cache, QueryCache) else QueryCache()
+    if conn is not None:
+        catalog, schema = conn.catalog, conn.schema
+    else:
+        config = config or get_trino_config()
+        catalog = config.get("TQ_TRINO_CATALOG", "hive")
+        schema = config.get("TQ_TRINO_SCHEMA")
+    key = cache_key(content_addressed_sql(sql), catalog, schema)
+
+    entry = None if refresh else store.get(key, ttl=ttl)
+    if entry is None:
+        with _connection(conn) as trino_conn:
+            if estimate:
+                _preflight(sql, trino_conn, config, scan_budget, confirm)
+            entry = store.put_stream(
+                key,
+                stream_query(sql, trino_conn),
+                metadata={
+                    "sql": sql,
+                    "params": {
+                        k: _format_param(v) for k, v in (params or {}).items()
+                    },
+                    "catalog": catalog,
+                    "schema": schema,
+                    "fetched_at": utc_now(),
+                },
+            )
+
+    return pl.scan_parquet(entry) if lazy else pl.read_parquet(entry)
+
+
+def run_queries(
+    queries: Mapping[str, str | Path | tuple[str | Path, Mapping[str, Any]]],
+    params: Mapping[str, Any] | None = None,
+    max_concurrency: int = 4,
+    progress: bool = True,
+    **kwargs: Any,
+) -> dict[str, pl.DataFrame | pl.LazyFrame]:
+    """
+    Run several independent (templated) queries against Trino in parallel.
+
+    Each query runs through :func:`read_query` on its own worker thread,
+    with its own connection checked out of the default pool, so total wall
+    time is roughly that of the slowest query. Progress is logged to the
+    ``tq.query`` logger as each query starts and finishes, and printed to
+    stderr unless ``progress=False``.
+
+    :param queries:
+        Mapping of result names to SQL text or ``.sql`` paths. A value can
+        also be a ``(sql_or_path, params)`` tuple to pass query-specific
+        template parameters, which take precedence over ``params``.
+    :type queries: Mapping
+    :param params:
+        Template parameters shared by all queries. Parameters a template
+        doesn't use are ignored.
+    :type params: Mapping
+    :param max_concurrency:
+        Maximum number of queries running on Trino at the same time.
+    :type max_concurrency: int
+    :param progress:
+        Print a line to stderr as each query starts and finishes, so
+        progress is visible without configuring logging.
+    :type progress: bool
+    :param kwargs:
+        Additional arguments passed to :func:`read_query` e.g. ``ttl``,
+        ``cache`` or ``lazy``.
+
+    :return:
+        Query results keyed by name, in the same order as ``queries``.
+    :rtype: dict[str, pl.DataFrame | pl.LazyFrame]
+
+    :raises RuntimeError:
+        If any query fails. Queries that haven't started yet are cancelled.
+    """
+    if "conn" in kwargs:
+        raise ValueError("run_queries uses one pooled connection per query.")
+
+    def report(message: str, *args: Any) -> None:
+        logger.info(message, *args)
+        if progress:
+            print(f"[tq] {message % args}", file=sys.stderr, flush=True)
+
+    def run_one(name: str) -> pl.DataFrame | pl.LazyFrame:
+        query = queries[name]
+        query_params = dict(params or {})
+        if isinstance(query, tuple):
+            query, extra_params = query
+            query_params.update(extra_params)
+
+        report("Started query '%s'", name)
+        start = time.perf_counter()
+        result = read_query(query, query_params, **kwargs)
+        report(
+            "Finished query '%s' in %.1fs",
+            name,
+            time.perf_counter() - start,
+        )
+        return result
+
+    results = {}
+    with ThreadPoolExecutor(
+        max_workers=max_concurrency, thread_name_prefix="tq-query"
+    ) as executor:
+        futures = {executor.submit(run_one, name): name for name in queries}
+        for done, future in enumerate(as_completed(futures), start=1):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as exc:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise RuntimeError(f"Query '{name}' failed") from exc
+            report("Completed %d/%d queries", done, len(futures))
+
+    return {name: results[name] for name in queries}
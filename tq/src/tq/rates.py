@@ -0,0 +1,372 @@
+"""
+Shared rules for cleaning negotiated rates.
+
+:func:`select_canonical` keeps one rate per group (e.g. per
+provider/payer/plan/code) according to an ordered list of priority rules,
+replacing the ``sort(...).unique(keep="first")`` and
+``== max().over(...)`` patterns copied between project scripts:
+
+    from tq.rates import Prefer, select_canonical
+
+    rates_df = select_canonical(
+        rates_df,
+        ["provider_id", "payer_id", "plan_name", "billing_code"],
+        priority=[
+            Prefer.values("final_rate_type", ["case rate", "per diem"]),
+            Prefer.max("canonical_rate_score"),
+        ],
+    )
+
+Rather than sorting every rate, each rule is turned into a small integer
+rank and the ranks are packed into a single ``UInt64`` key, so the
+selection is one hash-grouped ``min`` over that key.
+
+:class:`OutlierPolicy` declares outlier trimming rules once and compiles
+them both to a Polars expression and to a Trino ``WHERE`` fragment, so
+trimming can run server-side in a ``queries/*.sql`` template instead of
+after downloading every rate:
+
+    import tq
+    from tq.rates import Bound, OutlierPolicy
+
+    outliers = OutlierPolicy(
+        [
+            Bound("final_rate_amount", 3000, 500_000),
+            Bound.ratio(
+                "final_rate_amount", "medicare_rate", 0.6, 10,
+                keep_missing=True,
+            ),
+        ]
+    )
+    rates_df = tq.read_query(
+        "queries/rates.sql", params={"outlier_filter": outliers.to_sql()}
+    )
+
+    # The same rules, applied to a frame that's already local
+    local_df = local_df.filter(outliers.expr())
+"""
+
+import logging
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import polars as pl
+
+from .query import sql_literal
+
+logger = logging.getLogger(__name__)
+
+# Ways to pick between rows tied on every priority rule
+TIEBREAKS = ("first", "last", "all")
+
+# Name of the packed priority key while selecting
+_PACKED = "__tq_priority"
+
+# Column names usable in Trino SQL without quoting
+_BARE_IDENTIFIER = re.compile(r"[a-z_][a-z0-9_]*")
+
+
+@dataclass(frozen=True)
+class Prefer:
+    """
+    One priority rule for :func:`select_canonical`.
+
+    Rows with the smallest value of ``column`` are preferred, or the
+    largest if ``descending``. If ``order`` is given, rows are instead
+    preferred by the position of their value in it, and values not listed
+    rank after all listed ones. Nulls always rank last.
+    """
+
+    column: str
+    descending: bool = False
+    order: tuple[Any, ...] | None = None
+
+    @classmethod
+    def min(cls, column: str) -> "Prefer":
+        """Prefer the smallest value of a column."""
+        return cls(column)
+
+    @classmethod
+    def max(cls, column: str) -> "Prefer":
+        """Prefer the largest value of a column, e.g. a score."""
+        return cls(column, descending=True)
+
+    @classmethod
+    def values(cls, column: str, order: Sequence[Any]) -> "Prefer":
+        """Prefer values of a column in the given order, best first."""
+        return cls(column, order=tuple(order))
+
+    def rank(self, dtype: pl.DataType) -> pl.Expr:
+        """
+        Non-negative ``UInt64`` rank of each row under this rule, smaller
+        being preferred. Nulls are left null.
+        """
+        col = pl.col(self.column)
+        if self.order is not None:
+            ranked = col.replace_strict(
+                self.order,
+                range(len(self.order)),
+                default=len(self.order),
+                return_dtype=pl.UInt64,
+            )
+            return pl.when(col.is_not_null()).then(ranked)
+        if (
+            dtype == pl.Boolean
+            or dtype.is_temporal()
+            or (dtype.is_integer() and dtype != pl.UInt64)
+        ):
+            # Integers are their own rank, offset from the best value
+            x = col.to_physical().cast(pl.Int64)
+            offset = x.max() - x if self.descending else x - x.min()
+            return offset.cast(pl.UInt64)
+        return (
+            col.rank("dense", descending=self.descending).cast(pl.UInt64) - 1
+        )
+
+
+def _bits(n: int) -> int:
+    """Bits needed to store every integer from 0 to ``n``."""
+    return max(1, n.bit_length())
+
+
+def select_canonical(
+    df: pl.DataFrame,
+    keys: str | Sequence[str],
+    priority: Sequence[str | Prefer] = (),
+    tiebreak: str = "first",
+) -> pl.DataFrame:
+    """
+    Keep the most preferred row of each group.
+
+    Rows are compared by each rule of ``priority`` in turn, like a sort by
+    those columns, but without sorting the frame: every rule is converted
+    to an integer rank (integer, boolean and temporal columns by offset,
+    ``order`` rules by lookup, anything else by a dense rank), the ranks
+    and the row position are packed into one ``UInt64`` key, and the
+    winner of each group is its minimum key, found with a single
+    ``group_by``. Rules too wide to pack together are merged into a dense
+    rank of the rules before them first.
+
+    :param df:
+        Rates to select from.
+    :type df: pl.DataFrame
+    :param keys:
+        Column(s) defining a group, e.g. provider, payer, plan and code.
+        Null keys form their own group, as in ``unique``.
+    :type keys: str | Sequence[str]
+    :param priority:
+        Rules in order of importance. A plain column name prefers its
+        smallest value; see :class:`Prefer` for largest values and
+        ordered lists of values.
+    :type priority: Sequence[str | Prefer]
+    :param tiebreak:
+        Row kept among rows tied on every rule: ``"first"`` or ``"last"``
+        in frame order, or ``"all"`` to keep every tied row.
+    :type tiebreak: str
+
+    :return:
+        The selected rows, in their original order.
+    :rtype: pl.DataFrame
+    """
+    if tiebreak not in TIEBREAKS:
+        raise ValueError(
+            f"tiebreak must be one of {TIEBREAKS}, got {tiebreak!r}."
+        )
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    rules = [Prefer(r) if isinstance(r, str) else r for r in priority]
+    if df.height == 0:
+        return df
+
+    ranks = df.select(
+        rule.rank(df.schema[rule.column]).alias(f"__tq_rank_{i}")
+        for i, rule in enumerate(rules)
+    )
+    maxima = ranks.max().row(0) if rules else ()
+    row_bits = _bits(df.height - 1)
+    free_bits = 64 - (0 if tiebreak == "all" else row_bits)
+
+    work = df.select(keys).with_columns(pl.lit(0, pl.UInt64).alias(_PACKED))
+    packed_bits = 0
+    for name, top in zip(ranks.columns, maxima, strict=True):
+        # Nulls rank after every value
+        null_rank = 0 if top is None else top + 1
+        rank = ranks[name].fill_null(null_rank)
+        bits = _bits(null_rank)
+        if bits > row_bits:
+            rank = rank.rank("dense").cast(pl.UInt64) - 1
+            bits = row_bits
+        if packed_bits + bits > free_bits:
+            work = work.with_columns(
+                pl.col(_PACKED).rank("dense").cast(pl.UInt64) - 1
+            )
+            packed_bits = row_bits
+            if packed_bits + bits > free_bits:
+                raise ValueError(
+                    "Too many rows to pack priority ranks into 64 bits."
+                )
+        work = work.with_columns(
+            pl.col(_PACKED) * pl.lit(1 << bits, pl.UInt64) + rank
+        )
+        packed_bits += bits
+
+    if tiebreak == "all":
+        best = pl.col(_PACKED) == pl.col(_PACKED).min().over(keys)
+        return df.filter(work.select(best).to_series())
+
+    # The row position in the low bits breaks ties and identifies the row
+    position = pl.int_range(pl.len(), dtype=pl.UInt64)
+    if tiebreak == "last":
+        position = pl.len().cast(pl.UInt64) - 1 - position
+    row_mask = pl.lit(1 << row_bits, pl.UInt64)
+    rows = (
+        work.with_columns(pl.col(_PACKED) * row_mask + position)
+        .group_by(keys)
+        .agg(pl.col(_PACKED).min() % row_mask)
+        .get_column(_PACKED)
+    )
+    if tiebreak == "last":
+        rows = df.height - 1 - rows
+    logger.debug("Selected %d of %d rows", len(rows), df.height)
+    return df.gather(rows.sort())
+
+
+def _sql_column(name: str, alias: str | None) -> str:
+    """Trino reference to a column, quoted if needed and qualified."""
+    if not _BARE_IDENTIFIER.fullmatch(name):
+        name = '"' + name.replace('"', '""') + '"'
+    return f"{alias}.{name}" if alias else name
+
+
+@dataclass(frozen=True)
+class Bound:
+    """
+    One outlier rule: rows are kept if a value is within inclusive bounds.
+
+    The value is ``column``, or ``column / denominator`` for a ratio, with
+    a zero denominator giving a missing ratio (as in SQL ``NULLIF``). NaN
+    values are always dropped. Rows with a missing value are dropped
+    unless ``keep_missing``, e.g. to keep rates with no Medicare rate to
+    compare against.
+    """
+
+    column: str
+    lower: float | None = None
+    upper: float | None = None
+    denominator: str | None = None
+    keep_missing: bool = False
+
+    def __post_init__(self) -> None:
+        if self.lower is None and self.upper is None:
+            raise ValueError(f"Bound on {self.column!r} has no bounds.")
+
+    @classmethod
+    def ratio(
+        cls,
+        numerator: str,
+        denominator: str,
+        lower: float | None = None,
+        upper: float | None = None,
+        keep_missing: bool = False,
+    ) -> "Bound":
+        """Bound the ratio of two columns, e.g. a rate to Medicare."""
+        return cls(numerator, lower, upper, denominator, keep_missing)
+
+    def expr(self) -> pl.Expr:
+        """Polars expression, true for rows within the bounds."""
+        # Compare as floats, so Decimal columns (e.g. from Trino DECIMAL)
+        # support the NaN check below
+        value = pl.col(self.column).cast(pl.Float64)
+        if self.denominator is not None:
+            denominator = pl.col(self.denominator).cast(pl.Float64)
+            value = value / pl.when(denominator != 0).then(denominator)
+        if self.lower is not None and self.upper is not None:
+            within = value.is_between(self.lower, self.upper)
+        elif self.lower is not None:
+            within = value >= self.lower
+        else:
+            within = value <= self.upper
+        # NaN compares greater than any number in Polars, but never
+        # satisfies a comparison in Trino
+        within = within & value.is_not_nan()
+        return value.is_null() | within if self.keep_missing else within
+
+    def to_sql(self, alias: str | None = None) -> str:
+        """Trino condition, true for rows within the bounds."""
+        value = _sql_column(self.column, alias)
+        if self.denominator is not None:
+            denominator = _sql_column(self.denominator, alias)
+            value = f"CAST({value} AS DOUBLE) / NULLIF({denominator}, 0)"
+        if self.lower is not None and self.upper is not None:
+            within = (
+                f"{value} BETWEEN {sql_literal(self.lower)}"
+                f" AND {sql_literal(self.upper)}"
+            )
+        elif self.lower is not None:
+            within = f"{value} >= {sql_literal(self.lower)}"
+        else:
+            within = f"{value} <= {sql_literal(self.upper)}"
+        if self.keep_missing:
+            return f"({value} IS NULL OR {within})"
+        return f"({within})"
+
+
+@dataclass(frozen=True)
+class OutlierPolicy:
+    """
+    A set of outlier rules, all of which a row must pass to be kept.
+
+    The same rules compile to a Polars expression with :meth:`expr` and to
+    a Trino ``WHERE`` fragment with :meth:`to_sql`, which keep exactly the
+    same rows. Pass the fragment to a ``queries/*.sql`` template to trim
+    outliers server-side:
+
+    .. code-block:: sql
+
+        SELECT *
+        FROM rates
+        WHERE {{ outlier_filter }}
+
+    :param rules:
+        Rules to apply.
+    :type rules: Sequence[Bound]
+    """
+
+    rules: tuple[Bound, ...]
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "rules", tuple(self.rules))
+
+    def expr(self) -> pl.Expr:
+        """
+        Compile the rules into a Polars filter expression.
+
+        :return:
+            Expression that is true for rows passing every rule, or
+            ``True`` if there are no rules.
+        :rtype: pl.Expr
+        """
+        if not self.rules:
+            return pl.lit(True)
+        return pl.all_horizontal(rule.expr() for rule in self.rules)
+
+    def to_sql(self, alias: str | None = None) -> str:
+        """
+        Compile the rules into a Trino boolean expression.
+
+        :param alias:
+            Table alias to qualify column names with, e.g. ``"hr"``.
+        :type alias: str | None
+
+        :return:
+            SQL condition that is true for rows passing every rule, or
+            ``TRUE`` if there are no rules.
+        :rtype: str
+        """
+        if not self.rules:
+            return "TRUE"
+        conditions = "\n    AND ".join(
+            rule.to_sql(alias) for rule in self.rules
+        )
+        return f"({conditions})"
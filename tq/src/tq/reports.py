@@ -0,0 +1,276 @@
+"""
+Fast, formatted Excel output for analysis deliverables.
+
+:func:`write_workbook` writes a dict of frames to an XLSX workbook with
+XlsxWriter in constant-memory mode: rows are streamed to disk slice by
+slice straight from the frames, so memory stays flat however large the
+sheets are. Formatting is set per column (bold headers, widths sized from
+the data, percent/currency number formats) instead of cell by cell, and
+sheets longer than Excel's row limit are split across numbered sheets:
+
+    from tq.reports import write_workbook
+
+    write_workbook(
+        "data/output/codes_check.xlsx",
+        {"Codes": codes_df, "Counts by Payer-Provider": counts_df},
+        formats={"Percent Coverage": "percent", "Claims Revenue": "currency"},
+    )
+
+Requires XlsxWriter: ``pip install "tq[excel]"``.
+"""
+
+import logging
+import re
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# Rows per sheet in Excel, including the header
+EXCEL_MAX_ROWS = 1_048_576
+
+# Maximum length of an Excel sheet name
+_MAX_SHEET_NAME = 31
+
+# Characters Excel doesn't allow in sheet names
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+# Rows converted from the frame at a time while streaming
+_SLICE_ROWS = 50_000
+
+# Named number formats accepted by write_workbook(formats=...)
+NUMBER_FORMATS = {
+    "percent": "0.0%",
+    "currency": '"$"#,##0',
+    "currency_cents": '"$"#,##0.00',
+    "integer": "#,##0",
+    "decimal": "#,##0.00",
+    "date": "yyyy-mm-dd",
+    "datetime": "yyyy-mm-dd hh:mm:ss",
+}
+
+
+def _unique_sheet_name(name: str, suffix: str, used: set[str]) -> str:
+    """
+    A valid sheet name ending in ``suffix``, numbered if it would collide
+    (case-insensitively, as in Excel) with a name in ``used``.
+    """
+    name = _INVALID_SHEET_CHARS.sub("_", name).strip("'") or "Sheet"
+    candidate = name[: _MAX_SHEET_NAME - len(suffix)] + suffix
+    n = 2
+    while candidate.lower() in used:
+        numbered = f"{suffix}~{n}"
+        candidate = name[: _MAX_SHEET_NAME - len(numbered)] + numbered
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _sheet_names(name: str, parts: int, used: set[str]) -> list[str]:
+    """
+    Names of the sheets a sheet is split into, sanitized and made unique
+    among the ``used`` names, which they're added to.
+    """
+    if parts == 1:
+        return [_unique_sheet_name(name, "", used)]
+    return [
+        _unique_sheet_name(name, f" ({i})", used) for i in range(1, parts + 1)
+    ]
+
+
+def _to_excel_types(df: pl.DataFrame) -> pl.DataFrame:
+    """Cast columns XlsxWriter can't write natively to strings or floats."""
+    casts = []
+    for name, dtype in df.schema.items():
+        if isinstance(dtype, pl.Datetime) and dtype.time_zone is not None:
+            # Excel has no time zones, so keep the local wall time
+            casts.append(pl.col(name).dt.replace_time_zone(None))
+        elif dtype == pl.Binary:
+            casts.append(pl.col(name).bin.encode("hex"))
+        elif dtype.is_decimal():
+            casts.append(pl.col(name).cast(pl.Float64))
+        elif dtype.is_nested():
+            casts.append(
+                pl.col(name).map_elements(str, return_dtype=pl.String)
+            )
+        elif dtype in (pl.Categorical, pl.Enum, pl.Time, pl.Duration):
+            casts.append(pl.col(name).cast(pl.String))
+    return df.with_columns(casts) if casts else df
+
+
+def _writer(worksheet: Any, dtype: pl.DataType) -> Any:
+    """The XlsxWriter method writing values of one column's dtype."""
+    if dtype.is_numeric():
+        return worksheet.write_number
+    if dtype == pl.Boolean:
+        return worksheet.write_boolean
+    if dtype in (pl.Date, pl.Datetime):
+        return worksheet.write_datetime
+    if dtype == pl.String:
+        return worksheet.write_string
+    return worksheet.write
+
+
+def column_widths(
+    df: pl.DataFrame, min_width: int = 4, max_width: int = 60
+) -> list[int]:
+    """
+    Excel column widths fitting each column's header and longest value.
+
+    Lengths are computed in one vectorized pass over the frame. Floats are
+    measured rounded to two decimals, roughly as they'll be displayed.
+
+    :param df:
+        Frame to size.
+    :type df: pl.DataFrame
+    :param min_width:
+        Narrowest column width.
+    :type min_width: int
+    :param max_width:
+        Widest column width, before padding.
+    :type max_width: int
+
+    :return:
+        One width per column, in characters.
+    :rtype: list[int]
+    """
+    if df.width == 0:
+        return []
+    lengths = df.select(
+        (pl.col(name).round(2) if dtype.is_float() else pl.col(name))
+        .cast(pl.String)
+        .str.len_chars()
+        .max()
+        .fill_null(0)
+        .alias(name)
+        for name, dtype in df.schema.items()
+    ).row(0)
+    return [
+        max(min_width, min(max(len(name), length), max_width) + 2)
+        for name, length in zip(df.columns, lengths, strict=True)
+    ]
+
+
+def write_workbook(
+    path: str | Path,
+    sheets: Mapping[str, pl.DataFrame],
+    formats: Mapping[str, str | Mapping[str, Any]] | None = None,
+    max_width: int = 60,
+    max_rows: int = EXCEL_MAX_ROWS,
+) -> Path:
+    """
+    Write frames to an Excel workbook, one sheet per frame.
+
+    :param path:
+        Output ``.xlsx`` path.
+    :type path: str | Path
+    :param sheets:
+        Sheet names mapped to frames, in sheet order. Characters Excel
+        doesn't allow in sheet names are replaced with ``_``, and names
+        that collide once truncated to 31 characters are numbered
+        ``"~2"``, ``"~3"``, etc.
+    :type sheets: Mapping[str, pl.DataFrame]
+    :param formats:
+        Column names mapped to a format for that column in every sheet:
+        a name from :data:`NUMBER_FORMATS` (``"percent"``,
+        ``"currency"``, ...), an Excel number format string, or a dict of
+        XlsxWriter format properties. Date and datetime columns get a date
+        format by default.
+    :type formats: Mapping[str, str | Mapping[str, Any]]
+    :param max_width:
+        Widest automatic column width, in characters.
+    :type max_width: int
+    :param max_rows:
+        Rows per sheet including the header. Frames with more rows are
+        split across sheets named ``"<name> (1)"``, ``"<name> (2)"``, etc.
+    :type max_rows: int
+
+    :return:
+        Path to the written workbook.
+    :rtype: Path
+    """
+    try:
+        import xlsxwriter
+    except ImportError as exc:
+        raise ImportError(
+            "tq.reports requires xlsxwriter. Install it with: "
+            "pip install 'tq[excel]'"
+        ) from exc
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    formats = dict(formats or {})
+    rows_per_sheet = max_rows - 1
+
+    workbook = xlsxwriter.Workbook(
+        path,
+        {
+            "constant_memory": True,
+            "nan_inf_to_errors": True,
+            "default_date_format": NUMBER_FORMATS["date"],
+        },
+    )
+    bold = workbook.add_format({"bold": True})
+    cell_formats: dict[str, Any] = {}
+    used_names: set[str] = set()
+
+    def cell_format(name: str, dtype: pl.DataType) -> Any:
+        spec = formats.get(name)
+        if spec is None:
+            if dtype == pl.Datetime:
+                spec = "datetime"
+            elif dtype == pl.Date:
+                spec = "date"
+            else:
+                return None
+        key = repr(spec)
+        if key not in cell_formats:
+            if isinstance(spec, str):
+                spec = {"num_format": NUMBER_FORMATS.get(spec, spec)}
+            cell_formats[key] = workbook.add_format(dict(spec))
+        return cell_formats[key]
+
+    try:
+        for name, df in sheets.items():
+            df = _to_excel_types(df)
+            widths = column_widths(df, max_width=max_width)
+            column_formats = [
+                cell_format(col, dtype) for col, dtype in df.schema.items()
+            ]
+            parts = max(1, -(-df.height // rows_per_sheet))
+            sheet_names = _sheet_names(name, parts, used_names)
+            for part, sheet_name in enumerate(sheet_names):
+                worksheet = workbook.add_worksheet(sheet_name)
+                for i, (width, fmt) in enumerate(
+                    zip(widths, column_formats, strict=True)
+                ):
+                    worksheet.set_column(i, i, width, fmt)
+                worksheet.freeze_panes(1, 0)
+                worksheet.write_row(0, 0, df.columns, bold)
+
+                # Bind one typed write method per column, skipping
+                # XlsxWriter's per-cell type sniffing in write()
+                writers = list(
+                    enumerate(_writer(worksheet, dt) for dt in df.dtypes)
+                )
+                chunk = df.slice(part * rows_per_sheet, rows_per_sheet)
+                row = 1
+                for batch in chunk.iter_slices(_SLICE_ROWS):
+                    columns = [s.to_list() for s in batch.get_columns()]
+                    for values in zip(*columns, strict=True):
+                        for (col, write), value in zip(writers, values):
+                            if value is not None:
+                                write(row, col, value)
+                        row += 1
+            logger.info(
+                "Wrote sheet '%s': %d rows in %d part(s)",
+                name,
+                df.height,
+                parts,
+            )
+    finally:
+        workbook.close()
+    return path
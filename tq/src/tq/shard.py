@@ -0,0 +1,409 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from collections.abc import Iterable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+from .cache import read_metadata
+from .pool import pooled_connection
+from .query import load_sql, render_sql, sql_literal
+from .stream import stream_query
+from .utils import temp_path
+
+logger = logging.getLogger(__name__)
+
+
+class ShardError(RuntimeError):
+    """Raised when one or more shards still fail after all retries."""
+
+    def __init__(self, failed: dict[str, BaseException]) -> None:
+        self.failed = failed
+        names = ", ".join(sorted(failed))
+        super().__init__(
+            f"{len(failed)} shard(s) failed: {names}. Completed shards are "
+            "checkpointed, so re-running only executes the failed ones."
+        )
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    One slice of a sharded query.
+
+    :param name:
+        Unique, filesystem-safe name of the shard, used for its checkpoint.
+    :type name: str
+    :param predicate:
+        SQL boolean expression selecting the rows of this shard.
+    :type predicate: str
+    """
+
+    name: str
+    predicate: str
+
+
+def _slug(value: Any) -> str:
+    """Make a value safe to use in a checkpoint file name."""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(value)) or "_"
+
+
+def shards_by_values(column: str, values: Iterable[Any]) -> list[Shard]:
+    """
+    Create one shard per distinct value of a column e.g. one per state.
+
+    :param column:
+        SQL column (or expression) to shard on.
+    :type column: str
+    :param values:
+        Values of the column, one shard each. ``None`` shards on nulls.
+    :type values: Iterable
+
+    :return:
+        Shards in the order given.
+    :rtype: list[Shard]
+    """
+    shards = []
+    for value in values:
+        if value is None:
+            predicate = f"{column} IS NULL"
+        else:
+            predicate = f"{column} = {sql_literal(value)}"
+        shards.append(Shard(f"{_slug(column)}={_slug(value)}", predicate))
+    return shards
+
+
+def shards_by_range(column: str, bounds: Sequence[Any]) -> list[Shard]:
+    """
+    Create shards covering consecutive ranges of a column.
+
+    Given bounds ``[b0, b1, ..., bn]``, creates shards for ``< b1``,
+    ``[b1, b2)``, ..., ``>= bn``, plus a final ``IS NULL`` shard, so every
+    row (including values outside the bounds and nulls) falls into exactly
+    one shard. Works for numbers and strings, e.g. billing code ranges.
+
+    :param column:
+        SQL column (or expression) to shard on.
+    :type column: str
+    :param bounds:
+        Sorted range boundaries.
+    :type bounds: Sequence
+
+    :return:
+        ``len(bounds) + 1`` shards in range order, then the null shard.
+    :rtype: list[Shard]
+
+    :raises ValueError:
+        If ``bounds`` is empty or not sorted.
+    """
+    if not bounds:
+        raise ValueError("At least one range bound is required.")
+    if list(bounds) != sorted(bounds):
+        raise ValueError("Range bounds must be sorted.")
+
+    literals = [sql_literal(b) for b in bounds]
+    shards = [Shard(f"{_slug(column)}=0", f"{column} < {literals[0]}")]
+    for i, (lower, upper) in enumerate(zip(literals, literals[1:]), start=1):
+        shards.append(
+            Shard(
+                f"{_slug(column)}={i}",
+                f"{column} >= {lower} AND {column} < {upper}",
+            )
+        )
+    shards.append(
+        Shard(f"{_slug(column)}={len(bounds)}", f"{column} >= {literals[-1]}")
+    )
+    shards.append(Shard(f"{_slug(column)}=None", f"{column} IS NULL"))
+    return shards
+
+
+def _sql_hash(sql: str) -> str:
+    """Hash rendered shard SQL to detect stale checkpoints."""
+    return hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+
+def _is_checkpointed(path: Path, sql: str) -> bool:
+    """Check whether a shard checkpoint exists for exactly this SQL."""
+    if not path.exists():
+        return False
+    try:
+        return read_metadata(path).get("sql_hash") == _sql_hash(sql)
+    except Exception:
+        return False
+
+
+def run_sharded(
+    sql_or_path: str | Path,
+    shards: Sequence[Shard],
+    out_dir: str | Path,
+    params: Mapping[str, Any] | None = None,
+    shard_param: str = "shard_filter",
+    max_concurrency: int = 4,
+    retries: int = 2,
+    backoff: float = 5.0,
+) -> pl.LazyFrame:
+    """
+    Run one large query as independent shards in parallel, with checkpoints.
+
+    The template must contain a ``{{ shard_filter }}`` placeholder (or
+    ``shard_param``) in a ``WHERE`` clause, which is replaced by each
+    shard's predicate. Each shard is streamed to its own Parquet file in
+    ``out_dir`` as soon as it finishes. Failed shards are retried with
+    exponential backoff; shards that still fail raise a
+    :class:`ShardError`, but every completed shard stays checkpointed. A
+    rerun only executes shards without a checkpoint for the same SQL, so a
+    failure near the end of a long pull no longer loses everything.
+
+    :param sql_or_path:
+        SQL template text or path to a ``.sql`` template file.
+    :type sql_or_path: str | Path
+    :param shards:
+        Shards to run, see :func:`shards_by_values` and
+        :func:`shards_by_range`.
+    :type shards: Sequence[Shard]
+    :param out_dir:
+        Directory for per-shard checkpoint files.
+    :type out_dir: str | Path
+    :param params:
+        Other template parameters, shared by all shards.
+    :type params: Mapping
+    :param shard_param:
+        Name of the template placeholder that receives the shard predicate.
+    :type shard_param: str
+    :param max_concurrency:
+        Maximum number of shards running on Trino at the same time.
+    :type max_concurrency: int
+    :param retries:
+        Number of times to retry a failed shard.
+    :type retries: int
+    :param backoff:
+        Seconds to wait before the first retry, doubled for each retry.
+    :type backoff: float
+
+    :return:
+        A LazyFrame concatenating all shards, in shard order.
+    :rtype: pl.LazyFrame
+
+    :raises ShardError:
+        If any shard failed after all retries.
+    """
+    if len({shard.name for shard in shards}) != len(shards):
+        raise ValueError("Shard names must be unique.")
+
+    template = load_sql(sql_or_path)
+    if shard_param not in re.findall(r"\{\{\s*(\w+)\s*\}\}", template):
+        raise ValueError(
+            f"Template has no {{{{ {shard_param} }}}} placeholder."
+        )
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {shard.name: out_dir / f"{shard.name}.parquet" for shard in shards}
+    sqls = {
+        shard.name: render_sql(
+            template, {**(params or {}), shard_param: shard.predicate}
+        )
+        for shard in shards
+    }
+
+    pending = [
+        s for s in shards if not _is_checkpointed(paths[s.name], sqls[s.name])
+    ]
+    logger.info(
+        "Running %d of %d shards (%d already checkpointed)",
+        len(pending),
+        len(shards),
+        len(shards) - len(pending),
+    )
+
+    def run_shard(shard: Shard) -> None:
+        sql = sqls[shard.name]
+        for attempt in range(retries + 1):
+            try:
+                with pooled_connection() as trino_conn:
+                    stats = stream_query(sql, trino_conn).to_parquet(
+                        paths[shard.name],
+                        metadata={"sql": sql, "sql_hash": _sql_hash(sql)},
+                    )
+                logger.info(
+                    "Finished shard '%s': %d rows in %.1fs",
+                    shard.name,
+                    stats.rows,
+                    stats.seconds,
+                )
+                return
+            except Exception as exc:
+                if attempt == retries:
+                    raise
+                wait = backoff * 2**attempt
+                logger.warning(
+                    "Shard '%s' failed (%s), retrying in %.0fs",
+                    shard.name,
+                    exc,
+                    wait,
+                )
+                time.sleep(wait)
+
+    failed = {}
+    with ThreadPoolExecutor(
+        max_workers=max_concurrency, thread_name_prefix="tq-shard"
+    ) as executor:
+        futures = {
+            executor.submit(run_shard, shard): shard for shard in pending
+        }
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                future.result()
+            except Exception as exc:
+                logger.error("Shard '%s' failed: %s", shard.name, exc)
+                failed[shard.name] = exc
+
+    if failed:
+        raise ShardError(failed)
+
+    return pl.scan_parquet([paths[shard.name] for shard in shards])
+
+
+def _supertype(left: pl.DataType, right: pl.DataType) -> pl.DataType:
+    """Smallest type both dtypes cast to, falling back to strings."""
+    if left == right:
+        return left
+    try:
+        return pl.concat(
+            [
+                pl.DataFrame(schema={"c": left}),
+                pl.DataFrame(schema={"c": right}),
+            ],
+            how="vertical_relaxed",
+        ).schema["c"]
+    except pl.exceptions.PolarsError:
+        return pl.String
+
+
+def unify_schemas(paths: Sequence[str | Path]) -> pl.Schema:
+    """
+    Union the schemas of Parquet files, reading only their footers.
+
+    Columns appear in the order they're first seen. A column with different
+    types across files gets their common supertype (e.g. Int64 and Float64
+    become Float64), or String if there is none.
+
+    :param paths:
+        Parquet files to unify.
+    :type paths: Sequence[str | Path]
+
+    :return:
+        The unified schema.
+    :rtype: pl.Schema
+    """
+    unified: dict[str, pl.DataType] = {}
+    for path in paths:
+        for name, dtype in pl.read_parquet_schema(path).items():
+            unified[name] = _supertype(unified.get(name, dtype), dtype)
+    return pl.Schema(unified)
+
+
+def scan_aligned(path: str | Path, schema: pl.Schema) -> pl.LazyFrame:
+    """
+    Lazily scan a Parquet file aligned to ``schema``: columns are cast to
+    its types and put in its order, and missing columns are filled with
+    nulls. Aligned scans of files with different schemas can be
+    concatenated, with projections still pushed down into each file.
+
+    :param path:
+        Parquet file to scan.
+    :type path: str | Path
+    :param schema:
+        Target schema, usually from :func:`unify_schemas`.
+    :type schema: pl.Schema
+
+    :return:
+        The aligned scan.
+    :rtype: pl.LazyFrame
+    """
+    columns = pl.read_parquet_schema(path)
+    return pl.scan_parquet(path).select(
+        pl.col(name).cast(dtype)
+        if name in columns
+        else pl.lit(None, dtype).alias(name)
+        for name, dtype in schema.items()
+    )
+
+
+def _sink(lf: pl.LazyFrame, path: Path, tmp: Path) -> pl.LazyFrame:
+    """Lazy sink to ``tmp``, as CSV or Parquet by the extension of ``path``."""
+    if path.suffix == ".csv":
+        return lf.sink_csv(tmp, lazy=True)
+    return lf.sink_parquet(tmp, lazy=True)
+
+
+def consolidate_shards(
+    paths: Sequence[str | Path],
+    output: str | Path,
+    unique: Mapping[str | Path, Sequence[str]] | None = None,
+) -> pl.LazyFrame:
+    """
+    Stream many Parquet shards into one file, in constant memory.
+
+    Schemas are unified from the shard footers (see :func:`unify_schemas`),
+    then every shard is scanned, aligned to the unified schema and streamed
+    to ``output`` with ``sink_parquet``. Derived outputs listed in
+    ``unique`` are computed in the same streaming pass, so each shard is
+    read exactly once. Outputs are written to temporary files and moved
+    into place when all of them succeed.
+
+    :param paths:
+        Shard files to consolidate, concatenated in this order.
+    :type paths: Sequence[str | Path]
+    :param output:
+        Path of the consolidated Parquet file.
+    :type output: str | Path
+    :param unique:
+        Extra outputs of unique key combinations, as a mapping of output
+        path (``.csv`` or ``.parquet``) to key columns, e.g.
+        ``{"data/output/npis.csv": ["npi"]}``.
+    :type unique: Mapping[str | Path, Sequence[str]]
+
+    :return:
+        A LazyFrame scanning the consolidated file.
+    :rtype: pl.LazyFrame
+    """
+    if not paths:
+        raise ValueError("No shards to consolidate.")
+
+    schema = unify_schemas(paths)
+    combined = pl.concat(
+        [scan_aligned(path, schema) for path in paths], how="vertical"
+    )
+
+    targets = {Path(output): combined}
+    for out_path, keys in (unique or {}).items():
+        targets[Path(out_path)] = combined.select(keys).unique()
+
+    tmp_paths = {path: temp_path(path) for path in targets}
+    try:
+        for path in targets:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        pl.collect_all(
+            _sink(lf, path, tmp_paths[path]) for path, lf in targets.items()
+        )
+        for path, tmp in tmp_paths.items():
+            os.replace(tmp, path)
+    finally:
+        for tmp in tmp_paths.values():
+            tmp.unlink(missing_ok=True)
+
+    logger.info(
+        "Consolidated %d shards into %s (%d columns)",
+        len(paths),
+        output,
+        len(schema),
+    )
+    return pl.scan_parquet(output)
@@ -0,0 +1,278 @@
+"""
+Spatial index for nearest-neighbor and radius queries on lat/lon points.
+
+Points are projected onto the unit sphere and indexed with a KD-tree, so
+straight-line (chord) distances between 3D vectors map exactly to
+great-circle distances and queries are correct everywhere, including
+near the poles and the antimeridian. Queries are batched: millions of
+query points go through the tree in one vectorized call.
+
+    from tq.spatial import SpatialIndex
+
+    index = SpatialIndex.from_frame(providers, id="provider_id")
+    index.save("data/intermediate/providers.index.parquet")
+
+    nearest = index.nearest(zctas["lat"], zctas["lon"], k=3)
+    within = index.within(zctas["lat"], zctas["lon"], radius=50_000)
+
+Use this as a fast fallback where travel times (see
+:mod:`tq.traveltimes`) have no coverage. Requires SciPy:
+``pip install "tq[spatial]"``.
+"""
+
+import os
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+from .cache import encode_metadata, read_metadata, utc_now
+from .utils import temp_path
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError as exc:
+    raise ImportError(
+        "tq.spatial requires scipy. Install it with: pip install 'tq[spatial]'"
+    ) from exc
+
+# Mean Earth radius in meters (IUGG)
+EARTH_RADIUS_M = 6_371_008.8
+
+# Query points per ball-point batch, to bound memory of the neighbor lists
+_BATCH_SIZE = 100_000
+
+ArrayLike = np.ndarray | pl.Series | Sequence[float]
+
+
+def to_unit_vectors(lat: ArrayLike, lon: ArrayLike) -> np.ndarray:
+    """Convert degrees of latitude and longitude to 3D unit vectors."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack(
+        [cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)]
+    )
+
+
+def chord_to_meters(chord: np.ndarray) -> np.ndarray:
+    """Convert unit-sphere chord lengths to great-circle meters."""
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def meters_to_chord(meters: float) -> float:
+    """Convert great-circle meters to a unit-sphere chord length."""
+    return 2 * np.sin(min(meters / EARTH_RADIUS_M, np.pi) / 2)
+
+
+def haversine(
+    lat1: ArrayLike, lon1: ArrayLike, lat2: ArrayLike, lon2: ArrayLike
+) -> np.ndarray:
+    """Great-circle distance in meters between pairs of points."""
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(a, dtype=np.float64))
+        for a in (lat1, lon1, lat2, lon2)
+    )
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class SpatialIndex:
+    """
+    KD-tree over points on the Earth's surface.
+
+    :param ids:
+        Identifier of each point, e.g. provider IDs. Returned by queries.
+    :type ids: pl.Series
+    :param lat:
+        Latitudes in degrees.
+    :type lat: ArrayLike
+    :param lon:
+        Longitudes in degrees.
+    :type lon: ArrayLike
+    """
+
+    def __init__(self, ids: pl.Series, lat: ArrayLike, lon: ArrayLike) -> None:
+        self.ids = pl.Series("id", ids)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        if not len(self.ids) == len(self.lat) == len(self.lon):
+            raise ValueError("ids, lat and lon must have the same length.")
+        if np.isnan(self.lat).any() or np.isnan(self.lon).any():
+            raise ValueError("Coordinates can't be missing.")
+        self._tree = cKDTree(to_unit_vectors(self.lat, self.lon))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __repr__(self) -> str:
+        return f"SpatialIndex({len(self):,} points)"
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pl.DataFrame,
+        id: str = "id",
+        lat: str = "lat",
+        lon: str = "lon",
+    ) -> "SpatialIndex":
+        """
+        Build an index from a frame of points. Rows with a missing
+        coordinate are dropped.
+        """
+        df = df.select(id, lat, lon).drop_nulls([lat, lon])
+        return cls(df[id], df[lat], df[lon])
+
+    def save(self, path: Path | str) -> Path:
+        """
+        Persist the indexed points as Parquet. The tree itself is rebuilt
+        on :meth:`load`, which takes well under a second per million
+        points and avoids unpickling files from disk.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pl.DataFrame(
+            {"id": self.ids, "lat": self.lat, "lon": self.lon}
+        ).to_arrow()
+        table = table.replace_schema_metadata(
+            {
+                **(table.schema.metadata or {}),
+                **encode_metadata(
+                    {"index": "kdtree_unit_sphere", "created_at": utc_now()}
+                ),
+            }
+        )
+        tmp = temp_path(path)
+        try:
+            pq.write_table(table, tmp, compression="zstd")
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return path
+
+    @classmethod
+    def load(cls, path: Path | str) -> "SpatialIndex":
+        """Load an index saved with :meth:`save`."""
+        if read_metadata(Path(path)).get("index") != "kdtree_unit_sphere":
+            raise ValueError(f"{path} is not a saved tq.spatial index.")
+        df = pl.read_parquet(path)
+        return cls(df["id"], df["lat"], df["lon"])
+
+    def nearest(
+        self,
+        lat: ArrayLike,
+        lon: ArrayLike,
+        k: int = 1,
+        max_distance: float | None = None,
+        workers: int = -1,
+    ) -> pl.DataFrame:
+        """
+        Find the ``k`` nearest indexed points to each query point.
+
+        :param lat:
+            Query latitudes in degrees.
+        :type lat: ArrayLike
+        :param lon:
+            Query longitudes in degrees.
+        :type lon: ArrayLike
+        :param k:
+            Number of neighbors per query point.
+        :type k: int
+        :param max_distance:
+            Only return neighbors within this many meters.
+        :type max_distance: float
+        :param workers:
+            Threads to query with, ``-1`` for all cores.
+        :type workers: int
+
+        :return:
+            One row per (query point, neighbor) with ``query`` (position
+            of the query point), ``id``, ``distance_m`` and ``rank``
+            (1 for the nearest), sorted by query and rank.
+        :rtype: pl.DataFrame
+        """
+        k = min(k, len(self))
+        points = to_unit_vectors(lat, lon)
+        upper = (
+            np.inf if max_distance is None else meters_to_chord(max_distance)
+        )
+        chords, indices = self._tree.query(
+            points, k=k, distance_upper_bound=upper, workers=workers
+        )
+        chords = chords.reshape(len(points), k)
+        indices = indices.reshape(len(points), k)
+
+        # Missing neighbors (beyond max_distance) come back as index n
+        found = indices < len(self)
+        query, rank = np.nonzero(found)
+        return pl.DataFrame(
+            {
+                "query": query.astype(np.int64),
+                "id": self.ids.gather(indices[found]),
+                "distance_m": chord_to_meters(chords[found]),
+                "rank": (rank + 1).astype(np.int32),
+            }
+        )
+
+    def within(
+        self,
+        lat: ArrayLike,
+        lon: ArrayLike,
+        radius: float,
+        workers: int = -1,
+    ) -> pl.DataFrame:
+        """
+        Find all indexed points within ``radius`` meters of each query
+        point, in batches to bound memory use.
+
+        :param lat:
+            Query latitudes in degrees.
+        :type lat: ArrayLike
+        :param lon:
+            Query longitudes in degrees.
+        :type lon: ArrayLike
+        :param radius:
+            Search radius in meters.
+        :type radius: float
+        :param workers:
+            Threads to query with, ``-1`` for all cores.
+        :type workers: int
+
+        :return:
+            One row per (query point, match) with ``query``, ``id`` and
+            ``distance_m``, sorted by query and distance.
+        :rtype: pl.DataFrame
+        """
+        points = to_unit_vectors(lat, lon)
+        chord = meters_to_chord(radius)
+        queries, matches = [], []
+        for start in range(0, len(points), _BATCH_SIZE):
+            batch = points[start : start + _BATCH_SIZE]
+            neighbors = self._tree.query_ball_point(
+                batch, chord, workers=workers
+            )
+            lengths = np.fromiter((len(n) for n in neighbors), np.int64)
+            queries.append(np.repeat(np.arange(len(batch)) + start, lengths))
+            matches.append(
+                np.concatenate([np.asarray(n, np.int64) for n in neighbors])
+                if lengths.sum()
+                else np.empty(0, np.int64)
+            )
+
+        query = np.concatenate(queries) if queries else np.empty(0, np.int64)
+        match = np.concatenate(matches) if matches else np.empty(0, np.int64)
+        distances = chord_to_meters(
+            np.linalg.norm(points[query] - self._tree.data[match], axis=1)
+        )
+        return pl.DataFrame(
+            {
+                "query": query,
+                "id": self.ids.gather(match),
+                "distance_m": distances,
+            }
+        ).sort("query", "distance_m")
@@ -0,0 +1,252 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+from .cache import utc_now
+from .utils import get_cache_dir, get_project_root
+
+logger = logging.getLogger(__name__)
+
+# Maps Trino server-side stats (from the statement protocol) to record fields
+_SERVER_STATS = {
+    "state": "state",
+    "elapsedTimeMillis": "elapsed_ms",
+    "queuedTimeMillis": "queued_ms",
+    "cpuTimeMillis": "cpu_ms",
+    "wallTimeMillis": "wall_ms",
+    "processedRows": "processed_rows",
+    "processedBytes": "processed_bytes",
+    "physicalInputBytes": "physical_input_bytes",
+    "peakMemoryBytes": "peak_memory_bytes",
+    "spilledBytes": "spilled_bytes",
+    "totalSplits": "total_splits",
+}
+
+# Non-integer columns of the stats log
+_LOG_TYPES = {
+    "query_id": pl.String,
+    "fingerprint": pl.String,
+    "project": pl.String,
+    "sql": pl.String,
+    "finished_at": pl.String,
+    "state": pl.String,
+    "first_row_seconds": pl.Float64,
+    "fetch_seconds": pl.Float64,
+    "rows_per_sec": pl.Float64,
+}
+
+# Only the start of each statement is logged, to keep huge IN lists out
+MAX_LOGGED_SQL_CHARS = 2000
+
+_log_lock = threading.Lock()
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    Fingerprint a SQL statement, ignoring literal values and formatting.
+
+    Comments, string and numeric literals, the length of ``IN (...)``
+    lists, whitespace and keyword casing are all normalized away, so runs
+    of the same template with different parameters share a fingerprint.
+
+    :param sql:
+        SQL text.
+    :type sql: str
+
+    :return:
+        Short hex fingerprint.
+    :rtype: str
+    """
+    normalized = re.sub(r"--[^\n]*|/\*.*?\*/", " ", sql, flags=re.S)
+    normalized = re.sub(r"'(?:[^']|'')*'", "?", normalized)
+    normalized = re.sub(r"\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", "?", normalized)
+    normalized = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?)", normalized)
+    normalized = " ".join(normalized.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def current_project() -> str:
+    """Get the working directory relative to the project root."""
+    cwd = Path.cwd()
+    try:
+        return cwd.relative_to(get_project_root()).as_posix()
+    except Exception:
+        return cwd.name
+
+
+def get_stats_log_path() -> Path:
+    """
+    Get the path of the query stats log.
+
+    Defaults to ``stats.jsonl`` in the tq cache directory and can be
+    changed with the ``TQ_STATS_LOG`` environment variable.
+    """
+    log_path = os.environ.get("TQ_STATS_LOG")
+    return Path(log_path) if log_path else get_cache_dir() / "stats.jsonl"
+
+
+@dataclass
+class QueryRecord:
+    """Server- and client-side execution statistics for one query."""
+
+    query_id: str | None
+    fingerprint: str
+    project: str
+    sql: str
+    finished_at: str
+    state: str | None = None
+    elapsed_ms: int | None = None
+    queued_ms: int | None = None
+    cpu_ms: int | None = None
+    wall_ms: int | None = None
+    processed_rows: int | None = None
+    processed_bytes: int | None = None
+    physical_input_bytes: int | None = None
+    peak_memory_bytes: int | None = None
+    spilled_bytes: int | None = None
+    total_splits: int | None = None
+    rows: int | None = None
+    first_row_seconds: float | None = None
+    fetch_seconds: float | None = None
+    rows_per_sec: float | None = None
+
+    @classmethod
+    def from_query(
+        cls,
+        sql: str,
+        query_id: str | None,
+        server_stats: dict[str, Any] | None,
+        client_stats: Any = None,
+    ) -> "QueryRecord":
+        """
+        Build a record from Trino and :class:`tq.stream.FetchStats` stats.
+
+        :param sql:
+            SQL text of the query.
+        :type sql: str
+        :param query_id:
+            Trino query ID.
+        :type query_id: str
+        :param server_stats:
+            Stats reported by Trino, e.g. ``cursor.stats``.
+        :type server_stats: dict
+        :param client_stats:
+            Client-side fetch stats, if the result was fetched.
+        :type client_stats: tq.stream.FetchStats
+        """
+        server_stats = server_stats or {}
+        fields = {
+            field: server_stats.get(key)
+            for key, field in _SERVER_STATS.items()
+        }
+        if client_stats is not None:
+            fields.update(
+                rows=client_stats.rows,
+                first_row_seconds=client_stats.first_row_seconds,
+                fetch_seconds=client_stats.seconds,
+                rows_per_sec=client_stats.rows_per_sec,
+            )
+
+        return cls(
+            query_id=query_id or server_stats.get("queryId"),
+            fingerprint=fingerprint_sql(sql),
+            project=current_project(),
+            sql=sql[:MAX_LOGGED_SQL_CHARS],
+            finished_at=utc_now().isoformat(),
+            **fields,
+        )
+
+
+def record_query(record: QueryRecord, path: Path | None = None) -> None:
+    """
+    Append a query record to the stats log as one JSON line.
+
+    :param record:
+        Record to append.
+    :type record: QueryRecord
+    :param path:
+        Log file path. Defaults to :func:`get_stats_log_path`.
+    :type path: Path
+    """
+    path = Path(path) if path is not None else get_stats_log_path()
+    line = json.dumps(dataclasses.asdict(record)) + "\n"
+    with _log_lock, open(path, "a") as log:
+        log.write(line)
+
+
+def load_stats(path: Path | None = None) -> pl.DataFrame:
+    """
+    Load the query stats log as a DataFrame.
+
+    :param path:
+        Log file path. Defaults to :func:`get_stats_log_path`.
+    :type path: Path
+
+    :return:
+        One row per recorded query.
+    :rtype: pl.DataFrame
+    """
+    path = Path(path) if path is not None else get_stats_log_path()
+    schema = {
+        field.name: _LOG_TYPES.get(field.name, pl.Int64)
+        for field in dataclasses.fields(QueryRecord)
+    }
+    if not path.exists():
+        return pl.DataFrame(schema=schema)
+
+    return pl.read_ndjson(path, schema=schema)
+
+
+def summarize_stats(
+    stats: pl.DataFrame, by: str = "fingerprint", sort: str = "cpu_ms"
+) -> pl.DataFrame:
+    """
+    Summarize recorded query stats by SQL fingerprint or project.
+
+    :param stats:
+        Query records, see :func:`load_stats`.
+    :type stats: pl.DataFrame
+    :param by:
+        Column to group by, ``"fingerprint"`` or ``"project"``.
+    :type by: str
+    :param sort:
+        Total to sort by (descending), e.g. ``"cpu_ms"``,
+        ``"processed_bytes"`` or ``"elapsed_ms"``.
+    :type sort: str
+
+    :return:
+        One row per group, with run counts, totals and averages.
+    :rtype: pl.DataFrame
+    """
+    totals = [
+        "elapsed_ms",
+        "queued_ms",
+        "cpu_ms",
+        "processed_rows",
+        "processed_bytes",
+    ]
+    return (
+        stats.group_by(by)
+        .agg(
+            pl.len().alias("runs"),
+            pl.col("project").unique().sort().str.join(", ").alias("projects")
+            if by != "project"
+            else pl.col("fingerprint").n_unique().alias("queries"),
+            *[pl.col(c).sum() for c in totals],
+            pl.col("peak_memory_bytes").max(),
+            pl.col("total_splits").mean().alias("avg_splits"),
+            pl.col("first_row_seconds").mean().alias("avg_first_row_s"),
+            pl.col("rows_per_sec").mean().alias("avg_rows_per_sec"),
+            pl.col("sql").last().str.slice(0, 60).alias("sql"),
+        )
+        .sort(sort, descending=True, nulls_last=True)
+    )
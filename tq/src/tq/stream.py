@@ -0,0 +1,344 @@
+import logging
+import os
+import re
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .cache import encode_metadata
+from .stats import QueryRecord, record_query
+from .utils import temp_path
+
+logger = logging.getLogger(__name__)
+
+# Default number of rows converted to Arrow at a time. Large enough to
+# amortize per-batch overhead, small enough to keep memory flat
+DEFAULT_BATCH_SIZE = 100_000
+
+_SIMPLE_TYPES = {
+    "boolean": pa.bool_(),
+    "tinyint": pa.int8(),
+    "smallint": pa.int16(),
+    "integer": pa.int32(),
+    "bigint": pa.int64(),
+    "real": pa.float32(),
+    "double": pa.float64(),
+    "varchar": pa.string(),
+    "char": pa.string(),
+    "json": pa.string(),
+    "varbinary": pa.binary(),
+    "date": pa.date32(),
+}
+
+
+def _split_type_args(args: str) -> list[str]:
+    """Split a Trino type argument list on top-level commas."""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(args):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(args[start:i].strip())
+            start = i + 1
+    parts.append(args[start:].strip())
+    return parts
+
+
+def trino_type_to_arrow(type_str: str) -> pa.DataType:
+    """
+    Map a Trino type signature (e.g. ``decimal(10,2)``) to an Arrow type.
+
+    Types without a direct Arrow equivalent (``uuid``, ``ipaddress``, etc.)
+    map to strings.
+
+    :param type_str:
+        Trino type as reported in the cursor description.
+    :type type_str: str
+
+    :return:
+        Equivalent Arrow data type.
+    :rtype: pyarrow.DataType
+    """
+    type_str = type_str.strip().lower()
+    match = re.fullmatch(
+        r"([a-z ]+?)\s*(?:\((.*)\))?(\s+with time zone)?", type_str
+    )
+    if match is None:
+        return pa.string()
+    base, args, with_tz = match.groups()
+
+    if base in _SIMPLE_TYPES:
+        return _SIMPLE_TYPES[base]
+    if base == "decimal" and args:
+        precision, scale = (int(a) for a in _split_type_args(args))
+        return pa.decimal128(precision, scale)
+    if base == "timestamp":
+        # The Trino client returns Python datetimes, which have microsecond
+        # precision at most
+        return pa.timestamp("us", tz="UTC" if with_tz else None)
+    if base == "time":
+        return pa.time64("us")
+    if base == "array" and args:
+        return pa.list_(trino_type_to_arrow(args))
+    if base == "map" and args:
+        key_type, value_type = _split_type_args(args)
+        return pa.map_(
+            trino_type_to_arrow(key_type), trino_type_to_arrow(value_type)
+        )
+    if base == "row" and args:
+        fields = []
+        for i, arg in enumerate(_split_type_args(args)):
+            name, _, field_type = arg.partition(" ")
+            if not field_type:
+                name, field_type = f"field{i}", name
+            fields.append(
+                pa.field(name.strip('"'), trino_type_to_arrow(field_type))
+            )
+        return pa.struct(fields)
+
+    return pa.string()
+
+
+def schema_from_description(description: list[Any]) -> pa.Schema:
+    """Build an Arrow schema from a DB-API cursor description."""
+    return pa.schema(
+        [
+            pa.field(col[0], trino_type_to_arrow(str(col[1])))
+            for col in description
+        ]
+    )
+
+
+def rows_to_batch(rows: list[Any], schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Convert a page of row tuples to a columnar Arrow record batch.
+
+    :param rows:
+        Sequence of row sequences, as returned by ``cursor.fetchmany()``.
+    :type rows: list
+    :param schema:
+        Schema of the result, see :func:`schema_from_description`.
+    :type schema: pyarrow.Schema
+
+    :return:
+        The rows as a record batch.
+    :rtype: pyarrow.RecordBatch
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for values, schema_field in zip(columns, schema):
+        try:
+            array = pa.array(values, type=schema_field.type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if not pa.types.is_string(schema_field.type):
+                raise
+            # UUIDs, IP addresses, etc. come back as Python objects
+            array = pa.array(
+                [None if v is None else str(v) for v in values],
+                type=pa.string(),
+            )
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def peak_rss_bytes() -> int | None:
+    """Get the peak resident memory of the current process, if available."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+@dataclass
+class FetchStats:
+    """Client-side statistics for a streamed query result."""
+
+    rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    first_row_seconds: float | None = None
+    peak_rss_bytes: int | None = None
+    started: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def rows_per_sec(self) -> float:
+        """Fetch throughput in rows per second."""
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+class QueryStream:
+    """
+    A query result consumed as a stream of Arrow record batches.
+
+    Iterating over the stream yields batches one at a time, so memory use
+    stays flat regardless of result size. Each stream can only be consumed
+    once. Fetch statistics are available on ``stats`` once it's exhausted,
+    at which point any ``on_complete`` callbacks are called with them.
+
+    :param schema:
+        Arrow schema of the result.
+    :type schema: pyarrow.Schema
+    :param batches:
+        Iterable of record batches matching ``schema``.
+    :type batches: Iterable[pyarrow.RecordBatch]
+    """
+
+    def __init__(
+        self, schema: pa.Schema, batches: Iterable[pa.RecordBatch]
+    ) -> None:
+        self.schema = schema
+        self.stats = FetchStats()
+        self.on_complete: list[Callable[[FetchStats], None]] = []
+        self._batches = iter(batches)
+
+    def __iter__(self) -> Iterator[pa.RecordBatch]:
+        stats = self.stats
+        for batch in self._batches:
+            if stats.first_row_seconds is None and batch.num_rows > 0:
+                stats.first_row_seconds = time.perf_counter() - stats.started
+            stats.rows += batch.num_rows
+            stats.batches += 1
+            yield batch
+
+        stats.seconds = time.perf_counter() - stats.started
+        stats.peak_rss_bytes = peak_rss_bytes()
+        for callback in self.on_complete:
+            callback(stats)
+
+    def read_all(self) -> pa.Table:
+        """Collect the remaining stream into a single Arrow table."""
+        return pa.Table.from_batches(list(self), schema=self.schema)
+
+    def to_parquet(
+        self,
+        path: Path,
+        metadata: dict[str, Any] | None = None,
+        compression: str = "zstd",
+    ) -> FetchStats:
+        """
+        Write the stream to a Parquet file incrementally, one batch at a time.
+
+        The file is written to a temporary path and moved into place once
+        complete, so a failed fetch never leaves a truncated file behind.
+
+        :param path:
+            Output Parquet file path.
+        :type path: Path
+        :param metadata:
+            Extra ``tq.`` footer metadata to store in the file, see
+            :func:`tq.cache.encode_metadata`. The final row count is always
+            added as ``row_count``.
+        :type metadata: dict
+        :param compression:
+            Parquet compression codec.
+        :type compression: str
+
+        :return:
+            Fetch statistics for the stream.
+        :rtype: FetchStats
+        """
+        path = Path(path)
+        tmp = temp_path(path)
+        schema = self.schema.with_metadata(
+            {**(self.schema.metadata or {}), **encode_metadata(metadata or {})}
+        )
+        try:
+            with pq.ParquetWriter(
+                tmp, schema, compression=compression
+            ) as writer:
+                for batch in self:
+                    writer.write_batch(batch)
+                writer.add_key_value_metadata(
+                    encode_metadata({"row_count": self.stats.rows})
+                )
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        return self.stats
+
+
+def _iter_cursor_batches(
+    cursor: Any, schema: pa.Schema, batch_size: int
+) -> Iterator[pa.RecordBatch]:
+    """Fetch pages from a cursor and convert each one to a record batch."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows_to_batch(rows, schema)
+
+
+def _record_stats(sql: str, cursor: Any, client_stats: FetchStats) -> None:
+    """Log server- and client-side stats of a finished query."""
+    try:
+        record = QueryRecord.from_query(
+            sql,
+            getattr(cursor, "query_id", None),
+            getattr(cursor, "stats", None),
+            client_stats,
+        )
+        record_query(record)
+    except Exception as exc:
+        logger.warning("Failed to record query stats: %s", exc)
+
+
+def stream_query(
+    sql: str,
+    conn: Any,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    record_stats: bool = True,
+) -> QueryStream:
+    """
+    Execute a query and stream the result as bounded Arrow record batches.
+
+    Unlike ``pl.read_database``, the full result never exists as Python
+    objects at once: each page of at most ``batch_size`` rows is converted
+    to columnar Arrow buffers before the next page is fetched.
+
+    :param sql:
+        SQL text to execute.
+    :type sql: str
+    :param conn:
+        Trino (or other DB-API) connection.
+    :type conn: trino.dbapi.Connection
+    :param batch_size:
+        Maximum number of rows per record batch.
+    :type batch_size: int
+    :param record_stats:
+        Append the Trino query ID, server-side stats and client-side fetch
+        stats to the query stats log once the result is consumed, see
+        :mod:`tq.stats`.
+    :type record_stats: bool
+
+    :return:
+        A stream of the query result. Iterate over it, or use
+        :meth:`QueryStream.read_all` or :meth:`QueryStream.to_parquet`.
+    :rtype: QueryStream
+
+    """
+    cursor = conn.cursor()
+    stats_started = time.perf_counter()
+    cursor.execute(sql)
+    schema = schema_from_description(cursor.description or [])
+
+    stream = QueryStream(
+        schema, _iter_cursor_batches(cursor, schema, batch_size)
+    )
+    stream.stats.started = stats_started
+    if record_stats:
+        stream.on_complete.append(
+            lambda stats: _record_stats(sql, cursor, stats)
+        )
+    return stream
@@ -0,0 +1,318 @@
+import hashlib
+import logging
+import re
+import uuid
+import weakref
+from collections.abc import Iterator
+from typing import Any
+
+import polars as pl
+
+from .connectors import get_trino_config
+from .pool import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+# Trino rejects statements longer than query.max-length (1M characters by
+# default), so INSERT statements are split to stay safely below it
+DEFAULT_MAX_STATEMENT_CHARS = 900_000
+
+# Live temporary tables mapped to names derived only from their contents,
+# which stand in for them in query cache keys
+_content_names: dict[str, str] = {}
+
+
+def trino_type(dtype: pl.DataType) -> str:
+    """
+    Map a Polars data type to the Trino column type used to store it.
+
+    :param dtype:
+        Polars data type of a column.
+    :type dtype: pl.DataType
+
+    :return:
+        Trino type name.
+    :rtype: str
+
+    :raises TypeError:
+        If the type can't be stored as a Trino column.
+    """
+    simple_types = {
+        pl.Boolean: "BOOLEAN",
+        pl.Int8: "TINYINT",
+        pl.Int16: "SMALLINT",
+        pl.Int32: "INTEGER",
+        pl.Int64: "BIGINT",
+        pl.UInt8: "SMALLINT",
+        pl.UInt16: "INTEGER",
+        pl.UInt32: "BIGINT",
+        pl.UInt64: "DECIMAL(20, 0)",
+        pl.Float32: "REAL",
+        pl.Float64: "DOUBLE",
+        pl.String: "VARCHAR",
+        pl.Categorical: "VARCHAR",
+        pl.Enum: "VARCHAR",
+        pl.Date: "DATE",
+    }
+    for polars_type, name in simple_types.items():
+        if dtype == polars_type:
+            return name
+
+    if isinstance(dtype, pl.Decimal):
+        return f"DECIMAL({dtype.precision}, {dtype.scale})"
+    if isinstance(dtype, pl.Datetime):
+        tz = " WITH TIME ZONE" if dtype.time_zone else ""
+        return f"TIMESTAMP(6){tz}"
+
+    raise TypeError(f"Can't upload columns of type {dtype} to Trino.")
+
+
+def _literal_expr(name: str, dtype: pl.DataType) -> pl.Expr:
+    """Build an expression rendering a column as Trino SQL literals."""
+    col = pl.col(name)
+    if dtype == pl.Boolean:
+        expr = col.replace_strict(
+            {True: "TRUE", False: "FALSE"}, return_dtype=pl.String
+        )
+    elif dtype.is_integer():
+        expr = col.cast(pl.String)
+    elif dtype.is_float():
+        expr = (
+            pl.when(col.is_nan())
+            .then(pl.lit("nan()"))
+            .when(col.is_infinite() & (col > 0))
+            .then(pl.lit("infinity()"))
+            .when(col.is_infinite())
+            .then(pl.lit("-infinity()"))
+            .otherwise(col.cast(pl.String))
+        )
+    elif isinstance(dtype, pl.Decimal):
+        expr = pl.concat_str(
+            pl.lit("DECIMAL '"), col.cast(pl.String), pl.lit("'")
+        )
+    elif dtype == pl.Date:
+        expr = pl.concat_str(
+            pl.lit("DATE '"), col.dt.strftime("%Y-%m-%d"), pl.lit("'")
+        )
+    elif isinstance(dtype, pl.Datetime):
+        if dtype.time_zone:
+            col = col.dt.convert_time_zone("UTC")
+        expr = pl.concat_str(
+            pl.lit("TIMESTAMP '"),
+            col.dt.strftime("%Y-%m-%d %H:%M:%S%.6f"),
+            pl.lit(" UTC'" if dtype.time_zone else "'"),
+        )
+    else:
+        expr = pl.concat_str(
+            pl.lit("'"),
+            col.cast(pl.String).str.replace_all("'", "''", literal=True),
+            pl.lit("'"),
+        )
+
+    return expr.fill_null(pl.lit("NULL"))
+
+
+def values_rows(df: pl.DataFrame) -> pl.Series:
+    """
+    Render every row of a frame as a Trino ``VALUES`` row e.g. ``(1,'a')``.
+
+    Rendering is vectorized per column, so large frames don't go through a
+    Python loop over rows.
+
+    :param df:
+        Frame to render.
+    :type df: pl.DataFrame
+
+    :return:
+        String Series with one SQL row tuple per frame row.
+    :rtype: pl.Series
+    """
+    return df.select(
+        pl.concat_str(
+            pl.lit("("),
+            pl.concat_str(
+                [_literal_expr(n, t) for n, t in df.schema.items()],
+                separator=",",
+            ),
+            pl.lit(")"),
+        ).alias("row")
+    )["row"]
+
+
+def _chunk_rows(rows: pl.Series, max_chars: int) -> Iterator[list[str]]:
+    """Split rendered rows into chunks of at most ``max_chars`` characters."""
+    chunk, size = [], 0
+    for row in rows:
+        if chunk and size + len(row) + 1 > max_chars:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(row)
+        size += len(row) + 1
+    if chunk:
+        yield chunk
+
+
+def _execute(conn: Any, sql: str) -> None:
+    """Execute a statement and wait for it to finish."""
+    cursor = conn.cursor()
+    cursor.execute(sql)
+    cursor.fetchall()
+
+
+def _drop_table(name: str, conn: Any = None) -> None:
+    """Drop a table, using a pooled connection if none is given."""
+    try:
+        if conn is not None:
+            _execute(conn, f"DROP TABLE IF EXISTS {name}")
+        else:
+            with pooled_connection() as trino_conn:
+                _execute(trino_conn, f"DROP TABLE IF EXISTS {name}")
+    except Exception as exc:
+        logger.warning("Failed to drop temporary table %s: %s", name, exc)
+
+
+def _release(name: str, conn: Any = None) -> None:
+    """Forget a temporary table's content name and drop it."""
+    _content_names.pop(name, None)
+    _drop_table(name, conn)
+
+
+def content_addressed_sql(sql: str) -> str:
+    """
+    Replace live temporary table names in SQL with content-derived names.
+
+    Each :func:`register_frame` call creates its own uniquely named table,
+    so concurrent registrations never share (and drop) one table. Query
+    cache keys are built from this form of the SQL instead, so a query
+    joining a re-registered frame with the same contents still hits the
+    cache.
+
+    :param sql:
+        Rendered SQL text.
+    :type sql: str
+
+    :return:
+        SQL with every registered table name replaced.
+    :rtype: str
+    """
+    for name, content_name in list(_content_names.items()):
+        sql = sql.replace(name, content_name)
+    return sql
+
+
+class TempTable(str):
+    """
+    Fully qualified name of a temporary Trino table holding a local frame.
+
+    Because it's a string, it can be passed directly as a template
+    parameter (e.g. ``{{ bswh_eins }}``) and joined against in SQL. The
+    table is dropped when :meth:`drop` is called, when used as a context
+    manager and the block exits, or when the object is garbage collected
+    or the interpreter exits, whichever comes first.
+    """
+
+    content_name: str
+    _finalizer: weakref.finalize
+
+    def drop(self) -> None:
+        """Drop the table from Trino now."""
+        self._finalizer()
+
+    @property
+    def dropped(self) -> bool:
+        """Whether the table has already been dropped."""
+        return not self._finalizer.alive
+
+    def __enter__(self) -> "TempTable":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.drop()
+
+
+def register_frame(
+    df: pl.DataFrame,
+    name: str,
+    conn: Any = None,
+    catalog: str | None = None,
+    schema: str | None = None,
+    max_statement_chars: int = DEFAULT_MAX_STATEMENT_CHARS,
+) -> TempTable:
+    """
+    Upload a local frame to a temporary Trino table for use in joins.
+
+    This replaces interpolating thousands of values into ``IN (...)`` or
+    ``VALUES`` strings, which runs into statement size limits and slows
+    down the Trino planner. The table is created in a scratch location,
+    set by ``TQ_TRINO_SCRATCH_CATALOG`` and ``TQ_TRINO_SCRATCH_SCHEMA`` in
+    the .env file (defaulting to the ``memory.default`` connector), and
+    loaded with batched ``INSERT`` statements.
+
+    Every call creates its own table, named with a unique suffix, so
+    registrations of the same frame (in this or other processes) never
+    drop each other's table. Query cache keys replace the suffixed name
+    with one derived from a hash of the frame contents (see
+    :func:`content_addressed_sql`), so re-registering the same frame keeps
+    :func:`tq.read_query` cache hits working.
+
+    :param df:
+        Frame to upload.
+    :type df: pl.DataFrame
+    :param name:
+        Short name for the table, used as a prefix of the table name.
+    :type name: str
+    :param conn:
+        Trino connection to use. If not provided, one is checked out of
+        the default pool.
+    :type conn: trino.dbapi.Connection
+    :param catalog:
+        Scratch catalog override.
+    :type catalog: str
+    :param schema:
+        Scratch schema override.
+    :type schema: str
+    :param max_statement_chars:
+        Maximum length of each ``INSERT`` statement.
+    :type max_statement_chars: int
+
+    :return:
+        The fully qualified table name, which drops the table once it's
+        no longer needed.
+    :rtype: TempTable
+
+    """
+    if catalog is None or schema is None:
+        config = get_trino_config()
+        catalog = catalog or config.get("TQ_TRINO_SCRATCH_CATALOG") or "memory"
+        schema = schema or config.get("TQ_TRINO_SCRATCH_SCHEMA") or "default"
+
+    digest = hashlib.sha256(
+        df.write_ipc(None, compression="uncompressed").getvalue()
+    ).hexdigest()[:12]
+    slug = re.sub(r"[^a-z0-9_]", "_", name.lower())
+    content_name = f"{catalog}.{schema}.tq_{slug}_{digest}"
+    table_name = f"{content_name}_{uuid.uuid4().hex[:8]}"
+
+    columns = ", ".join(
+        f'"{col}" {trino_type(dtype)}' for col, dtype in df.schema.items()
+    )
+
+    def load(trino_conn: Any) -> None:
+        _execute(trino_conn, f"CREATE TABLE {table_name} ({columns})")
+        prefix = f"INSERT INTO {table_name} VALUES "
+        rows = values_rows(df)
+        for chunk in _chunk_rows(rows, max_statement_chars - len(prefix)):
+            _execute(trino_conn, prefix + ",".join(chunk))
+
+    if conn is not None:
+        load(conn)
+    else:
+        with pooled_connection() as trino_conn:
+            load(trino_conn)
+    logger.info("Registered %d rows as %s", df.height, table_name)
+
+    table = TempTable(table_name)
+    table.content_name = content_name
+    table._finalizer = weakref.finalize(table, _release, table_name, conn)
+    _content_names[table_name] = content_name
+    return table
@@ -0,0 +1,461 @@
+"""
+Local mirror of OpenTimes (https://opentimes.org) travel-time tables.
+
+Instead of attaching the public OpenTimes DuckDB database over HTTP and
+pulling hundreds of millions of rows through pandas on every run, slices
+of the ``times`` table (one version, mode, year and geography) are synced
+once into the tq cache as Parquet, partitioned by origin state:
+
+    .tq_cache/traveltimes/version=0.0.1/mode=car/year=2024/geography=zcta/
+        origin_state=17/part-0.parquet
+
+Rows within each file are sorted by origin and destination, so row group
+statistics let lookups skip most of the file. Lookups are lazy Polars
+scans, so duration, origin and destination filters are pushed down into
+the Parquet reader and no pandas copy is ever made:
+
+    from tq.traveltimes import read_times
+
+    times = read_times("car", 2024, "county", max_duration=3600)
+
+Syncing requires DuckDB: ``pip install "tq[traveltimes]"``.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .cache import encode_metadata, utc_now
+from .utils import get_cache_dir, temp_path
+
+logger = logging.getLogger(__name__)
+
+OPENTIMES_DATABASE_URL = (
+    "https://data.opentimes.org/databases/{version}.duckdb"
+)
+
+DEFAULT_VERSION = "0.0.1"
+
+# Rows per Parquet row group. Smaller groups mean finer-grained skipping
+# on origin and destination filters, at the cost of a bigger footer
+ROW_GROUP_SIZE = 256 * 1024
+
+# Hive partition keys in the local mirror's paths
+_PARTITIONS = ["version", "mode", "year", "geography", "origin_state"]
+
+# Rows synced per origin state, and every state the source has for the
+# slice once it's known, updated after each sync
+_MANIFEST = "_manifest.json"
+
+TIMES_SCHEMA = pa.schema(
+    [
+        ("origin_id", pa.string()),
+        ("destination_id", pa.string()),
+        ("duration_sec", pa.float64()),
+    ]
+)
+
+
+@dataclass(frozen=True)
+class TimesSlice:
+    """One (version, mode, year, geography) slice of the OpenTimes table."""
+
+    mode: str
+    year: int
+    geography: str
+    version: str = DEFAULT_VERSION
+
+    @property
+    def partition(self) -> str:
+        """Hive-style relative path of the slice."""
+        return (
+            f"version={self.version}/mode={self.mode}/year={self.year}/"
+            f"geography={self.geography}"
+        )
+
+
+class TimesSource(Protocol):
+    """
+    Where travel times are synced from. ``states`` lists the origin states
+    available for a slice, and ``read`` yields one state's rows as Arrow
+    batches matching ``TIMES_SCHEMA``, sorted by origin and destination.
+    """
+
+    def states(self, times_slice: TimesSlice) -> list[str]: ...
+
+    def read(
+        self, times_slice: TimesSlice, state: str
+    ) -> Iterable[pa.RecordBatch]: ...
+
+
+class OpenTimesSource:
+    """
+    Read slices from the public OpenTimes DuckDB database over HTTP.
+    Each state is read through its own DuckDB cursor, so states can be
+    synced concurrently.
+    """
+
+    def __init__(self, batch_size: int = ROW_GROUP_SIZE) -> None:
+        try:
+            import duckdb
+        except ImportError as exc:
+            raise ImportError(
+                "Syncing OpenTimes requires duckdb. Install it with: "
+                "pip install 'tq[traveltimes]'"
+            ) from exc
+
+        self._batch_size = batch_size
+        self._conn = duckdb.connect(database=":memory:")
+        self._conn.execute("INSTALL httpfs; LOAD httpfs;")
+        self._attached: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _database(self, version: str) -> str:
+        """Attach a version's database (once) and return its alias."""
+        alias = "opentimes_" + version.replace(".", "_")
+        with self._lock:
+            if version not in self._attached:
+                url = OPENTIMES_DATABASE_URL.format(version=version)
+                self._conn.execute(f"ATTACH '{url}' AS {alias} (READ_ONLY)")
+                self._attached.add(version)
+        return alias
+
+    def states(self, times_slice: TimesSlice) -> list[str]:
+        database = self._database(times_slice.version)
+        rows = self._conn.execute(
+            f"""
+            SELECT DISTINCT state FROM {database}.public.times
+            WHERE version = ? AND mode = ? AND year = ? AND geography = ?
+            ORDER BY state
+            """,
+            [
+                times_slice.version,
+                times_slice.mode,
+                str(times_slice.year),
+                times_slice.geography,
+            ],
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def read(
+        self, times_slice: TimesSlice, state: str
+    ) -> Iterator[pa.RecordBatch]:
+        database = self._database(times_slice.version)
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+                SELECT
+                    CAST(origin_id AS VARCHAR) AS origin_id,
+                    CAST(destination_id AS VARCHAR) AS destination_id,
+                    CAST(duration_sec AS DOUBLE) AS duration_sec
+                FROM {database}.public.times
+                WHERE version = ? AND mode = ? AND year = ?
+                    AND geography = ? AND state = ?
+                ORDER BY origin_id, destination_id
+                """,
+                [
+                    times_slice.version,
+                    times_slice.mode,
+                    str(times_slice.year),
+                    times_slice.geography,
+                    state,
+                ],
+            )
+            yield from cursor.fetch_record_batch(self._batch_size)
+        finally:
+            cursor.close()
+
+
+def get_times_dir(times_slice: TimesSlice) -> Path:
+    """Local directory of a slice, inside ``.tq_cache/traveltimes``."""
+    return get_cache_dir("traveltimes") / times_slice.partition
+
+
+def _read_manifest(times_slice: TimesSlice) -> dict:
+    """A slice's manifest, or an empty one if nothing has been synced."""
+    path = get_times_dir(times_slice) / _MANIFEST
+    if not path.exists():
+        return {"all_states": None, "states": {}}
+    manifest = json.loads(path.read_text())
+    manifest.setdefault("all_states", None)
+    return manifest
+
+
+def is_synced(
+    times_slice: TimesSlice, states: Iterable[str] | None = None
+) -> bool:
+    """
+    Whether the given origin states of a slice have been synced, or every
+    state if ``states`` is None.
+    """
+    manifest = _read_manifest(times_slice)
+    if states is None:
+        # Partial syncs don't know which states the source has
+        states = manifest["all_states"]
+        if states is None:
+            return False
+    return set(states) <= set(manifest["states"])
+
+
+def _write_state(
+    source: TimesSource, times_slice: TimesSlice, state: str, out_dir: Path
+) -> int:
+    """Stream one origin state into a Parquet file, in full row groups."""
+    path = out_dir / f"origin_state={state}" / "part-0.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(path)
+    schema = TIMES_SCHEMA.with_metadata(
+        encode_metadata(
+            {
+                "source": OPENTIMES_DATABASE_URL.format(
+                    version=times_slice.version
+                ),
+                "origin_state": state,
+                "synced_at": utc_now(),
+            }
+        )
+    )
+
+    rows = 0
+    pending: list[pa.RecordBatch] = []
+    pending_rows = 0
+    try:
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            for batch in source.read(times_slice, state):
+                pending.append(batch.cast(TIMES_SCHEMA))
+                pending_rows += batch.num_rows
+                if pending_rows < ROW_GROUP_SIZE:
+                    continue
+                # Write whole row groups and carry the remainder over
+                table = pa.Table.from_batches(pending, TIMES_SCHEMA)
+                full = table.num_rows // ROW_GROUP_SIZE * ROW_GROUP_SIZE
+                writer.write_table(
+                    table.slice(0, full), row_group_size=ROW_GROUP_SIZE
+                )
+                pending = table.slice(full).to_batches()
+                pending_rows = table.num_rows - full
+                rows += full
+            if pending_rows:
+                table = pa.Table.from_batches(pending, TIMES_SCHEMA)
+                writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+                rows += table.num_rows
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    logger.info("Synced %d travel times from origin state %s", rows, state)
+    return rows
+
+
+def sync_times(
+    mode: str,
+    year: int,
+    geography: str,
+    version: str = DEFAULT_VERSION,
+    states: Sequence[str] | None = None,
+    source: TimesSource | None = None,
+    refresh: bool = False,
+    max_concurrency: int = 4,
+) -> Path:
+    """
+    Sync a slice of the OpenTimes table to local Parquet.
+
+    Each origin state is streamed to its own file as Arrow batches, so
+    memory use stays bounded regardless of the slice size. States are
+    synced concurrently. The manifest records which states have been
+    synced once they all succeed; states that already have been are
+    skipped unless ``refresh`` is set.
+
+    :param mode:
+        Travel mode, e.g. ``"car"``, ``"walk"`` or ``"bicycle"``.
+    :type mode: str
+    :param year:
+        OpenTimes year.
+    :type year: int
+    :param geography:
+        Origin/destination geography, e.g. ``"county"`` or ``"zcta"``.
+    :type geography: str
+    :param version:
+        OpenTimes data version.
+    :type version: str
+    :param states:
+        Origin state FIPS codes to sync. Defaults to all states.
+    :type states: Sequence[str]
+    :param source:
+        Where to read travel times from. Defaults to the public OpenTimes
+        database.
+    :type source: TimesSource
+    :param refresh:
+        Re-sync even if the slice has already been synced.
+    :type refresh: bool
+    :param max_concurrency:
+        Maximum number of states synced at once.
+    :type max_concurrency: int
+
+    :return:
+        Local directory of the slice.
+    :rtype: Path
+    """
+    times_slice = TimesSlice(mode, year, geography, version)
+    out_dir = get_times_dir(times_slice)
+    states = list(states) if states is not None else None
+    if not refresh and is_synced(times_slice, states):
+        return out_dir
+
+    source = source or OpenTimesSource()
+    manifest = _read_manifest(times_slice)
+    if states is None:
+        states = source.states(times_slice)
+        manifest["all_states"] = states
+    if not refresh:
+        states = [s for s in states if s not in manifest["states"]]
+    logger.info(
+        "Syncing %s travel times for %d origin states",
+        times_slice.partition,
+        len(states),
+    )
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        counts = dict(
+            zip(
+                states,
+                executor.map(
+                    lambda s: _write_state(source, times_slice, s, out_dir),
+                    states,
+                ),
+            )
+        )
+
+    manifest["states"].update(counts)
+    manifest["synced_at"] = utc_now().isoformat()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / _MANIFEST
+    tmp = temp_path(path)
+    try:
+        tmp.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return out_dir
+
+
+def scan_times(
+    mode: str,
+    year: int,
+    geography: str,
+    max_duration: float | None = None,
+    origins: Iterable[str] | None = None,
+    destinations: Iterable[str] | None = None,
+    origin_states: Iterable[str] | None = None,
+    version: str = DEFAULT_VERSION,
+    sync: bool = True,
+) -> pl.LazyFrame:
+    """
+    Lazily scan a locally synced slice of travel times, syncing it first
+    if needed. Only ``origin_states`` need to have been synced if given,
+    otherwise every state of the slice does.
+
+    Filters are applied in the scan, so Polars prunes origin state
+    partitions and skips row groups using their min/max statistics.
+
+    :param mode:
+        Travel mode, e.g. ``"car"``.
+    :type mode: str
+    :param year:
+        OpenTimes year.
+    :type year: int
+    :param geography:
+        Origin/destination geography, e.g. ``"county"`` or ``"zcta"``.
+    :type geography: str
+    :param max_duration:
+        Only keep times up to this many seconds.
+    :type max_duration: float
+    :param origins:
+        Only keep times from these origin IDs.
+    :type origins: Iterable[str]
+    :param destinations:
+        Only keep times to these destination IDs.
+    :type destinations: Iterable[str]
+    :param origin_states:
+        Only scan these origin state FIPS codes.
+    :type origin_states: Iterable[str]
+    :param version:
+        OpenTimes data version.
+    :type version: str
+    :param sync:
+        Sync the slice if it hasn't been synced yet. Otherwise raise
+        ``FileNotFoundError``.
+    :type sync: bool
+
+    :return:
+        Lazy frame of ``origin_id``, ``destination_id`` and
+        ``duration_sec``.
+    :rtype: pl.LazyFrame
+    """
+    times_slice = TimesSlice(mode, year, geography, version)
+    if origin_states is not None:
+        origin_states = list(origin_states)
+    if not is_synced(times_slice, origin_states):
+        if not sync:
+            raise FileNotFoundError(
+                f"Travel times for {times_slice.partition} haven't been "
+                "synced, see tq.traveltimes.sync_times."
+            )
+        sync_times(mode, year, geography, version, states=origin_states)
+
+    lf = pl.scan_parquet(
+        get_times_dir(times_slice) / "**" / "*.parquet",
+        hive_partitioning=True,
+        hive_schema=dict.fromkeys(_PARTITIONS, pl.String),
+    )
+    if origin_states is not None:
+        lf = lf.filter(pl.col("origin_state").is_in(origin_states))
+    if max_duration is not None:
+        lf = lf.filter(pl.col("duration_sec") <= max_duration)
+    if origins is not None:
+        lf = lf.filter(pl.col("origin_id").is_in(list(origins)))
+    if destinations is not None:
+        lf = lf.filter(pl.col("destination_id").is_in(list(destinations)))
+    return lf.select("origin_id", "destination_id", "duration_sec")
+
+
+def read_times(
+    mode: str,
+    year: int,
+    geography: str,
+    max_duration: float | None = None,
+    origins: Iterable[str] | None = None,
+    destinations: Iterable[str] | None = None,
+    origin_states: Iterable[str] | None = None,
+    version: str = DEFAULT_VERSION,
+    sync: bool = True,
+) -> pl.DataFrame:
+    """
+    Read travel times from the local mirror, see :func:`scan_times`.
+
+    :return:
+        Frame of ``origin_id``, ``destination_id`` and ``duration_sec``.
+    :rtype: pl.DataFrame
+    """
+    return scan_times(
+        mode,
+        year,
+        geography,
+        max_duration=max_duration,
+        origins=origins,
+        destinations=destinations,
+        origin_states=origin_states,
+        version=version,
+        sync=sync,
+    ).collect()
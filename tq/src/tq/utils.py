@@ -1,31 +1,100 @@
+import functools
+import os
+import uuid
 import warnings
 from pathlib import Path
 
-import git
+
+@functools.lru_cache(maxsize=None)
+def _find_git_root(start: Path) -> Path | None:
+    """Walk up from a directory to the first one containing ``.git``."""
+    for directory in [start, *start.parents]:
+        # .git is a file in worktrees and submodules
+        if (directory / ".git").exists():
+            return directory
+
+    # Fall back to GitPython (if installed) for e.g. GIT_DIR overrides
+    try:
+        import git
+    except ImportError:
+        return None
+    try:
+        working_tree_dir = git.Repo(
+            start, search_parent_directories=True
+        ).working_tree_dir
+    except git.exc.InvalidGitRepositoryError:
+        return None
+    return Path(working_tree_dir) if working_tree_dir else None
 
 
 def get_project_root():
-    """Get the git root directory of the research monorepo."""
-    working_tree_dir = git.Repo(
-        ".", search_parent_directories=True
-    ).working_tree_dir
+    """
+    Get the git root directory of the research monorepo.
+
+    The root is found by looking for ``.git`` in the working directory and
+    its parents, so no git process or library is needed. Results are
+    memoized per working directory for the life of the process.
+    """
+    working_tree_dir = _find_git_root(Path.cwd())
 
     if working_tree_dir is None:
         raise ValueError("Could not determine the git root directory.")
 
-    return Path(working_tree_dir)
+    return working_tree_dir
+
+
+@functools.lru_cache(maxsize=None)
+def _find_env_file(cwd: Path) -> Path:
+    """Resolve the default .env file for a working directory, once."""
+    cwd_env = Path(cwd, ".env")
+    if cwd_env.exists():
+        return cwd_env
+    return Path(get_project_root(), ".env")
 
 
 def get_env_file_path(env_file: Path | None = None) -> Path:
     """Get .env file path, using the first one found unless one is provided."""
     if env_file is None:
-        cwd_env = Path(Path.cwd(), ".env")
-        if cwd_env.exists():
-            env_file = cwd_env
-        else:
-            env_file = Path(get_project_root(), ".env")
+        env_file = _find_env_file(Path.cwd())
 
     if not env_file.exists():
         warnings.warn(f".env file not found at {env_file}. ")
 
     return env_file
+
+
+def get_cache_dir(name: str | None = None) -> Path:
+    """
+    Get (and create) a tq cache directory.
+
+    Caches live in ``.tq_cache`` at the project git root unless the
+    ``TQ_CACHE_DIR`` environment variable points somewhere else.
+
+    :param name:
+        Optional subdirectory of the cache root, e.g. ``"queries"``.
+    :type name: str
+
+    :return:
+        Path to the (existing) cache directory.
+    :rtype: Path
+    """
+    cache_root = os.environ.get("TQ_CACHE_DIR")
+    cache_dir = (
+        Path(cache_root)
+        if cache_root
+        else Path(get_project_root(), ".tq_cache")
+    )
+    if name is not None:
+        cache_dir = cache_dir / name
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def temp_path(path: Path) -> Path:
+    """
+    Unique temporary sibling of ``path`` to write to before an atomic
+    ``os.replace``. Each call gets its own name, so concurrent writes of
+    the same file, from other processes or threads, never share one.
+    """
+    return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    # Keep caches and stats logs written during tests out of the repo
+    cache_dir = tmp_path_factory.mktemp("tq_cache")
+    monkeypatch.setenv("TQ_CACHE_DIR", str(cache_dir))
+    monkeypatch.delenv("TQ_STATS_LOG", raising=False)
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def clear_path_caches():
+    # Project root and .env lookups are memoized per process
+    from tq.utils import _find_env_file, _find_git_root
+
+    _find_git_root.cache_clear()
+    _find_env_file.cache_clear()
+    yield
+    _find_git_root.cache_clear()
+    _find_env_file.cache_clear()
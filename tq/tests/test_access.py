@@ -0,0 +1,156 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from tq.access import (
+    CatchmentMatrix,
+    gaussian_decay,
+    gravity_access,
+    logistic_decay,
+    power_decay,
+    providers_within,
+    two_step_fca,
+)
+
+
+@pytest.fixture
+def edges():
+    return pl.DataFrame(
+        {
+            "origin_id": ["a", "a", "b", "b", "c", "a"],
+            "provider_id": ["p1", "p2", "p1", "p3", "p3", "p1"],
+            # a-p1 appears twice (e.g. two provider sites), keep the shortest
+            "duration_sec": [600, 1800, 1200, 3000, 300, 900],
+        }
+    )
+
+
+@pytest.fixture
+def matrix(edges):
+    return CatchmentMatrix.from_edges(edges)
+
+
+@pytest.fixture
+def supply():
+    return pl.DataFrame(
+        {"provider_id": ["p1", "p2", "p3"], "beds": [10, 20, 30]}
+    )
+
+
+@pytest.fixture
+def demand():
+    return pl.DataFrame({"geoid": ["a", "b", "c"], "pop": [100, 200, 300]})
+
+
+def naive_2sfca(edges, supply, demand, max_duration):
+    """Join-based 2SFCA, as computed before tq.access."""
+    catchment = edges.group_by("origin_id", "provider_id").agg(
+        pl.col("duration_sec").min()
+    )
+    catchment = catchment.filter(pl.col("duration_sec") <= max_duration)
+    ratios = (
+        catchment.join(demand, left_on="origin_id", right_on="geoid")
+        .group_by("provider_id")
+        .agg(pl.col("pop").sum())
+        .join(supply, on="provider_id")
+        .select("provider_id", ratio=pl.col("beds") / pl.col("pop"))
+    )
+    return (
+        catchment.join(ratios, on="provider_id")
+        .group_by("origin_id")
+        .agg(pl.col("ratio").sum())
+        .sort("origin_id")
+    )
+
+
+class TestCatchmentMatrix:
+    def test_from_edges_csr_layout(self, matrix):
+        assert matrix.origins.to_list() == ["a", "b", "c"]
+        assert matrix.providers.to_list() == ["p1", "p2", "p3"]
+        assert matrix.shape == (3, 3)
+        assert matrix.nnz == 5
+        assert matrix.indptr.tolist() == [0, 2, 4, 5]
+        assert matrix.indices.tolist() == [0, 1, 0, 2, 2]
+        assert matrix.durations.tolist() == [600, 1800, 1200, 3000, 300]
+
+    def test_max_duration_and_extra_origins(self, edges):
+        matrix = CatchmentMatrix.from_edges(
+            edges, max_duration=1200, origins=["d"]
+        )
+        assert matrix.origins.to_list() == ["a", "b", "c", "d"]
+        assert matrix.providers.to_list() == ["p1", "p3"]
+        assert matrix.indptr.tolist() == [0, 1, 2, 3, 3]
+
+    def test_within(self, matrix):
+        within = matrix.within(1200)
+        assert within.indptr.tolist() == [0, 1, 2, 3]
+        assert within.to_edges().rows() == [
+            ("a", "p1", 600.0),
+            ("b", "p1", 1200.0),
+            ("c", "p3", 300.0),
+        ]
+
+    def test_matvec_and_rmatvec(self, matrix):
+        dense = np.zeros(matrix.shape)
+        dense[matrix.rows, matrix.indices] = matrix.durations
+        x = np.array([1.0, 2.0, 3.0])
+        np.testing.assert_allclose(matrix.matvec(x, lambda d: d), dense @ x)
+        np.testing.assert_allclose(matrix.rmatvec(x, lambda d: d), dense.T @ x)
+
+    def test_align(self, matrix, supply):
+        reordered = supply.reverse().filter(pl.col("provider_id") != "p2")
+        assert matrix.align(reordered, "providers").tolist() == [10, 0, 30]
+        with pytest.raises(ValueError, match="one per origins"):
+            matrix.align(np.ones(2), "origins")
+
+    def test_repr(self, matrix):
+        assert repr(matrix) == (
+            "CatchmentMatrix(3 origins x 3 providers, 5 entries)"
+        )
+
+
+class TestAccessibility:
+    def test_two_step_fca_matches_joins(self, edges, matrix, supply, demand):
+        result = two_step_fca(
+            matrix, supply, demand, max_duration=2000
+        ).filter(pl.col("accessibility") > 0)
+        expected = naive_2sfca(edges, supply, demand, max_duration=2000)
+        assert result["origin_id"].to_list() == expected["origin_id"].to_list()
+        np.testing.assert_allclose(result["accessibility"], expected["ratio"])
+
+    def test_two_step_fca_conserves_supply(self, matrix, supply, demand):
+        # Every provider is reachable, so total access * demand == supply
+        result = two_step_fca(matrix, supply, demand)
+        total = (result["accessibility"] * demand["pop"]).sum()
+        assert total == pytest.approx(60)
+
+    def test_gaussian_decay(self):
+        decay = gaussian_decay(3600)
+        weights = decay(np.array([0.0, 1800.0, 3600.0, 4000.0]))
+        assert weights[0] == pytest.approx(1)
+        assert 0 < weights[1] < 1
+        assert weights[2:].tolist() == [0, 0]
+
+    def test_gravity_access(self, matrix, supply, demand):
+        decay = power_decay(beta=1)
+        hansen = gravity_access(matrix, supply, decay=decay)
+        assert hansen["accessibility"][2] == pytest.approx(30 / 300)
+
+        adjusted = gravity_access(matrix, supply, demand, decay=decay)
+        # p3 potential demand: 200/3000 + 300/300
+        assert adjusted["accessibility"][2] == pytest.approx(
+            30 / 300 / (200 / 3000 + 300 / 300)
+        )
+
+    def test_logistic_decay(self):
+        decay = logistic_decay(midpoint=1800, steepness=0.01)
+        weights = decay(np.array([0.0, 1800.0, 3600.0]))
+        assert weights[1] == pytest.approx(0.5)
+        assert weights[0] > 0.99 > 0.01 > weights[2]
+
+    def test_providers_within(self, matrix, supply):
+        counts = providers_within(matrix, 1800)
+        assert counts.rows() == [("a", 2), ("b", 1), ("c", 1)]
+
+        beds = providers_within(matrix, 1800, weights=supply)
+        assert beds["providers"].to_list() == [30.0, 10.0, 30.0]
@@ -0,0 +1,265 @@
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+from trino.exceptions import TrinoQueryError  # noqa: E402
+
+from tq.aio import (  # noqa: E402
+    AsyncTrinoClient,
+    json_rows_to_batch,
+    json_schema,
+)
+
+COLUMNS = [
+    {"name": "npi", "type": "varchar"},
+    {"name": "rate", "type": "decimal(10,2)"},
+    {"name": "effective", "type": "date"},
+    {"name": "count", "type": "bigint"},
+    {"name": "score", "type": "double"},
+]
+
+
+class FakeTrino:
+    """Minimal Trino statement protocol server with paged results."""
+
+    def __init__(self, pages=3, rows_per_page=2, delay=0.0, infinite=False):
+        self.pages = pages
+        self.rows_per_page = rows_per_page
+        self.delay = delay
+        self.infinite = infinite
+        self.running = 0
+        self.max_running = 0
+        self.deleted = []
+        self.unavailable = 0
+        self.app = web.Application()
+        self.app.router.add_post("/v1/statement", self.submit)
+        self.app.router.add_get("/v1/statement/{query}/{page}", self.page)
+        self.app.router.add_delete("/v1/statement/{query}/{page}", self.cancel)
+        self.queries = 0
+
+    def next_uri(self, request, query, page):
+        return str(request.url.with_path(f"/v1/statement/{query}/{page}"))
+
+    async def submit(self, request):
+        if self.unavailable:
+            self.unavailable -= 1
+            return web.Response(status=503)
+        sql = await request.text()
+        self.queries += 1
+        query = f"q{self.queries}"
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        if "fail" in sql:
+            self.running -= 1
+            return web.json_response(
+                {
+                    "id": query,
+                    "error": {
+                        "message": "line 1:8: Column 'fail' cannot be resolved",
+                        "errorName": "COLUMN_NOT_FOUND",
+                        "errorType": "USER_ERROR",
+                    },
+                }
+            )
+        return web.json_response(
+            {"id": query, "nextUri": self.next_uri(request, query, 0)}
+        )
+
+    async def page(self, request):
+        await asyncio.sleep(self.delay)
+        query = request.match_info["query"]
+        page = int(request.match_info["page"])
+        data = [
+            ["123", "12.50", "2024-01-01", page * 10 + i, "NaN"]
+            for i in range(self.rows_per_page)
+        ]
+        response = {"id": query, "columns": COLUMNS, "data": data}
+        if self.infinite or page + 1 < self.pages:
+            response["nextUri"] = self.next_uri(request, query, page + 1)
+        else:
+            self.running -= 1
+            response["stats"] = {"state": "FINISHED", "cpuTimeMillis": 5}
+        return web.json_response(response)
+
+    async def cancel(self, request):
+        self.deleted.append(request.match_info["query"])
+        self.running -= 1
+        return web.Response(status=204)
+
+
+def run_with_server(trino, test, **client_kwargs):
+    """Run an async test against a fake Trino server."""
+
+    async def main():
+        async with TestServer(trino.app) as server:
+            config = {
+                "TQ_TRINO_HOST": server.host,
+                "TQ_TRINO_PORT": server.port,
+            }
+            async with AsyncTrinoClient(
+                config, http_scheme="http", **client_kwargs
+            ) as client:
+                return await test(client)
+
+    return asyncio.run(main())
+
+
+class TestJsonConversion:
+    def test_json_rows_to_batch(self):
+        schema = json_schema(
+            COLUMNS
+            + [
+                {"name": "ts", "type": "timestamp(3) with time zone"},
+                {"name": "tags", "type": "array(varchar)"},
+                {"name": "address", "type": "row(city varchar, zip varchar)"},
+            ]
+        )
+        batch = json_rows_to_batch(
+            [
+                [
+                    "1",
+                    "12.50",
+                    "2024-01-01",
+                    3,
+                    "Infinity",
+                    "2024-01-01 00:00:00.000 UTC",
+                    ["a", "b"],
+                    ["Chicago", "60601"],
+                ],
+                [None] * 8,
+            ],
+            schema,
+        )
+
+        row = batch.to_pylist()[0]
+        assert row["rate"] == Decimal("12.50")
+        assert row["effective"] == date(2024, 1, 1)
+        assert row["score"] == float("inf")
+        assert row["ts"] == "2024-01-01 00:00:00.000 UTC"
+        assert row["tags"] == ["a", "b"]
+        assert row["address"] == '["Chicago", "60601"]'
+        assert batch.to_pylist()[1] == dict.fromkeys(schema.names)
+
+    def test_string_encoded_array_and_map_elements(self):
+        schema = json_schema(
+            [
+                {"name": "dates", "type": "array(date)"},
+                {"name": "amounts", "type": "array(decimal(10,2))"},
+                {"name": "times", "type": "array(timestamp(3))"},
+                {"name": "by_code", "type": "map(varchar,decimal(10,2))"},
+            ]
+        )
+        batch = json_rows_to_batch(
+            [
+                [
+                    ["2024-01-01", None],
+                    ["12.50", "3.00"],
+                    ["2024-01-01 12:30:00.000"],
+                    {"99213": "75.25"},
+                ],
+                [None] * 4,
+            ],
+            schema,
+        )
+
+        row = batch.to_pylist()[0]
+        assert row["dates"] == [date(2024, 1, 1), None]
+        assert row["amounts"] == [Decimal("12.50"), Decimal("3.00")]
+        assert row["times"] == [datetime(2024, 1, 1, 12, 30)]
+        assert row["by_code"] == [("99213", Decimal("75.25"))]
+        assert batch.schema.field("amounts").type == pa.list_(
+            pa.decimal128(10, 2)
+        )
+        assert batch.to_pylist()[1] == dict.fromkeys(schema.names)
+
+
+class TestAsyncTrinoClient:
+    def test_query_collects_pages(self):
+        trino = FakeTrino(pages=3, rows_per_page=2)
+
+        result = run_with_server(
+            trino, lambda client: client.query("SELECT {{ x }}", {"x": "1"})
+        )
+
+        assert result.height == 6
+        assert result["count"].to_list() == [0, 1, 10, 11, 20, 21]
+        assert str(result["rate"].dtype) == "Decimal(precision=10, scale=2)"
+        assert trino.deleted == []
+
+    def test_iter_batches_bounded(self):
+        trino = FakeTrino(pages=3, rows_per_page=2)
+
+        async def test(client):
+            return [
+                b.num_rows async for b in client.iter_batches("SELECT 1", 4)
+            ]
+
+        assert run_with_server(trino, test) == [4, 2]
+
+    def test_concurrency_limit(self):
+        trino = FakeTrino(pages=2, delay=0.05)
+
+        async def test(client):
+            return await asyncio.gather(
+                *[client.query(f"SELECT {i}") for i in range(6)]
+            )
+
+        results = run_with_server(trino, test, max_concurrency=2)
+
+        assert len(results) == 6
+        assert trino.max_running == 2
+
+    def test_cancel_kills_server_query(self):
+        trino = FakeTrino(infinite=True, delay=0.02)
+
+        async def test(client):
+            task = asyncio.create_task(
+                client.query("SELECT * FROM core_rates")
+            )
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        run_with_server(trino, test)
+
+        assert trino.deleted == ["q1"]
+
+    def test_break_kills_server_query(self):
+        trino = FakeTrino(infinite=True)
+
+        async def test(client):
+            stream = client.iter_batches("SELECT 1", batch_size=2)
+            async for _ in stream:
+                break
+            await stream.aclose()
+
+        run_with_server(trino, test)
+
+        assert trino.deleted == ["q1"]
+
+    def test_query_error(self):
+        trino = FakeTrino()
+
+        async def test(client):
+            with pytest.raises(TrinoQueryError, match="COLUMN_NOT_FOUND"):
+                await client.query("SELECT fail")
+
+        run_with_server(trino, test)
+
+    def test_retries_unavailable(self):
+        trino = FakeTrino(pages=1)
+        trino.unavailable = 2
+
+        result = run_with_server(
+            trino, lambda client: client.query("SELECT 1")
+        )
+
+        assert result.height == 2
@@ -0,0 +1,112 @@
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from tq.cache import QueryCache, cache_key, read_metadata
+
+
+def make_table(n: int = 3) -> pa.Table:
+    return pa.table({"id": list(range(n)), "rate": [1.5] * n})
+
+
+class TestCacheKey:
+    def test_cache_key_ignores_whitespace(self):
+        key1 = cache_key("SELECT 1\nFROM t", "hive", None)
+        key2 = cache_key("SELECT   1 FROM t  ", "hive", None)
+        assert key1 == key2
+
+    def test_cache_key_keeps_whitespace_in_literals(self):
+        key1 = cache_key("SELECT * FROM t WHERE x = 'A  B'", "hive", None)
+        key2 = cache_key("SELECT * FROM t WHERE x = 'A B'", "hive", None)
+        assert key1 != key2
+        key3 = cache_key("SELECT *\n FROM t WHERE x = 'A  B' ", "hive", None)
+        assert key1 == key3
+        assert cache_key('SELECT "a  b" FROM t', "hive", None) != cache_key(
+            'SELECT "a b" FROM t', "hive", None
+        )
+
+    def test_cache_key_keeps_line_comments_apart(self):
+        # The newline ending a comment is part of the query
+        key1 = cache_key("SELECT x -- c\nWHERE y", "hive", None)
+        key2 = cache_key("SELECT x -- c WHERE y", "hive", None)
+        assert key1 != key2
+        key3 = cache_key("SELECT x -- c\n\n   WHERE  y", "hive", None)
+        assert key1 == key3
+
+    def test_cache_key_ignores_quotes_in_comments(self):
+        for comment in ["-- don't\n", "/* don't */"]:
+            key1 = cache_key(f"SELECT 1 {comment} WHERE x = 'A  B'", "h", None)
+            key2 = cache_key(f"SELECT 1 {comment} WHERE x = 'A B'", "h", None)
+            assert key1 != key2
+            key3 = cache_key(
+                f"SELECT 1\n{comment}\nWHERE x = 'A  B'", "h", None
+            )
+            assert key1 == key3
+
+    def test_cache_key_depends_on_catalog_and_schema(self):
+        sql = "SELECT 1"
+        assert cache_key(sql, "hive", None) != cache_key(sql, "memory", None)
+        assert cache_key(sql, "hive", "a") != cache_key(sql, "hive", "b")
+
+
+class TestQueryCache:
+    def test_put_and_get_roundtrip(self, tmp_path):
+        cache = QueryCache(tmp_path)
+        entry = cache.put("abc", make_table(), {"sql": "SELECT 1"})
+
+        assert cache.get("abc") == entry
+        assert pq.read_table(entry).num_rows == 3
+        assert pq.ParquetFile(entry).metadata.row_group(0).column(
+            0
+        ).compression == ("ZSTD")
+
+    def test_get_missing_returns_none(self, tmp_path):
+        assert QueryCache(tmp_path).get("missing") is None
+
+    def test_metadata_roundtrip(self, tmp_path):
+        cache = QueryCache(tmp_path)
+        metadata = {
+            "sql": "SELECT '1'",
+            "params": {"ids": "'1','2'"},
+            "row_count": 3,
+        }
+        entry = cache.put("abc", make_table(), metadata)
+
+        assert read_metadata(entry) == metadata
+        assert cache.metadata("abc") == metadata
+
+    def test_expired_entry_is_removed(self, tmp_path):
+        cache = QueryCache(tmp_path, ttl=60)
+        entry = cache.put("abc", make_table())
+        old = time.time() - 120
+        os.utime(entry, (old, old))
+
+        assert cache.get("abc") is None
+        assert not entry.exists()
+
+    def test_ttl_override(self, tmp_path):
+        cache = QueryCache(tmp_path)
+        entry = cache.put("abc", make_table())
+        old = time.time() - 120
+        os.utime(entry, (old, old))
+
+        assert cache.get("abc") == entry
+        assert cache.get("abc", ttl=60) is None
+
+    def test_lru_eviction(self, tmp_path):
+        cache = QueryCache(tmp_path, max_bytes=None)
+        first = cache.put("first", make_table(1000))
+        second = cache.put("second", make_table(1000))
+        now = time.time()
+        os.utime(first, (now - 100, now - 100))
+        os.utime(second, (now - 200, now - 200))
+
+        # Reading the second entry makes it the most recently used
+        cache.get("second")
+        cache.max_bytes = first.stat().st_size + 1
+        evicted = cache.evict()
+
+        assert evicted == [first]
+        assert second.exists()
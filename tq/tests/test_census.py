@@ -0,0 +1,149 @@
+import threading
+
+import polars as pl
+import pytest
+
+import tq.census
+from tq.census import (
+    MAX_VARIABLES,
+    parse_response,
+    read_acs,
+    read_acs_geographies,
+)
+
+GEO_IDS = {
+    "state": [["17"], ["06"]],
+    "county": [["17", "031"], ["06", "037"]],
+    "cbsa": [["16980"], ["31080"]],
+}
+
+
+@pytest.fixture
+def requests_made(monkeypatch):
+    # Fake Census API: each variable's value is derived from its position
+    made = []
+    lock = threading.Lock()
+
+    def fake_request_json(url, params):
+        with lock:
+            made.append((url, params))
+        variables = params["get"].split(",")
+        geography = next(
+            g
+            for g, geo in tq.census.GEOGRAPHIES.items()
+            if geo.for_clause == params["for"]
+        )
+        id_columns = list(tq.census.GEOGRAPHIES[geography].id_columns)
+        rows = [variables + id_columns]
+        for i, ids in enumerate(GEO_IDS[geography]):
+            rows.append([str(i * 1000 + len(v)) for v in variables] + ids)
+        return rows
+
+    monkeypatch.setattr(tq.census, "_request_json", fake_request_json)
+    monkeypatch.setenv("CENSUS_API_KEY", "secret")
+    return made
+
+
+class TestParseResponse:
+    def test_types_and_geoid(self):
+        rows = [
+            ["NAME", "B01001_001E", "B19013_001E", "state", "county"],
+            ["Cook County", "5087072", "-666666666", "17", "031"],
+            ["LA County", "9663345", "83411", "06", "037"],
+        ]
+        result = parse_response(rows, "county")
+        assert result.schema == pl.Schema(
+            {
+                "geoid": pl.String,
+                "NAME": pl.String,
+                "B01001_001E": pl.Float64,
+                "B19013_001E": pl.Float64,
+            }
+        )
+        assert result["geoid"].to_list() == ["17031", "06037"]
+        assert result["B19013_001E"].to_list() == [None, 83411.0]
+
+    def test_dtype_overrides(self):
+        rows = [["B01001_001E", "state"], ["5087072", "17"]]
+        result = parse_response(rows, "state", {"B01001_001E": pl.Int64})
+        assert result["B01001_001E"].dtype == pl.Int64
+
+
+class TestReadAcs:
+    def test_fetches_geographies_concurrently_with_renames(
+        self, requests_made
+    ):
+        frames = read_acs_geographies(
+            {"B01001_001E": "total_pop", "B19013_001E": "income"},
+            ["state", "county", "cbsa"],
+            year=2023,
+        )
+        assert list(frames) == ["state", "county", "cbsa"]
+        assert len(requests_made) == 3
+        url, params = requests_made[0]
+        assert url == "https://api.census.gov/data/2023/acs/acs5"
+        assert params["key"] == "secret"
+
+        county = frames["county"]
+        assert county.columns == ["geoid", "total_pop", "income"]
+        assert county["geoid"].to_list() == ["06037", "17031"]
+        assert county["total_pop"].dtype == pl.Float64
+
+    def test_splits_long_variable_lists(self, requests_made):
+        variables = [f"B{i:05d}_001E" for i in range(MAX_VARIABLES + 10)]
+        result = read_acs(variables, "state", year=2023)
+
+        assert sorted(len(p["get"].split(",")) for _, p in requests_made) == [
+            10,
+            MAX_VARIABLES,
+        ]
+        assert result.columns == ["geoid", *variables]
+        assert result.height == 2
+        assert result.null_count().sum_horizontal().item() == 0
+
+    def test_cached_by_variables(self, requests_made, isolated_cache_dir):
+        read_acs(["B01001_001E"], "county", year=2023)
+        first = read_acs(["B01001_001E"], "county", year=2023)
+        assert len(requests_made) == 1
+        assert list((isolated_cache_dir / "census").glob("*.parquet"))
+
+        # Different renames share the cache entry
+        renamed = read_acs({"B01001_001E": "pop"}, "county", year=2023)
+        assert len(requests_made) == 1
+        assert renamed["pop"].equals(first["B01001_001E"], check_names=False)
+
+        # Different variables, year or refresh hit the API again
+        read_acs(["B01001_001E", "B19013_001E"], "county", year=2023)
+        read_acs(["B01001_001E"], "county", year=2022)
+        read_acs(["B01001_001E"], "county", year=2023, refresh=True)
+        assert len(requests_made) == 4
+
+    def test_cached_by_dtypes(self, requests_made, isolated_cache_dir):
+        read_acs(["B01001_001E"], "state", year=2023)
+        typed = read_acs(
+            ["B01001_001E"],
+            "state",
+            year=2023,
+            dtypes={"B01001_001E": pl.Int64},
+        )
+        assert len(requests_made) == 2
+        assert typed.schema["B01001_001E"] == pl.Int64
+
+        # Overrides for variables not requested don't change the entry
+        read_acs(
+            ["B01001_001E"],
+            "state",
+            year=2023,
+            dtypes={"B19013_001E": pl.Int64},
+        )
+        assert len(requests_made) == 2
+
+    def test_cache_disabled(self, requests_made, isolated_cache_dir):
+        read_acs(["B01001_001E"], "state", year=2023, cache=False)
+        read_acs(["B01001_001E"], "state", year=2023, cache=False)
+        assert len(requests_made) == 2
+        assert not list((isolated_cache_dir / "census").glob("*.parquet"))
+
+    def test_unknown_geography(self, requests_made):
+        with pytest.raises(ValueError, match="Unknown geographies"):
+            read_acs(["B01001_001E"], "tract", year=2023)
@@ -0,0 +1,55 @@
+import os
+
+from tq.connectors import (
+    LazyConnection,
+    get_trino_config,
+    get_trino_connection,
+)
+
+
+class TestGetTrinoConfig:
+    def test_reloads_modified_env_file(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("TQ_TRINO_HOST=a\n")
+        assert get_trino_config(env_file)["TQ_TRINO_HOST"] == "a"
+
+        env_file.write_text("TQ_TRINO_HOST=b\n")
+        stat = env_file.stat()
+        os.utime(env_file, (stat.st_atime, stat.st_mtime + 10))
+        assert get_trino_config(env_file)["TQ_TRINO_HOST"] == "b"
+
+    def test_returns_copy(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text("TQ_TRINO_HOST=a\n")
+        get_trino_config(env_file)["TQ_TRINO_HOST"] = "changed"
+
+        assert get_trino_config(env_file)["TQ_TRINO_HOST"] == "a"
+
+
+class TestLazyConnection:
+    def test_connects_on_first_use(self, tmp_path, monkeypatch):
+        env_file = tmp_path / ".env"
+        env_file.write_text("TQ_TRINO_CATALOG=hive\n")
+        connects = []
+
+        class FakeConnection:
+            catalog = "hive"
+
+            def cursor(self):
+                return "cursor"
+
+        def fake_connect(config):
+            connects.append(config)
+            return FakeConnection()
+
+        monkeypatch.setattr("tq.connectors.connect_trino", fake_connect)
+        conn = get_trino_connection(env_file)
+
+        assert isinstance(conn, LazyConnection)
+        assert not conn.connected
+        assert connects == []
+
+        assert conn.cursor() == "cursor"
+        assert conn.catalog == "hive"
+        assert conn.connected
+        assert len(connects) == 1
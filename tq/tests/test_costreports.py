@@ -0,0 +1,226 @@
+import json
+import os
+from datetime import date
+
+import polars as pl
+import pytest
+
+from tq.costreports import (
+    Cell,
+    convert_cost_reports,
+    convert_hcris,
+    get_cost_reports_dir,
+    get_hcris_dir,
+    scan_cost_reports,
+    scan_hcris,
+    scan_hcris_cells,
+)
+
+PATTERN = r"hosp_yr(\d{4})\.parquet"
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    source_dir = tmp_path / "cost_reports"
+    source_dir.mkdir()
+    pl.DataFrame(
+        {"PRVDR_NUM": ["140001", "140002"], "C_1_C5_73": [10.0, 20.0]}
+    ).write_parquet(source_dir / "hosp_yr2020.parquet")
+    # Later years add columns
+    pl.DataFrame(
+        {
+            "PRVDR_NUM": ["140001"],
+            "C_1_C5_73": [15.0],
+            "G3_C1_3": [100.0],
+        }
+    ).write_parquet(source_dir / "hosp_yr2021.parquet")
+    (source_dir / "notes.txt").write_text("not a cost report")
+    return source_dir
+
+
+def convert(source_dir, **kwargs):
+    return convert_cost_reports(
+        source_dir,
+        pattern=PATTERN,
+        reader=pl.scan_parquet,
+        max_workers=2,
+        **kwargs,
+    )
+
+
+def part_mtimes(out_dir):
+    return {
+        p.parent.name: p.stat().st_mtime_ns
+        for p in out_dir.rglob("part-0.parquet")
+    }
+
+
+class TestConvertCostReports:
+    def test_converts_to_year_partitions(self, source_dir):
+        out_dir = convert(source_dir)
+        assert out_dir == get_cost_reports_dir()
+        assert sorted(part_mtimes(out_dir)) == ["year=2020", "year=2021"]
+
+        part = pl.read_parquet(out_dir / "year=2020/part-0.parquet")
+        assert part.columns == ["prvdr_num", "c_1_c5_73"]
+
+        manifest = json.loads((out_dir / "_manifest.json").read_text())
+        assert manifest["years"]["2021"]["source"] == "hosp_yr2021.parquet"
+        assert manifest["years"]["2020"]["rows"] == 2
+
+    def test_skips_unchanged_files(self, source_dir):
+        out_dir = convert(source_dir)
+        before = part_mtimes(out_dir)
+
+        # Touched but identical: hashed, then skipped
+        os.utime(source_dir / "hosp_yr2020.parquet", ns=(1, 1))
+        convert(source_dir)
+        assert part_mtimes(out_dir) == before
+
+        # Changed contents: reconverted
+        pl.DataFrame(
+            {"PRVDR_NUM": ["140001"], "C_1_C5_73": [99.0]}
+        ).write_parquet(source_dir / "hosp_yr2021.parquet")
+        convert(source_dir)
+        after = part_mtimes(out_dir)
+        assert after["year=2020"] == before["year=2020"]
+        assert after["year=2021"] != before["year=2021"]
+
+        convert(source_dir, refresh=True)
+        assert part_mtimes(out_dir)["year=2020"] != before["year=2020"]
+
+    def test_no_matching_files(self, tmp_path):
+        with pytest.raises(FileNotFoundError, match="No files matching"):
+            convert(tmp_path)
+
+
+class TestScanCostReports:
+    def test_scan_aligns_years(self, source_dir):
+        convert(source_dir)
+        result = scan_cost_reports().collect().sort("year", "prvdr_num")
+        assert result.columns == ["prvdr_num", "c_1_c5_73", "g3_c1_3", "year"]
+        assert result.rows() == [
+            ("140001", 10.0, None, 2020),
+            ("140002", 20.0, None, 2020),
+            ("140001", 15.0, 100.0, 2021),
+        ]
+
+    def test_scan_projection_and_years(self, source_dir):
+        convert(source_dir)
+        result = scan_cost_reports(["g3_c1_3"], years=[2021]).collect()
+        assert result.rows() == [(100.0, 2021)]
+
+        with pytest.raises(ValueError, match="Unknown cost report columns"):
+            scan_cost_reports(["c_1_c6_73"])
+        with pytest.raises(ValueError, match="No converted cost reports"):
+            scan_cost_reports(years=[2019])
+
+    def test_not_converted(self):
+        with pytest.raises(FileNotFoundError, match="convert_cost_reports"):
+            scan_cost_reports()
+
+
+@pytest.fixture
+def hcris_dir(tmp_path):
+    hcris_dir = tmp_path / "hcris"
+    hcris_dir.mkdir()
+    rpt = {
+        2021: [
+            "101,1,140001,,1,01/01/2021,12/31/2021,,,,,,,,,,,",
+            "102,1,140002,,1,07/01/2021,06/30/2022,,,,,,,,,,,",
+        ],
+        2022: ["201,1,140001,,1,01/01/2022,12/31/2022,,,,,,,,,,,"],
+    }
+    nmrc = {
+        2021: [
+            "101,C000001,07300,00500,100",
+            "101,C000001,07300,00600,150",
+            "101,C000001,07300,00700,250",
+            "101,G300000,00300,00100,5000",
+            # Same line and column on another worksheet, not requested
+            "101,A000000,07300,00500,1",
+            "102,C000001,07300,00500,40",
+        ],
+        2022: [
+            "201,C000001,07300,00500,120",
+            "201,C000001,07300,00600,100",
+            "201,C000001,07300,00700,100",
+        ],
+    }
+    alpha = {
+        2021: ["101,S200001,02100,00100,2", "102,S200001,02100,00100,4"],
+        2022: ["201,S200001,02100,00100,1"],
+    }
+    for year in (2021, 2022):
+        for table, rows in (("RPT", rpt), ("NMRC", nmrc), ("alpha", alpha)):
+            path = hcris_dir / f"HOSP10_{year}_{table}.CSV"
+            path.write_text("\n".join(rows[year]) + "\n")
+    return hcris_dir
+
+
+class TestHcris:
+    def test_cell_codes(self):
+        assert Cell("C000001", 73, 5).codes() == ("C000001", "07300", "00500")
+        assert Cell("C000001", 73.01, "0100A").codes() == (
+            "C000001",
+            "07301",
+            "0100A",
+        )
+
+    def test_convert_hcris(self, hcris_dir):
+        out_dir = convert_hcris(hcris_dir, max_workers=2)
+        assert out_dir == get_hcris_dir()
+
+        rpt = scan_hcris("rpt", years=[2021]).collect()
+        assert rpt["fy_end_dt"].to_list() == [
+            date(2021, 12, 31),
+            date(2022, 6, 30),
+        ]
+        nmrc = scan_hcris("nmrc", years=[2021]).collect()
+        assert nmrc.schema["worksheet"] == pl.Categorical
+        assert nmrc.columns == [
+            "rpt_rec_num",
+            "worksheet",
+            "line",
+            "column",
+            "value",
+            "year",
+        ]
+        # Sorted by cell address
+        assert nmrc["worksheet"].cast(pl.String).to_list()[:2] == [
+            "A000000",
+            "C000001",
+        ]
+
+        with pytest.raises(ValueError, match="Unknown HCRIS table"):
+            scan_hcris("wide")
+
+    def test_scan_hcris_cells(self, hcris_dir):
+        convert_hcris(hcris_dir, max_workers=2)
+        result = scan_hcris_cells(
+            {
+                "drug_cost": Cell("C000001", 73, 5),
+                "drug_charges_ip": Cell("C000001", 73, 6),
+                "net_revenue": Cell("G300000", 3, 1),
+            },
+            text_cells={"type_of_control": Cell("S200001", 21, 1)},
+            report_columns=["prvdr_num"],
+        ).collect()
+        assert result.rows() == [
+            (2021, 101, "140001", 100.0, 150.0, 5000.0, "2"),
+            (2021, 102, "140002", 40.0, None, None, "4"),
+            (2022, 201, "140001", 120.0, 100.0, None, "1"),
+        ]
+
+    def test_scan_hcris_cells_years(self, hcris_dir):
+        convert_hcris(hcris_dir, max_workers=2)
+        result = scan_hcris_cells(
+            {"drug_cost": Cell("C000001", 73, 5)}, years=[2022]
+        ).collect()
+        assert result.select("year", "drug_cost").rows() == [(2022, 120.0)]
+
+        with pytest.raises(ValueError, match="unique"):
+            scan_hcris_cells(
+                {"a": Cell("C000001", 73, 5)},
+                text_cells={"a": Cell("S200001", 21, 1)},
+            )
@@ -0,0 +1,139 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from tq.estimate import (
+    QueryEstimate,
+    ScanBudgetError,
+    check_scan_budget,
+    estimate_query,
+    get_scan_budget,
+    parse_bytes,
+)
+
+IO_PLAN = {
+    "inputTableColumnInfos": [
+        {
+            "table": {
+                "catalog": "hive",
+                "schemaTable": {
+                    "schema": "public_latest",
+                    "table": "core_rates",
+                },
+            },
+            "estimate": {
+                "outputRowCount": 1e9,
+                "outputSizeInBytes": 4e12,
+            },
+        },
+        {
+            "table": {
+                "catalog": "hive",
+                "schemaTable": {"schema": "public_latest", "table": "payers"},
+            },
+            "estimate": {"outputRowCount": 1e3, "outputSizeInBytes": 1e5},
+        },
+    ],
+    "estimate": {"outputRowCount": 5e6, "outputSizeInBytes": 2e8},
+}
+
+
+class TestParseBytes:
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            (1024, 1024),
+            ("1024", 1024),
+            ("500GB", 500 * 1024**3),
+            ("1.5 tb", int(1.5 * 1024**4)),
+            ("10M", 10 * 1024**2),
+        ],
+    )
+    def test_parse_bytes(self, value, expected):
+        assert parse_bytes(value) == expected
+
+    def test_parse_bytes_invalid(self):
+        with pytest.raises(ValueError, match="lots"):
+            parse_bytes("lots")
+
+    def test_get_scan_budget_env_overrides_config(self, monkeypatch):
+        config = {"TQ_SCAN_BUDGET": "1GB"}
+        assert get_scan_budget(config) == 1024**3
+
+        monkeypatch.setenv("TQ_SCAN_BUDGET", "2GB")
+        assert get_scan_budget(config) == 2 * 1024**3
+        assert get_scan_budget({}) == 2 * 1024**3
+
+    def test_get_scan_budget_unset(self):
+        assert get_scan_budget({}) is None
+
+
+class TestQueryEstimate:
+    def test_from_io_plan(self):
+        estimate = QueryEstimate.from_io_plan(IO_PLAN)
+
+        assert estimate.input_bytes == 4e12 + 1e5
+        assert estimate.input_rows == 1e9 + 1e3
+        assert estimate.output_rows == 5e6
+        assert estimate.output_bytes == 2e8
+        assert estimate.tables == (
+            "hive.public_latest.core_rates",
+            "hive.public_latest.payers",
+        )
+
+    def test_from_io_plan_missing_stats(self):
+        plan = json.loads(json.dumps(IO_PLAN))
+        plan["inputTableColumnInfos"][0]["estimate"]["outputSizeInBytes"] = (
+            "NaN"
+        )
+        plan["estimate"]["outputRowCount"] = float("nan")
+
+        estimate = QueryEstimate.from_io_plan(plan)
+
+        assert estimate.input_bytes is None
+        assert estimate.output_rows is None
+
+    def test_estimate_query(self):
+        executed = []
+
+        class Cursor:
+            def execute(self, sql):
+                executed.append(sql)
+
+            def fetchall(self):
+                return [[json.dumps(IO_PLAN)]]
+
+        conn = SimpleNamespace(cursor=Cursor)
+        estimate = estimate_query("SELECT * FROM core_rates", conn)
+
+        assert executed == [
+            "EXPLAIN (TYPE IO, FORMAT JSON) SELECT * FROM core_rates"
+        ]
+        assert estimate.output_rows == 5e6
+
+
+class TestCheckScanBudget:
+    @pytest.fixture
+    def estimate(self):
+        return QueryEstimate.from_io_plan(IO_PLAN)
+
+    def test_within_budget(self, estimate):
+        check_scan_budget(estimate, parse_bytes("5TB"))
+        check_scan_budget(estimate, None)
+
+    def test_over_budget_refused(self, estimate):
+        with pytest.raises(ScanBudgetError, match="3.6 TB"):
+            check_scan_budget(estimate, parse_bytes("500GB"))
+
+    def test_over_budget_confirmed(self, estimate, monkeypatch):
+        monkeypatch.setattr("builtins.input", lambda prompt: "y")
+        check_scan_budget(estimate, parse_bytes("500GB"), confirm=True)
+
+        monkeypatch.setattr("builtins.input", lambda prompt: "")
+        with pytest.raises(ScanBudgetError):
+            check_scan_budget(estimate, parse_bytes("500GB"), confirm=True)
+
+    def test_unknown_estimate_allowed(self):
+        estimate = QueryEstimate(None, None, None, None, ("hive.t",))
+        check_scan_budget(estimate, 1)
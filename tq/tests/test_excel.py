@@ -0,0 +1,92 @@
+import polars as pl
+import pytest
+import xlsxwriter
+
+import tq
+from tq.excel import read_excel_cached
+
+
+def write_workbook(path, sheets):
+    with xlsxwriter.Workbook(path) as workbook:
+        for name, df in sheets.items():
+            df.write_excel(workbook, worksheet=name)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "opais.xlsx"
+    write_workbook(
+        path,
+        {
+            "Covered Entities": pl.DataFrame(
+                {"id": ["a", "b"], "participating": [True, False]}
+            ),
+            "Contract Pharmacies": pl.DataFrame({"id": ["c"], "n": [1]}),
+        },
+    )
+    return path
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Record the sheets parsed by each pl.read_excel call."""
+    parsed = []
+    read_excel = pl.read_excel
+
+    def counting_read_excel(source, sheet_name, **kwargs):
+        parsed.append(sheet_name)
+        return read_excel(source, sheet_name=sheet_name, **kwargs)
+
+    monkeypatch.setattr(pl, "read_excel", counting_read_excel)
+    return parsed
+
+
+class TestReadExcelCached:
+    def test_exported(self):
+        assert tq.read_excel_cached is read_excel_cached
+
+    def test_single_sheet_matches_read_excel(self, workbook, parses):
+        expected = pl.read_excel(workbook, sheet_name="Covered Entities")
+        parses.clear()
+
+        cold = read_excel_cached(workbook, "Covered Entities")
+        warm = read_excel_cached(workbook, "Covered Entities")
+        assert cold.equals(expected)
+        assert warm.equals(expected)
+        assert parses == [["Covered Entities"]]
+
+    def test_multiple_and_all_sheets(self, workbook, parses):
+        sheets = read_excel_cached(
+            workbook, ["Contract Pharmacies", "Covered Entities"]
+        )
+        assert list(sheets) == ["Contract Pharmacies", "Covered Entities"]
+        assert sheets["Contract Pharmacies"]["n"].to_list() == [1]
+
+        all_sheets = read_excel_cached(workbook)
+        assert list(all_sheets) == ["Covered Entities", "Contract Pharmacies"]
+        # Both sheets were parsed in one pass over the workbook
+        assert parses == [["Contract Pharmacies", "Covered Entities"]]
+
+    def test_only_uncached_sheets_are_parsed(self, workbook, parses):
+        read_excel_cached(workbook, "Covered Entities")
+        read_excel_cached(workbook)
+        assert parses == [["Covered Entities"], ["Contract Pharmacies"]]
+
+    def test_read_options_are_part_of_key(self, workbook, parses):
+        read_excel_cached(workbook, "Covered Entities")
+        skipped = read_excel_cached(
+            workbook, "Covered Entities", read_options={"header_row": 1}
+        )
+        assert skipped.columns[0] == "a"
+        assert len(parses) == 2
+
+    def test_workbook_changes_invalidate(self, workbook, parses):
+        read_excel_cached(workbook, "Contract Pharmacies")
+        write_workbook(
+            workbook, {"Contract Pharmacies": pl.DataFrame({"id": ["d"]})}
+        )
+        result = read_excel_cached(workbook, "Contract Pharmacies")
+        assert result["id"].to_list() == ["d"]
+
+        read_excel_cached(workbook, "Contract Pharmacies", refresh=True)
+        assert len(parses) == 3
@@ -0,0 +1,218 @@
+import time
+
+import pytest
+
+from tq.geocode import (
+    CensusBatchBackend,
+    FakeBackend,
+    GeocodeCache,
+    Geocoder,
+    GeocodeResult,
+    RateLimiter,
+    normalize_address,
+    split_address,
+)
+
+
+class TestNormalizeAddress:
+    def test_ignores_case_punctuation_and_whitespace(self):
+        assert normalize_address("1 Main St., Chicago  IL") == (
+            "1 MAIN ST CHICAGO IL"
+        )
+        assert normalize_address(" 1 main st , chicago, il ") == (
+            "1 MAIN ST CHICAGO IL"
+        )
+
+    def test_keeps_unit_characters(self):
+        assert normalize_address("12-B Elm St #4") == "12-B ELM ST #4"
+
+
+class TestSplitAddress:
+    @pytest.mark.parametrize(
+        "address",
+        [
+            "1 Main St, Chicago, IL 60601",
+            "1 Main St , Chicago IL , 60601",
+            "1 Main St, Chicago, IL, 60601",
+        ],
+    )
+    def test_splits_components(self, address):
+        assert split_address(address) == (
+            "1 Main St",
+            "Chicago",
+            "IL",
+            "60601",
+        )
+
+    def test_missing_zip(self):
+        assert split_address("1 Main St, Chicago, IL") == (
+            "1 Main St",
+            "Chicago",
+            "IL",
+            "",
+        )
+
+    def test_unparseable_address_goes_in_street(self):
+        assert split_address("somewhere") == ("somewhere", "", "", "")
+
+
+class TestCensusBatchBackend:
+    def test_format_batch(self):
+        text = CensusBatchBackend.format_batch(
+            ["1 Main St, Chicago, IL 60601"]
+        )
+        assert text.strip() == "0,1 Main St,Chicago,IL,60601"
+
+    def test_parse_batch(self):
+        text = (
+            '"1","2 ELM ST, X, IL, 60601","No_Match"\n'
+            '"0","1 MAIN ST, CHICAGO, IL, 60601","Match","Exact",'
+            '"1 MAIN ST, CHICAGO, IL, 60601","-87.6,41.8","123","L"\n'
+        )
+        assert CensusBatchBackend.parse_batch(text, 2) == [
+            GeocodeResult(41.8, -87.6, "1 MAIN ST, CHICAGO, IL, 60601"),
+            None,
+        ]
+
+    def test_rejects_oversized_batches(self):
+        with pytest.raises(ValueError, match="batch_size"):
+            CensusBatchBackend(batch_size=10_001)
+
+
+class TestRateLimiter:
+    def test_waits_for_tokens(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        limiter = RateLimiter(
+            rate=2, burst=2, clock=lambda: now[0], sleep=sleep
+        )
+        for _ in range(4):
+            limiter.acquire()
+        # Two burst tokens, then one token every half second
+        assert sleeps == [0.5, 0.5]
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            RateLimiter(rate=0)
+        with pytest.raises(ValueError, match="burst"):
+            RateLimiter(rate=1).acquire(2)
+
+
+class TestGeocodeCache:
+    def test_round_trip_and_persistence(self, tmp_path):
+        path = tmp_path / "geocode.sqlite"
+        cache = GeocodeCache(path)
+        cache.put_many(
+            {"A": GeocodeResult(1.0, 2.0, "a"), "B": None}, backend="fake"
+        )
+        cache.close()
+
+        reopened = GeocodeCache(path)
+        assert len(reopened) == 2
+        assert reopened.get_many(["A", "B", "C"], backend="fake") == {
+            "A": GeocodeResult(1.0, 2.0, "a"),
+            "B": None,
+        }
+
+    def test_keyed_by_backend(self, tmp_path):
+        cache = GeocodeCache(tmp_path / "geocode.sqlite")
+        cache.put_many({"A": GeocodeResult(1.0, 2.0, "a")}, backend="fake")
+        cache.put_many({"A": None}, backend="census")
+        assert cache.get_many(["A"], backend="fake") == {
+            "A": GeocodeResult(1.0, 2.0, "a")
+        }
+        assert cache.get_many(["A"], backend="census") == {"A": None}
+        assert cache.get_many(["A"], backend="geopy") == {}
+
+    def test_default_path_in_cache_dir(self, isolated_cache_dir):
+        cache = GeocodeCache()
+        assert cache.path == isolated_cache_dir / "geocode" / "geocode.sqlite"
+
+
+class TestGeocoder:
+    def test_geocodes_unique_addresses(self):
+        backend = FakeBackend(missing={"nowhere"})
+        geocoder = Geocoder(backend, cache=False)
+        result = geocoder.geocode(["1 Main St", "nowhere", "1 Main St", None])
+
+        assert result["address"].to_list() == ["1 Main St", "nowhere"]
+        expected = FakeBackend.locate("1 Main St")
+        assert result.row(0) == (
+            "1 Main St",
+            expected.latitude,
+            expected.longitude,
+            expected.matched_address,
+        )
+        assert result.row(1) == ("nowhere", None, None, None)
+
+    def test_cache_skips_known_addresses(self):
+        backend = FakeBackend(missing={"nowhere"})
+        Geocoder(backend).geocode(["1 Main St", "nowhere"])
+        assert len(backend.calls) == 2
+
+        # Same addresses after normalization, including the cached miss
+        result = Geocoder(backend).geocode(["1 MAIN ST.", "NOWHERE", "2 Elm"])
+        assert backend.calls[2:] == [["2 Elm"]]
+        assert result["latitude"].is_null().to_list() == [False, True, False]
+
+    def test_normalized_duplicates_are_fetched_once(self):
+        backend = FakeBackend()
+        result = Geocoder(backend, cache=False).geocode(
+            ["1 Main St", "1 MAIN ST."]
+        )
+        assert backend.calls == [["1 Main St"]]
+        assert result["latitude"].n_unique() == 1
+
+    def test_batches_by_backend_size(self):
+        backend = FakeBackend(batch_size=3)
+        addresses = [f"{i} Main St" for i in range(7)]
+        result = Geocoder(backend, cache=False).geocode(addresses)
+        assert sorted(len(batch) for batch in backend.calls) == [1, 3, 3]
+        assert result["latitude"].null_count() == 0
+
+    def test_dispatches_concurrently(self):
+        backend = FakeBackend(latency=0.2)
+        addresses = [f"{i} Main St" for i in range(8)]
+        start = time.perf_counter()
+        Geocoder(backend, cache=False, max_concurrency=8).geocode(addresses)
+        assert time.perf_counter() - start < 0.2 * 4
+
+    def test_failed_batches_are_retried(self):
+        class FlakyBackend(FakeBackend):
+            def __init__(self):
+                super().__init__()
+                self.failures = 1
+
+            def geocode_batch(self, addresses):
+                if self.failures:
+                    self.failures -= 1
+                    raise ConnectionError("boom")
+                return super().geocode_batch(addresses)
+
+        result = Geocoder(FlakyBackend(), cache=False, backoff=0).geocode(
+            ["1 Main St"]
+        )
+        assert result["latitude"].null_count() == 0
+
+    def test_failed_batches_are_not_cached(self):
+        class BrokenBackend(FakeBackend):
+            def geocode_batch(self, addresses):
+                raise ConnectionError("boom")
+
+        cache = GeocodeCache()
+        geocoder = Geocoder(BrokenBackend(), cache=cache, retries=0)
+        result = geocoder.geocode(["1 Main St"])
+        assert result["latitude"].to_list() == [None]
+        assert len(cache) == 0
+
+    def test_rate_limited(self):
+        geocoder = Geocoder(FakeBackend(), cache=False, rate=20)
+        start = time.perf_counter()
+        geocoder.geocode([f"{i} Main St" for i in range(5)])
+        # One burst token, then 4 more at 20 per second
+        assert time.perf_counter() - start >= 4 / 20 * 0.9
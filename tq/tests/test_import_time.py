@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parents[1] / "src"
+
+# Cumulative import time budget for `import tq`, in microseconds. Generous
+# enough for slow CI machines; eager imports of Polars, PyArrow, Trino and
+# GitPython take several hundred milliseconds
+IMPORT_BUDGET_US = 50_000
+
+HEAVY_MODULES = {"git", "polars", "pyarrow", "requests", "trino"}
+
+
+def import_times(code: str) -> dict[str, int]:
+    """Run code in a fresh interpreter and parse ``-X importtime`` output."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": str(SRC_DIR)},
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime:
+    def test_import_tq_is_lazy(self):
+        times = import_times("import tq")
+
+        assert "tq" in times
+        assert not HEAVY_MODULES & {name.split(".")[0] for name in times}
+        assert times["tq"] < IMPORT_BUDGET_US
+
+    def test_get_trino_connection_is_lazy(self):
+        times = import_times(
+            "from tq import get_trino_connection; get_trino_connection()"
+        )
+
+        assert not HEAVY_MODULES & {name.split(".")[0] for name in times}
+
+    def test_exports_resolve(self):
+        import tq
+
+        for name in tq.__all__:
+            assert getattr(tq, name) is not None
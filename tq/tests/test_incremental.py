@@ -0,0 +1,176 @@
+from datetime import date
+
+import polars as pl
+import pytest
+
+from tq.cache import read_metadata
+from tq.incremental import incremental_sql, refresh_incremental
+from tq.stream import QueryStream
+
+SQL = "SELECT provider_id, payer_id, rate, updated_on FROM rates"
+
+
+class TestIncrementalSql:
+    def test_wraps_query_in_watermark_filter(self):
+        assert incremental_sql(SQL, "updated_on", date(2025, 1, 2)) == (
+            f"SELECT * FROM (\n{SQL}\n) AS tq_base\n"
+            "WHERE tq_base.\"updated_on\" >= DATE '2025-01-02'"
+        )
+
+    def test_fills_watermark_placeholder(self):
+        sql = "SELECT * FROM rates WHERE snapshot >= {{ watermark }}"
+        assert incremental_sql(sql, "snapshot", "2025-01") == (
+            "SELECT * FROM rates WHERE snapshot >= '2025-01'"
+        )
+
+
+class TestRefreshIncremental:
+    @pytest.fixture
+    def upstream(self, monkeypatch):
+        """Fake Trino returning whichever frame is set as the upstream."""
+        state = {"df": None, "sql": []}
+
+        def fake_stream_query(sql, conn):
+            state["sql"].append(sql)
+            table = state["df"].to_arrow()
+            return QueryStream(table.schema, table.to_batches())
+
+        monkeypatch.setattr("tq.incremental.stream_query", fake_stream_query)
+        return state
+
+    def refresh(self, path, **kwargs):
+        return refresh_incremental(
+            SQL,
+            path,
+            key=["provider_id", "payer_id"],
+            watermark="updated_on",
+            conn=object(),
+            **kwargs,
+        )
+
+    def test_first_run_fetches_everything(self, tmp_path, upstream):
+        path = tmp_path / "rates.parquet"
+        upstream["df"] = pl.DataFrame(
+            {
+                "provider_id": [1, 2],
+                "payer_id": [10, 10],
+                "rate": [100.0, 200.0],
+                "updated_on": [date(2025, 1, 1), date(2025, 1, 2)],
+            }
+        )
+
+        result = self.refresh(path)
+
+        assert upstream["sql"] == [SQL]
+        assert result.height == 2
+        metadata = read_metadata(path)
+        assert metadata["high_water"] == "2025-01-02"
+        assert metadata["row_count"] == 2
+
+    def test_merges_changed_rows(self, tmp_path, upstream):
+        path = tmp_path / "rates.parquet"
+        upstream["df"] = pl.DataFrame(
+            {
+                "provider_id": [1, 2],
+                "payer_id": [10, 10],
+                "rate": [100.0, 200.0],
+                "updated_on": [date(2025, 1, 1), date(2025, 1, 2)],
+            }
+        )
+        self.refresh(path)
+
+        # Provider 2 changed its rate and provider 3 is new
+        upstream["df"] = pl.DataFrame(
+            {
+                "provider_id": [2, 3],
+                "payer_id": [10, 10],
+                "rate": [250.0, 300.0],
+                "updated_on": [date(2025, 1, 3), date(2025, 1, 3)],
+            }
+        )
+        result = self.refresh(path)
+
+        assert "DATE '2025-01-02'" in upstream["sql"][-1]
+        assert result.sort("provider_id")["rate"].to_list() == [
+            100.0,
+            250.0,
+            300.0,
+        ]
+        assert pl.read_parquet(path).height == 3
+        assert read_metadata(path)["high_water"] == "2025-01-03"
+
+    def test_no_new_rows_keeps_data(self, tmp_path, upstream):
+        path = tmp_path / "rates.parquet"
+        upstream["df"] = pl.DataFrame(
+            {
+                "provider_id": [1],
+                "payer_id": [10],
+                "rate": [100.0],
+                "updated_on": [date(2025, 1, 1)],
+            }
+        )
+        self.refresh(path)
+
+        upstream["df"] = upstream["df"].clear()
+        result = self.refresh(path)
+
+        assert result.height == 1
+        assert read_metadata(path)["high_water"] == "2025-01-01"
+
+    def test_changed_query_fetches_everything(self, tmp_path, upstream):
+        path = tmp_path / "rates.parquet"
+        upstream["df"] = pl.DataFrame(
+            {
+                "provider_id": [1],
+                "payer_id": [10],
+                "rate": [100.0],
+                "updated_on": [date(2025, 1, 1)],
+            }
+        )
+        self.refresh(path)
+        refresh_incremental(
+            SQL + " WHERE rate > 0",
+            path,
+            key=["provider_id", "payer_id"],
+            watermark="updated_on",
+            conn=object(),
+        )
+
+        assert upstream["sql"][-1] == SQL + " WHERE rate > 0"
+
+    def test_whitespace_in_literals_changes_query(self, tmp_path, upstream):
+        path = tmp_path / "rates.parquet"
+        upstream["df"] = pl.DataFrame(
+            {
+                "provider_id": [1],
+                "payer_id": [10],
+                "rate": [100.0],
+                "updated_on": [date(2025, 1, 1)],
+            }
+        )
+        for sql in [
+            SQL + " WHERE plan = 'a  b'",
+            SQL + "\n  WHERE plan = 'a  b'",
+            SQL + " WHERE plan = 'a b'",
+        ]:
+            refresh_incremental(
+                sql,
+                path,
+                key=["provider_id", "payer_id"],
+                watermark="updated_on",
+                conn=object(),
+            )
+
+        # Reformatting the query is incremental, editing the literal isn't
+        assert upstream["sql"][1].startswith("SELECT * FROM (")
+        assert upstream["sql"][2] == SQL + " WHERE plan = 'a b'"
+
+    def test_placeholder_requires_initial_watermark(self, tmp_path, upstream):
+        with pytest.raises(ValueError, match="initial_watermark"):
+            refresh_incremental(
+                "SELECT * FROM rates WHERE snapshot >= {{ watermark }}",
+                tmp_path / "rates.parquet",
+                key="id",
+                watermark="snapshot",
+                conn=object(),
+            )
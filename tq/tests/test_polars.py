@@ -0,0 +1,145 @@
+import json
+import math
+
+import polars as pl
+import pytest
+
+import tq.polars  # noqa: F401
+from tq.polars import read_json_records, weighted_stats
+
+
+@pytest.fixture
+def rates():
+    return pl.DataFrame(
+        {
+            "npi": ["a", "a", "a", "a", "b", "b", "c"],
+            "rate": [10.0, 20.0, 30.0, None, 5.0, 7.0, None],
+            "pom": [1.0, 2.0, None, 4.0, 1.5, 1.5, None],
+            "share": [1.0, 1.0, 2.0, 5.0, 0.0, 0.0, 1.0],
+        }
+    )
+
+
+class TestUtilDataFrame:
+    def test_to_snake_case(self):
+        df = pl.DataFrame({"Provider Name": [1], "340B-ID": [2]})
+        assert df.util.to_snake_case().columns == ["provider_name", "340b_id"]
+
+    def test_empty_strings_to_null(self):
+        df = pl.DataFrame({"a": ["", "x"], "b": [1, 2]})
+        assert df.util.empty_strings_to_null()["a"].to_list() == [None, "x"]
+
+
+class TestUtilExpr:
+    def test_wmean_ignores_null_values(self, rates):
+        result = rates.group_by("npi", maintain_order=True).agg(
+            pl.col("rate").util.wmean("share")
+        )
+        # (10 + 20 + 60) / 4; b has zero total weight; c has no values
+        assert result["rate"].to_list() == [22.5, None, None]
+
+    def test_wcount_and_wsum(self, rates):
+        result = rates.filter(pl.col("npi") == "a").select(
+            pl.col("rate").util.wcount("share").alias("count"),
+            pl.col("rate").util.wsum("share").alias("sum"),
+        )
+        assert result.row(0) == (4.0, 90.0)
+
+    def test_wstd(self, rates):
+        result = rates.filter(pl.col("npi") == "a").select(
+            pl.col("rate").util.wstd("share")
+        )
+        expected = math.sqrt((1 * 12.5**2 + 1 * 2.5**2 + 2 * 7.5**2) / 4)
+        assert result.item() == pytest.approx(expected)
+
+    def test_wmedian_and_wquantile(self, rates):
+        result = rates.filter(pl.col("npi") == "a").select(
+            pl.col("rate").util.wmedian("share").alias("median"),
+            pl.col("rate").util.wquantile("share", 0.25).alias("q25"),
+            pl.col("rate").util.wquantile("share", 1.0).alias("max"),
+        )
+        # Cumulative weights of 10, 20, 30 are 1, 2, 4 out of 4
+        assert result.row(0) == (20.0, 10.0, 30.0)
+
+    def test_wquantile_bounds(self):
+        with pytest.raises(ValueError, match="between 0 and 1"):
+            pl.col("rate").util.wquantile("share", 1.5)
+
+
+class TestWeightedStats:
+    def test_matches_expressions(self, rates):
+        stats = ["count", "sum", "mean", "std", "median"]
+        fused = weighted_stats(
+            rates, "npi", ["rate", "pom"], "share", stats, quantiles=[0.25]
+        )
+        expected = rates.group_by("npi", maintain_order=True).agg(
+            *[
+                expr
+                for col in ["rate", "pom"]
+                for expr in [
+                    pl.col(col).util.wcount("share").alias(f"{col}_count"),
+                    pl.col(col).util.wsum("share").alias(f"{col}_sum"),
+                    pl.col(col).util.wmean("share").alias(f"{col}_mean"),
+                    pl.col(col).util.wstd("share").alias(f"{col}_std"),
+                    pl.col(col).util.wmedian("share").alias(f"{col}_median"),
+                    pl.col(col)
+                    .util.wquantile("share", 0.25)
+                    .alias(f"{col}_q25"),
+                ]
+            ]
+        )
+
+        assert fused.columns == expected.columns
+        for col in fused.columns[1:]:
+            for got, want in zip(fused[col], expected[col]):
+                if want is None or math.isnan(want):
+                    assert got is None or math.isnan(got), col
+                else:
+                    assert got == pytest.approx(want), col
+
+    def test_lazy_frame(self, rates):
+        result = weighted_stats(rates.lazy(), ["npi"], ["rate"], "share")
+        assert isinstance(result, pl.LazyFrame)
+        assert result.collect()["rate_mean"].to_list() == [22.5, None, None]
+
+    def test_unknown_stat(self, rates):
+        with pytest.raises(ValueError, match="mode"):
+            weighted_stats(rates, "npi", ["rate"], "share", ["mode"])
+
+
+class TestReadJsonRecords:
+    # Mixed-type values, keys missing from some records, booleans, floats
+    # and nulls
+    RECORDS = [
+        {"id": "1", "npi": 1234567890, "a": [1], "p": {"p": 1}, "x": 1.0},
+        {"id": "2", "npi": "1234567891", "a": "b", "p": {"q": "é"}},
+        {"id": "3", "a": None, "active": True, "x": 1e-07},
+        {"id": "4", "active": False, "s": "true"},
+    ]
+
+    def test_values_are_strings(self):
+        content = json.dumps({"hits": self.RECORDS, "nbPages": 3}).encode()
+        records, others = read_json_records(content, "hits")
+        assert others == {"nbPages": 3}
+        assert records.schema == dict.fromkeys(
+            ["id", "npi", "a", "p", "x", "active", "s"], pl.String
+        )
+        assert records.rows() == [
+            ("1", "1234567890", "[1]", '{"p": 1}', "1.0", None, None),
+            ("2", "1234567891", "b", '{"q": "é"}', None, None, None),
+            ("3", None, None, None, "1e-07", "True", None),
+            ("4", None, None, None, None, "False", "true"),
+        ]
+
+    def test_compact_and_indented_json(self):
+        expected, _ = read_json_records(
+            json.dumps({"hits": self.RECORDS}).encode(), "hits"
+        )
+        for kwargs in ({"separators": (",", ":")}, {"indent": 2}):
+            content = json.dumps({"hits": self.RECORDS}, **kwargs).encode()
+            assert read_json_records(content, "hits")[0].equals(expected)
+
+    def test_no_records(self):
+        records, others = read_json_records(b'{"hits": [], "n": 0}', "hits")
+        assert records.is_empty()
+        assert others == {"n": 0}
@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+from tq.pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        if not self.conn.healthy:
+            raise ConnectionError("Connection reset by peer")
+
+    def fetchall(self):
+        return [[1]]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.healthy = True
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool:
+    def test_pool_is_lazy(self):
+        created = []
+        pool = ConnectionPool(connect=lambda: created.append(1))
+        assert created == []
+        assert pool.size == 0
+
+    def test_pool_reuses_connections(self):
+        pool = ConnectionPool(connect=FakeConnection)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        assert first is second
+        assert pool.size == 1
+
+    def test_pool_connections_are_exclusive(self):
+        pool = ConnectionPool(connect=FakeConnection)
+        with pool.connection() as first, pool.connection() as second:
+            assert first is not second
+        assert pool.size == 2
+
+    def test_pool_max_size(self):
+        pool = ConnectionPool(max_size=1, connect=FakeConnection)
+        with pool.connection(), pytest.raises(PoolTimeoutError):
+            pool.acquire(timeout=0.01)
+
+    def test_pool_blocks_until_release(self):
+        pool = ConnectionPool(max_size=1, connect=FakeConnection)
+        conn = pool.acquire()
+        threading.Timer(0.05, pool.release, args=[conn]).start()
+
+        assert pool.acquire(timeout=1) is conn
+
+    def test_pool_threads_share_connections(self):
+        pool = ConnectionPool(max_size=2, connect=FakeConnection)
+        seen = set()
+        lock = threading.Lock()
+
+        def work():
+            with pool.connection() as conn:
+                with lock:
+                    seen.add(id(conn))
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert pool.size <= 2
+        assert len(seen) <= 2
+
+    def test_pool_replaces_unhealthy_connection(self):
+        pool = ConnectionPool(connect=FakeConnection, health_check_interval=0)
+        with pool.connection() as first:
+            pass
+        first.healthy = False
+
+        with pool.connection() as second:
+            pass
+
+        assert second is not first
+        assert first.closed
+        assert pool.size == 1
+
+    def test_pool_discards_broken_connection_on_error(self):
+        pool = ConnectionPool(connect=FakeConnection)
+        with pytest.raises(RuntimeError), pool.connection() as first:
+            first.healthy = False
+            raise RuntimeError("Query failed")
+
+        assert first.closed
+        assert pool.size == 0
+
+    def test_pool_loads_config_once(self, monkeypatch):
+        loads = []
+
+        def fake_config(env_file):
+            loads.append(env_file)
+            return {"TQ_TRINO_HOST": "localhost"}
+
+        monkeypatch.setattr("tq.pool.get_trino_config", fake_config)
+        monkeypatch.setattr(
+            "tq.pool.connect_trino", lambda config: FakeConnection()
+        )
+        pool = ConnectionPool()
+        with pool.connection(), pool.connection():
+            pass
+
+        assert len(loads) == 1
+
+    def test_pool_close(self):
+        pool = ConnectionPool(connect=FakeConnection)
+        with pool.connection() as conn:
+            pass
+        pool.close()
+
+        assert conn.closed
+        assert pool.size == 0
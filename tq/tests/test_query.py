@@ -0,0 +1,288 @@
+import os
+import time
+from contextlib import nullcontext
+from datetime import date
+from types import SimpleNamespace
+
+import polars as pl
+import pyarrow as pa
+import pytest
+
+import tq.query
+from tq.cache import QueryCache
+from tq.estimate import QueryEstimate, ScanBudgetError
+from tq.query import load_sql, read_query, render_sql, run_queries
+from tq.stream import QueryStream
+
+
+class TestLoadSql:
+    def test_load_sql_from_path(self, tmp_path):
+        sql_file = tmp_path / "rates.sql"
+        sql_file.write_text("SELECT 1")
+
+        assert load_sql(sql_file) == "SELECT 1"
+        assert load_sql(str(sql_file)) == "SELECT 1"
+
+    def test_load_sql_text(self):
+        assert load_sql("SELECT 1") == "SELECT 1"
+
+
+class TestRenderSql:
+    def test_render_sql_string_verbatim(self):
+        sql = "SELECT * FROM t WHERE id IN ({{ ids }})"
+        assert render_sql(sql, {"ids": "'1','2'"}) == (
+            "SELECT * FROM t WHERE id IN ('1','2')"
+        )
+
+    def test_render_sql_list_literals(self):
+        sql = "WHERE a IN ({{a}}) AND b IN ({{ b }}) AND d = {{ d }}"
+        result = render_sql(
+            sql,
+            {
+                "a": ["x", "O'Brien"],
+                "b": pl.Series([1, 2]),
+                "d": date(2024, 1, 1),
+            },
+        )
+        assert result == (
+            "WHERE a IN ('x','O''Brien') AND b IN (1,2) "
+            "AND d = DATE '2024-01-01'"
+        )
+
+    def test_render_sql_missing_param(self):
+        with pytest.raises(ValueError, match="blue_states"):
+            render_sql("{{ blue_states }}", {})
+
+
+class TestReadQuery:
+    @pytest.fixture
+    def fetch_calls(self, monkeypatch):
+        calls = []
+
+        def fake_stream_query(sql, conn):
+            calls.append(sql)
+            table = pa.table({"id": [1, 2, 3]})
+            return QueryStream(table.schema, table.to_batches())
+
+        monkeypatch.setattr("tq.query.stream_query", fake_stream_query)
+        return calls
+
+    @pytest.fixture
+    def conn(self):
+        return SimpleNamespace(catalog="hive", schema=None)
+
+    def test_read_query_caches_result(self, tmp_path, fetch_calls, conn):
+        cache = QueryCache(tmp_path)
+        sql = "SELECT * FROM t WHERE id IN ({{ ids }})"
+
+        first = read_query(sql, {"ids": [1, 2, 3]}, conn=conn, cache=cache)
+        second = read_query(sql, {"ids": [1, 2, 3]}, conn=conn, cache=cache)
+
+        assert fetch_calls == ["SELECT * FROM t WHERE id IN (1,2,3)"]
+        assert first.equals(second)
+
+    def test_read_query_records_provenance(self, tmp_path, fetch_calls, conn):
+        cache = QueryCache(tmp_path)
+        read_query("SELECT {{ x }}", {"x": "1"}, conn=conn, cache=cache)
+
+        (entry,) = tmp_path.glob("*.parquet")
+        metadata = cache.metadata(entry.stem)
+        assert metadata["sql"] == "SELECT 1"
+        assert metadata["params"] == {"x": "1"}
+        assert metadata["row_count"] == 3
+        assert "fetched_at" in metadata
+
+    def test_read_query_refresh(self, tmp_path, fetch_calls, conn):
+        cache = QueryCache(tmp_path)
+        read_query("SELECT 1", conn=conn, cache=cache)
+        read_query("SELECT 1", conn=conn, cache=cache, refresh=True)
+
+        assert len(fetch_calls) == 2
+
+    def test_read_query_no_cache(self, tmp_path, fetch_calls, conn):
+        read_query("SELECT 1", conn=conn, cache=False)
+        result = read_query("SELECT 1", conn=conn, cache=False)
+
+        assert result.height == 3
+        assert len(fetch_calls) == 2
+        assert list(tmp_path.iterdir()) == []
+
+    def test_read_query_lazy(self, tmp_path, fetch_calls, conn):
+        result = read_query(
+            "SELECT 1", conn=conn, cache=QueryCache(tmp_path), lazy=True
+        )
+        assert isinstance(result, pl.LazyFrame)
+        assert result.collect().height == 3
+
+    def test_read_query_hit_does_not_connect(
+        self, tmp_path, fetch_calls, monkeypatch
+    ):
+        def fail():
+            raise AssertionError("Should not connect on a cache hit")
+
+        monkeypatch.setattr(
+            "tq.query.get_trino_config", lambda: {"TQ_TRINO_CATALOG": "hive"}
+        )
+        monkeypatch.setattr("tq.query.pooled_connection", nullcontext)
+        cache = QueryCache(tmp_path)
+        read_query("SELECT 1", cache=cache)
+
+        monkeypatch.setattr("tq.query.pooled_connection", fail)
+        assert read_query("SELECT 1", cache=cache).height == 3
+        assert len(fetch_calls) == 1
+
+    @pytest.fixture
+    def estimates(self, monkeypatch):
+        estimates = []
+
+        def fake_estimate_query(sql, conn):
+            estimates.append(sql)
+            return QueryEstimate(
+                input_bytes=1e12,
+                input_rows=1e9,
+                output_bytes=3e9,
+                output_rows=1e7,
+            )
+
+        monkeypatch.setattr("tq.query.estimate_query", fake_estimate_query)
+        monkeypatch.setattr("tq.query.get_trino_config", lambda: {})
+        return estimates
+
+    def test_read_query_over_budget(
+        self, tmp_path, fetch_calls, estimates, conn
+    ):
+        with pytest.raises(ScanBudgetError):
+            read_query(
+                "SELECT 1",
+                conn=conn,
+                cache=QueryCache(tmp_path),
+                scan_budget="500GB",
+            )
+
+        assert estimates == ["SELECT 1"]
+        assert fetch_calls == []
+
+    def test_read_query_budget_from_env(
+        self, tmp_path, fetch_calls, estimates, conn, monkeypatch
+    ):
+        monkeypatch.setenv("TQ_SCAN_BUDGET", "2TB")
+        cache = QueryCache(tmp_path)
+        read_query("SELECT 1", conn=conn, cache=cache, estimate=True)
+        read_query("SELECT 1", conn=conn, cache=cache, estimate=True)
+
+        # Cache hits don't need an estimate
+        assert estimates == ["SELECT 1"]
+        assert fetch_calls == ["SELECT 1"]
+
+    def test_read_query_spills_large_eager_results(
+        self, tmp_path, fetch_calls, estimates, conn, monkeypatch
+    ):
+        monkeypatch.setattr(
+            "tq.query.get_cache_dir", lambda name: tmp_path / name
+        )
+        (tmp_path / "spill").mkdir()
+        spills = []
+        spill = tq.query._spill
+        monkeypatch.setattr(
+            "tq.query._spill",
+            lambda sql, conn: spills.append(sql) or spill(sql, conn),
+        )
+
+        monkeypatch.setenv("TQ_SPILL_BYTES", "1GB")
+        result = read_query("SELECT 1", conn=conn, cache=False, estimate=True)
+        assert isinstance(result, pl.DataFrame)
+        assert result.height == 3
+        assert spills == ["SELECT 1"]
+        # Eager results are read back and their spill file removed
+        assert not list((tmp_path / "spill").iterdir())
+
+        monkeypatch.setenv("TQ_SPILL_BYTES", "10GB")
+        read_query("SELECT 1", conn=conn, cache=False, estimate=True)
+        assert spills == ["SELECT 1"]
+
+    def test_read_query_lazy_without_cache_spills(
+        self, tmp_path, fetch_calls, conn, monkeypatch
+    ):
+        monkeypatch.setattr(
+            "tq.query.get_cache_dir", lambda name: tmp_path / name
+        )
+        (tmp_path / "spill").mkdir()
+        stale = tmp_path / "spill" / "stale.parquet"
+        stale.touch()
+        os.utime(stale, (0, 0))
+
+        result = read_query("SELECT 1", conn=conn, cache=False, lazy=True)
+        assert isinstance(result, pl.LazyFrame)
+        assert result.collect().height == 3
+
+        # The spill file stays until exit, stale ones from crashed runs go
+        (spilled,) = (tmp_path / "spill").iterdir()
+        assert spilled in tq.query._spill_paths
+        tq.query._remove_spill_files({spilled})
+        assert not spilled.exists()
+
+
+class TestRunQueries:
+    @pytest.fixture
+    def fake_trino(self, monkeypatch):
+        calls = []
+
+        def fake_stream_query(sql, conn):
+            calls.append(sql)
+            time.sleep(0.2)
+            if "fail" in sql:
+                raise RuntimeError("Query exceeded maximum time limit")
+            table = pa.table({"sql": [sql]})
+            return QueryStream(table.schema, table.to_batches())
+
+        monkeypatch.setattr("tq.query.stream_query", fake_stream_query)
+        monkeypatch.setattr("tq.query.pooled_connection", nullcontext)
+        monkeypatch.setattr(
+            "tq.query.get_trino_config", lambda: {"TQ_TRINO_CATALOG": "hive"}
+        )
+        return calls
+
+    def test_run_queries_parallel(self, tmp_path, fake_trino):
+        sql_file = tmp_path / "stoploss.sql"
+        sql_file.write_text("SELECT '{{ blue_payer_ids }}'")
+        queries = {
+            "blue_rates": "SELECT 'rates {{ blue_states }}'",
+            "blue_providers": "SELECT 'providers'",
+            "stoploss": sql_file,
+            "employers": (
+                "SELECT '{{ blue_payer_ids }}'",
+                {"blue_payer_ids": 2},
+            ),
+        }
+
+        start = time.perf_counter()
+        results = run_queries(
+            queries,
+            params={"blue_payer_ids": 1, "blue_states": "CA"},
+            max_concurrency=4,
+            cache=QueryCache(tmp_path / "cache"),
+        )
+        elapsed = time.perf_counter() - start
+
+        assert list(results) == list(queries)
+        assert results["blue_rates"]["sql"][0] == "SELECT 'rates CA'"
+        assert results["stoploss"]["sql"][0] == "SELECT '1'"
+        assert results["employers"]["sql"][0] == "SELECT '2'"
+        assert elapsed < 0.2 * len(queries)
+
+    def test_run_queries_progress(self, tmp_path, fake_trino, capsys):
+        queries = {"a": "SELECT 1", "b": "SELECT 2"}
+        run_queries(queries, cache=QueryCache(tmp_path))
+        err = capsys.readouterr().err
+        assert "[tq] Started query 'a'" in err
+        assert "[tq] Finished query 'b' in" in err
+        assert "[tq] Completed 2/2 queries" in err
+
+        run_queries(queries, cache=QueryCache(tmp_path), progress=False)
+        assert capsys.readouterr().err == ""
+
+    def test_run_queries_failure(self, tmp_path, fake_trino):
+        queries = {"ok": "SELECT 1", "bad": "SELECT fail"}
+
+        with pytest.raises(RuntimeError, match="'bad' failed"):
+            run_queries(queries, cache=QueryCache(tmp_path))
@@ -0,0 +1,211 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from tq.rates import Bound, OutlierPolicy, Prefer, select_canonical
+
+RATE_TYPES = ["case rate", "per diem", "fee schedule"]
+
+
+@pytest.fixture
+def rates():
+    rng = np.random.default_rng(0)
+    n = 2000
+    types = np.array([*RATE_TYPES, "other"], dtype=object)[
+        rng.integers(0, 4, n)
+    ]
+    types[rng.random(n) < 0.05] = None
+    score = rng.integers(0, 5, n).astype(float)
+    score[rng.random(n) < 0.05] = np.nan
+    return pl.DataFrame(
+        {
+            "provider_id": rng.integers(0, 50, n),
+            "billing_code": rng.choice(["a", "b", "c", None], n),
+            "final_rate_type": types.tolist(),
+            "score": score,
+            "amount": rng.integers(100, 120, n),
+            "row": np.arange(n),
+        }
+    ).with_columns(pl.col("score").fill_nan(None))
+
+
+KEYS = ["provider_id", "billing_code"]
+
+
+def sorted_unique(df, by, descending=False):
+    """Reference selection with a stable global sort."""
+    return (
+        df.sort(
+            by, descending=descending, nulls_last=True, maintain_order=True
+        )
+        .unique(KEYS, keep="first", maintain_order=True)
+        .sort("row")
+    )
+
+
+def test_prefer_values_matches_enum_sort(rates):
+    result = select_canonical(
+        rates, KEYS, [Prefer.values("final_rate_type", RATE_TYPES)]
+    )
+    ranked = rates.with_columns(
+        pl.col("final_rate_type")
+        .replace_strict(RATE_TYPES, [0, 1, 2], default=3)
+        .alias("rank")
+    ).with_columns(
+        pl.when(pl.col("final_rate_type").is_not_null()).then(pl.col("rank"))
+    )
+    expected = sorted_unique(ranked, "rank").drop("rank")
+    assert result.equals(expected)
+
+
+def test_multiple_rules(rates):
+    result = select_canonical(
+        rates,
+        KEYS,
+        [Prefer.max("score"), "amount"],
+        tiebreak="last",
+    )
+    # The last tied row in frame order wins
+    expected = sorted_unique(
+        rates, ["score", "amount", "row"], descending=[True, False, True]
+    )
+    assert result.equals(expected)
+
+
+def test_string_and_float_columns(rates):
+    result = select_canonical(rates, KEYS, ["final_rate_type", "score"])
+    expected = sorted_unique(rates, ["final_rate_type", "score"])
+    assert result.equals(expected)
+
+
+def test_no_rules_keeps_first_row(rates):
+    result = select_canonical(rates, KEYS)
+    assert result.equals(rates.unique(KEYS, keep="first", maintain_order=True))
+
+
+def test_tiebreak_all():
+    df = pl.DataFrame({"key": [1, 1, 1, 2, 2], "score": [3, 5, 5, None, None]})
+    result = select_canonical(df, "key", [Prefer.max("score")], "all")
+    assert result.to_dict(as_series=False) == {
+        "key": [1, 1, 2, 2],
+        "score": [5, 5, None, None],
+    }
+
+
+def test_wide_ranks_are_packed(rates):
+    # Integer ranges too wide for the available bits are dense ranked, and
+    # rules that don't fit alongside the row position are merged first
+    rng = np.random.default_rng(1)
+    wide = rates.with_columns(
+        (pl.col("amount").cast(pl.Int64) * 2**40).alias("amount"),
+        *[
+            pl.Series(f"x{i}", rng.integers(0, 1500, rates.height) / 7)
+            for i in range(5)
+        ],
+    )
+    rules = ["amount", *[Prefer.max(f"x{i}") for i in range(5)]]
+    result = select_canonical(wide, KEYS, rules)
+    expected = sorted_unique(
+        wide,
+        ["amount", *[f"x{i}" for i in range(5)]],
+        descending=[False, *[True] * 5],
+    )
+    assert result.equals(expected)
+
+
+def test_empty_frame():
+    df = pl.DataFrame(schema={"key": pl.Int64, "score": pl.Float64})
+    assert select_canonical(df, "key", ["score"]).is_empty()
+
+
+def test_invalid_tiebreak(rates):
+    with pytest.raises(ValueError, match="tiebreak"):
+        select_canonical(rates, KEYS, tiebreak="random")
+
+
+@pytest.fixture
+def policy():
+    return OutlierPolicy(
+        [
+            Bound("final_rate_amount", 3000, 500_000),
+            Bound.ratio(
+                "final_rate_amount",
+                "medicare_rate",
+                0.6,
+                10,
+                keep_missing=True,
+            ),
+        ]
+    )
+
+
+class TestOutlierPolicy:
+    def test_to_sql(self, policy):
+        assert policy.to_sql("hr") == (
+            "((hr.final_rate_amount BETWEEN 3000 AND 500000)\n"
+            "    AND (CAST(hr.final_rate_amount AS DOUBLE)"
+            " / NULLIF(hr.medicare_rate, 0) IS NULL"
+            " OR CAST(hr.final_rate_amount AS DOUBLE)"
+            " / NULLIF(hr.medicare_rate, 0) BETWEEN 0.6 AND 10))"
+        )
+
+    def test_one_sided_bounds_and_quoting(self):
+        policy = OutlierPolicy(
+            [Bound("Rate %", lower=0.5), Bound("rate", upper=100)]
+        )
+        assert policy.to_sql() == '(("Rate %" >= 0.5)\n    AND (rate <= 100))'
+
+    def test_expr_matches_sql(self, policy):
+        rng = np.random.default_rng(0)
+        n = 1000
+        amount = rng.uniform(0, 600_000, n)
+        medicare = rng.uniform(0, 60_000, n)
+        medicare[rng.random(n) < 0.1] = 0
+        df = pl.DataFrame(
+            {"final_rate_amount": amount, "medicare_rate": medicare}
+        ).with_columns(
+            pl.when(pl.int_range(pl.len()) % 7 == 0)
+            .then(None)
+            .otherwise(pl.col(c))
+            .alias(c)
+            for c in ["final_rate_amount", "medicare_rate"]
+        )
+        expected = df.filter(policy.expr())
+        sql = f"SELECT * FROM df WHERE {policy.to_sql()}"
+        assert pl.SQLContext(df=df).execute(sql, eager=True).equals(expected)
+        assert 0 < expected.height < n
+        # Zero or missing Medicare rates don't count against a rate
+        kept = expected.filter(
+            pl.col("medicare_rate").is_null() | (pl.col("medicare_rate") == 0)
+        )
+        assert kept.height > 0
+
+    def test_nan_and_null(self):
+        df = pl.DataFrame({"x": [1.0, float("nan"), None, 20.0]})
+        policy = OutlierPolicy([Bound("x", lower=0)])
+        assert df.filter(policy.expr())["x"].to_list() == [1.0, 20.0]
+        keep = OutlierPolicy([Bound("x", lower=0, keep_missing=True)])
+        assert df.filter(keep.expr())["x"].to_list() == [1.0, None, 20.0]
+
+    def test_decimal_columns(self, policy):
+        # Trino DECIMAL rates arrive as Polars Decimals
+        df = pl.DataFrame(
+            {
+                "final_rate_amount": ["5000.00", "100.00", "9000.00"],
+                "medicare_rate": ["1000.00", "50.00", None],
+            }
+        ).cast(pl.Decimal(12, 2))
+        result = df.filter(policy.expr())
+        assert result["final_rate_amount"].cast(pl.Float64).to_list() == [
+            5000.0,
+            9000.0,
+        ]
+
+    def test_empty_policy(self, rates):
+        policy = OutlierPolicy([])
+        assert policy.to_sql() == "TRUE"
+        assert rates.filter(policy.expr()).height == rates.height
+
+    def test_bound_requires_a_limit(self):
+        with pytest.raises(ValueError, match="no bounds"):
+            Bound("rate")
@@ -0,0 +1,115 @@
+import re
+import zipfile
+from datetime import date, datetime
+
+import polars as pl
+import pytest
+
+from tq.reports import column_widths, write_workbook
+
+
+def sheet_xml(path, index):
+    with zipfile.ZipFile(path) as archive:
+        return archive.read(f"xl/worksheets/sheet{index}.xml").decode()
+
+
+@pytest.fixture
+def counts():
+    return pl.DataFrame(
+        {
+            "Provider Name": ["General Hospital", "St. Elsewhere", None],
+            "Codes w Rate": [10, 20, 30],
+            "Percent Coverage": [0.5, 0.25, float("nan")],
+            "Updated": [date(2025, 1, 1), date(2025, 2, 1), None],
+        }
+    )
+
+
+class TestColumnWidths:
+    def test_fits_header_and_values(self, counts):
+        assert column_widths(counts) == [18, 14, 18, 12]
+        assert column_widths(counts, max_width=10) == [12, 12, 12, 12]
+        assert column_widths(pl.DataFrame()) == []
+
+
+class TestWriteWorkbook:
+    def test_round_trip(self, counts, tmp_path):
+        path = write_workbook(tmp_path / "out/report.xlsx", {"Counts": counts})
+        result = pl.read_excel(path, sheet_name="Counts")
+        assert result.columns == counts.columns
+        assert (
+            result["Provider Name"].to_list()
+            == counts["Provider Name"].to_list()
+        )
+        assert result["Codes w Rate"].to_list() == [10, 20, 30]
+        assert result["Updated"].cast(pl.Date).to_list() == [
+            date(2025, 1, 1),
+            date(2025, 2, 1),
+            None,
+        ]
+
+    def test_column_formats(self, counts, tmp_path):
+        path = write_workbook(
+            tmp_path / "report.xlsx",
+            {"Counts": counts},
+            formats={"Percent Coverage": "percent", "Codes w Rate": "0"},
+        )
+        with zipfile.ZipFile(path) as archive:
+            styles = archive.read("xl/styles.xml").decode()
+        assert 'formatCode="0.0%"' in styles
+        assert "<b/>" in styles
+
+        xml = sheet_xml(path, 1)
+        cols = re.findall(r'<col min="(\d+)"[^>]*width="([\d.]+)"[^>]*/>', xml)
+        assert [int(c) for c, _ in cols] == [1, 2, 3, 4]
+        # Body cells inherit their column's format, so each formatted column's
+        # cells carry a style without any per-cell formatting work
+        percent_cells = re.findall(r'<c r="C[2-3]" s="(\d+)"', xml)
+        assert len(set(percent_cells)) == 1
+
+    def test_splits_long_sheets(self, tmp_path):
+        df = pl.DataFrame({"id": range(10)})
+        path = write_workbook(
+            tmp_path / "report.xlsx",
+            {"A very long sheet name over thirty-one chars": df},
+            max_rows=4,
+        )
+        sheets = pl.read_excel(path, sheet_id=0)
+        assert list(sheets) == [
+            f"A very long sheet name over ({i})" for i in (1, 2, 3, 4)
+        ]
+        assert pl.concat(sheets.values())["id"].to_list() == list(range(10))
+
+    def test_sheet_names_are_sanitized_and_unique(self, tmp_path):
+        df = pl.DataFrame({"id": [1]})
+        long_name = "Counts by Payer-Provider and Code"
+        path = write_workbook(
+            tmp_path / "report.xlsx",
+            {
+                "Rates [2025]: A/B?": df,
+                long_name: df,
+                long_name + " (copy)": df,
+                "counts by payer-provider and co": df,
+            },
+        )
+        assert list(pl.read_excel(path, sheet_id=0)) == [
+            "Rates _2025__ A_B_",
+            "Counts by Payer-Provider and Co",
+            "Counts by Payer-Provider and ~2",
+            "counts by payer-provider and ~3",
+        ]
+
+    def test_timezones_and_binary(self, tmp_path):
+        df = pl.DataFrame(
+            {
+                "Fetched": [datetime(2025, 1, 1, 12), None],
+                "Hash": [None, b"\x01\xab"],
+            }
+        ).with_columns(
+            pl.col("Fetched").dt.replace_time_zone("America/Chicago")
+        )
+        path = write_workbook(tmp_path / "report.xlsx", {"Sheet": df})
+        result = pl.read_excel(path)
+        # Local wall time, without the zone
+        assert result["Fetched"].to_list() == [datetime(2025, 1, 1, 12), None]
+        assert result["Hash"].to_list() == [None, "01ab"]
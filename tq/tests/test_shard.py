@@ -0,0 +1,199 @@
+from contextlib import nullcontext
+
+import polars as pl
+import pyarrow as pa
+import pytest
+
+from tq.shard import (
+    Shard,
+    ShardError,
+    consolidate_shards,
+    run_sharded,
+    shards_by_range,
+    shards_by_values,
+    unify_schemas,
+)
+from tq.stream import QueryStream
+
+TEMPLATE = "SELECT * FROM rates WHERE year = {{ year }} AND {{ shard_filter }}"
+
+
+class TestShardSpecs:
+    def test_shards_by_values(self):
+        shards = shards_by_values("state", ["CA", "NY", None])
+
+        assert shards == [
+            Shard("state=CA", "state = 'CA'"),
+            Shard("state=NY", "state = 'NY'"),
+            Shard("state=None", "state IS NULL"),
+        ]
+
+    def test_shards_by_range_covers_all_values(self):
+        shards = shards_by_range("billing_code", ["1000", "5000"])
+
+        assert [s.predicate for s in shards] == [
+            "billing_code < '1000'",
+            "billing_code >= '1000' AND billing_code < '5000'",
+            "billing_code >= '5000'",
+            "billing_code IS NULL",
+        ]
+        assert len({s.name for s in shards}) == 4
+
+    def test_shards_by_range_unsorted(self):
+        with pytest.raises(ValueError, match="sorted"):
+            shards_by_range("payer_id", [5, 1])
+
+    def test_shards_by_range_empty(self):
+        with pytest.raises(ValueError, match="range bound"):
+            shards_by_range("payer_id", [])
+
+
+class TestRunSharded:
+    @pytest.fixture
+    def failures(self):
+        return {}
+
+    @pytest.fixture
+    def executed(self, monkeypatch, failures):
+        executed = []
+
+        def fake_stream_query(sql, conn):
+            executed.append(sql)
+            state = sql.split("'")[-2]
+            if failures.get(state, 0) > 0:
+                failures[state] -= 1
+                raise RuntimeError(f"{state} failed")
+            table = pa.table({"state": [state, state], "rate": [1.0, 2.0]})
+            return QueryStream(table.schema, table.to_batches())
+
+        monkeypatch.setattr("tq.shard.stream_query", fake_stream_query)
+        monkeypatch.setattr(
+            "tq.shard.pooled_connection", lambda: nullcontext(object())
+        )
+        return executed
+
+    @pytest.fixture
+    def shards(self):
+        return shards_by_values("state", ["CA", "NY", "TX"])
+
+    def test_run_sharded_concatenates_in_order(
+        self, tmp_path, executed, shards
+    ):
+        result = run_sharded(TEMPLATE, shards, tmp_path, params={"year": 2024})
+
+        assert isinstance(result, pl.LazyFrame)
+        assert result.collect()["state"].to_list() == [
+            "CA",
+            "CA",
+            "NY",
+            "NY",
+            "TX",
+            "TX",
+        ]
+        assert sorted(executed) == [
+            f"SELECT * FROM rates WHERE year = 2024 AND state = '{s}'"
+            for s in ["CA", "NY", "TX"]
+        ]
+
+    def test_run_sharded_retries_failed_shard(
+        self, tmp_path, executed, failures, shards
+    ):
+        failures["NY"] = 1
+
+        result = run_sharded(
+            TEMPLATE, shards, tmp_path, params={"year": 2024}, backoff=0
+        )
+
+        assert result.collect().height == 6
+        assert sum("'NY'" in sql for sql in executed) == 2
+
+    def test_rerun_only_executes_missing_shards(
+        self, tmp_path, executed, failures, shards
+    ):
+        failures["TX"] = 10
+
+        with pytest.raises(ShardError, match="state=TX") as exc_info:
+            run_sharded(
+                TEMPLATE,
+                shards,
+                tmp_path,
+                params={"year": 2024},
+                retries=1,
+                backoff=0,
+            )
+        assert set(exc_info.value.failed) == {"state=TX"}
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "state=CA.parquet",
+            "state=NY.parquet",
+        ]
+
+        executed.clear()
+        failures.clear()
+        result = run_sharded(TEMPLATE, shards, tmp_path, params={"year": 2024})
+
+        assert executed == [
+            "SELECT * FROM rates WHERE year = 2024 AND state = 'TX'"
+        ]
+        assert result.collect().height == 6
+
+    def test_changed_sql_invalidates_checkpoints(
+        self, tmp_path, executed, shards
+    ):
+        run_sharded(TEMPLATE, shards, tmp_path, params={"year": 2024})
+        executed.clear()
+
+        run_sharded(TEMPLATE, shards, tmp_path, params={"year": 2025})
+
+        assert len(executed) == 3
+
+    def test_run_sharded_requires_placeholder(self, tmp_path, shards):
+        with pytest.raises(ValueError, match="shard_filter"):
+            run_sharded("SELECT 1", shards, tmp_path)
+
+    def test_run_sharded_unique_names(self, tmp_path):
+        shards = [Shard("a", "x = 1"), Shard("a", "x = 2")]
+        with pytest.raises(ValueError, match="unique"):
+            run_sharded(TEMPLATE, shards, tmp_path)
+
+
+class TestConsolidateShards:
+    @pytest.fixture
+    def shards(self, tmp_path):
+        frames = [
+            pl.DataFrame({"npi": ["1", "2"], "count": [1, 2]}),
+            # Different column order, a wider type and an extra column
+            pl.DataFrame({"extra": [True], "count": [1.5], "npi": ["2"]}),
+            pl.DataFrame({"npi": ["3"], "count": ["many"]}),
+        ]
+        paths = []
+        for i, df in enumerate(frames):
+            paths.append(tmp_path / f"shard_{i}.parquet")
+            df.write_parquet(paths[-1])
+        return paths
+
+    def test_unify_schemas(self, shards):
+        assert unify_schemas(shards[:2]) == pl.Schema(
+            {"npi": pl.String, "count": pl.Float64, "extra": pl.Boolean}
+        )
+        # No numeric supertype with strings, fall back to String
+        assert unify_schemas(shards)["count"] == pl.String
+
+    def test_consolidate_shards(self, shards, tmp_path):
+        output = tmp_path / "out/combined.parquet"
+        unique_csv = tmp_path / "out/npis.csv"
+        result = consolidate_shards(
+            shards[:2], output, unique={unique_csv: ["npi"]}
+        ).collect()
+
+        assert result.rows() == [
+            ("1", 1.0, None),
+            ("2", 2.0, None),
+            ("2", 1.5, True),
+        ]
+        npis = pl.read_csv(unique_csv, schema={"npi": pl.String})
+        assert sorted(npis["npi"]) == ["1", "2"]
+        assert not list(output.parent.glob("*.tmp"))
+
+    def test_consolidate_no_shards(self, tmp_path):
+        with pytest.raises(ValueError, match="No shards"):
+            consolidate_shards([], tmp_path / "out.parquet")
@@ -0,0 +1,132 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from tq.spatial import SpatialIndex, haversine
+
+
+@pytest.fixture
+def providers():
+    rng = np.random.default_rng(0)
+    n = 500
+    return pl.DataFrame(
+        {
+            "provider_id": [f"p{i}" for i in range(n)],
+            "lat": rng.uniform(25, 49, n),
+            "lon": rng.uniform(-124, -67, n),
+        }
+    )
+
+
+@pytest.fixture
+def queries():
+    rng = np.random.default_rng(1)
+    return rng.uniform(25, 49, 50), rng.uniform(-124, -67, 50)
+
+
+@pytest.fixture
+def index(providers):
+    return SpatialIndex.from_frame(providers, id="provider_id")
+
+
+def brute_force(providers, lat, lon):
+    """Distances from every query point to every provider, in meters."""
+    return haversine(
+        lat[:, None], lon[:, None], providers["lat"], providers["lon"]
+    )
+
+
+def test_haversine_known_distance():
+    # Chicago to New York, ~1,145 km
+    distance = haversine(41.8781, -87.6298, 40.7128, -74.0060)
+    assert distance == pytest.approx(1_145_000, rel=0.01)
+
+
+class TestSpatialIndex:
+    def test_nearest_matches_brute_force(self, index, providers, queries):
+        lat, lon = queries
+        result = index.nearest(lat, lon, k=3)
+        assert result.columns == ["query", "id", "distance_m", "rank"]
+        assert result.height == 150
+
+        distances = brute_force(providers, lat, lon)
+        expected = np.argsort(distances, axis=1)[:, :3]
+        ids = providers["provider_id"].to_numpy()
+        assert result["id"].to_list() == ids[expected].ravel().tolist()
+        np.testing.assert_allclose(
+            result["distance_m"],
+            np.take_along_axis(distances, expected, axis=1).ravel(),
+            rtol=1e-9,
+        )
+        assert result["rank"].to_list() == [1, 2, 3] * 50
+
+    def test_nearest_max_distance(self, index, providers, queries):
+        lat, lon = queries
+        result = index.nearest(lat, lon, k=10, max_distance=100_000)
+        assert result["distance_m"].max() <= 100_000
+        expected = np.minimum(
+            (brute_force(providers, lat, lon) <= 100_000).sum(1), 10
+        )
+        counts = result.group_by("query").len()
+        assert counts["len"].sum() == expected.sum()
+
+    def test_nearest_k_larger_than_index(self):
+        index = SpatialIndex(pl.Series(["a", "b"]), [0, 1], [0, 1])
+        result = index.nearest([0.1], [0.1], k=5)
+        assert result["id"].to_list() == ["a", "b"]
+
+    def test_within_matches_brute_force(self, index, providers, queries):
+        lat, lon = queries
+        result = index.within(lat, lon, radius=150_000)
+        distances = brute_force(providers, lat, lon)
+        query, match = np.nonzero(distances <= 150_000)
+        assert result.height == len(query)
+        expected = pl.DataFrame(
+            {
+                "query": query,
+                "id": providers["provider_id"].gather(match),
+                "distance_m": distances[query, match],
+            }
+        ).sort("query", "distance_m")
+        assert result["id"].to_list() == expected["id"].to_list()
+        np.testing.assert_allclose(
+            result["distance_m"], expected["distance_m"], rtol=1e-9
+        )
+
+    def test_within_batches(self, index, queries, monkeypatch):
+        lat, lon = queries
+        expected = index.within(lat, lon, radius=200_000)
+        monkeypatch.setattr("tq.spatial._BATCH_SIZE", 7)
+        assert index.within(lat, lon, radius=200_000).equals(expected)
+
+    def test_within_no_matches(self, index):
+        result = index.within([0.0], [0.0], radius=1_000)
+        assert result.height == 0
+        assert result.columns == ["query", "id", "distance_m"]
+
+    def test_antimeridian(self):
+        index = SpatialIndex(pl.Series(["east", "west"]), [0, 0], [179.9, 10])
+        result = index.nearest([0], [-179.9], k=1)
+        assert result["id"].to_list() == ["east"]
+        assert result["distance_m"][0] == pytest.approx(22_239, rel=1e-3)
+
+    def test_from_frame_drops_missing(self):
+        df = pl.DataFrame(
+            {"id": [1, 2, 3], "lat": [1.0, None, 3.0], "lon": [1.0, 2.0, 3.0]}
+        )
+        assert len(SpatialIndex.from_frame(df)) == 2
+
+    def test_save_and_load(self, index, queries, tmp_path):
+        lat, lon = queries
+        path = index.save(tmp_path / "providers.parquet")
+        loaded = SpatialIndex.load(path)
+        assert repr(loaded) == "SpatialIndex(500 points)"
+        assert loaded.nearest(lat, lon, k=2).equals(
+            index.nearest(lat, lon, k=2)
+        )
+
+    def test_load_rejects_other_files(self, providers, tmp_path):
+        path = tmp_path / "providers.parquet"
+        providers.write_parquet(path)
+        with pytest.raises(ValueError, match="not a saved"):
+            SpatialIndex.load(path)
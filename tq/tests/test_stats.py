@@ -0,0 +1,138 @@
+import pyarrow as pa
+import pytest
+
+from tq.cli import main
+from tq.stats import (
+    QueryRecord,
+    fingerprint_sql,
+    load_stats,
+    record_query,
+    summarize_stats,
+)
+from tq.stream import FetchStats, QueryStream, stream_query
+
+SERVER_STATS = {
+    "queryId": "20250101_000000_00001_abcde",
+    "state": "FINISHED",
+    "elapsedTimeMillis": 1500,
+    "queuedTimeMillis": 10,
+    "cpuTimeMillis": 4000,
+    "processedRows": 1000,
+    "processedBytes": 2_000_000,
+    "peakMemoryBytes": 50_000,
+    "totalSplits": 12,
+}
+
+
+@pytest.fixture
+def stats_log(tmp_path, monkeypatch):
+    log = tmp_path / "stats.jsonl"
+    monkeypatch.setenv("TQ_STATS_LOG", str(log))
+    monkeypatch.setattr("tq.stats.current_project", lambda: "projects/test")
+    return log
+
+
+class TestFingerprintSql:
+    def test_fingerprint_ignores_literals_and_formatting(self):
+        first = fingerprint_sql(
+            "SELECT * FROM t -- comment\nWHERE id IN ('1','2') AND x > 10"
+        )
+        second = fingerprint_sql(
+            "select *\n  from t where id in ( 'a', 'b', 'c' ) and x > 2.5"
+        )
+        assert first == second
+
+    def test_fingerprint_differs_by_structure(self):
+        assert fingerprint_sql("SELECT a FROM t") != fingerprint_sql(
+            "SELECT b FROM t"
+        )
+
+
+class TestQueryRecord:
+    def test_from_query(self, stats_log):
+        client = FetchStats(rows=10, seconds=2.0, first_row_seconds=0.5)
+        record = QueryRecord.from_query("SELECT 1", None, SERVER_STATS, client)
+
+        assert record.query_id == SERVER_STATS["queryId"]
+        assert record.cpu_ms == 4000
+        assert record.processed_bytes == 2_000_000
+        assert record.rows_per_sec == 5.0
+        assert record.project == "projects/test"
+
+    def test_record_and_load(self, stats_log):
+        for sql in ["SELECT 1", "SELECT 2", "SELECT a FROM t"]:
+            record_query(QueryRecord.from_query(sql, None, SERVER_STATS))
+
+        stats = load_stats()
+        assert stats.height == 3
+        assert stats["cpu_ms"].to_list() == [4000] * 3
+
+        summary = summarize_stats(stats)
+        assert summary.height == 2
+        assert summary["runs"].to_list() == [2, 1]
+        assert summary["cpu_ms"].to_list() == [8000, 4000]
+
+        by_project = summarize_stats(stats, by="project")
+        assert by_project["queries"].to_list() == [2]
+
+    def test_load_missing_log(self, stats_log):
+        assert load_stats().is_empty()
+
+
+class FakeCursor:
+    query_id = SERVER_STATS["queryId"]
+    stats = SERVER_STATS
+    description = [("id", "bigint")]
+
+    def __init__(self):
+        self.rows = [[1], [2]]
+
+    def execute(self, sql):
+        pass
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows, []
+        return rows
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+
+class TestStreamStats:
+    def test_stream_query_records_stats(self, stats_log):
+        list(stream_query("SELECT id FROM t", FakeConnection()))
+
+        stats = load_stats()
+        assert stats["query_id"].to_list() == [SERVER_STATS["queryId"]]
+        assert stats["rows"].to_list() == [2]
+        assert stats["first_row_seconds"][0] is not None
+
+    def test_stream_query_without_stats(self, stats_log):
+        stream = stream_query(
+            "SELECT id FROM t", FakeConnection(), record_stats=False
+        )
+        list(stream)
+        assert not stats_log.exists()
+
+    def test_on_complete_called_once_exhausted(self):
+        table = pa.table({"id": [1, 2]})
+        stream = QueryStream(table.schema, table.to_batches())
+        seen = []
+        stream.on_complete.append(seen.append)
+
+        stream.read_all()
+        assert seen == [stream.stats]
+
+
+class TestStatsCli:
+    def test_cli_stats(self, stats_log, capsys):
+        record_query(QueryRecord.from_query("SELECT 1", None, SERVER_STATS))
+        main(["stats", "--by", "project"])
+
+        assert "projects/test" in capsys.readouterr().out
+
+    def test_cli_stats_empty(self, stats_log, capsys):
+        main(["stats"])
+        assert "No queries recorded" in capsys.readouterr().out
@@ -0,0 +1,159 @@
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from tq.cache import read_metadata
+from tq.stream import (
+    rows_to_batch,
+    schema_from_description,
+    stream_query,
+    trino_type_to_arrow,
+)
+
+
+class FakeCursor:
+    def __init__(self, description, rows):
+        self.description = None
+        self._description = description
+        self._rows = rows
+        self.fetch_sizes = []
+
+    def execute(self, sql):
+        self.description = self._description
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class FakeConnection:
+    def __init__(self, description, rows):
+        self.cursor_obj = FakeCursor(description, rows)
+
+    def cursor(self):
+        return self.cursor_obj
+
+
+DESCRIPTION = [
+    ("provider_id", "bigint"),
+    ("billing_code", "varchar(7)"),
+    ("canonical_rate", "decimal(12,2)"),
+    ("fetched", "timestamp(3)"),
+]
+
+
+def make_rows(n):
+    return [
+        [i, f"{i:05d}", Decimal("10.50"), datetime(2025, 1, 1)]
+        for i in range(n)
+    ]
+
+
+class TestTrinoTypeToArrow:
+    @pytest.mark.parametrize(
+        "type_str,expected",
+        [
+            ("bigint", pa.int64()),
+            ("varchar(10)", pa.string()),
+            ("varchar", pa.string()),
+            ("decimal(10,2)", pa.decimal128(10, 2)),
+            ("date", pa.date32()),
+            ("timestamp(3)", pa.timestamp("us")),
+            ("timestamp(6) with time zone", pa.timestamp("us", tz="UTC")),
+            ("array(varchar)", pa.list_(pa.string())),
+            ("map(varchar, double)", pa.map_(pa.string(), pa.float64())),
+            (
+                "row(code varchar, rates array(decimal(5,2)))",
+                pa.struct(
+                    [
+                        ("code", pa.string()),
+                        ("rates", pa.list_(pa.decimal128(5, 2))),
+                    ]
+                ),
+            ),
+            ("uuid", pa.string()),
+        ],
+    )
+    def test_trino_type_to_arrow(self, type_str, expected):
+        assert trino_type_to_arrow(type_str) == expected
+
+
+class TestRowsToBatch:
+    def test_rows_to_batch(self):
+        schema = schema_from_description(
+            [("id", "integer"), ("day", "date"), ("tags", "array(varchar)")]
+        )
+        batch = rows_to_batch(
+            [[1, date(2025, 1, 1), ["a"]], [None, None, None]], schema
+        )
+
+        assert batch.num_rows == 2
+        assert batch.schema == schema
+        assert batch.column(0).to_pylist() == [1, None]
+
+    def test_rows_to_batch_stringifies_objects(self):
+        schema = schema_from_description([("id", "uuid")])
+        value = UUID(int=1)
+        batch = rows_to_batch([[value]], schema)
+
+        assert batch.column(0).to_pylist() == [str(value)]
+
+    def test_rows_to_batch_empty(self):
+        schema = schema_from_description(DESCRIPTION)
+        assert rows_to_batch([], schema).num_rows == 0
+
+
+class TestStreamQuery:
+    def test_stream_query_bounded_batches(self):
+        conn = FakeConnection(DESCRIPTION, make_rows(25))
+        stream = stream_query("SELECT 1", conn, batch_size=10)
+        batches = list(stream)
+
+        assert [b.num_rows for b in batches] == [10, 10, 5]
+        assert stream.stats.rows == 25
+        assert stream.stats.batches == 3
+        assert stream.stats.first_row_seconds is not None
+        assert stream.stats.rows_per_sec > 0
+
+    def test_stream_query_read_all(self):
+        conn = FakeConnection(DESCRIPTION, make_rows(5))
+        table = stream_query("SELECT 1", conn, batch_size=2).read_all()
+
+        assert table.num_rows == 5
+        assert table.schema.field("canonical_rate").type == (
+            pa.decimal128(12, 2)
+        )
+
+    def test_stream_query_to_parquet(self, tmp_path):
+        conn = FakeConnection(DESCRIPTION, make_rows(25))
+        path = tmp_path / "rates.parquet"
+        stats = stream_query("SELECT 1", conn, batch_size=10).to_parquet(
+            path, metadata={"sql": "SELECT 1"}
+        )
+
+        assert stats.rows == 25
+        assert pq.read_table(path).num_rows == 25
+        assert read_metadata(path) == {"sql": "SELECT 1", "row_count": 25}
+        assert list(tmp_path.iterdir()) == [path]
+
+    def test_stream_query_to_parquet_empty(self, tmp_path):
+        conn = FakeConnection(DESCRIPTION, [])
+        path = tmp_path / "rates.parquet"
+        stream_query("SELECT 1", conn).to_parquet(path)
+
+        table = pq.read_table(path)
+        assert table.num_rows == 0
+        assert table.column_names == [d[0] for d in DESCRIPTION]
+
+    def test_stream_query_to_parquet_failure_cleans_up(self, tmp_path):
+        conn = FakeConnection(DESCRIPTION, [[1, "a", "not a decimal", None]])
+        path = tmp_path / "rates.parquet"
+
+        with pytest.raises((pa.ArrowInvalid, pa.ArrowTypeError)):
+            stream_query("SELECT 1", conn).to_parquet(path)
+        assert list(tmp_path.iterdir()) == []
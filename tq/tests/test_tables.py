@@ -0,0 +1,167 @@
+import gc
+from datetime import date, datetime
+from decimal import Decimal
+
+import polars as pl
+import pytest
+
+from tq.query import render_sql
+from tq.tables import (
+    content_addressed_sql,
+    register_frame,
+    trino_type,
+    values_rows,
+)
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, sql):
+        self.statements.append(sql)
+
+    def fetchall(self):
+        return []
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+
+@pytest.fixture
+def eins_df():
+    return pl.DataFrame({"ein": ["751837454", "O'Brien"], "n": [1, None]})
+
+
+class TestTrinoType:
+    @pytest.mark.parametrize(
+        "dtype,expected",
+        [
+            (pl.Int64, "BIGINT"),
+            (pl.UInt32, "BIGINT"),
+            (pl.Float64, "DOUBLE"),
+            (pl.String, "VARCHAR"),
+            (pl.Decimal(12, 2), "DECIMAL(12, 2)"),
+            (pl.Datetime("us"), "TIMESTAMP(6)"),
+            (pl.Datetime("us", "UTC"), "TIMESTAMP(6) WITH TIME ZONE"),
+        ],
+    )
+    def test_trino_type(self, dtype, expected):
+        assert trino_type(dtype) == expected
+
+    def test_trino_type_unsupported(self):
+        with pytest.raises(TypeError):
+            trino_type(pl.List(pl.String))
+
+
+class TestValuesRows:
+    def test_values_rows(self):
+        df = pl.DataFrame(
+            {
+                "code": ["99213", "O'Brien", None],
+                "rate": [1.5, float("nan"), None],
+                "flag": [True, False, None],
+                "day": [date(2025, 1, 2), None, None],
+                "ts": [datetime(2025, 1, 2, 3, 4, 5), None, None],
+                "amt": [Decimal("1.50"), None, None],
+            },
+            schema_overrides={"amt": pl.Decimal(5, 2)},
+        )
+        assert values_rows(df).to_list() == [
+            "('99213',1.5,TRUE,DATE '2025-01-02',"
+            "TIMESTAMP '2025-01-02 03:04:05.000000',DECIMAL '1.50')",
+            "('O''Brien',nan(),FALSE,NULL,NULL,NULL)",
+            "(NULL,NULL,NULL,NULL,NULL,NULL)",
+        ]
+
+
+class TestRegisterFrame:
+    def test_register_frame_creates_and_loads(self, eins_df):
+        conn = FakeConnection()
+        table = register_frame(
+            eins_df, "bswh_eins", conn=conn, catalog="memory", schema="tmp"
+        )
+
+        assert table.startswith("memory.tmp.tq_bswh_eins_")
+        create, insert = conn.statements
+        assert create == f'CREATE TABLE {table} ("ein" VARCHAR, "n" BIGINT)'
+        assert insert == (
+            f"INSERT INTO {table} VALUES ('751837454',1),('O''Brien',NULL)"
+        )
+        table.drop()
+
+    def test_register_frame_names_are_unique(self, eins_df):
+        conn = FakeConnection()
+        kwargs = {"conn": conn, "catalog": "memory", "schema": "tmp"}
+        first = register_frame(eins_df, "eins", **kwargs)
+        second = register_frame(eins_df.clone(), "eins", **kwargs)
+        third = register_frame(eins_df.head(1), "eins", **kwargs)
+
+        # Each registration has its own table, so dropping one leaves the
+        # other intact
+        assert first != second
+        first.drop()
+        assert not any(
+            s == f"DROP TABLE IF EXISTS {second}" for s in conn.statements
+        )
+
+        # Cache keys see the same name for the same contents
+        assert first.content_name == second.content_name
+        assert first.content_name != third.content_name
+        sql = f"SELECT * FROM {second} JOIN {third} USING (ein)"
+        assert content_addressed_sql(sql) == (
+            f"SELECT * FROM {second.content_name}"
+            f" JOIN {third.content_name} USING (ein)"
+        )
+
+    def test_register_frame_splits_inserts(self):
+        conn = FakeConnection()
+        df = pl.DataFrame({"npi": [f"{i:010d}" for i in range(1000)]})
+        register_frame(
+            df,
+            "npis",
+            conn=conn,
+            catalog="memory",
+            schema="tmp",
+            max_statement_chars=2000,
+        )
+
+        inserts = [s for s in conn.statements if s.startswith("INSERT")]
+        assert len(inserts) > 1
+        assert all(len(s) <= 2000 for s in inserts)
+        assert sum(s.count("(") for s in inserts) == 1000
+
+    def test_register_frame_drops_on_exit(self, eins_df):
+        conn = FakeConnection()
+        kwargs = {"conn": conn, "catalog": "memory", "schema": "tmp"}
+        with register_frame(eins_df, "eins", **kwargs) as table:
+            assert not table.dropped
+
+        assert table.dropped
+        assert conn.statements[-1] == f"DROP TABLE IF EXISTS {table}"
+
+        # Dropping is idempotent
+        n_statements = len(conn.statements)
+        table.drop()
+        assert len(conn.statements) == n_statements
+
+    def test_register_frame_drops_on_gc(self, eins_df):
+        conn = FakeConnection()
+        kwargs = {"conn": conn, "catalog": "memory", "schema": "tmp"}
+        name = str(register_frame(eins_df, "eins", **kwargs))
+        gc.collect()
+
+        assert conn.statements[-1] == f"DROP TABLE IF EXISTS {name}"
+
+    def test_register_frame_renders_in_templates(self, eins_df):
+        conn = FakeConnection()
+        kwargs = {"conn": conn, "catalog": "memory", "schema": "tmp"}
+        with register_frame(eins_df, "eins", **kwargs) as table:
+            sql = render_sql("JOIN {{ bswh_eins }} AS e", {"bswh_eins": table})
+
+        assert sql == f"JOIN {table} AS e"
@@ -0,0 +1,185 @@
+import json
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import tq.traveltimes
+from tq.traveltimes import (
+    TimesSlice,
+    get_times_dir,
+    is_synced,
+    read_times,
+    scan_times,
+    sync_times,
+)
+
+
+class FakeSource:
+    """In-memory travel times: every origin to every destination."""
+
+    def __init__(self, ids_by_state):
+        self.ids_by_state = ids_by_state
+        self.reads = []
+
+    def states(self, times_slice):
+        return sorted(self.ids_by_state)
+
+    def read(self, times_slice, state):
+        self.reads.append(state)
+        all_ids = sorted(i for ids in self.ids_by_state.values() for i in ids)
+        origins, destinations, durations = [], [], []
+        for origin in sorted(self.ids_by_state[state]):
+            for destination in all_ids:
+                origins.append(origin)
+                destinations.append(destination)
+                durations.append(abs(int(origin) - int(destination)) * 60)
+        table = pa.table(
+            {
+                "origin_id": origins,
+                "destination_id": destinations,
+                # Sources may return other numeric types
+                "duration_sec": pa.array(durations, pa.int64()),
+            }
+        )
+        yield from table.to_batches(max_chunksize=5)
+
+
+@pytest.fixture
+def source():
+    return FakeSource(
+        {
+            "17": [f"{17000 + i}" for i in range(10)],
+            "18": [f"{18000 + i}" for i in range(5)],
+        }
+    )
+
+
+@pytest.fixture
+def synced(source):
+    sync_times("car", 2024, "zcta", source=source)
+    return source
+
+
+class TestSyncTimes:
+    def test_writes_state_partitions(self, synced, isolated_cache_dir):
+        out_dir = get_times_dir(TimesSlice("car", 2024, "zcta"))
+        assert out_dir == (
+            isolated_cache_dir
+            / "traveltimes/version=0.0.1/mode=car/year=2024/geography=zcta"
+        )
+        files = sorted(
+            p.relative_to(out_dir) for p in out_dir.rglob("*.parquet")
+        )
+        assert [str(f) for f in files] == [
+            "origin_state=17/part-0.parquet",
+            "origin_state=18/part-0.parquet",
+        ]
+        manifest = json.loads((out_dir / "_manifest.json").read_text())
+        assert manifest["states"] == {"17": 150, "18": 75}
+
+    def test_typed_row_groups_with_statistics(self, synced, monkeypatch):
+        path = (
+            get_times_dir(TimesSlice("car", 2024, "zcta"))
+            / "origin_state=17/part-0.parquet"
+        )
+        metadata = pq.read_metadata(path)
+        assert pq.read_schema(path).field("duration_sec").type == pa.float64()
+        stats = metadata.row_group(0).column(0).statistics
+        assert stats.has_min_max
+        assert stats.min == "17000"
+
+    def test_row_groups_are_sized(self, source, monkeypatch):
+        monkeypatch.setattr(tq.traveltimes, "ROW_GROUP_SIZE", 40)
+        sync_times("car", 2024, "county", source=source, states=["17"])
+        path = (
+            get_times_dir(TimesSlice("car", 2024, "county"))
+            / "origin_state=17/part-0.parquet"
+        )
+        sizes = [
+            pq.read_metadata(path).row_group(i).num_rows
+            for i in range(pq.read_metadata(path).num_row_groups)
+        ]
+        assert sizes == [40, 40, 40, 30]
+
+    def test_skips_synced_slices(self, synced):
+        assert is_synced(TimesSlice("car", 2024, "zcta"))
+        sync_times("car", 2024, "zcta", source=synced)
+        assert sorted(synced.reads) == ["17", "18"]
+
+        sync_times("car", 2024, "zcta", source=synced, refresh=True)
+        assert sorted(synced.reads) == ["17", "17", "18", "18"]
+
+    def test_partial_sync_is_not_complete(self, source):
+        times_slice = TimesSlice("car", 2024, "zcta")
+        sync_times("car", 2024, "zcta", source=source, states=["17"])
+        assert is_synced(times_slice, ["17"])
+        assert not is_synced(times_slice, ["17", "18"])
+        assert not is_synced(times_slice)
+
+        # A full sync only fetches the states still missing
+        sync_times("car", 2024, "zcta", source=source)
+        assert source.reads == ["17", "18"]
+        assert is_synced(times_slice)
+        manifest = json.loads(
+            (get_times_dir(times_slice) / "_manifest.json").read_text()
+        )
+        assert manifest["all_states"] == ["17", "18"]
+        assert manifest["states"] == {"17": 150, "18": 75}
+
+
+class TestReadTimes:
+    def test_filters(self, synced):
+        result = read_times(
+            "car",
+            2024,
+            "zcta",
+            max_duration=120,
+            origins=["17001"],
+            destinations=["17000", "17002", "17009"],
+        )
+        assert result.sort("destination_id").rows() == [
+            ("17001", "17000", 60.0),
+            ("17001", "17002", 60.0),
+        ]
+
+    def test_origin_states(self, synced):
+        result = scan_times(
+            "car", 2024, "zcta", origin_states=["18"]
+        ).collect()
+        assert result.height == 75
+        assert result["origin_id"].str.starts_with("18").all()
+        assert result.columns == [
+            "origin_id",
+            "destination_id",
+            "duration_sec",
+        ]
+
+    def test_unsynced_slice(self):
+        assert not is_synced(TimesSlice("walk", 2024, "zcta"))
+        with pytest.raises(FileNotFoundError, match="sync_times"):
+            read_times("walk", 2024, "zcta", sync=False)
+
+    def test_reads_every_state_after_partial_sync(self, source, monkeypatch):
+        monkeypatch.setattr(tq.traveltimes, "OpenTimesSource", lambda: source)
+        sync_times("car", 2024, "zcta", source=source, states=["18"])
+        assert (
+            scan_times("car", 2024, "zcta", origin_states=["18"])
+            .collect()
+            .height
+            == 75
+        )
+        assert source.reads == ["18"]
+
+        with pytest.raises(FileNotFoundError):
+            read_times("car", 2024, "zcta", sync=False)
+        assert read_times("car", 2024, "zcta").height == 225
+        assert source.reads == ["18", "17"]
+
+    def test_syncs_on_first_read(self, source, monkeypatch):
+        monkeypatch.setattr(tq.traveltimes, "OpenTimesSource", lambda: source)
+        result = read_times("car", 2024, "zcta", max_duration=0)
+        assert sorted(source.reads) == ["17", "18"]
+        assert result.height == 15
+        assert result.schema["duration_sec"] == pl.Float64
@@ -2,7 +2,7 @@ from pathlib import Path
 
 import pytest
 
-from tq.utils import get_env_file_path
+from tq.utils import get_env_file_path, get_project_root, temp_path
 
 
 class TestGetEnvFilePath:
@@ -31,3 +31,38 @@ class TestGetEnvFilePath:
             result = get_env_file_path()
 
         assert result == tmp_path / ".env"
+
+
+class TestGetProjectRoot:
+    def test_finds_git_dir_in_parents(self, tmp_path, monkeypatch):
+        (tmp_path / ".git").mkdir()
+        nested = tmp_path / "projects" / "2025_07_blues"
+        nested.mkdir(parents=True)
+        monkeypatch.setattr(Path, "cwd", lambda: nested)
+
+        assert get_project_root() == tmp_path
+
+    def test_finds_git_file_of_worktree(self, tmp_path, monkeypatch):
+        (tmp_path / ".git").write_text("gitdir: /elsewhere/.git/worktrees/x")
+        monkeypatch.setattr(Path, "cwd", lambda: tmp_path)
+
+        assert get_project_root() == tmp_path
+
+    def test_memoized_per_working_directory(self, tmp_path, monkeypatch):
+        (tmp_path / ".git").mkdir()
+        monkeypatch.setattr(Path, "cwd", lambda: tmp_path)
+        get_project_root()
+
+        (tmp_path / ".git").rmdir()
+        assert get_project_root() == tmp_path
+
+
+class TestTempPath:
+    def test_unique_sibling_per_call(self, tmp_path):
+        path = tmp_path / "result.parquet"
+        paths = {temp_path(path) for _ in range(100)}
+        assert len(paths) == 100
+        for tmp in paths:
+            assert tmp.parent == tmp_path
+            assert tmp.name.startswith("result.parquet.")
+            assert tmp.suffix == ".tmp"